@@ -17,6 +17,7 @@ from warlock.callbacks.callback_node_tunner import CallbackNodeTunner
 from warlock.callbacks.callback_pod_operator import CallbackPodsOperator
 from warlock.callbacks.callback_ring_tunner import CallbackRingTunner
 from warlock.callbacks.callback_state_printer import CallbackStatePrinter
+from warlock.callbacks.callback_topology_index import CallbackTopologyIndex
 from warlock.spell_specs import SpellSpecs
 from warlock.states.kube_state_reader import KubernetesState
 from warlock.warlock import WarlockSpellCaster
@@ -58,10 +59,15 @@ def main(cmd_args):
             spells_specs=master_spell
         )
     else:
+        kube_state = KubernetesState()
         warlock = WarlockSpellCaster(
             state_callbacks=[
                 CallbackPodsOperator(spell_master_specs=master_spell),
-                CallbackIaasObserver(spell_master_specs=master_spell),
+                CallbackIaasObserver(
+                    spell_master_specs=master_spell,
+                    inventory_dir=cmd_args.inventory_dir
+                ),
+                CallbackTopologyIndex(spell_master_specs=master_spell, kube_state=kube_state),
                 CallbackEsxiObserver(spell_master_specs=master_spell),
                 CallbackNodeObserver(spell_master_specs=master_spell),
                 CallbackStatePrinter(spell_master_specs=master_spell),
@@ -81,6 +87,8 @@ if __name__ == '__main__':
     # parser.add_argument("--username", default="capv", help="Username for SSH.")
     # parser.add_argument("--password", help="Password for SSH (optional).")
     parser.add_argument("--spell_file", default="spell.json", help="a master spell warlock will read")
+    parser.add_argument("--inventory_dir", default="",
+                        help="vCenter inventory snapshot directory, empty string disables warm start")
     parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
                         help="Set the logging level")
 
@@ -0,0 +1,145 @@
+"""
+Unit tests for AsyncShellOperator and JsonStreamDecoder,
+commands are local python and sleep processes.
+
+Author: Mustafa Bayramov
+spyroot@gmail.com
+mbayramo@stanford.edu
+"""
+import asyncio
+import json
+import sys
+import time
+import unittest
+
+from warlock.operators.async_shell_operator import (
+    AsyncShellOperator,
+    JsonStreamDecoder,
+    CommandError,
+    CommandTimeoutError
+)
+
+POD_LIST = {
+    'apiVersion': 'v1',
+    'items': [
+        {'metadata': {'name': f'pod-{i}', 'annotations': {'note': 'brace } [ and "quote" \\ é'}},
+         'spec': {'containers': [{'args': ['{', ']']}]}}
+        for i in range(5)
+    ],
+    'kind': 'List',
+    'metadata': {'resourceVersion': ''},
+}
+
+
+def python_cmd(code):
+    """Return argument list that runs python code"""
+    return [sys.executable, "-c", code]
+
+
+class TestJsonStreamDecoder(unittest.TestCase):
+
+    def test_items_any_chunking(self):
+        """Test items decoded for every chunk size"""
+        text = json.dumps(POD_LIST, ensure_ascii=False)
+        for size in (1, 2, 3, 7, 64, len(text)):
+            decoder = JsonStreamDecoder(items=True)
+            items = []
+            for i in range(0, len(text), size):
+                items.extend(decoder.feed(text[i:i + size]))
+            decoder.close()
+            self.assertEqual(items, POD_LIST['items'], f"chunk size {size}")
+
+    def test_items_emitted_early_and_buffer_trimmed(self):
+        """Test item returned once closed and decoded text dropped"""
+        text = json.dumps(POD_LIST)
+        first_start = text.index('[', text.index('"items"')) + 1
+        first_end = first_start + len(json.dumps(POD_LIST['items'][0]))
+        decoder = JsonStreamDecoder(items=True)
+        items = decoder.feed(text[:first_end])
+        self.assertEqual([i['metadata']['name'] for i in items], ["pod-0"])
+        self.assertLess(len(decoder._buf), 8)
+
+    def test_values(self):
+        """Test stream of concatenated values"""
+        text = json.dumps({'type': 'ADDED'}) + "\n" + json.dumps({'type': 'DELETED', 'x': [1, {'y': '}'}]})
+        decoder = JsonStreamDecoder()
+        values = decoder.feed(text[:10]) + decoder.feed(text[10:])
+        self.assertEqual([v['type'] for v in values], ["ADDED", "DELETED"])
+        self.assertEqual(decoder.close(), [])
+        decoder.feed('{"open": ')
+        with self.assertRaises(ValueError):
+            decoder.close()
+
+    def test_values_scalar(self):
+        """Test bare top level scalar returned on close"""
+        for text in ('42', ' "a{b"\n', 'true', '{"a": 1} '):
+            decoder = JsonStreamDecoder()
+            values = []
+            for c in text:
+                values.extend(decoder.feed(c))
+            values.extend(decoder.close())
+            self.assertEqual(values, [json.loads(text)], text)
+
+
+class TestAsyncShellOperator(unittest.TestCase):
+
+    def test_run_command(self):
+        """Test stdout lines and error"""
+        shell = AsyncShellOperator()
+        lines = asyncio.run(shell.run_command(python_cmd("print('a'); print('b')")))
+        self.assertEqual(lines, ["a", "b"])
+        with self.assertRaises(CommandError) as ctx:
+            asyncio.run(shell.run_command(python_cmd("import sys; sys.stderr.write('NotFound'); sys.exit(2)")))
+        self.assertEqual((ctx.exception.returncode, ctx.exception.stderr), (2, "NotFound"))
+        # not run by shell
+        lines = asyncio.run(shell.run_command("echo '$HOME; ls'"))
+        self.assertEqual(lines, ["$HOME; ls"])
+
+    def test_run_command_json(self):
+        """Test large json decoded and expected error"""
+        shell = AsyncShellOperator()
+        code = f"import json, sys; sys.stdout.write(json.dumps({POD_LIST!r}))"
+        self.assertEqual(asyncio.run(shell.run_command_json(python_cmd(code))), POD_LIST)
+        err = python_cmd("import sys; sys.stderr.write('Error (NotFound)'); sys.exit(1)")
+        self.assertEqual(asyncio.run(shell.run_command_json(err, expect_error="(NotFound)")), {})
+        self.assertEqual(asyncio.run(shell.run_command_json(python_cmd("print(42)"))), 42)
+
+    def test_iter_json_items(self):
+        """Test items yielded while process still writes"""
+        shell = AsyncShellOperator()
+        code = ("import sys, time\n"
+                "sys.stdout.write('{\"items\": [{\"n\": 1},'); sys.stdout.flush()\n"
+                "time.sleep(0.5)\n"
+                "sys.stdout.write('{\"n\": 2}], \"kind\": \"List\"}')\n")
+
+        async def consume():
+            seen = []
+            start = time.monotonic()
+            async for item in shell.iter_json_items(python_cmd(code)):
+                seen.append((item['n'], time.monotonic() - start))
+            return seen
+
+        seen = asyncio.run(consume())
+        self.assertEqual([n for n, _ in seen], [1, 2])
+        self.assertLess(seen[0][1], seen[1][1] - 0.3)
+
+    def test_timeout_and_concurrency(self):
+        """Test timeout kills process and commands run concurrently"""
+        shell = AsyncShellOperator(max_concurrency=4, timeout=0.3)
+        start = time.monotonic()
+        with self.assertRaises(CommandTimeoutError):
+            asyncio.run(shell.run_command(["sleep", "5"]))
+        self.assertLess(time.monotonic() - start, 3)
+
+        shell = AsyncShellOperator(max_concurrency=4, timeout=10)
+        start = time.monotonic()
+        results = asyncio.run(shell.run_many([["sleep", "0.3"]] * 4 + [["false"]]))
+        self.assertLess(time.monotonic() - start, 1.5)
+        self.assertEqual(results[:4], [[""]] * 4)
+        self.assertIsInstance(results[4], CommandError)
+        with self.assertRaises(ValueError):
+            AsyncShellOperator(max_concurrency=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
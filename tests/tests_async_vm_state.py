@@ -0,0 +1,138 @@
+"""
+Unit tests for async vim state reader facade and single-flight.
+
+Author: Mustafa Bayramov
+spyroot@gmail.com
+mbayramo@stanford.edu
+"""
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from warlock.states.async_vm_state import AsyncVimStateReader, SingleFlight
+from warlock.states.vm_state import VMwareVimStateReader, EsxHostNotFound
+
+
+class SlowReader(VMwareVimStateReader):
+    """Reader where read_esxi_host blocks until released"""
+
+    def __init__(self):
+        super().__init__(None, vcenter_ip="vc", username="u", password="p")
+        self.release = threading.Event()
+        self.calls = 0
+        self._calls_lock = threading.Lock()
+
+    def read_esxi_host(self, identifier: str):
+        with self._calls_lock:
+            self.calls += 1
+        self.release.wait(5)
+        if identifier == "missing":
+            raise EsxHostNotFound(identifier)
+        return f"host-{identifier}"
+
+    def read_host_hardware(self, esxi_host_identifier: str):
+        return self.read_esxi_host(esxi_host_identifier)
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def test_coalesce(self):
+        """Test concurrent calls with same key share one call"""
+        single_flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def fn(x):
+            calls.append(x)
+            release.wait(5)
+            return x * 2
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [executor.submit(single_flight.do, "k", fn, 21) for _ in range(4)]
+            while single_flight.in_flight() == 0:
+                time.sleep(0.01)
+            time.sleep(0.05)
+            release.set()
+            results = [f.result() for f in futures]
+
+        self.assertEqual(results, [42] * 4)
+        self.assertEqual(calls, [21])
+        self.assertEqual(single_flight.in_flight(), 0)
+
+    def test_exception_and_reentrant(self):
+        """Test exception propagated and re-entrant call not deadlocked"""
+        single_flight = SingleFlight()
+
+        def fail():
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            single_flight.do("k", fail)
+
+        def outer():
+            return single_flight.do("k", lambda: 1) + 1
+
+        self.assertEqual(single_flight.do("k", outer), 2)
+
+
+class TestAsyncVimStateReader(unittest.TestCase):
+
+    def test_submit_coalesce(self):
+        """Test identical in-flight submits share one future"""
+        reader = SlowReader()
+        with AsyncVimStateReader(reader, max_workers=4) as vim_reader:
+            f1 = vim_reader.submit('read_esxi_host', "10.0.0.1")
+            f2 = vim_reader.submit('read_esxi_host', "10.0.0.1")
+            f3 = vim_reader.submit('read_esxi_host', "10.0.0.2")
+            self.assertIs(f1, f2)
+            self.assertIsNot(f1, f3)
+            reader.release.set()
+            self.assertEqual(f1.result(), "host-10.0.0.1")
+            self.assertEqual(f3.result(), "host-10.0.0.2")
+        self.assertEqual(reader.calls, 2)
+
+    def test_nested_calls_coalesced(self):
+        """Test nested reader calls from many threads coalesced"""
+        reader = SlowReader()
+        with AsyncVimStateReader(reader, max_workers=8) as vim_reader:
+            futures = vim_reader.map('read_host_hardware', ["10.0.0.1"])
+            futures += [vim_reader.submit('read_esxi_host', "10.0.0.1")]
+            # reader not patched, facade calls through a view
+            self.assertNotIn('read_esxi_host', reader.__dict__)
+            self.assertIs(type(reader), SlowReader)
+            time.sleep(0.1)
+            reader.release.set()
+            results = [f.result() for f in futures]
+        self.assertEqual(set(results), {"host-10.0.0.1"})
+        self.assertEqual(reader.calls, 1)
+
+    def test_view_shares_reader_state(self):
+        """Test state written through facade visible on reader"""
+        reader = SlowReader()
+        reader.release.set()
+        with AsyncVimStateReader(reader) as vim_reader:
+            vim_reader.submit('read_esxi_host', "10.0.0.1").result()
+            vim_reader.submit('_add_to_host_cache', "host-1", SimpleNamespace(
+                uuid="uuid-1", host="10.0.0.1", moid="host-1")).result()
+        self.assertEqual(reader.calls, 1)
+        self.assertEqual(reader.esxi_host_cache["uuid-1"], "host-1")
+
+    def test_async_call(self):
+        """Test asyncio call and exception propagation"""
+        reader = SlowReader()
+        reader.release.set()
+
+        async def run(vim_reader):
+            return await asyncio.gather(
+                vim_reader.call('read_esxi_host', "10.0.0.1"),
+                vim_reader.call('read_esxi_host', "missing"),
+                return_exceptions=True)
+
+        with AsyncVimStateReader(reader) as vim_reader:
+            result = asyncio.run(run(vim_reader))
+
+        self.assertEqual(result[0], "host-10.0.0.1")
+        self.assertIsInstance(result[1], EsxHostNotFound)
@@ -0,0 +1,85 @@
+"""
+Unit tests for parallel pod lifecycle of CallbackPodsOperator,
+kubectl and spell specs are mocked.
+
+Author: Mustafa Bayramov
+spyroot@gmail.com
+mbayramo@stanford.edu
+"""
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from warlock.callbacks.callback_pod_operator import CallbackPodsOperator
+
+SHELL = 'warlock.callbacks.callback_pod_operator.ShellOperator'
+
+
+def running_pod(name, ip):
+    """Return running pod spec"""
+    return {'metadata': {'name': name},
+            'status': {'phase': 'Running', 'podIPs': [{'ip': ip}], 'hostIP': '10.0.0.2'}}
+
+
+class TestCallbackPodsParallel(unittest.TestCase):
+
+    def setUp(self):
+        specs = MagicMock()
+        specs.absolute_dir = Path("/tmp")
+        specs.pods_spells.return_value = {
+            'server0': {'type': 'pod', 'pod_name': 'server0', 'pod_spec_file': 'server0.yaml'},
+            'client0': {'type': 'pod', 'pod_name': 'client0', 'pod_spec_file': 'client0.yaml'},
+            'server1': {'type': 'pod', 'pod_name': 'server1', 'pod_spec_file': 'server1.yaml',
+                        'namespace': 'perf'},
+            'comment': 'not a pod',
+        }
+        self.specs = specs
+        self.caster_state = MagicMock(k8s_pods_states={})
+
+    def test_kubectl_bulk_apply_wait_delete(self):
+        """Test one apply, wait, get and delete per namespace"""
+        callback = CallbackPodsOperator(self.specs, dry_run=False)
+        callback.register_spell_caster_state(self.caster_state)
+
+        def get_pods(cmd):
+            if "-n perf" in cmd:
+                return running_pod("server1", "10.1.0.3")
+            return {'items': [running_pod("server0", "10.1.0.1"), running_pod("client0", "10.1.0.2")]}
+
+        with patch(SHELL) as shell:
+            shell.run_command_json.side_effect = lambda cmd: {} if cmd.startswith("kubectl apply") else get_pods(cmd)
+            callback.on_scenario_begin()
+
+            applies = sorted(c.args[0] for c in shell.run_command_json.call_args_list if "apply" in c.args[0])
+            self.assertEqual(len(applies), 2)
+            self.assertIn("-f /tmp/server0.yaml -f /tmp/client0.yaml -n default", applies[0])
+            waits = [c.args[0] for c in shell.run_command.call_args_list]
+            self.assertEqual(len(waits), 2)
+            self.assertTrue(all(w.startswith("kubectl wait --for=condition=Ready") for w in waits))
+
+            self.assertEqual(self.caster_state.k8s_pods_states['client0']['ip'], "10.1.0.2")
+            self.assertEqual(self.caster_state.k8s_pods_states['server1']['ip'], "10.1.0.3")
+
+            shell.run_command.reset_mock()
+            callback.on_scenario_end()
+            deletes = sorted(c.args[0] for c in shell.run_command.call_args_list)
+            self.assertEqual(len(deletes), 2)
+            self.assertTrue(deletes[0].startswith("kubectl delete pod server0 client0 -n default"))
+            self.assertIn("--wait=true", deletes[0])
+
+    def test_kube_state_wait(self):
+        """Test readiness waited through kube state and missing pod reported"""
+        kube_state = MagicMock()
+        kube_state.wait_for_pods_ready.side_effect = lambda names, ns, timeout: {
+            n: running_pod(n, "10.1.0.9") for n in names if n != "server1"}
+        callback = CallbackPodsOperator(self.specs, dry_run=False, kube_state=kube_state, wait_for_deletion=False)
+        callback.register_spell_caster_state(self.caster_state)
+
+        with patch(SHELL):
+            callback.on_scenario_begin()
+        self.assertEqual(kube_state.wait_for_pods_ready.call_count, 2)
+        self.assertEqual(self.caster_state.k8s_pods_states, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
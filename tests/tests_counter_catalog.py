@@ -0,0 +1,117 @@
+"""
+Unit tests for persistent counter catalog, uses fake
+performance manager.
+
+Author: Mustafa Bayramov
+spyroot@gmail.com
+mbayramo@stanford.edu
+"""
+import json
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, PropertyMock, patch
+
+from pyVmomi import vim
+
+from warlock.metrics.counter_catalog import CounterCatalog, DEFAULT_CATALOG_DIR
+from warlock.metrics.vm_metric_stats import VMwareMetricCollector
+
+
+def perf_counter(key, group, name, rollup):
+    """Return fake PerfCounterInfo"""
+    return SimpleNamespace(key=key, groupInfo=SimpleNamespace(key=group),
+                           nameInfo=SimpleNamespace(key=name), rollupType=rollup)
+
+
+def fake_collector(catalog_dir, build="21560480"):
+    """Return collector with fake service instance,  perfCounter is property mock
+    so number of catalog fetches can be checked."""
+    collector = VMwareMetricCollector(vcenter_ip="vc", username="u", password="p", catalog_dir=catalog_dir)
+    collector.si = MagicMock()
+    collector.si.content.about.instanceUuid = "vc-uuid"
+    collector.si.content.about.build = build
+    perf_manager = collector.si.content.perfManager
+    perf_counters = PropertyMock(return_value=[
+        perf_counter(6, "cpu", "usagemhz", "average"),
+        perf_counter(146, "net", "packetsTx", "summation"),
+    ])
+    type(perf_manager).perfCounter = perf_counters
+    perf_manager.QueryAvailablePerfMetric.return_value = [
+        SimpleNamespace(counterId=146, instance="4000"),
+        SimpleNamespace(counterId=146, instance=""),
+        SimpleNamespace(counterId=6, instance=""),
+    ]
+    return collector, perf_counters
+
+
+class TestCounterCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.catalog_dir = self.tmp_dir.name
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_catalog_round_trip(self):
+        """Test catalog saved and loaded, other build ignored"""
+        catalog = CounterCatalog("vc-uuid", "1", {"cpu.usagemhz.average": 6}, {"vm": [6]})
+        path = catalog.save(self.catalog_dir)
+        self.assertTrue(os.path.exists(path))
+
+        loaded = CounterCatalog.load(self.catalog_dir, "vc-uuid", "1")
+        self.assertEqual(loaded.counters, {"cpu.usagemhz.average": 6})
+        self.assertEqual(loaded.available, {"vm": [6]})
+        self.assertEqual(loaded.counter_names(), {6: "cpu.usagemhz.average"})
+        self.assertIsNone(CounterCatalog.load(self.catalog_dir, "vc-uuid", "2"))
+
+        with open(path, "w") as f:
+            f.write("{corrupted")
+        self.assertIsNone(CounterCatalog.load(self.catalog_dir, "vc-uuid", "1"))
+
+    def test_collector_fetch_once(self):
+        """Test catalog fetched once and second collector loads it from disk"""
+        collector, perf_counters = fake_collector(self.catalog_dir)
+        self.assertEqual(collector.metric_index("net.packetsTx.summation"), 146)
+        self.assertEqual(collector.resolve_metric_names([6]), ["cpu.usagemhz.average"])
+        collector.read_all_supported_metrics()
+        self.assertEqual(perf_counters.call_count, 1)
+
+        collector2, perf_counters2 = fake_collector(self.catalog_dir)
+        self.assertEqual(collector2.metric_index("cpu.usagemhz.average"), 6)
+        self.assertEqual(perf_counters2.call_count, 0)
+
+        # new vCenter build refetch catalog
+        collector3, perf_counters3 = fake_collector(self.catalog_dir, build="22000000")
+        collector3.read_all_supported_metrics()
+        self.assertEqual(perf_counters3.call_count, 1)
+
+    def test_default_catalog_dir(self):
+        """Test collector persists catalog in default dir, empty string disables"""
+        collector = VMwareMetricCollector(vcenter_ip="vc", username="u", password="p")
+        self.assertEqual(collector.catalog_dir, DEFAULT_CATALOG_DIR)
+
+        collector, perf_counters = fake_collector("")
+        with patch.object(CounterCatalog, 'save') as save:
+            collector.read_all_supported_metrics()
+        self.assertEqual(perf_counters.call_count, 1)
+        save.assert_not_called()
+
+    def test_available_per_entity_type(self):
+        """Test available counters cached per entity type and persisted"""
+        collector, _ = fake_collector(self.catalog_dir)
+        vm1, vm2 = vim.VirtualMachine("vm-1"), vim.VirtualMachine("vm-2")
+        collector.get_managed_entities = MagicMock(side_effect=[vm1, vm2])
+
+        counter_ids, names = collector.read_vm_available_perf_metric("vm-a")
+        self.assertEqual(counter_ids, [6, 146])
+        self.assertEqual(names, ["cpu.usagemhz.average", "net.packetsTx.summation"])
+        collector.read_vm_available_perf_metric("vm-b")
+        perf_manager = collector.si.content.perfManager
+        self.assertEqual(perf_manager.QueryAvailablePerfMetric.call_count, 1)
+
+        path = CounterCatalog.catalog_path(self.catalog_dir, "vc-uuid", "21560480")
+        with open(path) as f:
+            self.assertEqual(json.load(f)["available"], {"vm": [6, 146]})
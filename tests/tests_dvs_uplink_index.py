@@ -0,0 +1,117 @@
+"""
+Unit tests for DVS uplink index in VMwareVimStateReader.
+
+Author: Mustafa Bayramov
+spyroot@gmail.com
+mbayramo@stanford.edu
+"""
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+
+from pyVmomi import vim
+
+from warlock.states.vm_state import VMwareVimStateReader, SwitchNotFound
+
+
+def host_member(host_moid: str, pnics):
+    """Return fake DistributedVirtualSwitchHostMember"""
+    return SimpleNamespace(config=SimpleNamespace(
+        host=vim.HostSystem(host_moid),
+        backing=SimpleNamespace(pnicSpec=[SimpleNamespace(pnicDevice=p) for p in pnics])))
+
+
+class FakeInventory:
+    """Fake property collector over two switches and two hosts"""
+
+    def __init__(self):
+        self.versions = {"dvs-1": "3", "dvs-2": "1"}
+        self.members = {
+            "dvs-1": [host_member("host-12", ["vmnic5"]), host_member("host-13", ["vmnic8"])],
+            "dvs-2": [host_member("host-12", ["vmnic2", "vmnic3"])],
+        }
+        self.calls = []
+
+    def collect_properties(self, root, vim_type, props):
+        self.calls.append((vim_type, tuple(props)))
+        if vim_type is vim.HostSystem:
+            return {vim.HostSystem("host-12"): {'name': 'esxi-a'},
+                    vim.HostSystem("host-13"): {'name': 'esxi-b'}}
+        if vim_type is vim.DistributedVirtualSwitch:
+            result = {}
+            for moid, version in self.versions.items():
+                entry = {'uuid': f"uuid-{moid}", 'config.configVersion': version}
+                if 'config.host' in props:
+                    entry['config.host'] = self.members[moid]
+                result[vim.dvs.VmwareDistributedVirtualSwitch(moid)] = entry
+            return result
+        if vim_type is vim.dvs.DistributedVirtualPortgroup:
+            return {vim.dvs.DistributedVirtualPortgroup(f"dvportgroup-{moid}"): {
+                'key': f"dvportgroup-{moid}",
+                'config.distributedVirtualSwitch': vim.dvs.VmwareDistributedVirtualSwitch(moid)}
+                for moid in self.versions}
+        return {}
+
+
+class TestDvsUplinkIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.reader = VMwareVimStateReader(None, vcenter_ip="vc", username="u", password="p")
+        self.reader.si = MagicMock()
+        self.inventory = FakeInventory()
+        patcher = patch.object(self.reader, 'collect_properties', side_effect=self.inventory.collect_properties)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_index(self):
+        """Test index built once for all switches"""
+        self.assertEqual(self.reader.read_dvs_pnics_by_switch_uuid("uuid-dvs-1"),
+                         {'esxi-a': ['vmnic5'], 'esxi-b': ['vmnic8']})
+        num_calls = len(self.inventory.calls)
+        self.assertEqual(self.reader.read_dvs_pnics_by_switch_uuid("uuid-dvs-2"),
+                         {'esxi-a': ['vmnic2', 'vmnic3']})
+        self.assertEqual(self.reader.find_dvs_uplinks("uuid-dvs-1", "esxi-b"), ["vmnic8"])
+        self.assertEqual(self.reader.find_dvs_uplinks("uuid-dvs-2", "esxi-b"), [])
+        self.assertEqual(self.reader.find_portgroup_switch("dvportgroup-dvs-2"), "uuid-dvs-2")
+        self.assertEqual(self.reader.dvs_switches_of_hosts(["esxi-b"]), {"uuid-dvs-1"})
+        self.assertEqual(self.reader.dvs_switches_of_hosts(["esxi-a"]), {"uuid-dvs-1", "uuid-dvs-2"})
+        self.assertEqual(len(self.inventory.calls), num_calls)
+
+    def test_unknown_switch(self):
+        """Test unknown switch raise SwitchNotFound"""
+        with self.assertRaises(SwitchNotFound):
+            self.reader.read_dvs_pnics_by_switch_uuid("uuid-dvs-9")
+
+    def test_config_version_invalidation(self):
+        """Test only switch with new config version re-indexed"""
+        self.reader.build_dvs_uplink_index()
+        self.inventory.calls.clear()
+        self.reader.build_dvs_uplink_index()
+        self.assertEqual(len(self.inventory.calls), 1)
+
+        self.inventory.versions["dvs-2"] = "2"
+        self.inventory.members["dvs-2"] = [host_member("host-13", ["vmnic9"])]
+        self.inventory.members["dvs-1"] = []
+        self.reader.build_dvs_uplink_index()
+        self.assertEqual(self.reader.find_dvs_uplinks("uuid-dvs-2", "esxi-b"), ["vmnic9"])
+        self.assertEqual(self.reader.find_dvs_uplinks("uuid-dvs-2", "esxi-a"), [])
+        self.assertEqual(self.reader.find_dvs_uplinks("uuid-dvs-1", "esxi-a"), ["vmnic5"])
+
+        del self.inventory.versions["dvs-1"]
+        self.reader.build_dvs_uplink_index()
+        self.assertNotIn("uuid-dvs-1", self.reader._dvs_cache)
+        self.assertIsNone(self.reader._portgroup_switch.get("dvportgroup-dvs-1"))
+
+    def test_config_version_checked_on_read(self):
+        """Test reads re-check config version once index older than ttl"""
+        self.assertEqual(self.reader.find_dvs_uplinks("uuid-dvs-2", "esxi-a"), ["vmnic2", "vmnic3"])
+        self.inventory.versions["dvs-2"] = "2"
+        self.inventory.members["dvs-2"] = [host_member("host-12", ["vmnic4"])]
+        # within ttl served from index
+        self.assertEqual(self.reader.find_dvs_uplinks("uuid-dvs-2", "esxi-a"), ["vmnic2", "vmnic3"])
+
+        self.reader.dvs_index_ttl = 0
+        self.assertEqual(self.reader.find_dvs_uplinks("uuid-dvs-2", "esxi-a"), ["vmnic4"])
+        self.assertEqual(self.reader.read_dvs_pnics_by_switch_uuid("uuid-dvs-2"), {'esxi-a': ['vmnic4']})
+        switch_calls = [c for c in self.inventory.calls if c[0] is vim.DistributedVirtualSwitch]
+        self.assertTrue(all('config.host' in props for _, props in switch_calls))
@@ -0,0 +1,120 @@
+"""
+Unit tests for esxi host hardware model and shared host hardware cache
+in VMwareVimStateReader.
+
+Author: Mustafa Bayramov
+spyroot@gmail.com
+mbayramo@stanford.edu
+"""
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch, PropertyMock, MagicMock
+
+from warlock.states.esxi_host_hardware import EsxiHostHardware
+from warlock.states.vm_state import VMwareVimStateReader, PciDeviceClass
+
+
+def sample_host_system(moid: str = "host-12"):
+    """Return a fake vim.HostSystem with two numa nodes, three PCI devices and two pnics.
+    :return:
+    """
+    numa_info = SimpleNamespace(
+        numNodes=2,
+        numaNode=[
+            SimpleNamespace(typeId=0, cpuID=[0, 1], pciId=["0000:18:00.0\n", "0000:00:17.0"]),
+            SimpleNamespace(typeId=1, cpuID=[2, 3], pciId=["0000:88:00.0"]),
+        ])
+    pci_devices = [
+        SimpleNamespace(id="0000:18:00.0", classId=0x0200, deviceName="X550", vendorName="Intel(R)"),
+        SimpleNamespace(id="0000:88:00.0", classId=0x0200, deviceName="E810", vendorName="Intel(R)"),
+        SimpleNamespace(id="0000:00:17.0", classId=0x0106, deviceName="SATA", vendorName="Intel(R)"),
+    ]
+    pnics = [
+        SimpleNamespace(device="vmnic0", pci="0000:18:00.0", mac="e4:43:4b:62:e9:fc",
+                        driver="ixgben", driverVersion="1.15.1.0", firmwareVersion="3.30",
+                        linkSpeed=SimpleNamespace(speedMb=10000)),
+        SimpleNamespace(device="vmnic5", pci="0000:88:00.0", mac="e4:43:4b:62:e9:fd",
+                        driver="icen", driverVersion="1.11.2.0", firmwareVersion="4.20",
+                        linkSpeed=None),
+    ]
+    return SimpleNamespace(
+        _moId=moid,
+        hardware=SimpleNamespace(numaInfo=numa_info, pciDevice=pci_devices),
+        config=SimpleNamespace(
+            network=SimpleNamespace(pnic=pnics),
+            pciPassthruInfo=[
+                SimpleNamespace(id="0000:88:00.0", sriovEnabled=True, numVirtualFunction=8),
+                SimpleNamespace(id="0000:18:00.0", sriovEnabled=False, numVirtualFunction=0),
+                SimpleNamespace(id="0000:00:17.0", passthruEnabled=False),
+            ]),
+    )
+
+
+class TestEsxiHostHardware(unittest.TestCase):
+
+    def test_from_host_system(self):
+        """Test we can build hardware model from host system"""
+        hw = EsxiHostHardware.from_host_system(sample_host_system())
+        self.assertEqual(hw.moid, "host-12")
+        self.assertEqual(hw.num_numa_nodes, 2)
+        self.assertEqual(hw.numa_topology['cpu'], {0: ['0', '1'], 1: ['2', '3']})
+        self.assertEqual(hw.numa_topology['pci'][0], ["0000:18:00.0", "0000:00:17.0"])
+        self.assertEqual(len(hw.pci_devices), 3)
+        self.assertEqual(hw.pnic_names(), ["vmnic0", "vmnic5"])
+        self.assertEqual(hw.sriov_devices, {"0000:88:00.0": 8})
+
+    def test_pci_by_class(self):
+        """Test PCI class index"""
+        hw = EsxiHostHardware.from_host_system(sample_host_system())
+        net = hw.pci_devices_by_class(PciDeviceClass.NETWORK_CONTROLLER)
+        self.assertEqual(set(net.keys()), {"0000:18:00.0", "0000:88:00.0"})
+        storage = hw.pci_devices_by_class(PciDeviceClass.MASS_STORAGE_CONTROLLER.value)
+        self.assertEqual(list(storage.keys()), ["0000:00:17.0"])
+        self.assertEqual(hw.pci_devices_by_class(PciDeviceClass.DISPLAY_CONTROLLER), {})
+        self.assertEqual(len(hw.pci_devices_by_class(None)), 3)
+
+    def test_find_pnic_and_numa(self):
+        """Test pnic lookup by pci id and numa node lookup"""
+        hw = EsxiHostHardware.from_host_system(sample_host_system())
+        pnic_name, pnic_data = hw.find_pnic("0000:88:00.0")
+        self.assertEqual(pnic_name, "vmnic5")
+        self.assertFalse(pnic_data['is_connected'])
+        self.assertEqual(hw.find_pnic("0000:00:17.0"), (None, None))
+        self.assertEqual(hw.numa_node_of_pci("0000:88:00.0"), 1)
+        self.assertIsNone(hw.numa_node_of_pci("0000:99:00.0"))
+
+    def test_no_numa_info(self):
+        """Test host without numa info"""
+        host = sample_host_system()
+        host.hardware.numaInfo = None
+        hw = EsxiHostHardware.from_host_system(host)
+        self.assertIsNone(hw.num_numa_nodes)
+        self.assertEqual(hw.numa_topology, {'cpu': None, 'pci': None})
+
+    def test_reader_builds_model_once(self):
+        """Test reader build model once per host and shares it across identifiers"""
+        reader = VMwareVimStateReader(None, vcenter_ip="vc", username="u", password="p")
+        host = MagicMock()
+        host._moId = "host-12"
+        hardware_prop = PropertyMock(return_value=sample_host_system().hardware)
+        config_prop = PropertyMock(return_value=sample_host_system().config)
+        type(host).hardware = hardware_prop
+        type(host).config = config_prop
+
+        with patch.object(reader, 'connect_to_vcenter'), \
+                patch.object(reader, 'read_esxi_host', return_value=host) as read_host:
+            hw_by_name = reader.read_host_hardware("10.252.80.107")
+            hw_by_uuid = reader.read_host_hardware("4c4c4544-004d-5010-805a-b8c04f325732")
+            hw_by_name_again = reader.read_host_hardware("10.252.80.107")
+            pnics = reader.read_esxi_host_pnic("10.252.80.107")
+            pnic_name, _ = reader.find_esxi_host_pnic("10.252.80.107", "0000:18:00.0")
+            pci = reader.find_pci_device("10.252.80.107", "0000:88:00.0")
+
+        self.assertIs(hw_by_name, hw_by_uuid)
+        self.assertIs(hw_by_name, hw_by_name_again)
+        self.assertEqual(read_host.call_count, 2)
+        self.assertEqual(hardware_prop.call_count, 1)
+        self.assertEqual(config_prop.call_count, 1)
+        self.assertIn("vmnic0", pnics)
+        self.assertEqual(pnic_name, "vmnic0")
+        self.assertEqual(pci.deviceName, "E810")
@@ -0,0 +1,136 @@
+"""
+Unit tests for preallocated esxi port sampler, uses fake esxi state readers.
+
+Author: Mustafa Bayramov
+spyroot@gmail.com
+mbayramo@stanford.edu
+"""
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+
+from warlock.callbacks.named_tuples import PortInfo
+from warlock.metrics.esxi_metric_collector import EsxiMetricCollector, PORT_COUNTERS
+
+
+def netstats(port_id, txpps):
+    """Return net-stats sample for one port"""
+    return {'stats': [{'ports': [
+        {'id': port_id, 'txpps': txpps, 'rxpps': 2 * txpps, 'intr': {'count': 7}},
+        {'id': 999, 'txpps': 1},
+    ]}]}
+
+
+def port_info(port_id, client_name):
+    """Return PortInfo as read_netstats_vm_net_port_ids"""
+    return PortInfo(port_id, 5, 9, "DvsPortset-0", "00:50:56:00:00:01", client_name, "SRIOV" in client_name)
+
+
+class TestPortIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.release = threading.Event()
+        self.host_a = MagicMock(fqdn="10.0.0.1")
+        self.host_b = MagicMock(fqdn="10.0.0.2")
+
+        def host_a_ports():
+            self.release.wait(1)
+            return {
+                100: port_info(100, "vm-1.eth0"),
+                101: port_info(101, "SRIOVvm-1.eth1"),
+                102: port_info(102, "vmk0"),
+            }
+
+        def host_b_ports():
+            # host a blocks until host b is read, hence hosts are read concurrently
+            self.release.set()
+            return {
+                200: port_info(200, "vm-2.eth0"),
+                201: port_info(201, "vm-1.eth0"),
+            }
+
+        self.host_a.read_netstats_vm_net_port_ids.side_effect = host_a_ports
+        self.host_b.read_netstats_vm_net_port_ids.side_effect = host_b_ports
+        self.collector = EsxiMetricCollector([self.host_a, self.host_b])
+
+    def test_port_index(self):
+        """Test inverted index built from all hosts"""
+        port_index = self.collector.read_port_index()
+        self.assertTrue(self.release.is_set())
+        self.assertEqual(port_index["vm-1"], [
+            ("10.0.0.1", 100, "vm-1.eth0"),
+            ("10.0.0.1", 101, "SRIOVvm-1.eth1"),
+            ("10.0.0.2", 201, "vm-1.eth0"),
+        ])
+        self.assertEqual(port_index["vmk0"], [("10.0.0.1", 102, "vmk0")])
+
+    def test_map_vm_hosts_port_ids(self):
+        """Test vm resolved on first host, substring and adapter filter"""
+        result = self.collector.map_vm_hosts_port_ids(["vm-1", "vm-2", "missing"])
+        self.assertEqual(result["vm-1"], {
+            'port_ids': [100, 101],
+            'esxi_host': "10.0.0.1",
+            'port_vm_nic_name': ["vm-1.eth0", "SRIOVvm-1.eth1"]
+        })
+        self.assertEqual(result["vm-2"]['esxi_host'], "10.0.0.2")
+        self.assertNotIn("missing", result)
+
+        self.release.clear()
+        result = self.collector.filtered_map_vm_hosts_port_ids(["vm-"], {"vm-": "eth1"})
+        self.assertEqual(result["vm-"]['port_ids'], [101])
+
+
+class TestEsxiPortSampler(unittest.TestCase):
+
+    def setUp(self):
+        self.host_a = MagicMock(fqdn="10.0.0.1")
+        self.host_b = MagicMock(fqdn="10.0.0.2")
+        self.host_a.read_netstats_by_vm.side_effect = lambda adapter: netstats(100, 10)
+        self.host_b.read_netstats_by_vm.side_effect = lambda adapter: netstats(200, 20)
+        self.collector = EsxiMetricCollector([self.host_a, self.host_b])
+        self.port_map = {
+            "vm-1": {'port_ids': [100, 101], 'esxi_host': "10.0.0.1",
+                     'port_vm_nic_name': ["vm-1.eth0", "SRIOVvm-1.eth0"]},
+            "vm-2": {'port_ids': [200], 'esxi_host': "10.0.0.2", 'port_vm_nic_name': ["vm-2.eth0"]},
+        }
+
+    def test_sample_preallocated(self):
+        """Test samples filled in place with per port timestamps"""
+        with patch.object(self.collector, 'filtered_map_vm_hosts_port_ids', return_value=self.port_map):
+            samples = self.collector.sample_vm_port_metrics(
+                ["vm-1", "vm-2"], {"vm-1": "eth0", "vm-2": "eth0"}, num_samples=3, interval=0.02)
+
+        self.assertEqual(samples.values.shape, (3, 2, len(PORT_COUNTERS)))
+        self.assertEqual(samples.port_labels, [("vm-1", 100), ("vm-2", 200)])
+        np.testing.assert_array_equal(samples.values[:, 0, 0], [10, 10, 10])
+        np.testing.assert_array_equal(samples.values[2, 1], [20, 40, 0, 0, 0, 7])
+        self.assertFalse(np.isnan(samples.timestamps).any())
+        self.assertTrue((np.diff(samples.timestamps[:, 0]) > 0.01).all())
+        self.host_a.read_netstats_by_vm.assert_called_with("vm-1.eth0")
+
+    def test_drift_free_schedule(self):
+        """Test slow read doesn't shift sample schedule"""
+        def slow_read(adapter):
+            time.sleep(0.03)
+            return netstats(100, 10)
+
+        self.host_a.read_netstats_by_vm.side_effect = slow_read
+        port_map = {"vm-1": self.port_map["vm-1"]}
+        with patch.object(self.collector, 'filtered_map_vm_hosts_port_ids', return_value=port_map):
+            start = time.monotonic()
+            self.collector.sample_vm_port_metrics(["vm-1"], {}, num_samples=4, interval=0.05)
+            elapsed = time.monotonic() - start
+        # three intervals plus last read, sleep(interval) would take 4 * 0.03 + 3 * 0.05
+        self.assertLess(elapsed, 0.25)
+
+    def test_stop_event(self):
+        """Test stop event leaves unsampled rows NaN"""
+        stop_event = threading.Event()
+        stop_event.set()
+        with patch.object(self.collector, 'filtered_map_vm_hosts_port_ids', return_value=self.port_map):
+            samples = self.collector.sample_vm_port_metrics(
+                ["vm-1", "vm-2"], {}, num_samples=2, stop_event=stop_event)
+        self.assertTrue(np.isnan(samples.values).all())
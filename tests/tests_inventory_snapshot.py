@@ -0,0 +1,171 @@
+"""
+Unit tests for on-disk inventory snapshot and
+VMwareVimStateReader warm start.
+
+Author: Mustafa Bayramov
+spyroot@gmail.com
+mbayramo@stanford.edu
+"""
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+
+from tests.tests_esxi_host_hardware import sample_host_system
+from warlock.callbacks.callback_iaas_observer import CallbackIaasObserver
+from warlock.states.esxi_host_hardware import EsxiHostHardware
+from warlock.states.inventory_snapshot import (
+    InventorySnapshot,
+    INVENTORY_SNAPSHOT_VERSION
+)
+from warlock.states.vm_state import VMwareVimStateReader
+from warlock.states.warlock_state import WarlockState
+
+VC_UUID = "2a3c6ec2-8c2e-4b4f-a0b4-44c0d8c2f1aa"
+
+
+def sample_inventory() -> InventorySnapshot:
+    """Return inventory with two VMs, one host and one switch"""
+    hardware = EsxiHostHardware.from_host_system(sample_host_system("host-12"))
+    return InventorySnapshot(
+        instance_uuid=VC_UUID,
+        vcenter="vc",
+        vms={
+            "test-np1-a": {"uuid": "4236d5ce-aaaa", "moid": "vm-101", "change_version": "1", "host": "esxi-a"},
+            "test-np1-b": {"uuid": "4236d5ce-bbbb", "moid": "vm-102", "change_version": "7", "host": "esxi-a"},
+        },
+        hosts={"esxi-a": {"uuid": "4c4c4544-0001", "moid": "host-12"}},
+        dvs={
+            "50 36 28 c6": {"moid": "dvs-21", "name": "core", "config_version": "3",
+                            "portgroups": {"dvportgroup-69": "sriov-pg"},
+                            "pnics": {"esxi-a": ["vmnic5"]}},
+        },
+        hardware={"host-12": hardware.to_dict()},
+    )
+
+
+def fake_reader() -> VMwareVimStateReader:
+    """Return reader with fake service instance"""
+    reader = VMwareVimStateReader(None, vcenter_ip="vc", username="u", password="p")
+    reader.si = MagicMock()
+    reader.si._stub = None
+    reader.si.content.about.instanceUuid = VC_UUID
+    return reader
+
+
+class TestInventorySnapshot(unittest.TestCase):
+
+    def test_save_load(self):
+        """Test snapshot round trip and hardware restore"""
+        with tempfile.TemporaryDirectory() as snapshot_dir:
+            path = sample_inventory().save(snapshot_dir)
+            self.assertEqual(os.path.basename(path), f"{VC_UUID}.json")
+            self.assertEqual(os.listdir(snapshot_dir), [f"{VC_UUID}.json"])
+
+            loaded = InventorySnapshot.load(snapshot_dir, VC_UUID)
+            self.assertEqual(loaded.vms, sample_inventory().vms)
+            self.assertIsNone(InventorySnapshot.load(snapshot_dir, "other-vc"))
+
+            hw = EsxiHostHardware.from_dict(loaded.hardware["host-12"])
+            self.assertEqual(hw.numa_node_of_pci("0000:88:00.0"), 1)
+            self.assertEqual(hw.pci_devices["0000:88:00.0"].deviceName, "E810")
+            self.assertEqual(hw.sriov_devices, {"0000:88:00.0": 8})
+
+    def test_version_mismatch(self):
+        """Test snapshot from other version or corrupted snapshot ignored"""
+        with tempfile.TemporaryDirectory() as snapshot_dir:
+            path = InventorySnapshot.snapshot_path(snapshot_dir, VC_UUID)
+            with open(path, "w") as f:
+                json.dump({"version": INVENTORY_SNAPSHOT_VERSION + 1, "instance_uuid": VC_UUID}, f)
+            self.assertIsNone(InventorySnapshot.load(snapshot_dir, VC_UUID))
+            with open(path, "w") as f:
+                f.write("{")
+            self.assertIsNone(InventorySnapshot.load(snapshot_dir, VC_UUID))
+
+    def test_stale_entries(self):
+        """Test change version comparison"""
+        live = sample_inventory()
+        live.vms["test-np1-a"]["change_version"] = "2"
+        del live.vms["test-np1-b"]
+        live.dvs["50 36 28 c6"]["pnics"] = None
+        stale = sample_inventory().stale_entries(live)
+        self.assertEqual(sorted(stale["vms"]), ["test-np1-a", "test-np1-b"])
+        self.assertEqual(stale["hosts"], [])
+        self.assertEqual(stale["dvs"], [])
+
+        live.dvs["50 36 28 c6"]["config_version"] = "4"
+        self.assertEqual(sample_inventory().stale_entries(live)["dvs"], ["50 36 28 c6"])
+
+
+class TestWarmStart(unittest.TestCase):
+
+    def test_warm_start(self):
+        """Test reader serves lookups from snapshot without vCenter round trip"""
+        reader = fake_reader()
+        with tempfile.TemporaryDirectory() as snapshot_dir:
+            sample_inventory().save(snapshot_dir)
+            with patch.object(reader, 'collect_properties') as collect:
+                self.assertTrue(reader.warm_start(snapshot_dir, reconcile=False))
+                vms = reader.find_vm_by_name_substring("test-np1")
+                host = reader.get_esxi_ip_of_vm("test-np1-a")
+                hw = reader.read_host_hardware("esxi-a")
+                pnics = reader.read_dvs_pnics_by_switch_uuid("50 36 28 c6")
+                collect.assert_not_called()
+
+        self.assertEqual(sorted(v.name for v in vms), ["test-np1-a", "test-np1-b"])
+        self.assertEqual(vms[0].moid._moId, "vm-101")
+        self.assertEqual(host.host, "esxi-a")
+        self.assertIs(hw, reader.read_host_hardware("host-12"))
+        self.assertEqual(pnics, {"esxi-a": ["vmnic5"]})
+        self.assertEqual(reader._find_by_dns_or_uuid("test-np1-b")._moId, "vm-102")
+
+    def test_scenario_end_saves_reconciled_inventory(self):
+        """Test scenario end saves reader inventory without vCenter sweep"""
+        reader = fake_reader()
+        with tempfile.TemporaryDirectory() as snapshot_dir:
+            sample_inventory().save(snapshot_dir)
+            reader.warm_start(snapshot_dir, reconcile=False)
+            callback = CallbackIaasObserver(MagicMock(), inventory_dir=snapshot_dir)
+            callback.caster_state = WarlockState()
+            callback.caster_state.iaas_state = {'reader': reader}
+            with patch.object(reader, 'collect_inventory') as collect:
+                callback.on_scenario_end()
+                collect.assert_not_called()
+            saved = InventorySnapshot.load(snapshot_dir, VC_UUID)
+        self.assertEqual(saved.dvs["50 36 28 c6"]["pnics"], {"esxi-a": ["vmnic5"]})
+
+    def test_no_snapshot(self):
+        """Test warm start without snapshot"""
+        reader = fake_reader()
+        with tempfile.TemporaryDirectory() as snapshot_dir:
+            self.assertFalse(reader.warm_start(snapshot_dir))
+
+    def test_reconcile(self):
+        """Test reconcile evicts stale entries and saves reconciled snapshot"""
+        reader = fake_reader()
+        live = sample_inventory()
+        live.vms["test-np1-a"]["change_version"] = "2"
+        live.dvs["50 36 28 c6"]["config_version"] = "4"
+        live.dvs["50 36 28 c6"]["pnics"] = None
+        live.hardware = {}
+
+        with tempfile.TemporaryDirectory() as snapshot_dir:
+            sample_inventory().save(snapshot_dir)
+            reader.warm_start(snapshot_dir, reconcile=False)
+            reader._sriov_device_cache["vm_sriov_devices_test-np1-a"] = ([], [])
+            reader._sriov_device_cache["vm_sriov_devices_test-np1-b"] = ([], [])
+
+            with patch.object(reader, 'collect_inventory', return_value=live):
+                stale = reader.reconcile_inventory(reader._inventory, snapshot_dir)
+
+            saved = InventorySnapshot.load(snapshot_dir, VC_UUID)
+
+        self.assertEqual(stale["vms"], ["test-np1-a"])
+        self.assertEqual(stale["dvs"], ["50 36 28 c6"])
+        self.assertNotIn("vm_sriov_devices_test-np1-a", reader._sriov_device_cache)
+        self.assertIn("vm_sriov_devices_test-np1-b", reader._sriov_device_cache)
+        self.assertNotIn("50 36 28 c6", reader._dvs_cache)
+        self.assertEqual(saved.vms["test-np1-a"]["change_version"], "2")
+        self.assertIsNone(saved.dvs["50 36 28 c6"]["pnics"])
+        self.assertIn("host-12", saved.hardware)
@@ -0,0 +1,238 @@
+"""
+Unit tests for Kubernetes API client and api backend of KubernetesState.
+API server is faked,  requests session get is mocked.
+
+Author: Mustafa Bayramov
+spyroot@gmail.com
+mbayramo@stanford.edu
+"""
+import os
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+import yaml
+
+from tests.test_utils import write_temp_kubeconfig
+from warlock.states.kube_api_client import KubeApiClient, KubeApiError, KubeConfigError
+from warlock.states.kube_state_reader import KubernetesState
+
+
+def response(status_code, body):
+    """Return fake requests response"""
+    r = MagicMock(status_code=status_code, text=str(body))
+    r.json.return_value = body
+    return r
+
+
+NODES = {'items': [
+    {'metadata': {'name': 'cp-1', 'labels': {'node-role.kubernetes.io/control-plane': ''}},
+     'status': {'addresses': [{'type': 'InternalIP', 'address': '10.0.0.1'}]}},
+    {'metadata': {'name': 'worker-1', 'labels': {}},
+     'status': {'addresses': [{'type': 'Hostname', 'address': 'worker-1'},
+                              {'type': 'InternalIP', 'address': '10.0.0.2'}]}},
+]}
+
+PODS = {'items': [
+    {'metadata': {'name': 'server', 'namespace': 'default'}, 'spec': {'nodeName': 'worker-1'}},
+    {'metadata': {'name': 'pending', 'namespace': 'default'}, 'spec': {}},
+]}
+
+
+def fake_api_server(url, params=None, timeout=None):
+    """Route API paths to fake objects"""
+    path = url.split("6443", 1)[1]
+    routes = {
+        "/version": {'gitVersion': 'v1.28.3'},
+        "/api/v1/nodes": NODES,
+        "/api/v1/nodes/worker-1": NODES['items'][1],
+        "/api/v1/namespaces/default/pods": PODS,
+        "/api/v1/pods": PODS,
+        "/api/v1/namespaces/default/pods/server": {'status': {'phase': 'Running'}},
+        "/api/v1/namespaces": {'items': [{'metadata': {'name': 'default'}}, {'metadata': {'name': 'kube-system'}}]},
+        "/apis/k8s.cni.cncf.io/v1/namespaces/default/network-attachment-definitions": {
+            'items': [{'metadata': {'name': 'sriov-net'}}]},
+    }
+    if path in routes:
+        return response(200, routes[path])
+    return response(404, {'reason': 'NotFound'})
+
+
+class TestKubeApiClient(unittest.TestCase):
+
+    def setUp(self):
+        self.kubeconfig = write_temp_kubeconfig()
+
+    def tearDown(self):
+        os.remove(self.kubeconfig)
+
+    def test_kubeconfig(self):
+        """Test server, client certificate and redacted config view"""
+        with KubeApiClient(self.kubeconfig) as client:
+            self.assertEqual(client.server, "https://127.0.0.1:6443")
+            cert, key = client.session.cert
+            self.assertTrue(os.path.exists(cert) and os.path.exists(key))
+            with open(client.session.verify, "rb") as f:
+                self.assertTrue(f.read().startswith(b"-----BEGIN CERTIFICATE"))
+            view = client.config_view()
+            self.assertEqual(view['users'][0]['user']['client-key-data'], "DATA+OMITTED")
+            self.assertEqual(view['current-context'], "kubernetes-admin@test-test")
+        self.assertFalse(os.path.exists(cert))
+
+    def test_token_and_exec(self):
+        """Test bearer token and unsupported exec plugin"""
+        with open(self.kubeconfig) as f:
+            config = yaml.safe_load(f)
+        config['users'][0]['user'] = {'token': 'secret'}
+        with open(self.kubeconfig, "w") as f:
+            yaml.safe_dump(config, f)
+        with KubeApiClient(self.kubeconfig) as client:
+            self.assertEqual(client.session.headers['Authorization'], "Bearer secret")
+            self.assertEqual(client.config_view()['users'][0]['user']['token'], "REDACTED")
+
+        config['users'][0]['user'] = {'exec': {'command': 'aws'}}
+        with open(self.kubeconfig, "w") as f:
+            yaml.safe_dump(config, f)
+        with self.assertRaises(KubeConfigError):
+            KubeApiClient(self.kubeconfig)
+
+    def test_get_errors(self):
+        """Test not found and error status"""
+        with KubeApiClient(self.kubeconfig) as client:
+            client.session.get = MagicMock(side_effect=fake_api_server)
+            self.assertEqual(client.read_node("missing"), {})
+            with self.assertRaises(KubeApiError) as ctx:
+                client.read_pod("missing")
+            self.assertEqual(ctx.exception.status_code, 404)
+
+
+class TestKubeSelectors(unittest.TestCase):
+
+    def setUp(self):
+        self.kubeconfig = write_temp_kubeconfig()
+        self.saved_kubeconfig = os.environ.get('KUBECONFIG')
+
+    def tearDown(self):
+        os.remove(self.kubeconfig)
+        if self.saved_kubeconfig is None:
+            os.environ.pop('KUBECONFIG', None)
+        else:
+            os.environ['KUBECONFIG'] = self.saved_kubeconfig
+
+    def test_pagination(self):
+        """Test list follows continue token and passes selectors"""
+        pages = [
+            response(200, {'metadata': {'continue': 'tok'}, 'items': [PODS['items'][0]]}),
+            response(200, {'metadata': {'resourceVersion': '7'}, 'items': [PODS['items'][1]]}),
+        ]
+        with KubeApiClient(self.kubeconfig) as client:
+            client.session.get = MagicMock(side_effect=pages)
+            pods = client.list_pods("default", "app=iperf", "spec.nodeName=worker-1", limit=1)
+            self.assertEqual([p['metadata']['name'] for p in pods['items']], ["server", "pending"])
+            self.assertNotIn('continue', pods['metadata'])
+            first, second = [c.kwargs['params'] for c in client.session.get.call_args_list]
+            self.assertEqual(first, {'labelSelector': 'app=iperf', 'fieldSelector': 'spec.nodeName=worker-1',
+                                     'limit': 1})
+            self.assertEqual(second['continue'], "tok")
+
+    def test_kubectl_selectors(self):
+        """Test kubectl backend passes selectors, chunk size and node pool selector"""
+        nodes = {'items': [
+            {'metadata': {'name': 'worker-1', 'labels': {'nodepool.vmware.com/name': 'np1'}}, 'spec': {},
+             'status': {}}]}
+        with patch.dict('os.environ', {'SKIP_KUBECONFIG_VALIDATE': '1'}),                 patch.object(KubernetesState, 'is_kubectl_installed', return_value=True),                 patch.object(KubernetesState, 'run_command', return_value=["server worker-1 default"]) as cmd,                 patch.object(KubernetesState, 'run_command_json', return_value=nodes) as json_cmd:
+            state = KubernetesState()
+            self.assertEqual(list(state.node_specs(node_pool="np1")), ["worker-1"])
+            node_cmd = json_cmd.call_args_list[-1].args[0]
+            self.assertIn("--chunk-size=500", node_cmd)
+            self.assertIn("-l 'nodepool.vmware.com/name=np1,!node-role.kubernetes.io/control-plane", node_cmd)
+            self.assertEqual(list(state.node_records(node_pool="np1")), ["worker-1"])
+            self.assertEqual(state.node_records(node_pool="np2"), {})
+
+            pods = state.pod_node_ns_names(label_selector="app=iperf", node_name="worker-1")
+            self.assertEqual(pods, {'server': {'node': 'worker-1', 'ns': 'default'}})
+            self.assertIn("-l 'app=iperf' --field-selector 'spec.nodeName=worker-1'", cmd.call_args.args[0])
+            self.assertEqual(state.pods_name(), ["server"])
+
+
+class TestKubernetesStateApiBackend(unittest.TestCase):
+
+    def setUp(self):
+        self.kubeconfig = write_temp_kubeconfig()
+        self.saved_kubeconfig = os.environ.get('KUBECONFIG')
+        patcher = patch('requests.Session.get', side_effect=fake_api_server)
+        self.session_get = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        os.remove(self.kubeconfig)
+        if self.saved_kubeconfig is None:
+            os.environ.pop('KUBECONFIG', None)
+        else:
+            os.environ['KUBECONFIG'] = self.saved_kubeconfig
+
+    def test_api_backend(self):
+        """Test state read through api server without kubectl"""
+        with patch.object(KubernetesState, 'is_kubectl_installed') as kubectl_installed:
+            state = KubernetesState(self.kubeconfig, backend="api")
+        kubectl_installed.assert_not_called()
+        self.assertEqual(state.backend, "api")
+
+        self.assertEqual(list(state.node_specs().keys()), ["worker-1"])
+        self.assertEqual(state.node_specs("worker-1")["worker-1"]['metadata']['name'], "worker-1")
+        self.assertEqual(state.node_ips(), ["10.0.0.1", "10.0.0.2"])
+        self.assertEqual(state.pod_node_ns_names(), {
+            'server': {'node': 'worker-1', 'ns': 'default'},
+            'pending': {'node': '<none>', 'ns': 'default'},
+        })
+        self.assertEqual(state.pod_spec("server")['status']['phase'], "Running")
+        self.assertEqual(state.namespaces(), ["default", "kube-system"])
+        self.assertEqual(state.fetch_networks(), ["sriov-net"])
+        self.assertEqual(state.read_cluster_name(), "test-test")
+        state.close()
+
+    def test_informers(self):
+        """Test node and pod reads served from informers cache"""
+        stop_watch = threading.Event()
+
+        def blocking_watch(path, resource_version=None, timeout_seconds=300, params=None):
+            stop_watch.wait()
+            return iter([])
+
+        with patch.object(KubeApiClient, 'watch', side_effect=blocking_watch):
+            state = KubernetesState(self.kubeconfig, backend="api")
+            state.start_informers()
+            calls = self.session_get.call_count
+            self.assertEqual(list(state.node_specs().keys()), ["worker-1"])
+            self.assertEqual(state.node_ips(), ["10.0.0.1", "10.0.0.2"])
+            self.assertEqual(state.wait_for_pods_ready(["server"], timeout=0.1), {})
+            self.assertEqual(self.session_get.call_count, calls)
+            stop_watch.set()
+            state.close()
+
+    def test_wait_for_pods_ready_poll(self):
+        """Test wait for pods falls back to polling without informers"""
+        state = KubernetesState(self.kubeconfig, backend="api")
+        running = {'status': {'phase': 'Running', 'podIPs': [{'ip': '10.1.0.1'}]}}
+        with patch.object(state, 'pod_spec', side_effect=[{'status': {'phase': 'Pending'}}, running]) as pod_spec:
+            ready = state.wait_for_pods_ready(["server"], timeout=5, poll_interval=0.01)
+        self.assertEqual(ready, {'server': running})
+        self.assertEqual(pod_spec.call_count, 2)
+        state.close()
+
+    def test_auto_fallback(self):
+        """Test auto backend falls back to kubectl if kubeconfig not usable"""
+        with open(self.kubeconfig) as f:
+            config = yaml.safe_load(f)
+        config['users'][0]['user'] = {'exec': {'command': 'aws'}}
+        with open(self.kubeconfig, "w") as f:
+            yaml.safe_dump(config, f)
+
+        with patch.object(KubernetesState, 'is_kubectl_installed', return_value=True), \
+                patch.object(KubernetesState, 'validate_kubeconfig') as validate:
+            state = KubernetesState(self.kubeconfig, backend="auto")
+        validate.assert_called_once()
+        self.assertEqual(state.backend, "kubectl")
+
+        with self.assertRaises(ValueError):
+            KubernetesState(self.kubeconfig, backend="grpc")
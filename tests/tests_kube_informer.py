@@ -0,0 +1,135 @@
+"""
+Unit tests for KubeInformer,  list and watch of a fake API client.
+
+Author: Mustafa Bayramov
+spyroot@gmail.com
+mbayramo@stanford.edu
+"""
+import queue
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from warlock.states.kube_api_client import KubeApiError
+from warlock.states.kube_informer import KubeInformer, is_pod_ready
+
+
+def pod(name, phase="Pending", ip=None, ready=None, rv="1"):
+    """Return pod object"""
+    status = {'phase': phase}
+    if ip:
+        status['podIPs'] = [{'ip': ip}]
+    if ready is not None:
+        status['conditions'] = [{'type': 'Ready', 'status': 'True' if ready else 'False'}]
+    return {'metadata': {'name': name, 'namespace': 'default', 'resourceVersion': rv}, 'status': status}
+
+
+class FakeApi:
+    """Fake API client,  list returns items and watch streams events
+    pushed to a queue.  None in queue ends current watch stream.
+    """
+
+    def __init__(self, items, resource_version="10"):
+        self.items = items
+        self.resource_version = resource_version
+        self.events = queue.Queue()
+        self.list_calls = 0
+        self.watch_versions = []
+
+    def get(self, path, params=None, expect_not_found=False):
+        self.list_calls += 1
+        return {'metadata': {'resourceVersion': self.resource_version}, 'items': list(self.items)}
+
+    def watch(self, path, resource_version=None, timeout_seconds=300, params=None):
+        self.watch_versions.append(resource_version)
+        while True:
+            event = self.events.get()
+            if event is None:
+                return
+            if isinstance(event, Exception):
+                raise event
+            yield event
+
+
+class TestKubeInformer(unittest.TestCase):
+
+    def test_is_pod_ready(self):
+        """Test pod readiness"""
+        self.assertFalse(is_pod_ready(pod("a")))
+        self.assertFalse(is_pod_ready(pod("a", "Running")))
+        self.assertTrue(is_pod_ready(pod("a", "Running", "10.1.0.1")))
+        self.assertFalse(is_pod_ready(pod("a", "Running", "10.1.0.1", ready=False)))
+        self.assertTrue(is_pod_ready(pod("a", "Running", "10.1.0.1", ready=True)))
+
+    def test_list_and_events(self):
+        """Test initial list and cache updates from watch events"""
+        api = FakeApi([pod("server"), pod("client")])
+        with KubeInformer(api, "pods", namespace="default") as informer:
+            self.assertTrue(informer.synced)
+            self.assertEqual(informer.resource_version, "10")
+            self.assertEqual(informer.path, "/api/v1/namespaces/default/pods")
+            self.assertEqual(len(informer.list()), 2)
+
+            informer.apply_event({'type': 'MODIFIED', 'object': pod("server", "Running", rv="11")})
+            informer.apply_event({'type': 'DELETED', 'object': pod("client", rv="12")})
+            informer.apply_event({'type': 'BOOKMARK', 'object': {'metadata': {'resourceVersion': "13"}}})
+            self.assertEqual(informer.get("server")['status']['phase'], "Running")
+            self.assertIsNone(informer.get("client"))
+            self.assertEqual(informer.resource_version, "13")
+            self.assertFalse(informer.apply_event({'type': 'ERROR', 'object': {'code': 410}}))
+            with self.assertRaises(KubeApiError):
+                informer.apply_event({'type': 'ERROR', 'object': {'code': 500, 'message': 'boom'}})
+            api.events.put(None)
+
+    def test_wait_for_pods_ready(self):
+        """Test waiter wakes up on watch event"""
+        api = FakeApi([pod("server"), pod("client", "Running", "10.1.0.2")])
+        with KubeInformer(api, "pods", namespace="default") as informer:
+            def make_ready():
+                time.sleep(0.05)
+                api.events.put({'type': 'MODIFIED', 'object': pod("server", "Running", "10.1.0.1", rv="11")})
+
+            threading.Thread(target=make_ready).start()
+            start = time.monotonic()
+            ready = informer.wait_for_pods_ready(["server", "client"], timeout=5)
+            self.assertLess(time.monotonic() - start, 2)
+            self.assertEqual(sorted(ready), ["client", "server"])
+            self.assertEqual(api.watch_versions[0], "10")
+            api.events.put(None)
+
+    def test_wait_timeout(self):
+        """Test waiter returns ready subset on timeout"""
+        api = FakeApi([pod("server"), pod("client", "Running", "10.1.0.2")])
+        with KubeInformer(api, "pods", namespace="default") as informer:
+            ready = informer.wait_for_pods_ready(["server", "client"], timeout=0.1)
+            self.assertEqual(list(ready), ["client"])
+            api.events.put(None)
+
+    def test_relist_on_expired(self):
+        """Test informer re-lists if resource version expired"""
+        api = FakeApi([pod("server")])
+        with KubeInformer(api, "pods", namespace="default") as informer:
+            api.items = [pod("server"), pod("late", "Running", "10.1.0.3")]
+            api.resource_version = "20"
+            api.events.put({'type': 'ERROR', 'object': {'code': 410}})
+            ready = informer.wait_for_pods_ready(["late"], timeout=5)
+            self.assertIn("late", ready)
+            self.assertEqual(api.list_calls, 2)
+            self.assertEqual(informer.resource_version, "20")
+            api.events.put(None)
+
+    def test_nodes_path(self):
+        """Test nodes informer is cluster scoped"""
+        api = MagicMock()
+        informer = KubeInformer(api, "nodes", namespace="default")
+        self.assertEqual(informer.path, "/api/v1/nodes")
+        self.assertIsNone(informer.namespace)
+        with self.assertRaises(ValueError):
+            informer.wait_for_pods_ready(["a"], timeout=0)
+        with self.assertRaises(ValueError):
+            KubeInformer(api, "services")
+
+
+if __name__ == '__main__':
+    unittest.main()
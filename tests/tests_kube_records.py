@@ -0,0 +1,136 @@
+"""
+Unit tests for NodeRecord and PodRecord projection and node records
+of KubernetesState,  kubectl is mocked.
+
+Author: Mustafa Bayramov
+spyroot@gmail.com
+mbayramo@stanford.edu
+"""
+import json
+import pickle
+import unittest
+from unittest.mock import patch
+
+from warlock.states.kube_records import NodeRecord, PodRecord
+from warlock.states.kube_state_reader import KubernetesState
+from warlock.states.warlock_state import WarlockState, NamedTupleEncoder
+
+WORKER = {
+    'metadata': {'name': 'worker-1', 'labels': {'nodepool': 'np1'},
+                 'annotations': {'a': 'x' * 1024}, 'managedFields': [{'manager': 'kubelet'}] * 16},
+    'spec': {'podCIDR': '10.244.1.0/24'},
+    'status': {
+        'addresses': [{'type': 'Hostname', 'address': 'worker-1'}, {'type': 'InternalIP', 'address': '10.0.0.2'}],
+        'allocatable': {'cpu': '8', 'memory': '16Gi'},
+        'images': [{'names': [f'image-{i}'], 'sizeBytes': i} for i in range(64)],
+    },
+}
+
+CONTROL = {
+    'metadata': {'name': 'cp-1', 'labels': {}},
+    'spec': {'taints': [{'key': 'node-role.kubernetes.io/control-plane', 'effect': 'NoSchedule'}]},
+    'status': {'addresses': [{'type': 'InternalIP', 'address': '10.0.0.1'}]},
+}
+
+POD = {
+    'metadata': {'name': 'server', 'namespace': 'perf', 'labels': {'app': 'iperf'}},
+    'spec': {'nodeName': 'worker-1', 'containers': [{'name': 'iperf'}]},
+    'status': {'phase': 'Running', 'hostIP': '10.0.0.2', 'podIP': '10.1.0.1',
+               'podIPs': [{'ip': '10.1.0.1'}, {'ip': 'fd00::1'}]},
+}
+
+
+class TestKubeRecords(unittest.TestCase):
+
+    def test_node_record(self):
+        """Test node projection keeps only needed fields"""
+        record = NodeRecord.from_node(WORKER)
+        self.assertEqual(record.name, "worker-1")
+        self.assertEqual(record.internal_ip, "10.0.0.2")
+        self.assertEqual(record.addresses, (("Hostname", "worker-1"), ("InternalIP", "10.0.0.2")))
+        self.assertEqual(record.labels, {'nodepool': 'np1'})
+        self.assertEqual(record.allocatable['cpu'], "8")
+        self.assertFalse(record.is_control_plane)
+        self.assertTrue(NodeRecord.from_node(CONTROL).is_control_plane)
+        self.assertFalse(hasattr(record, '__dict__'))
+        self.assertLess(len(pickle.dumps(record)), len(pickle.dumps(WORKER)) / 4)
+
+    def test_pod_record(self):
+        """Test pod projection"""
+        record = PodRecord.from_pod(POD)
+        self.assertEqual((record.name, record.namespace, record.node_name), ("server", "perf", "worker-1"))
+        self.assertEqual(record.pod_ip, "10.1.0.1")
+        self.assertEqual(record.pod_ips, ("10.1.0.1", "fd00::1"))
+        self.assertEqual((record.host_ip, record.phase), ("10.0.0.2", "Running"))
+        self.assertEqual(PodRecord.from_pod({'metadata': {'name': 'p'}}).pod_ips, ())
+
+    def test_pickle_and_json(self):
+        """Test records pickle and serialize with warlock state"""
+        node = NodeRecord.from_node(WORKER)
+        pod = PodRecord.from_pod(POD)
+        self.assertEqual(pickle.loads(pickle.dumps(node)), node)
+        self.assertEqual(pickle.loads(pickle.dumps(pod)), pod)
+        self.assertEqual(NodeRecord.from_dict(node._asdict()), node)
+
+        state = WarlockState()
+        state.k8s_pods_states['server01'] = {'ip': pod.pod_ip, 'pod_state': pod}
+        data = json.loads(state.to_json())
+        self.assertEqual(data['k8s_pods_states']['server01']['pod_state']['host_ip'], "10.0.0.2")
+        self.assertEqual(json.loads(json.dumps(node, cls=NamedTupleEncoder))['internal_ip'], "10.0.0.2")
+
+
+class TestKubernetesStateNodeRecords(unittest.TestCase):
+
+    def setUp(self):
+        patchers = [
+            patch.dict('os.environ', {'SKIP_KUBECONFIG_VALIDATE': '1'}),
+            patch.object(KubernetesState, 'is_kubectl_installed', return_value=True),
+            patch.object(KubernetesState, 'run_command_json', return_value={'items': [CONTROL, WORKER]}),
+        ]
+        for p in patchers:
+            p.start()
+            self.addCleanup(p.stop)
+        self.state = KubernetesState()
+
+    def test_node_records(self):
+        """Test node state holds records and address view built from records"""
+        self.assertEqual(list(self.state.node_records()), ["worker-1"])
+        self.assertEqual(sorted(self.state.node_records(is_worker_node_only=False)), ["cp-1", "worker-1"])
+        self.assertEqual(self.state.node_ips(), ["10.0.0.1", "10.0.0.2"])
+        self.assertEqual(self.state.fetch_nodes_uuid_ip("worker")["10.0.0.2"], "worker-1")
+        self.assertEqual(self.state.read_node_labels("worker-1"), {'nodepool': 'np1'})
+        self.assertEqual(self.state.read_node_pool_name("worker-1"), "np1")
+        self.assertTrue(all(isinstance(r, NodeRecord) for r in self.state._node_state.values()))
+
+    def test_node_specs(self):
+        """Test node specs returns full specs without retaining them"""
+        specs = self.state.node_specs()
+        self.assertEqual(list(specs), ["worker-1"])
+        self.assertIn('images', specs['worker-1']['status'])
+        self.assertIsInstance(self.state._node_state['worker-1'], NodeRecord)
+        self.assertNotIn('cp-1', self.state._node_state)
+
+    def test_node_specs_by_name_cached(self):
+        """Test node read by name cached trimmed and control plane not recorded"""
+        run_json = KubernetesState.run_command_json
+        run_json.side_effect = lambda cmd, expect_error=None: CONTROL if "cp-1" in cmd else WORKER
+        self.assertEqual(self.state.node_specs(node_name="cp-1"), {})
+        self.assertEqual(len(self.state._node_state), 0)
+
+        spec = self.state.node_specs(node_name="worker-1")['worker-1']
+        self.assertNotIn('images', spec['status'])
+        self.assertNotIn('managedFields', spec['metadata'])
+        self.assertEqual(self.state.read_node_metadata("worker-1")['labels'], {'nodepool': 'np1'})
+        self.assertEqual(run_json.call_count, 2)
+
+        # records answer control plane and unknown nodes without a read
+        run_json.side_effect = None
+        self.state.node_records(is_worker_node_only=False, refresh=True)
+        calls = run_json.call_count
+        self.assertEqual(self.state.node_specs(node_name="cp-1"), {})
+        self.assertEqual(self.state.node_specs(node_name="missing"), {})
+        self.assertEqual(run_json.call_count, calls)
+
+
+if __name__ == '__main__':
+    unittest.main()
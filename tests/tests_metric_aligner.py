@@ -0,0 +1,77 @@
+"""
+Unit tests for cross source metric aligner.
+
+Author: Mustafa Bayramov
+spyroot@gmail.com
+mbayramo@stanford.edu
+"""
+import tempfile
+import unittest
+
+import numpy as np
+
+from warlock.metrics.metric_aligner import MetricAligner, interpolate_columns, ALIGN_PREVIOUS
+from warlock.metrics.metric_store import MetricStore
+
+T0 = np.datetime64('2024-03-01T10:00:00', 'ms')
+
+
+def seconds(n):
+    return T0 + np.timedelta64(int(n * 1000), 'ms')
+
+
+class TestMetricAligner(unittest.TestCase):
+
+    def test_interpolate_columns(self):
+        """Test linear, previous and nan columns"""
+        ts = np.array([0, 10, 20], dtype=np.int64)
+        values = np.array([[0, 1], [10, np.nan], [20, 3]], dtype=np.float64)
+        grid = np.array([-5, 0, 5, 15, 20, 25], dtype=np.int64)
+
+        result = interpolate_columns(ts, values, grid)
+        np.testing.assert_array_equal(result[:, 0], [np.nan, 0, 5, 15, 20, np.nan])
+        np.testing.assert_array_equal(result[:, 1], [np.nan, 1, 1.5, 2.5, 3, np.nan])
+
+        result = interpolate_columns(ts, values, grid, ALIGN_PREVIOUS)
+        np.testing.assert_array_equal(result[:, 0], [np.nan, 0, 0, 10, 20, np.nan])
+
+    def test_align_sources(self):
+        """Test vcenter, port and iperf streams joined on one grid"""
+        aligner = MetricAligner()
+        aligner.add_vcenter("vm-1", [seconds(0), seconds(20)], np.array([[100.0], [300.0]]),
+                            ["cpu.usagemhz.average"])
+        port_data = np.array([
+            [0, 7, 10, 20, 0, 0, 0, 1],
+            [0, 7, 30, 40, 0, 0, 0, 1],
+        ])
+        aligner.add_port_metrics(port_data, ["vm-1"], [seconds(0), seconds(10)])
+        iperf = np.array([[5, 1, 1000, 0, 0, 0, 0]] * 20, dtype=np.float64)
+        iperf[:, 2] = np.arange(20) * 100
+        aligner.add_iperf("client", iperf, T0)
+
+        grid, features, names = aligner.align(step_seconds=5)
+        self.assertEqual(grid[0], seconds(1))
+        self.assertEqual(grid[-1], seconds(6))
+        self.assertEqual(features.shape, (2, 13))
+        self.assertEqual(names[0], "vm-1/cpu.usagemhz.average")
+        self.assertEqual(names[1], "vm-1:7/port.txpps")
+        self.assertEqual(names[7], "client:5/iperf.bytes")
+        np.testing.assert_allclose(features[:, 0], [110, 160])
+        np.testing.assert_allclose(features[:, 1], [12, 22])
+        np.testing.assert_allclose(features[:, 8], [0, 500])
+
+        grid, features, _ = aligner.align(T0, seconds(30), step_seconds=10)
+        self.assertEqual(len(grid), 4)
+        self.assertTrue(np.isnan(features[3, 0]))
+
+    def test_from_store(self):
+        """Test aligner built from store scenario"""
+        with tempfile.TemporaryDirectory() as store_dir:
+            store = MetricStore(store_dir)
+            store.append("vm-1", "cpu", [seconds(0), seconds(10)], [1.0, 2.0], scenario="a")
+            store.append("vm-1", "cpu", [seconds(0)], [9.0], scenario="b")
+            store.append("vm-2", "cpu", [seconds(0), seconds(10)], [3.0, 5.0], scenario="a")
+            aligner = MetricAligner.from_store(store, scenario="a")
+            grid, features, names = aligner.align(step_seconds=5)
+        self.assertEqual(names, ["vm-1/cpu", "vm-2/cpu"])
+        np.testing.assert_allclose(features, [[1, 3], [1.5, 4], [2, 5]])
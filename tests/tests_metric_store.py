@@ -0,0 +1,98 @@
+"""
+Unit tests for columnar metric store.
+
+Author: Mustafa Bayramov
+spyroot@gmail.com
+mbayramo@stanford.edu
+"""
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from warlock.metrics.metric_store import MetricStore, MetricStoreError, PORT_METRIC_NAMES
+
+T0 = np.datetime64('2024-03-01T10:00:00', 'ms')
+
+
+class TestMetricStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store_dir = self.tmp_dir.name
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_append_tensor_and_query(self):
+        """Test tensor appended without NaN padding and filtered"""
+        store = MetricStore(self.store_dir)
+        data = np.array([
+            [[1, 10], [2, 20], [3, 30]],
+            [[4, 40], [np.nan, np.nan], [np.nan, np.nan]],
+        ], dtype=np.float32)
+        timestamps = T0 + np.arange(3) * np.timedelta64(20, 's')
+        n = store.append_tensor(["vm-1", "vm-2"], ["cpu", "mem"], timestamps, data, scenario="step-1")
+        self.assertEqual(n, 8)
+        self.assertEqual(len(store), 8)
+
+        rows = store.query(entities=["vm-1"], metrics="mem", start_time=T0 + np.timedelta64(20, 's'))
+        np.testing.assert_array_equal(rows['value'], [20, 30])
+        self.assertEqual(set(rows['entity']), {"vm-1"})
+        self.assertEqual(rows['timestamp'][0], T0 + np.timedelta64(20, 's'))
+
+        rows = store.query(end_time=T0 + np.timedelta64(1, 's'), scenarios=["step-1"])
+        self.assertEqual(len(rows['value']), 4)
+        self.assertEqual(len(store.query(entities=["unknown"])['value']), 0)
+
+        with self.assertRaises(MetricStoreError):
+            store.append_tensor(["vm-1"], ["cpu"], timestamps, np.zeros((3, 1)))
+
+    def test_reopen_and_partial_append(self):
+        """Test store reopened from disk, truncated column ignored"""
+        store = MetricStore(self.store_dir)
+        store.append("vm-1", "cpu", T0, [1.0, 2.0], scenario="a")
+        store.append("vm-2", "cpu", 1709287200.5, 3.0, scenario="b")
+
+        # simulate crash in the middle of append
+        with open(os.path.join(self.store_dir, "value.bin"), "ab") as f:
+            f.write(np.float64(9.0).tobytes())
+
+        store = MetricStore(self.store_dir)
+        self.assertEqual(len(store), 3)
+        self.assertEqual(store.names("scenario"), ["a", "b"])
+        rows = store.query(scenarios="b")
+        np.testing.assert_array_equal(rows['value'], [3.0])
+        self.assertEqual(rows['timestamp'][0], np.datetime64('2024-03-01T10:00:00.500', 'ms'))
+
+        # append after crash doesn't shift rows
+        store.append("vm-3", "cpu", T0, 4.0, scenario="c")
+        self.assertEqual(len(store), 4)
+        rows = store.query(scenarios="c")
+        np.testing.assert_array_equal(rows['value'], [4.0])
+        self.assertEqual(list(store.query(entities="vm-3")['entity']), ["vm-3"])
+
+    def test_port_and_iperf(self):
+        """Test esxi port metrics and iperf stats layouts"""
+        store = MetricStore(self.store_dir)
+        port_data = np.array([
+            [0, 67108902, 100, 200, 0, 0, 0, 5],
+            [1, 67108903, 300, 400, 1, 0, 0, 6],
+        ])
+        self.assertEqual(store.append_port_metrics(port_data, ["vm-a", "vm-b"], T0), 2 * len(PORT_METRIC_NAMES))
+        rows = store.query(entities=["vm-b:67108903"], metrics=["port.rxpps"])
+        np.testing.assert_array_equal(rows['value'], [400])
+
+        # two intervals, two streams
+        iperf_data = np.array([
+            [5, 100, 800, 10, 20, 30, 1],
+            [7, 110, 880, 10, 20, 31, 1],
+            [5, 120, 960, 10, 20, 32, 1],
+            [7, 130, 1040, 10, 20, 33, np.nan],
+        ])
+        store.append_iperf(iperf_data, "client", T0, scenario="iperf")
+        rows = store.query(entities="client:5", metrics="iperf.bps")
+        np.testing.assert_array_equal(rows['value'], [800, 960])
+        np.testing.assert_array_equal(rows['timestamp'], [T0 + np.timedelta64(1, 's'), T0 + np.timedelta64(2, 's')])
+        self.assertEqual(len(store.query(entities="client:7", metrics="iperf.rttvar")['value']), 1)
@@ -0,0 +1,128 @@
+"""
+Unit tests for NetworkInventory,  API server replaced by a mock
+that returns network attachment definitions, pods and nodes.
+
+Author: Mustafa Bayramov
+spyroot@gmail.com
+mbayramo@stanford.edu
+"""
+import json
+import unittest
+from unittest.mock import MagicMock, patch
+
+from warlock.states.kube_network_inventory import (
+    NetworkInventory,
+    NetworkRecord,
+    parse_network_selection,
+    is_device_resource,
+    NETWORK_STATUS_ANNOTATION,
+    NETWORKS_ANNOTATION,
+    RESOURCE_NAME_ANNOTATION
+)
+from warlock.states.kube_records import NodeRecord
+
+SRIOV = "intel.com/sriov_netdevice"
+
+
+def make_nad(name, config, rv="1", resource=None, ns="default"):
+    """Return NetworkAttachmentDefinition object"""
+    annotations = {RESOURCE_NAME_ANNOTATION: resource} if resource else {}
+    return {'metadata': {'name': name, 'namespace': ns, 'resourceVersion': rv, 'annotations': annotations},
+            'spec': {'config': json.dumps(config)}}
+
+
+def make_pod(name, node, pci=None, rv="1", networks=None):
+    """Return pod object, with network status if pci is set"""
+    annotations = {}
+    if networks:
+        annotations[NETWORKS_ANNOTATION] = networks
+    if pci:
+        annotations[NETWORK_STATUS_ANNOTATION] = json.dumps([
+            {'name': 'cbr0', 'interface': 'eth0', 'default': True},
+            {'name': 'default/sriov-net', 'interface': 'net1', 'mac': '00:50:56:aa:bb:01',
+             'device-info': {'type': 'pci', 'pci': {'pci-address': pci}}}])
+    return {'metadata': {'name': name, 'namespace': 'default', 'resourceVersion': rv,
+                         'annotations': annotations},
+            'spec': {'nodeName': node}}
+
+
+class TestNetworkInventory(unittest.TestCase):
+
+    def setUp(self):
+        self.nads = [
+            make_nad("sriov-net", {'cniVersion': '0.3.1', 'type': 'sriov', 'vlan': 100,
+                                   'ipam': {'type': 'whereabouts'}}, resource=SRIOV),
+            make_nad("macvlan", {'cniVersion': '0.3.1', 'plugins': [
+                {'type': 'macvlan', 'master': 'eth1'}, {'type': 'tuning'}]}, ns="perf"),
+        ]
+        self.pods = [make_pod("server0", "worker-1", "0000:3b:02.1"),
+                     make_pod("client0", "worker-1", networks="sriov-net@net1")]
+        self.kube_state = MagicMock()
+        self.kube_state.informer.return_value = None
+        self.kube_state.api.list_network_attachment_definitions.side_effect = lambda ns: {'items': self.nads}
+        self.kube_state.api.list_pods.side_effect = lambda ns, limit=None: {'items': self.pods}
+        self.kube_state.node_records.return_value = {
+            'worker-1': NodeRecord('worker-1', allocatable={SRIOV: '4', 'cpu': '8', 'hugepages-1Gi': '2Gi'}),
+            'worker-2': NodeRecord('worker-2', allocatable={SRIOV: '1'}),
+        }
+
+    def test_parse(self):
+        """Test CNI config and network selection parsed"""
+        inventory = NetworkInventory(self.kube_state)
+        inventory.refresh()
+        sriov = inventory.network("sriov-net")
+        self.assertEqual((sriov.cni_type, sriov.vlan, sriov.ipam_type, sriov.is_sriov),
+                         ("sriov", 100, "whereabouts", True))
+        macvlan = inventory.network("macvlan", "perf")
+        self.assertEqual((macvlan.plugins, macvlan.master, macvlan.is_sriov), (("macvlan", "tuning"), "eth1", False))
+        self.assertEqual([n.name for n in inventory.networks(sriov_only=True)], ["sriov-net"])
+        self.assertEqual(NetworkRecord.from_dict(sriov._asdict()), sriov)
+        self.assertEqual(parse_network_selection("perf/macvlan@net2, sriov-net", "default"),
+                         [("perf", "macvlan", "net2"), ("default", "sriov-net", None)])
+        self.assertEqual(parse_network_selection('[{"name": "sriov-net", "interface": "net1"}]'),
+                         [("default", "sriov-net", "net1")])
+        self.assertFalse(is_device_resource("hugepages-1Gi"))
+
+    def test_vfs_and_placement(self):
+        """Test VFs of pods and free resources per node"""
+        inventory = NetworkInventory(self.kube_state)
+        inventory.refresh(pods=True, nodes=True)
+        vf = inventory.pod_of_vf("worker-1", "0000:3b:02.1")
+        self.assertEqual((vf.pod, vf.interface, vf.resource_name), ("server0", "net1", SRIOV))
+        self.assertEqual(len(inventory.vf_allocations(node="worker-1")), 2)
+        self.assertEqual(inventory.resources_of_node("worker-1"), {SRIOV: 4})
+        self.assertEqual(inventory.free_resources("worker-1"), {SRIOV: 2})
+        self.assertEqual(inventory.nodes_with_resource(SRIOV, count=2), ["worker-1"])
+        self.assertEqual(sorted(inventory.nodes_with_resource(SRIOV)), ["worker-1", "worker-2"])
+
+    def test_incremental_refresh(self):
+        """Test only changed objects parsed and deleted pods release VF"""
+        inventory = NetworkInventory(self.kube_state)
+        self.assertEqual(inventory.refresh(pods=True, nodes=True), {'networks': 2, 'pods': 2})
+        with patch.object(NetworkRecord, 'from_nad') as from_nad:
+            self.assertEqual(inventory.refresh(pods=True), {'networks': 0, 'pods': 0})
+            from_nad.assert_not_called()
+
+        self.pods = [make_pod("server0", "worker-1", "0000:3b:02.2", rv="2")]
+        self.assertEqual(inventory.refresh(pods=True), {'networks': 0, 'pods': 2})
+        self.assertIsNone(inventory.pod_of_vf("worker-1", "0000:3b:02.1"))
+        self.assertEqual(inventory.pod_of_vf("worker-1", "0000:3b:02.2").pod, "server0")
+        self.assertEqual(inventory.free_resources("worker-1"), {SRIOV: 3})
+
+    def test_refresh_networks_only(self):
+        """Test pods and nodes listed only on request"""
+        inventory = NetworkInventory(self.kube_state)
+        self.assertEqual(inventory.refresh(), {'networks': 2, 'pods': 0})
+        self.kube_state.api.list_pods.assert_not_called()
+        self.kube_state.node_records.assert_not_called()
+
+        informer = MagicMock(namespace=None)
+        informer.list.return_value = self.pods
+        self.kube_state.informer.return_value = informer
+        self.assertEqual(inventory.refresh(pods=True), {'networks': 0, 'pods': 2})
+        self.kube_state.informer.assert_called_with('pods')
+        self.kube_state.api.list_pods.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
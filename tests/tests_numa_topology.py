@@ -0,0 +1,122 @@
+"""
+Unit tests for cluster wide numa topology.
+
+Author: Mustafa Bayramov
+spyroot@gmail.com
+mbayramo@stanford.edu
+"""
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import numpy as np
+
+from tests.tests_esxi_host_hardware import sample_host_system
+from warlock.states.esxi_host_hardware import EsxiHostHardware
+from warlock.states.numa_topology import NumaTopology, encode_pci_address
+from warlock.states.vm_state import VMwareVimStateReader, PciDeviceClass, VMwareHost
+
+
+def sample_topology():
+    """Two hosts, second host has SR-IOV PF on numa node 0 instead of 1."""
+    host_a = EsxiHostHardware.from_host_system(sample_host_system("host-12"))
+    host_b_system = sample_host_system("host-13")
+    host_b_system.hardware.numaInfo.numaNode[0].pciId.append("0000:88:00.0")
+    host_b_system.hardware.numaInfo.numaNode[1].pciId = []
+    host_b = EsxiHostHardware.from_host_system(host_b_system)
+    return NumaTopology({"esxi-a": host_a, "esxi-b": host_b})
+
+
+class TestNumaTopology(unittest.TestCase):
+
+    def test_encode_pci_address(self):
+        """Test pci address encoding"""
+        self.assertEqual(encode_pci_address("0000:88:00.0"), encode_pci_address("88:00.0"))
+        self.assertEqual(encode_pci_address("0000:88:00.1") - encode_pci_address("0000:88:00.0"), 1)
+        self.assertEqual(encode_pci_address("not a pci"), -1)
+        self.assertEqual(encode_pci_address(None), -1)
+
+    def test_pci_numa_nodes(self):
+        """Test vectorized pci to numa lookup"""
+        topology = sample_topology()
+        nodes = topology.pci_numa_nodes("esxi-a", ["0000:88:00.0", "0000:18:00.0", "0000:99:00.0", "bad"])
+        np.testing.assert_array_equal(nodes, [1, 0, -1, -1])
+        np.testing.assert_array_equal(topology.pci_numa_nodes("esxi-b", ["0000:88:00.0"]), [0])
+        with self.assertRaises(KeyError):
+            topology.pci_numa_nodes("esxi-c", ["0000:88:00.0"])
+
+    def test_numa_node_by_pci_device(self):
+        """Test reader pci to numa lookup through topology"""
+        topology = sample_topology()
+        lookup = VMwareVimStateReader.get_numa_node_by_pci_device
+        self.assertEqual(lookup("0000:88:00.0", topology, "esxi-a"), 1)
+        self.assertEqual(lookup("0000:88:00.0", topology, "esxi-b"), 0)
+        self.assertIsNone(lookup("0000:99:00.0", topology, "esxi-a"))
+        with self.assertRaises(ValueError):
+            lookup("0000:88:00.0", topology)
+        self.assertEqual(lookup("0000:88:00.0", {'pci': {1: ["0000:88:00.0"]}}), 1)
+
+    def test_cpu_numa_nodes(self):
+        """Test cpu to numa lookup"""
+        topology = sample_topology()
+        np.testing.assert_array_equal(topology.cpu_numa_nodes("esxi-a", [0, 3, 64]), [0, 1, -1])
+
+    def test_pci_devices_on_numa(self):
+        """Test pci devices filter by numa node and class"""
+        topology = sample_topology()
+        self.assertEqual(
+            topology.pci_devices_on_numa("esxi-a", [0], filter_class=PciDeviceClass.NETWORK_CONTROLLER),
+            ["0000:18:00.0"])
+        self.assertEqual(len(topology.pci_devices_on_numa("esxi-a", [0])), 2)
+
+    def test_colocated_sriov_devices(self):
+        """Test SR-IOV PF colocated with vCPUs"""
+        topology = sample_topology()
+        self.assertEqual(topology.colocated_sriov_devices("esxi-a", cpu_ids=[2, 3]), ["0000:88:00.0"])
+        self.assertEqual(topology.colocated_sriov_devices("esxi-a", cpu_ids=[0]), [])
+        self.assertEqual(topology.colocated_sriov_devices("esxi-b", numa_nodes=[0]), ["0000:88:00.0"])
+
+        result = topology.cluster_colocated_sriov_devices({
+            "vm-1": ("esxi-a", [1]),
+            "vm-2": ("esxi-a", [0]),
+            "vm-3": ("esxi-b", [0, 1]),
+            "vm-4": ("esxi-b", []),
+        })
+        self.assertEqual(result, {
+            "vm-1": ["0000:88:00.0"],
+            "vm-2": [],
+            "vm-3": ["0000:88:00.0"],
+            "vm-4": [],
+        })
+
+    def test_empty_topology(self):
+        """Test topology without hosts"""
+        topology = NumaTopology({})
+        self.assertEqual(topology.cluster_colocated_sriov_devices({}), {})
+
+    def test_reader_vm_colocated_sriov_devices(self):
+        """Test reader resolves vm numa nodes from cpu affinity and numa.nodeAffinity"""
+        reader = VMwareVimStateReader(None, vcenter_ip="vc", username="u", password="p")
+        reader._numa_topology = sample_topology()
+        vms = {
+            "vm-pinned": SimpleNamespace(config=SimpleNamespace(
+                cpuAffinity=SimpleNamespace(affinitySet=[2, 3]), extraConfig=[])),
+            "vm-node": SimpleNamespace(config=SimpleNamespace(
+                cpuAffinity=None,
+                extraConfig=[SimpleNamespace(key="numa.nodeAffinity", value="0")])),
+            "vm-free": SimpleNamespace(config=SimpleNamespace(cpuAffinity=None, extraConfig=[])),
+        }
+        hosts = {
+            "vm-pinned": VMwareHost(uuid="a", host="esxi-a", moid="host-12"),
+            "vm-node": VMwareHost(uuid="b", host="esxi-b", moid="host-13"),
+            "vm-free": VMwareHost(uuid="a", host="esxi-a", moid="host-12"),
+        }
+        with patch.object(reader, '_find_by_dns_or_uuid', side_effect=vms.get), \
+                patch.object(reader, 'get_esxi_ip_of_vm', side_effect=hosts.get):
+            result = reader.vm_colocated_sriov_devices(list(vms.keys()))
+
+        self.assertEqual(result, {
+            "vm-pinned": ["0000:88:00.0"],
+            "vm-node": ["0000:88:00.0"],
+            "vm-free": [],
+        })
@@ -0,0 +1,83 @@
+"""
+Unit tests for perf collection scope, uses fake
+performance manager.
+
+Author: Mustafa Bayramov
+spyroot@gmail.com
+mbayramo@stanford.edu
+"""
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from warlock.callbacks.callback_perf_collection import CallbackPerfCollection
+from warlock.metrics.perf_collection_scope import PerfCollectionScope, estimate_stats_growth
+from warlock.metrics.vm_metric_stats import VMwareMetricCollector
+
+
+def fake_collector():
+    """Return collector with fake performance manager and two historical intervals"""
+    collector = VMwareMetricCollector(vcenter_ip="vc", username="u", password="p")
+    collector.si = MagicMock()
+    collector._vm_metrics_type = {"net.droppedRx.summation": 10, "net.droppedTx.summation": 11}
+    perf_manager = collector.si.content.perfManager
+    perf_manager.historicalInterval = [
+        SimpleNamespace(key=1, samplingPeriod=300, name="day", length=86400, level=1, enabled=True),
+        SimpleNamespace(key=2, samplingPeriod=1800, name="week", length=604800, level=1, enabled=True),
+    ]
+    perf_manager.QueryPerfCounter.return_value = [
+        SimpleNamespace(key=10, level=3, perDeviceLevel=3),
+        SimpleNamespace(key=11, level=4, perDeviceLevel=4),
+    ]
+    return collector, perf_manager
+
+
+class TestPerfCollectionScope(unittest.TestCase):
+
+    def test_estimate(self):
+        """Test budget counts only intervals that store counter level"""
+        intervals = {
+            1: {'samplingPeriod': 300, 'length': 86400, 'level': 2, 'enabled': True},
+            2: {'samplingPeriod': 1800, 'length': 604800, 'level': 1, 'enabled': True},
+            3: {'samplingPeriod': 7200, 'length': 2592000, 'level': 4, 'enabled': False},
+        }
+        budget = estimate_stats_growth(intervals, 2, num_series=10, duration_seconds=3600)
+        self.assertEqual(budget.per_interval, {1: 120})
+        self.assertEqual(budget.num_bytes, 120 * 100)
+
+    def test_scope_restore(self):
+        """Test counter levels and intervals restored on exit"""
+        collector, perf_manager = fake_collector()
+        counters = ["net.droppedRx.summation", "net.droppedTx.summation"]
+        with self.assertRaises(RuntimeError):
+            with PerfCollectionScope(collector, counters, level=1,
+                                     intervals={1: {'sampling_period': 60}}, num_series=4) as scope:
+                mapping = perf_manager.UpdateCounterLevelMapping.call_args.kwargs['counterLevelMap']
+                self.assertEqual([(m.counterId, m.aggregateLevel) for m in mapping], [(10, 1), (11, 1)])
+                self.assertEqual(perf_manager.historicalInterval[0].samplingPeriod, 60)
+                self.assertEqual(scope.budget.per_interval, {1: 4 * 60, 2: 4 * 2})
+                raise RuntimeError("scenario failed")
+
+        self.assertFalse(scope.active)
+        mapping = perf_manager.UpdateCounterLevelMapping.call_args.kwargs['counterLevelMap']
+        self.assertEqual([(m.counterId, m.aggregateLevel, m.perDeviceLevel) for m in mapping],
+                         [(10, 3, 3), (11, 4, 4)])
+        self.assertEqual(perf_manager.historicalInterval[0].samplingPeriod, 300)
+        self.assertEqual(perf_manager.UpdatePerfInterval.call_count, 2)
+
+    def test_callback(self):
+        """Test callback enter on scenario begin and restore on end, dry run doesn't mutate"""
+        collector, perf_manager = fake_collector()
+        callback = CallbackPerfCollection(collector, ["net.droppedRx.summation"], dry_run=True)
+        callback.on_scenario_begin()
+        callback.on_scenario_end()
+        perf_manager.UpdateCounterLevelMapping.assert_not_called()
+        self.assertEqual(len(callback.dry_run_plan), 1)
+
+        callback = CallbackPerfCollection(collector, ["net.droppedRx.summation"], dry_run=False)
+        callback.on_scenario_begin()
+        self.assertTrue(callback.scope.active)
+        callback.on_scenario_end()
+        self.assertFalse(callback.scope.active)
+        self.assertEqual(perf_manager.UpdateCounterLevelMapping.call_count, 2)
+        self.assertEqual(len(callback.budgets), 1)
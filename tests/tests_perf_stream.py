@@ -0,0 +1,114 @@
+"""
+Unit tests for real-time perf stream collector, uses fake
+performance manager.
+
+Author: Mustafa Bayramov
+spyroot@gmail.com
+mbayramo@stanford.edu
+"""
+import threading
+import unittest
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import numpy as np
+from pyVmomi import vim
+
+from warlock.metrics.perf_stream import PerfStreamCollector, REALTIME_INTERVAL
+from warlock.metrics.vm_metric_stats import VMwareMetricCollector, MetricQuery
+
+T0 = int(datetime(2024, 3, 1, 10, 0, 0, tzinfo=timezone.utc).timestamp())
+
+
+def csv_entity_metric(entity, timestamps, series):
+    """Return fake EntityMetricCSV,  series is list of (counter id, instance, values)"""
+    sample_info = ",".join(
+        f"20,{datetime.fromtimestamp(t, tz=timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')}"
+        for t in timestamps)
+    return SimpleNamespace(entity=entity, sampleInfoCSV=sample_info, value=[
+        SimpleNamespace(id=SimpleNamespace(counterId=c, instance=i), value=",".join(str(x) for x in v))
+        for c, i, v in series
+    ])
+
+
+class TestPerfStreamCollector(unittest.TestCase):
+
+    def setUp(self):
+        self.collector = VMwareMetricCollector(vcenter_ip="vc", username="u", password="p")
+        self.collector.si = MagicMock()
+        self.perf_manager = self.collector.si.content.perfManager
+        self.vm = vim.VirtualMachine("vm-1")
+        self.host = vim.HostSystem("host-12")
+        self.stream = PerfStreamCollector(self.collector, [
+            MetricQuery(self.vm, "vm", [1, 2], ""),
+            MetricQuery(self.host, "host", [7], "vmnic0"),
+        ], capacity=4)
+
+    def test_incremental_poll(self):
+        """Test only new samples appended and start time advanced"""
+        self.perf_manager.QueryPerf.return_value = [
+            csv_entity_metric(self.vm, [T0, T0 + 20], [(1, "", [1, 2]), (2, "", [10, 20])]),
+            csv_entity_metric(self.host, [T0 + 20], [(7, "vmnic0", [5])]),
+        ]
+        self.assertEqual(self.stream.poll(now=T0 + 30), 3)
+
+        specs = self.perf_manager.QueryPerf.call_args.kwargs['querySpec']
+        self.assertEqual(specs[0].intervalId, REALTIME_INTERVAL)
+        self.assertEqual(specs[0].format, "csv")
+        self.assertEqual(int(specs[0].startTime.timestamp()), T0 + 30 - 300)
+
+        # server returns overlapping sample T0 + 20 again
+        self.perf_manager.QueryPerf.return_value = [
+            csv_entity_metric(self.vm, [T0 + 20, T0 + 40], [(1, "", [2, 3]), (2, "", [20, 30])]),
+        ]
+        self.assertEqual(self.stream.poll(now=T0 + 50), 1)
+        specs = self.perf_manager.QueryPerf.call_args.kwargs['querySpec']
+        self.assertEqual(int(specs[0].startTime.timestamp()), T0 + 20)
+        self.assertEqual(int(specs[1].startTime.timestamp()), T0 + 20)
+
+        timestamps, values = self.stream.window(0)
+        np.testing.assert_array_equal(values, [[1, 10], [2, 20], [3, 30]])
+        self.assertEqual(timestamps[-1], np.datetime64(T0 + 40, 's'))
+
+        _, host_values = self.stream.window(1)
+        np.testing.assert_array_equal(host_values, [[5, np.nan]])
+
+    def test_lagging_counter_not_duplicated(self):
+        """Test counter behind others fills buffered samples instead of appending twice"""
+        self.perf_manager.QueryPerf.return_value = [
+            csv_entity_metric(self.vm, [T0, T0 + 20], [(1, "", [1, 2]), (2, "", [10])]),
+        ]
+        self.assertEqual(self.stream.poll(now=T0 + 30), 2)
+        self.perf_manager.QueryPerf.return_value = [
+            csv_entity_metric(self.vm, [T0 + 20, T0 + 40], [(1, "", [2, 3]), (2, "", [20, 30])]),
+        ]
+        self.assertEqual(self.stream.poll(now=T0 + 50), 2)
+        specs = self.perf_manager.QueryPerf.call_args.kwargs['querySpec']
+        self.assertEqual(int(specs[0].startTime.timestamp()), T0)
+
+        timestamps, values = self.stream.window(0)
+        np.testing.assert_array_equal(values, [[1, 10], [2, 20], [3, 30]])
+        self.assertEqual(len(np.unique(timestamps)), 3)
+
+    def test_ring_buffer_wraps(self):
+        """Test ring buffer keep last capacity samples"""
+        ts = [T0 + 20 * i for i in range(6)]
+        self.perf_manager.QueryPerf.return_value = [
+            csv_entity_metric(self.vm, ts, [(1, "", list(range(6))), (2, "", list(range(6)))]),
+        ]
+        self.stream.poll(now=T0 + 200)
+        timestamps, values = self.stream.window(0)
+        np.testing.assert_array_equal(values[:, 0], [2, 3, 4, 5])
+        _, values = self.stream.window(0, last_n=2)
+        np.testing.assert_array_equal(values[:, 0], [4, 5])
+        self.assertTrue(np.isnat(self.stream.last_timestamps()[1, 0]))
+
+    def test_run_stops(self):
+        """Test run stops on event"""
+        self.perf_manager.QueryPerf.return_value = []
+        stop_event = threading.Event()
+        stop_event.set()
+        self.assertEqual(self.stream.run(duration=60, stop_event=stop_event), 0)
+        self.assertEqual(self.stream.run(duration=0.05, interval=0.01), 0)
+        self.assertGreaterEqual(self.perf_manager.QueryPerf.call_count, 2)
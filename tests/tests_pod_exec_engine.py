@@ -0,0 +1,152 @@
+"""
+Unit tests for PodExecEngine,  kubectl replaced by a script that
+runs command locally.
+
+Author: Mustafa Bayramov
+spyroot@gmail.com
+mbayramo@stanford.edu
+"""
+import json
+import os
+import stat
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from warlock.actions.node_action_iperf import NodeActions
+from warlock.operators.pod_exec_engine import (
+    PodExecEngine,
+    ExecRequest,
+    ExecResult,
+    kubectl_exec_args,
+    EXEC_TIMEOUT_EXIT_CODE
+)
+
+# fake kubectl, skip exec arguments and run command after --
+FAKE_KUBECTL = """#!/bin/bash
+while [ "$1" != "--" ]; do shift; done
+shift
+exec "$@"
+"""
+
+
+class TestPodExecEngine(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        fd, cls.kubectl = tempfile.mkstemp(prefix="kubectl-")
+        with os.fdopen(fd, "w") as f:
+            f.write(FAKE_KUBECTL)
+        os.chmod(cls.kubectl, stat.S_IRWXU)
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove(cls.kubectl)
+
+    def test_exec_args(self):
+        """Test kubectl exec argument list"""
+        self.assertEqual(
+            kubectl_exec_args(ExecRequest("server", "iperf3 -s", "perf", "iperf")),
+            ["kubectl", "exec", "server", "-n", "perf", "-c", "iperf", "--", "/bin/bash", "-c", "iperf3 -s"])
+
+    def test_run_parallel_and_stream(self):
+        """Test commands run concurrently, start together and stream lines"""
+        engine = PodExecEngine(max_workers=8, kubectl=self.kubectl)
+        lines = []
+        lock = threading.Lock()
+
+        def on_line(pod, line):
+            with lock:
+                lines.append((pod, line))
+
+        requests = [ExecRequest(f"client{i}", f"echo start {i}; sleep 0.3; echo done {i}") for i in range(8)]
+        start = time.monotonic()
+        results = engine.run(requests, on_line=on_line)
+        self.assertLess(time.monotonic() - start, 2.0)
+
+        self.assertEqual([r.pod_name for r in results], [f"client{i}" for i in range(8)])
+        self.assertTrue(all(r.exit_code == 0 for r in results))
+        self.assertEqual(results[3].stdout, "start 3\ndone 3\n")
+        self.assertIn(("client5", "done 5"), lines)
+        self.assertEqual(len(lines), 16)
+        start_times = [r.start_time for r in results]
+        self.assertLess(max(start_times) - min(start_times), 0.5)
+
+    def test_bounded_and_errors(self):
+        """Test bounded concurrency, exit code, stderr and timeout"""
+        engine = PodExecEngine(max_workers=2, kubectl=self.kubectl)
+        results = engine.run([
+            ExecRequest("ok", "echo ok"),
+            ExecRequest("fail", "echo bad >&2; exit 3"),
+            ExecRequest("slow", "sleep 5"),
+        ], timeout=0.5)
+        self.assertEqual(results[0].exit_code, 0)
+        self.assertEqual((results[1].exit_code, results[1].stderr), (3, "bad\n"))
+        self.assertEqual(results[2].exit_code, EXEC_TIMEOUT_EXIT_CODE)
+        self.assertLess(results[2].end_time - results[2].start_time, 3)
+        with self.assertRaises(ValueError):
+            PodExecEngine(max_workers=0)
+
+    def test_detached(self):
+        """Test detached commands collected later and terminated"""
+        engine = PodExecEngine(kubectl=self.kubectl)
+        handles = engine.start([ExecRequest("server", "sleep 0.2; echo listening")])
+        self.assertIsNone(handles[0].poll())
+        results = engine.collect(handles, timeout=5)
+        self.assertEqual((results[0].exit_code, results[0].stdout), (0, "listening\n"))
+
+        handles = engine.start([ExecRequest("server", "sleep 30")])
+        results = engine.terminate(handles)
+        self.assertNotEqual(results[0].exit_code, 0)
+
+
+class TestNodeActionsIperfPairs(unittest.TestCase):
+
+    def test_run_iperf_pairs(self):
+        """Test servers started before clients and client json parsed per pair"""
+        client_json = json.dumps({'end': {'sum_sent': {'bits_per_second': 10.0},
+                                          'sum_received': {'bits_per_second': 9.0}}})
+        engine = MagicMock()
+        engine.start.return_value = ["handle0", "handle1"]
+        engine.terminate.return_value = [ExecResult(f"server{i}", "default", "", -15, "", "", 0, 0) for i in range(2)]
+        engine.run.return_value = [
+            ExecResult("client0", "default", "", 0, client_json, "", 0, 0),
+            ExecResult("client1", "default", "", 1, "", "error", 0, 0)
+        ]
+        actions = NodeActions([], MagicMock(), {}, exec_engine=engine)
+        actions.debug = False
+        pairs = [
+            ({'pod_name': f'server{i}', 'ip': f'10.1.0.{i}', 'cmd': 'iperf3', 'port': 5201, 'options': '-s'},
+             {'pod_name': f'client{i}', 'cmd': 'iperf3', 'port': 5201, 'duration': 10, 'options': '--json'})
+            for i in range(2)
+        ]
+        with unittest.mock.patch('warlock.actions.node_action_iperf.time.sleep'):
+            results = actions.run_iperf_pairs(pairs)
+
+        self.assertEqual(results, [(10.0, 9.0, 'iperf3'), (0, 0, {})])
+        servers = engine.start.call_args.args[0]
+        clients = engine.run.call_args.args[0]
+        self.assertEqual(servers[1].command, "iperf3 --bind 10.1.0.1 -s --port 5201")
+        self.assertEqual(clients[0].command,
+                         "iperf3 --client 10.1.0.0 --json --time 10 --parallel 4 --port 5201")
+        self.assertEqual(engine.run.call_args.kwargs['timeout'], 70)
+        engine.terminate.assert_called_once_with(["handle0", "handle1"])
+
+    def test_run_iperf_pairs_terminates_servers(self):
+        """Test servers terminated when client run fails"""
+        engine = MagicMock()
+        engine.start.return_value = ["handle0"]
+        engine.run.side_effect = RuntimeError("kubectl failed")
+        actions = NodeActions([], MagicMock(), {}, exec_engine=engine)
+        pairs = [({'pod_name': 'server0', 'ip': '10.1.0.0', 'cmd': 'iperf3', 'port': 5201, 'options': '-s'},
+                  {'pod_name': 'client0', 'cmd': 'iperf3', 'port': 5201, 'options': '--json'})]
+        with unittest.mock.patch('warlock.actions.node_action_iperf.time.sleep'):
+            with self.assertRaises(RuntimeError):
+                actions.run_iperf_pairs(pairs)
+        engine.terminate.assert_called_once_with(["handle0"])
+
+
+if __name__ == '__main__':
+    unittest.main()
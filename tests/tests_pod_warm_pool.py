@@ -0,0 +1,168 @@
+"""
+Unit tests for PodWarmPool and warm pool mode of CallbackPodsOperator,
+kubectl is mocked.
+
+Author: Mustafa Bayramov
+spyroot@gmail.com
+mbayramo@stanford.edu
+"""
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import yaml
+
+from warlock.callbacks.callback_pod_operator import CallbackPodsOperator
+from warlock.states.pod_warm_pool import (
+    PodWarmPool,
+    manifest_hash,
+    manifest_node,
+    SPEC_HASH_ANNOTATION,
+    POOL_LABEL
+)
+
+POOL_SHELL = 'warlock.states.pod_warm_pool.ShellOperator'
+CALLBACK_SHELL = 'warlock.callbacks.callback_pod_operator.ShellOperator'
+
+MANIFEST = {
+    'apiVersion': 'v1',
+    'kind': 'Pod',
+    'metadata': {'name': 'placeholder', 'labels': {'app': 'iperf'}},
+    'spec': {'nodeName': 'worker-1', 'containers': [{'name': 'iperf', 'image': 'iperf:1'}]},
+}
+
+
+def running(entry, spec_hash=None, node="worker-1", **metadata):
+    """Return running pool pod of entry"""
+    return {'metadata': dict({'name': entry.pod_name, 'annotations': {
+        SPEC_HASH_ANNOTATION: spec_hash or entry.spec_hash}}, **metadata),
+            'spec': {'nodeName': node},
+            'status': {'phase': 'Running', 'podIPs': [{'ip': '10.1.0.1'}], 'hostIP': '10.0.0.2'}}
+
+
+class TestPodWarmPool(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        for name, image in (("server.yaml", "iperf:1"), ("client.yaml", "iperf:1")):
+            manifest = yaml.safe_load(yaml.safe_dump(MANIFEST))
+            manifest['spec']['containers'][0]['image'] = image
+            with open(self.tmp_dir / name, "w") as f:
+                yaml.safe_dump(manifest, f)
+        self.pool = PodWarmPool(self.tmp_dir / "pool")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_manifest_hash(self):
+        """Test hash ignores pool annotations and node resolved"""
+        annotated = yaml.safe_load(yaml.safe_dump(MANIFEST))
+        annotated['metadata']['annotations'] = {SPEC_HASH_ANNOTATION: "x"}
+        annotated['metadata']['labels'][POOL_LABEL] = "true"
+        self.assertEqual(manifest_hash(MANIFEST), manifest_hash(annotated))
+        annotated['spec']['containers'][0]['image'] = "iperf:2"
+        self.assertNotEqual(manifest_hash(MANIFEST), manifest_hash(annotated))
+        self.assertEqual(manifest_node(MANIFEST), "worker-1")
+        self.assertEqual(manifest_node({'spec': {'nodeSelector': {'kubernetes.io/hostname': 'w2'}}}), "w2")
+
+    def test_prepare(self):
+        """Test annotated manifest written with pod name"""
+        entry = self.pool.prepare("server01", "server", "default", self.tmp_dir / "server.yaml")
+        with open(entry.manifest_path) as f:
+            manifest = yaml.safe_load(f)
+        self.assertEqual(manifest['metadata']['name'], "server")
+        self.assertEqual(manifest['metadata']['annotations'][SPEC_HASH_ANNOTATION], entry.spec_hash)
+        self.assertEqual(manifest['metadata']['labels'][POOL_LABEL], "true")
+        self.assertEqual(entry.node, "worker-1")
+        self.assertEqual(manifest_hash(manifest), entry.spec_hash)
+
+    def test_plan(self):
+        """Test reuse, recycle and create split"""
+        server = self.pool.prepare("server01", "server", "default", self.tmp_dir / "server.yaml")
+        client = self.pool.prepare("client01", "client", "default", self.tmp_dir / "client.yaml")
+        other = self.pool.prepare("client02", "other", "default", self.tmp_dir / "client.yaml")
+        moved = self.pool.prepare("client03", "moved", "default", self.tmp_dir / "client.yaml")
+        pods = {'items': [
+            running(server), running(client, spec_hash="stale"),
+            running(moved, node="worker-9"),
+        ]}
+        with patch(POOL_SHELL) as shell:
+            shell.run_command_json.return_value = pods
+            plan = self.pool.plan([server, client, other, moved])
+        shell.run_command_json.assert_called_once_with(f"kubectl get pods -n default -l {POOL_LABEL}=true -o json")
+        self.assertEqual([e.pod_name for e in plan.reuse], ["server"])
+        self.assertEqual([e.pod_name for e in plan.recycle], ["client", "moved"])
+        self.assertEqual([e.pod_name for e in plan.create], ["other"])
+
+        terminating = running(server, deletionTimestamp="2024-01-01T00:00:00Z")
+        self.assertFalse(PodWarmPool.is_reusable(server, terminating))
+
+    def test_plan_deletes_orphans(self):
+        """Test pool pods whose key removed deleted and drain covers all namespaces"""
+        server = self.pool.prepare("server01", "server", "default", self.tmp_dir / "server.yaml")
+        client = self.pool.prepare("client01", "client", "perf", self.tmp_dir / "client.yaml")
+        with patch(POOL_SHELL) as shell:
+            shell.run_command_json.return_value = {'items': []}
+            self.pool.plan([server, client])
+            shell.run_command.assert_not_called()
+
+        # client01 removed from spell spec
+        pool_pods = {'default': {'items': [running(server)]}, 'perf': {'items': [running(client)]}}
+        with patch(POOL_SHELL) as shell:
+            shell.run_command_json.side_effect = lambda cmd: pool_pods[cmd.split(" -n ")[1].split()[0]]
+            plan = self.pool.plan([server])
+            self.assertEqual(plan.orphan, [("perf", "client")])
+            self.assertEqual([e.pod_name for e in plan.reuse], ["server"])
+            shell.run_command.assert_called_once_with(
+                "kubectl delete pod client -n perf --ignore-not-found --wait=false")
+
+            shell.reset_mock()
+            self.pool.drain()
+            deletes = [c.args[0] for c in shell.run_command.call_args_list]
+            self.assertEqual(len(deletes), 2)
+            self.assertTrue(deletes[1].startswith("kubectl delete pod -n perf"))
+
+    def test_callback_warm_pool(self):
+        """Test callback applies only changed pods and keeps pods on scenario end"""
+        specs = MagicMock()
+        specs.absolute_dir = self.tmp_dir
+        specs.pods_spells.return_value = {
+            'server01': {'type': 'pod', 'pod_name': 'server', 'pod_spec_file': 'server.yaml'},
+            'client01': {'type': 'pod', 'pod_name': 'client', 'pod_spec_file': 'client.yaml'},
+        }
+        server_hash = self.pool.prepare("server01", "server", "default", self.tmp_dir / "server.yaml").spec_hash
+        pool_pods = {'items': [
+            {'metadata': {'name': 'server', 'annotations': {SPEC_HASH_ANNOTATION: server_hash}},
+             'spec': {'nodeName': 'worker-1'}, 'status': {'phase': 'Running'}},
+            {'metadata': {'name': 'client', 'annotations': {SPEC_HASH_ANNOTATION: 'stale'}},
+             'spec': {'nodeName': 'worker-1'}, 'status': {'phase': 'Running'}},
+        ]}
+        kube_state = MagicMock(api=None)
+        kube_state.wait_for_pods_ready.side_effect = lambda names, ns, timeout: {
+            n: {'status': {'phase': 'Running', 'podIPs': [{'ip': '10.1.0.1'}]}} for n in names}
+        caster_state = MagicMock(k8s_pods_states={})
+
+        callback = CallbackPodsOperator(specs, dry_run=False, kube_state=kube_state, warm_pool=self.pool)
+        callback.register_spell_caster_state(caster_state)
+        with patch(POOL_SHELL) as pool_shell, patch(CALLBACK_SHELL) as shell:
+            pool_shell.run_command_json.return_value = pool_pods
+            callback.on_scenario_begin()
+            deletes = [c.args[0] for c in shell.run_command.call_args_list]
+            applies = [c.args[0] for c in shell.run_command_json.call_args_list]
+            self.assertEqual(len(deletes), 1)
+            self.assertTrue(deletes[0].startswith("kubectl delete pod client -n default"))
+            self.assertIn("--wait=true", deletes[0])
+            self.assertEqual(len(applies), 1)
+            self.assertIn("default-client.yaml", applies[0])
+            self.assertNotIn("server", applies[0])
+            self.assertEqual(sorted(caster_state.k8s_pods_states), ["client01", "server01"])
+
+            shell.reset_mock()
+            callback.on_scenario_end()
+            shell.run_command.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
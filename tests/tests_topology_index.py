@@ -0,0 +1,189 @@
+"""
+Unit tests for TopologyIndex and CallbackTopologyIndex,
+state built the same way as pod, iaas and esxi callbacks store it.
+
+Author: Mustafa Bayramov
+spyroot@gmail.com
+mbayramo@stanford.edu
+"""
+import pickle
+import unittest
+from unittest.mock import MagicMock, patch
+
+from warlock.callbacks.callback_esxi_observer import CallbackEsxiObserver
+from warlock.callbacks.callback_node_observer import CallbackNodeObserver
+from warlock.callbacks.callback_perf_collection import CallbackPerfCollection
+from warlock.callbacks.callback_topology_index import CallbackTopologyIndex
+from warlock.callbacks.named_tuples import VmState, HostVmnicInfo, MacAddressState, PortInfo
+from warlock.states.kube_records import PodRecord, NodeRecord
+from warlock.states.esxi_state_reader import EsxiStateReader
+from warlock.states.topology_index import TopologyIndex
+from warlock.states.warlock_state import WarlockState
+
+
+def make_state() -> WarlockState:
+    """Return warlock state with two pods, two VMs on two hosts"""
+    state = WarlockState()
+    state.k8s_pods_states = {
+        'server0': {'ip': '10.1.0.1', 'phase': 'Running', 'node_ip': '192.168.1.10',
+                    'pod_state': PodRecord('server0', 'perf', 'np1-vm-a', '10.1.0.1',
+                                           ['10.1.0.1'], '192.168.1.10', 'Running', {})},
+        'client0': {'ip': '10.1.0.2', 'phase': 'Running', 'node_ip': '192.168.1.11',
+                    'pod_state': None},
+    }
+    state.iaas_state = {
+        'vms': ['np1-vm-a', 'np1-vm-b-xk2'],
+        'np1-vm-a': VmState({'esxiHost': 'esxi-1'}, HostVmnicInfo('esxi-1', ['vmnic0'], ['vmnic4']),
+                            MacAddressState([], [])),
+        'np1-vm-b-xk2': VmState({'esxiHost': 'esxi-2'}, HostVmnicInfo('esxi-2', ['vmnic0'], []),
+                                MacAddressState([], [])),
+    }
+    state.esxi_node_states = {
+        'esxi-1': {'np1-vm-a': {
+            'WorldID': '100',
+            'port_ids': [PortInfo(67108881, 'vnic', '', 'dvs', '', 'np1-vm-a', False),
+                         PortInfo(67108882, 'sriov', '', 'dvs', '', 'np1-vm-a', True)],
+            'active_vfs': [{'VFID': '0', 'PCIAddress': '0000:3b:02.0', 'Active': 'true'}]}},
+        'esxi-2': {'np1-vm-b-xk2': {'port_ids': [PortInfo(67108881, 'vnic', '', 'dvs', '', '', False)],
+                                    'active_vfs': []}},
+    }
+    return state
+
+
+class TestTopologyIndex(unittest.TestCase):
+
+    def test_join_all_directions(self):
+        """Test pod -> node -> vm -> host -> port and back"""
+        topology = TopologyIndex.from_caster_state(make_state(), {'192.168.1.11': 'np1-vm-b'})
+        self.assertEqual(topology.node_of_pod("server0"), "np1-vm-a")
+        self.assertEqual(topology.vm_of_pod("server0"), "np1-vm-a")
+        self.assertEqual(topology.host_of_vm("np1-vm-a"), "esxi-1")
+        self.assertEqual(topology.ports_of_vm("np1-vm-a"), [67108881, 67108882])
+        self.assertEqual(topology.vm_of_port("esxi-1", "67108882"), "np1-vm-a")
+        self.assertEqual(topology.vm_of_vf("esxi-1", "0000:3b:02.0"), "np1-vm-a")
+        self.assertEqual(topology.vms_of_vmnic("esxi-1", "vmnic4"), ["np1-vm-a"])
+        self.assertEqual(topology.pods_of_vm("np1-vm-a"), ["server0"])
+        self.assertEqual(topology.pod_of_ip("10.1.0.1"), "server0")
+
+        # node resolved by ip, vm by name prefix, same port id on another host
+        self.assertEqual(topology.node_of_pod("client0"), "np1-vm-b")
+        self.assertEqual(topology.vm_of_node("np1-vm-b"), "np1-vm-b-xk2")
+        self.assertEqual(topology.vm_of_port("esxi-2", 67108881), "np1-vm-b-xk2")
+        self.assertEqual(topology.vms_of_host("esxi-2"), ["np1-vm-b-xk2"])
+
+    def test_path_and_unknown(self):
+        """Test joined path and unresolved lookups"""
+        topology = TopologyIndex.from_caster_state(make_state())
+        path = topology.path("server0")
+        self.assertEqual((path.namespace, path.node_ip, path.esxi_host, path.sriov_vmnics),
+                         ("perf", "192.168.1.10", "esxi-1", ["vmnic4"]))
+        self.assertEqual(path.vf_ids, ["0000:3b:02.0"])
+        # no node name for client0 without address map
+        self.assertIsNone(topology.path("client0").esxi_host)
+        self.assertIsNone(topology.path("unknown"))
+        self.assertIsNone(topology.vm_of_port("esxi-3", 1))
+        self.assertEqual(topology.pods_of_node("unknown"), [])
+        self.assertEqual(len(pickle.loads(pickle.dumps(topology)).paths()), 2)
+
+    def test_link_nodes_token_boundary(self):
+        """Test fallback match on name boundary and ambiguous node left unlinked"""
+        topology = TopologyIndex()
+        for vm in ("cluster-worker-10", "cluster-worker-1-abc", "a-worker-2", "b-worker-2"):
+            topology.add_vm(vm, "esxi-1")
+        topology.add_node("worker-1", "192.168.1.1")
+        topology.add_node("worker-2", "192.168.1.2")
+        with self.assertLogs(topology.logger, level="WARNING"):
+            topology.link_nodes()
+        self.assertEqual(topology.vm_of_node("worker-1"), "cluster-worker-1-abc")
+        self.assertEqual(topology.node_of_vm("cluster-worker-1-abc"), "worker-1")
+        self.assertIsNone(topology.node_of_vm("cluster-worker-10"))
+        self.assertIsNone(topology.vm_of_node("worker-2"))
+
+    def test_link_nodes_one_to_one(self):
+        """Test VM claimed by several nodes not linked to any of them"""
+        topology = TopologyIndex()
+        topology.add_vm("w-1", "esxi-1")
+        for i, node in enumerate(("w-1x", "w-1y", "w-1-a", "w-1-b")):
+            topology.add_node(node, f"192.168.1.{i}")
+        with self.assertLogs(topology.logger, level="WARNING"):
+            topology.link_nodes()
+        for node in ("w-1x", "w-1y", "w-1-a", "w-1-b"):
+            self.assertIsNone(topology.vm_of_node(node))
+        self.assertIsNone(topology.node_of_vm("w-1"))
+
+        topology.add_node("w-1", "192.168.1.9")
+        topology.link_nodes()
+        self.assertEqual(topology.node_of_vm("w-1"), "w-1")
+        self.assertIsNone(topology.vm_of_node("w-1-a"))
+
+
+class TestCallbackTopologyIndex(unittest.TestCase):
+
+    def test_scenario_begin(self):
+        """Test callback stores index in caster state"""
+        kube_state = MagicMock()
+        kube_state.node_records.return_value = {
+            'np1-vm-b': NodeRecord('np1-vm-b', '192.168.1.11', [], {}, {}, False)
+        }
+        callback = CallbackTopologyIndex(MagicMock(), kube_state=kube_state)
+        callback.caster_state = make_state()
+        callback.on_scenario_begin()
+        topology = callback.caster_state.topology
+        self.assertEqual(topology.host_of_vm(topology.vm_of_pod("client0")), "esxi-2")
+
+
+class TestTopologyConsumers(unittest.TestCase):
+
+    def test_esxi_observer(self):
+        """Test esxi observer resolves host through index and adds ports to it"""
+        state = make_state()
+        esxi_node_states = state.esxi_node_states
+        state.esxi_node_states = {}
+        state.iaas_state['hosts'] = ['esxi-1', 'esxi-2']
+        state.topology = TopologyIndex.from_caster_state(state)
+        # index built once, later iaas state changes not consulted
+        state.iaas_state['np1-vm-a'].state['esxiHost'] = 'esxi-9'
+
+        hosts = []
+
+        def process(reader, vm_name, esxi_host):
+            hosts.append(esxi_host)
+            state.esxi_node_states.setdefault(esxi_host, {})[vm_name] = esxi_node_states[esxi_host][vm_name]
+
+        observer = CallbackEsxiObserver(MagicMock())
+        observer.caster_state = state
+        with patch.object(EsxiStateReader, 'from_optional_credentials'), \
+                patch.object(observer, '_process_vm_process_state', side_effect=process), \
+                patch.object(observer, '_process_port_ids'), \
+                patch.object(observer, '_process_vfs_ids'):
+            observer.on_scenario_begin()
+
+        self.assertEqual(sorted(hosts), ['esxi-1', 'esxi-2'])
+        self.assertEqual(state.topology.vm_of_port("esxi-1", 67108882), "np1-vm-a")
+        self.assertEqual(state.topology.path("server0").vf_ids, ["0000:3b:02.0"])
+
+    def test_node_observer_addresses(self):
+        """Test node observer reads each node once"""
+        state = make_state()
+        state.k8s_pods_states['server1'] = {
+            'ip': '10.1.0.3', 'node_ip': None,
+            'pod_state': PodRecord('server1', 'perf', 'np1-vm-a', '10.1.0.3',
+                                   ['10.1.0.3'], None, 'Running', {})}
+        state.topology = TopologyIndex.from_caster_state(state)
+        observer = CallbackNodeObserver(MagicMock())
+        observer.caster_state = state
+        self.assertEqual(observer._node_addresses(), ['192.168.1.10', '192.168.1.11'])
+
+    def test_perf_collection_num_series(self):
+        """Test stats budget series estimated from index"""
+        state = make_state()
+        state.topology = TopologyIndex.from_caster_state(state)
+        callback = CallbackPerfCollection(MagicMock(), ["a", "b"], dry_run=True)
+        callback.caster_state = state
+        callback.on_scenario_begin()
+        # 2 VMs and 3 host uplinks
+        self.assertEqual(callback.scope.num_series, 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,196 @@
+"""
+Unit tests for batched metric queries in VMwareMetricCollector,
+these tests use fake performance manager.
+
+Author: Mustafa Bayramov
+spyroot@gmail.com
+mbayramo@stanford.edu
+"""
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+from pyVmomi import vim
+
+from warlock.states.vm_state import ClusterNotFoundException
+from warlock.metrics.vm_metric_stats import (
+    VMwareMetricCollector,
+    MetricQuery,
+    NET_METRIC_NAMES,
+    DVS_NET_METRIC_NAMES,
+    PERF_FORMAT_CSV,
+    parse_csv_values,
+    parse_csv_sample_info
+)
+
+
+def entity_metric(entity, series):
+    """Return fake PerfEntityMetric,  series is list of (counter id, instance, values)"""
+    return SimpleNamespace(entity=entity, value=[
+        SimpleNamespace(id=SimpleNamespace(counterId=c, instance=i), value=v) for c, i, v in series
+    ])
+
+
+def fake_collector() -> VMwareMetricCollector:
+    """Return collector with fake service instance"""
+    collector = VMwareMetricCollector(vcenter_ip="vc", username="u", password="p")
+    collector.si = MagicMock()
+    return collector
+
+
+class TestBatchedQueryPerf(unittest.TestCase):
+
+    def test_constructor(self):
+        """Test collector constructor"""
+        collector = VMwareMetricCollector(vcenter_ip="vc", username="u", password="p")
+        self.assertEqual(collector.vcenter_ip, "vc")
+
+    def test_read_entities_metric(self):
+        """Test many entities collected in one QueryPerf"""
+        collector = fake_collector()
+        vm1, vm2, host = vim.VirtualMachine("vm-1"), vim.VirtualMachine("vm-2"), vim.HostSystem("host-12")
+        perf_manager = collector.si.content.perfManager
+        # returned series order differs from requested order
+        perf_manager.QueryPerf.return_value = [
+            entity_metric(host, [(7, "vmnic0", [5, 6])]),
+            entity_metric(vm1, [(2, "", [10, 11, 12]), (1, "", [1, 2, 3])]),
+            entity_metric(vm2, [(1, "", [4])]),
+        ]
+
+        queries = [
+            MetricQuery(vm1, "vm", [1, 2], ""),
+            MetricQuery(vm2, "vm", [1, 2], ""),
+            MetricQuery(host, "host", [7], "vmnic0"),
+        ]
+        data = collector.read_entities_metric(queries, interval_seconds=300, max_sample=3)
+
+        self.assertEqual(perf_manager.QueryPerf.call_count, 1)
+        specs = perf_manager.QueryPerf.call_args.kwargs['querySpec']
+        self.assertEqual(len(specs), 3)
+        self.assertEqual(specs[2].metricId[0].instance, "vmnic0")
+
+        self.assertEqual(data.shape, (3, 3, 2))
+        np.testing.assert_array_equal(data[0], [[1, 10], [2, 11], [3, 12]])
+        np.testing.assert_array_equal(data[1, 0], [4, np.nan])
+        self.assertTrue(np.isnan(data[1, 1:]).all())
+        np.testing.assert_array_equal(data[2, :2, 0], [5, 6])
+        self.assertTrue(np.isnan(data[2, :, 1]).all())
+
+    def test_resolve_entity_by_name(self):
+        """Test entity names resolved by type"""
+        collector = fake_collector()
+        collector.si.content.perfManager.QueryPerf.return_value = []
+        vm = vim.VirtualMachine("vm-1")
+        with patch.object(collector, 'get_managed_entities', return_value=vm) as resolve:
+            data = collector.read_entities_metric([MetricQuery("test-vm", "vm", [1], "")])
+        resolve.assert_called_once_with("test-vm", "vm")
+        self.assertEqual(data.shape, (1, 0, 1))
+
+    def test_net_host_usage(self):
+        """Test host vmnic metrics collected in one request"""
+        collector = fake_collector()
+        host = vim.HostSystem("host-12")
+        collector._vm_metrics_type = {"net.packetsTx.summation": 1, "net.packetsRx.summation": 2,
+                                      "net.droppedTx.summation": 3, "net.droppedRx.summation": 4,
+                                      "net.received.average": 5, "net.transmitted.average": 6}
+        perf_manager = collector.si.content.perfManager
+        perf_manager.QueryPerf.return_value = [
+            entity_metric(host, [(c, "vmnic0", [c, c]) for c in range(1, 7)] +
+                          [(c, "vmnic1", [c]) for c in range(1, 7)]),
+        ]
+        with patch.object(collector, 'read_esxi_host_pnic', return_value={"vmnic0": {}, "vmnic1": {}}), \
+                patch.object(collector, 'get_managed_entities', return_value=host):
+            stats = collector.read_net_host_usage_metric("esxi-a")
+
+        self.assertEqual(perf_manager.QueryPerf.call_count, 1)
+        self.assertEqual(stats["vmnic0"].shape, (2, 6))
+        self.assertEqual(stats["vmnic1"].shape, (1, 6))
+        np.testing.assert_array_equal(stats["vmnic1"][0], [1, 2, 3, 4, 5, 6])
+
+
+class TestCsvPerfFormat(unittest.TestCase):
+
+    def test_parse_csv(self):
+        """Test csv values and sample info parsing"""
+        np.testing.assert_array_equal(parse_csv_values("10,11,-1"), [10, 11, -1])
+        self.assertEqual(parse_csv_values("").shape, (0,))
+        intervals, timestamps = parse_csv_sample_info(
+            "20,2024-03-01T10:00:20Z,20,2024-03-01T10:00:40Z")
+        np.testing.assert_array_equal(intervals, [20, 20])
+        self.assertEqual(timestamps[1] - timestamps[0], np.timedelta64(20, 's'))
+
+    def test_read_entities_metric_csv(self):
+        """Test csv format requested and parsed"""
+        collector = fake_collector()
+        vm1 = vim.VirtualMachine("vm-1")
+        perf_manager = collector.si.content.perfManager
+        perf_manager.QueryPerf.return_value = [
+            entity_metric(vm1, [(1, "", "1,2,3"), (2, "", "10,11")]),
+        ]
+        data = collector.read_entities_metric(
+            [MetricQuery(vm1, "vm", [1, 2], "")], perf_format=PERF_FORMAT_CSV)
+
+        spec = perf_manager.QueryPerf.call_args.kwargs['querySpec'][0]
+        self.assertEqual(spec.format, PERF_FORMAT_CSV)
+        np.testing.assert_array_equal(data[0, :, 0], [1, 2, 3])
+        np.testing.assert_array_equal(data[0, :, 1], [10, 11, np.nan])
+
+        with patch.object(collector, 'get_managed_entities', return_value=vm1):
+            trimmed = collector.read_entity_metric("vm", "vm", [1, 2], perf_format=PERF_FORMAT_CSV)
+        np.testing.assert_array_equal(trimmed, [[1, 10], [2, 11], [3, np.nan]])
+
+    def test_trim_padding(self):
+        """Test only trailing samples where all metrics NaN trimmed"""
+        values = np.array([[1, np.nan], [np.nan, 2], [3, 4], [np.nan, np.nan]], dtype=np.float32)
+        np.testing.assert_array_equal(VMwareMetricCollector._trim_padding(values), values[:3])
+        self.assertEqual(VMwareMetricCollector._trim_padding(np.full((2, 2), np.nan)).shape, (0, 2))
+
+
+class TestClusterNetSweep(unittest.TestCase):
+
+    def test_cluster_net_sweep(self):
+        """Test all hosts vmnics and dvs collected in one QueryPerf"""
+        collector = fake_collector()
+        collector._vm_metrics_type = {name: i + 1 for i, name in enumerate(NET_METRIC_NAMES + DVS_NET_METRIC_NAMES)}
+        host_a, host_b = vim.HostSystem("host-1"), vim.HostSystem("host-2")
+        dvs_1, dvs_2 = vim.DistributedVirtualSwitch("dvs-1"), vim.DistributedVirtualSwitch("dvs-2")
+        properties = {
+            vim.HostSystem: {
+                host_b: {'name': "esxi-b", 'config.network.pnic': [SimpleNamespace(device="vmnic0")]},
+                host_a: {'name': "esxi-a", 'config.network.pnic': [
+                    SimpleNamespace(device="vmnic1"), SimpleNamespace(device="vmnic0")]},
+            },
+            vim.DistributedVirtualSwitch: {
+                dvs_1: {'uuid': "uuid-1", 'name': "core"},
+                dvs_2: {'uuid': "uuid-2", 'name': "other-cluster"},
+            },
+        }
+        collector._dvs_uplinks = {("uuid-1", "esxi-a"): ["vmnic1"], ("uuid-2", "esxi-z"): ["vmnic0"]}
+        perf_manager = collector.si.content.perfManager
+        perf_manager.QueryPerf.return_value = [
+            entity_metric(host_a, [(c, "vmnic1", [c * 10]) for c in range(1, 7)]),
+            entity_metric(dvs_1, [(7, "", [70, 71])]),
+        ]
+
+        with patch.object(collector, 'read_cluster', return_value=MagicMock()), \
+                patch.object(collector, 'ensure_dvs_uplink_index'), \
+                patch.object(collector, 'collect_properties', side_effect=lambda root, t, p: properties[t]):
+            sweep = collector.read_cluster_net_sweep("cluster")
+
+        self.assertEqual(perf_manager.QueryPerf.call_count, 1)
+        self.assertEqual(len(perf_manager.QueryPerf.call_args.kwargs['querySpec']), 4)
+        self.assertEqual(sweep.labels, [("esxi-a", "vmnic0"), ("esxi-a", "vmnic1"), ("esxi-b", "vmnic0")])
+        self.assertEqual(sweep.dvs_labels, ["core"])
+        self.assertEqual(sweep.data.shape, (3, 2, 6))
+        self.assertEqual(sweep.dvs_data.shape, (1, 2, 4))
+        np.testing.assert_array_equal(sweep.data[1, 0], [10, 20, 30, 40, 50, 60])
+        self.assertTrue(np.isnan(sweep.data[0]).all())
+        np.testing.assert_array_equal(sweep.dvs_data[0, :, 0], [70, 71])
+
+    def test_cluster_not_found(self):
+        """Test unknown cluster raise"""
+        collector = fake_collector()
+        with patch.object(collector, 'read_cluster', return_value=None):
+            with self.assertRaises(ClusterNotFoundException):
+                collector.read_cluster_net_sweep("missing")
@@ -146,17 +146,35 @@ class CallbackEsxiObserver(Callback['WarlockState']):
         :param esxi_host: The ESXi host being processed.
         :param vm_name: The name of the VM to process.
         """
-        _vm_state = self.caster_state.iaas_state[vm_name]
         world_id = str(self.caster_state.esxi_node_states[esxi_host][vm_name]['WorldID'])
-        pnic_info = _vm_state.pnic_map
+        topology = self.caster_state.topology
+        if topology is not None:
+            _, sriov_vmnics = topology.vmnics_of_vm(vm_name)
+        else:
+            sriov_vmnics = self.caster_state.iaas_state[vm_name].pnic_map.sriov_vmnic
 
         self.caster_state.esxi_node_states[esxi_host][vm_name]['active_vfs'] = {}
 
-        for sriov_nic_name in pnic_info.sriov_vmnic:
+        for sriov_nic_name in sriov_vmnics:
             vfs_data = esxi_state_reader.read_vfs(pf_adapter_name=sriov_nic_name)
             active_vfs = [vf for vf in vfs_data if vf['Active'] and vf['OwnerWorldID'] == world_id]
             self.caster_state.esxi_node_states[esxi_host][vm_name]['active_vfs'] = active_vfs
 
+    def _host_of_vm(
+            self,
+            vm_name: str
+    ) -> str:
+        """Return ESXi host VM runs on, resolved through topology index
+        if CallbackTopologyIndex already built it.
+        :param vm_name: VM name
+        :return: esxi host
+        """
+        topology = self.caster_state.topology
+        esxi_host = topology.host_of_vm(vm_name) if topology is not None else None
+        if esxi_host is None:
+            esxi_host = self.caster_state.iaas_state[vm_name].state['esxiHost']
+        return esxi_host
+
     def collect_data(
             self,
             vm_name,
@@ -167,9 +185,9 @@ class CallbackEsxiObserver(Callback['WarlockState']):
         :param spell:
         :return:
         """
+        esxi_host = None
         try:
-            vm_info = self.caster_state.iaas_state[vm_name]
-            esxi_host = vm_info.state['esxiHost']
+            esxi_host = self._host_of_vm(vm_name)
             with EsxiStateReader.from_optional_credentials(
                     esxi_fqdn=esxi_host,
                     username=spell.get('hosts_username', 'root'),
@@ -209,6 +227,10 @@ class CallbackEsxiObserver(Callback['WarlockState']):
         for thread in threads:
             thread.join()
 
+        # port ids and VFs resolved, downstream callbacks look them up in index
+        if self.caster_state.topology is not None:
+            self.caster_state.topology.add_esxi_states(self.caster_state.esxi_node_states)
+
         self.logger.info("Final ESXi node states:")
         self.logger.info(json.dumps(self.caster_state.esxi_node_states, indent=2))
 
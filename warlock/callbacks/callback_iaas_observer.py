@@ -7,6 +7,7 @@ from typing import Optional, Dict, List
 from warlock.callbacks.callback import Callback
 from warlock.spell_specs import SpellSpecs
 from warlock.states.vm_state import VMwareVimStateReader
+from warlock.states.async_vm_state import AsyncVimStateReader
 from warlock.callbacks.named_tuples import (
     HostVmnicInfo,
     MacAddressState, VmState
@@ -27,6 +28,8 @@ class CallbackIaasObserver(Callback['WarlockState']):
             dry_run: Optional[bool] = True,
             logger: Optional[logging.Logger] = None,
             reuse_existing: Optional[bool] = False,
+            inventory_dir: Optional[str] = None,
+            max_workers: Optional[int] = 8,
     ):
         """
         Create Pod Operator
@@ -34,6 +37,9 @@ class CallbackIaasObserver(Callback['WarlockState']):
         :param dry_run:
         :param logger:
         :param reuse_existing:
+        :param inventory_dir: optional vCenter inventory snapshot directory,
+                              if provided reader warm starts from snapshot.
+        :param max_workers: max number of concurrent vCenter calls during discovery.
         """
         super().__init__()
         self.logger = logger if logger else logging.getLogger(__name__)
@@ -48,6 +54,8 @@ class CallbackIaasObserver(Callback['WarlockState']):
         # default wait time
         self._timeout = 30
         self._default_timeout = self._timeout
+        self._inventory_dir = inventory_dir
+        self._max_workers = max_workers
 
     def _log_dry_run_operation(
             self,
@@ -158,6 +166,13 @@ class CallbackIaasObserver(Callback['WarlockState']):
             spell['password'],
         )
 
+        if self._inventory_dir:
+            start_time = time.time()
+            is_warm = state_reader.warm_start(self._inventory_dir)
+            self.logger.info(
+                f"warm_start from {self._inventory_dir} loaded {is_warm}, "
+                f"took {time.time() - start_time:.2f} seconds")
+
         if self.caster_state.iaas_state is None:
             self.caster_state.iaas_state = {}
 
@@ -170,23 +185,25 @@ class CallbackIaasObserver(Callback['WarlockState']):
         start_time = time.time()
         self.logger.info(f"find_vm_by_name_substring took {time.time() - start_time:.2f} seconds")
 
-        for _vm in vms_name:
+        # discover all VMs concurrently, VMs on the same host share
+        # host lookups via single-flight.
+        start_time = time.time()
+        with AsyncVimStateReader(state_reader, max_workers=self._max_workers) as vim_reader:
+            vm_names = [_vm.name for _vm in vms_name]
+            state_futures = vim_reader.map('vm_state', vm_names)
+            vnic_futures = vim_reader.map('read_vm_vnic_info', vm_names)
+            vm_states = [f.result() for f in state_futures]
+            vm_vnics = [f.result() for f in vnic_futures]
+        self.logger.info(f"vm_state for {len(vm_names)} vms took {time.time() - start_time:.2f} seconds")
 
-            vm_name = _vm.name
-            start_time = time.time()
-            state = state_reader.vm_state(vm_name)
+        for _vm, state, _vnics in zip(vms_name, vm_states, vm_vnics):
 
+            vm_name = _vm.name
             if _vm not in self.caster_state.iaas_state:
                 self.caster_state.iaas_state[vm_name] = {}
 
-            self.logger.info(f"vm_state for {vm_name} took {time.time() - start_time:.2f} seconds")
             pnic_named = CallbackIaasObserver._extract_vmnic_info_from_state(state)
 
-            start_time = time.time()
-            _vnics = state_reader.read_vm_vnic_info(vm_name)
-            self.logger.info(
-                f"_extract_vmnic_from_state for {vm_name} took {time.time() - start_time:.2f} seconds")
-
             non_sriov_mac_addresses = [vnic['macAddress'] for vnic in _vnics if not vnic.get('is_sriov')]
             sriov_mac_addresses = [vnic['macAddress'] for vnic in _vnics if vnic.get('is_sriov')]
 
@@ -207,3 +224,10 @@ class CallbackIaasObserver(Callback['WarlockState']):
         :return:
         """
         self.logger.info("CallbackIaasObserver scenario end")
+        if self._inventory_dir and self.caster_state.iaas_state:
+            state_reader = self.caster_state.iaas_state.get('reader')
+            if state_reader is not None:
+                state_reader.wait_inventory_reconciled()
+                # reconciled inventory saved as is, vCenter swept
+                # only if reader wasn't warm started
+                state_reader.save_inventory_snapshot(self._inventory_dir, state_reader.inventory)
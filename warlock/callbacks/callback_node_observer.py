@@ -67,6 +67,25 @@ class CallbackNodeObserver(Callback['WarlockState']):
         """
         return self.dry_run_plan
 
+    def _node_addresses(self) -> List[str]:
+        """Return distinct addresses of nodes pods run on,  pod to node
+        resolved through topology index if CallbackTopologyIndex built it,
+        hence each node read once even if many pods run on it.
+        :return: list of node addresses
+        """
+        topology = self.caster_state.topology
+        node_addresses = []
+        for k, pod_state in self.caster_state.k8s_pods_states.items():
+            node_address = pod_state.get('node_ip')
+            if topology is not None:
+                pod = topology.pod_of_key(k)
+                node = topology.node_of_pod(pod) if pod is not None else None
+                if node is not None:
+                    node_address = topology.ip_of_node(node) or node_address
+            if node_address is not None and node_address not in node_addresses:
+                node_addresses.append(node_address)
+        return node_addresses
+
     def on_scenario_begin(self):
         """
         On scenario begin, this callback read information
@@ -74,11 +93,7 @@ class CallbackNodeObserver(Callback['WarlockState']):
         """
         self.logger.info("CallbackNodeObserver scenario begin")
         spell = self._master_spell_spec.caas_spells()
-        for k, pod_state in self.caster_state.k8s_pods_states.items():
-            if 'node_ip' not in pod_state or pod_state['node_ip'] is None:
-                continue
-
-            node_address = pod_state['node_ip']
+        for node_address in self._node_addresses():
             with NodeStateReader.from_optional_credentials(
                         node_address=node_address,
                         username=spell['username'],
@@ -0,0 +1,81 @@
+import logging
+from typing import Optional, Dict, List, Any
+
+from warlock.callbacks.callback import Callback
+from warlock.metrics.perf_collection_scope import PerfCollectionScope, StatsBudget
+from warlock.metrics.vm_metric_stats import VMwareMetricCollector
+
+
+class CallbackPerfCollection(Callback['WarlockState']):
+    """
+    Raises vCenter statistics collection for the counters an experiment
+    needs on scenario begin and restores it on scenario end.
+    """
+
+    def __init__(
+            self,
+            collector: VMwareMetricCollector,
+            counters: List[str],
+            level: Optional[int] = 1,
+            intervals: Optional[Dict[int, Dict[str, Any]]] = None,
+            num_series: Optional[int] = None,
+            duration_seconds: Optional[float] = 3600,
+            dry_run: Optional[bool] = True,
+            logger: Optional[logging.Logger] = None,
+    ):
+        """
+        :param collector: VMwareMetricCollector
+        :param counters: counter names, i.e. net.droppedRx.summation
+        :param level: level counters mapped to during scenario.
+        :param intervals: optional interval changes during scenario.
+        :param num_series: number of series for stats budget estimate, default
+                           counters x (VMs and host uplinks in caster state topology).
+        :param duration_seconds: expected scenario duration for stats budget estimate.
+        :param dry_run: on dry run we only log but never mutate vCenter.
+        :param logger: optional logger
+        """
+        super().__init__()
+        self.logger = logger if logger else logging.getLogger(__name__)
+        self.scope = PerfCollectionScope(
+            collector, counters,
+            level=level,
+            intervals=intervals,
+            num_series=num_series,
+            duration_seconds=duration_seconds,
+            logger=self.logger
+        )
+        self._num_series = num_series
+        self.is_dry_run = dry_run
+        self.dry_run_plan = []
+        # stats budget per scenario
+        self.budgets: List[StatsBudget] = []
+
+    def _estimate_num_series(self) -> Optional[int]:
+        """Return number of series scenario collects, each counter for every
+        VM and host uplink in topology index,  None if index not built.
+        """
+        topology = getattr(self.caster_state, 'topology', None)
+        if topology is None:
+            return None
+        num_entities = len(topology.vms()) + len(topology.host_vmnics())
+        return len(self.scope.counters) * max(1, num_entities)
+
+    def on_scenario_begin(self):
+        """Map counters to scenario level and apply interval changes."""
+        if self._num_series is None:
+            num_series = self._estimate_num_series()
+            if num_series is not None:
+                self.scope.num_series = num_series
+        if self.is_dry_run:
+            self.dry_run_plan.append({
+                "operation": "perf_collection_scope",
+                "counters": self.scope.counters,
+                "level": self.scope.level,
+                "intervals": self.scope.intervals,
+            })
+            return
+        self.budgets.append(self.scope.enter())
+
+    def on_scenario_end(self):
+        """Restore counter levels and intervals."""
+        self.scope.restore()
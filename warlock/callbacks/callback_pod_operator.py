@@ -1,11 +1,14 @@
 import logging
-import time
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Dict, List, Tuple, Any, Callable
 
 from warlock.spell_specs import SpellSpecs
 from warlock.callbacks.callback import Callback
+from warlock.states.kube_records import PodRecord
 from warlock.states.kube_state_reader import KubernetesState
 from warlock.operators.shell_operator import ShellOperator
+from warlock.states.pod_warm_pool import PodWarmPool
 
 
 class CallbackPodsOperator(Callback['WarlockState']):
@@ -28,6 +31,10 @@ class CallbackPodsOperator(Callback['WarlockState']):
             dry_run: Optional[bool] = True,
             logger: Optional[logging.Logger] = None,
             reuse_existing:  Optional[bool] = False,
+            kube_state: Optional[KubernetesState] = None,
+            max_workers: Optional[int] = 8,
+            wait_for_deletion: Optional[bool] = True,
+            warm_pool: Optional[PodWarmPool] = None,
     ):
         """
         Initializes the callback with the necessary configuration to manage Kubernetes pods.
@@ -36,6 +43,13 @@ class CallbackPodsOperator(Callback['WarlockState']):
         :param dry_run: If set to True, operations will be logged but not executed.
         :param logger: A logger instance for logging output. A default logger is used if none is provided.
         :param reuse_existing: If set to True, existing pods will not be deleted and will be reused.
+        :param kube_state: optional KubernetesState pods read through, i.e. with api backend.
+                           If not provided pods read with kubectl.
+        :param max_workers: max number of namespaces applied, waited and deleted concurrently.
+        :param wait_for_deletion: if True, scenario end waits until pods actually terminated.
+        :param warm_pool: optional warm pod pool,  pods kept running between scenarios,
+                          only pods which spec or node changed re-created.  Callback
+                          never drains pool, caller owns it and calls drain() once done.
         """
         super().__init__()
         self.logger = logger if logger else logging.getLogger(__name__)
@@ -47,9 +61,12 @@ class CallbackPodsOperator(Callback['WarlockState']):
 
         # re-use exiting won't delete pod and re-use existing pods
         self._reuse_existing = reuse_existing
-        # default wait time
+        # default wait time, pods of all namespaces waited up to 5x timeout
         self._timeout = 30
-        self._default_timeout = self._timeout
+        self._kube_state = kube_state
+        self._max_workers = max_workers
+        self._wait_for_deletion = wait_for_deletion
+        self._warm_pool = warm_pool
 
     def _log_dry_run_operation(
             self,
@@ -71,60 +88,172 @@ class CallbackPodsOperator(Callback['WarlockState']):
         """
         return self.dry_run_plan
 
+    def _read_pod_specs(
+            self,
+            pod_names: List[str],
+            pod_ns: str
+    ) -> Dict[str, Dict[str, Any]]:
+        """Read pod specs through kube state backend if provided, otherwise
+        with a single kubectl get for all pods in namespace.
+
+        :param pod_names: list of pod names
+        :param pod_ns: pods namespace
+        :return: a dict pod name to pod spec
+        """
+        if self._kube_state is not None:
+            return {name: self._kube_state.pod_spec(name, pod_ns) for name in pod_names}
+        pods = ShellOperator.run_command_json(f"kubectl get pods {' '.join(pod_names)} -n {pod_ns} -o json")
+        if 'items' not in pods:
+            pods = {'items': [pods]}
+        return {p.get('metadata', {}).get('name'): p for p in pods['items']}
+
+    def _pods_by_namespace(self) -> Dict[str, List[Tuple[str, str, Path]]]:
+        """Group pods of spell spec by namespace.
+        :return: a dict namespace to list of (key, pod name, pod spec file)
+        """
+        pods_by_ns = {}
+        for k, v in self._master_spell_spec.pods_spells().items():
+            if isinstance(v, dict) and v['type'] == 'pod':
+                pod_ns = v.get('namespace', "default")
+                pod_spec_path = (self._abs_dir / v['pod_spec_file']).resolve()
+                pods_by_ns.setdefault(pod_ns, []).append((k, v['pod_name'], pod_spec_path))
+        return pods_by_ns
+
+    def _run_per_namespace(
+            self,
+            fn: Callable,
+            pods_by_ns: Dict[str, List[Tuple[str, str, Path]]],
+    ) -> Dict[str, Any]:
+        """Run fn(ns, pods) for each namespace concurrently.
+        :return: a dict namespace to fn result
+        """
+        if not pods_by_ns:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self._max_workers, len(pods_by_ns))) as executor:
+            futures = {ns: executor.submit(fn, ns, pods) for ns, pods in pods_by_ns.items()}
+            return {ns: f.result() for ns, f in futures.items()}
+
+    def _apply_pods(
+            self,
+            pod_ns: str,
+            pods: List[Tuple[str, str, Path]]
+    ):
+        """Submit all pod specs of namespace in one kubectl apply."""
+        spec_files = " ".join(f"-f {spec_path}" for _, _, spec_path in pods)
+        return ShellOperator.run_command_json(f"kubectl apply {spec_files} -n {pod_ns} -o json")
+
+    def _wait_pods(
+            self,
+            pod_ns: str,
+            pods: List[Tuple[str, str, Path]],
+            timeout: float
+    ) -> Dict[str, Dict[str, Any]]:
+        """Wait for pods of namespace to be ready and return pod specs of ready pods.
+
+        With kube state,  wait is driven by informer watch events if started.
+        Otherwise, kubectl wait watches all pods of namespace at once.
+
+        :param pod_ns: pods namespace
+        :param pods: list of (key, pod name, pod spec file)
+        :param timeout: timeout in seconds
+        :return: a dict pod name to pod spec
+        """
+        pod_names = [pod_name for _, pod_name, _ in pods]
+        if self._kube_state is not None:
+            return self._kube_state.wait_for_pods_ready(pod_names, pod_ns, timeout=timeout)
+
+        pod_refs = " ".join(f"pod/{pod_name}" for pod_name in pod_names)
+        try:
+            ShellOperator.run_command(
+                f"kubectl wait --for=condition=Ready {pod_refs} -n {pod_ns} --timeout={int(timeout)}s")
+        except Exception as e:
+            self.logger.error(f"Pods in namespace {pod_ns} not ready: {e}")
+        return {
+            name: spec for name, spec in self._read_pod_specs(pod_names, pod_ns).items()
+            if spec.get('status', {}).get('phase') == 'Running' and spec.get('status', {}).get('podIPs')
+        }
+
+    def _delete_pods(
+            self,
+            pod_ns: str,
+            pods: List[Tuple[str, str, Path]],
+            wait: Optional[bool] = None,
+    ):
+        """Delete all pods of namespace in one kubectl delete,  if wait
+        is True call returns once pods actually terminated.
+        :param wait: default wait_for_deletion
+        """
+        pod_names = " ".join(pod_name for _, pod_name, _ in pods)
+        wait = self._wait_for_deletion if wait is None else wait
+        wait = "true" if wait else "false"
+        return ShellOperator.run_command(
+            f"kubectl delete pod {pod_names} -n {pod_ns} --ignore-not-found "
+            f"--wait={wait} --timeout={self._timeout * 5}s")
+
+    def _acquire_warm_pods(
+            self,
+            pods_by_ns: Dict[str, List[Tuple[str, str, Path]]],
+    ):
+        """Hand out pods from warm pool,  pods which spec or node changed
+        deleted first, then changed and missing pods applied with pool annotations.
+        """
+        entries = [
+            self._warm_pool.prepare(k, pod_name, pod_ns, spec_path)
+            for pod_ns, pods in pods_by_ns.items() for k, pod_name, spec_path in pods
+        ]
+        plan = self._warm_pool.plan(entries)
+
+        def by_ns(pool_entries):
+            grouped = {}
+            for e in pool_entries:
+                grouped.setdefault(e.namespace, []).append((e.key, e.pod_name, e.manifest_path))
+            return grouped
+
+        # same pod name re-created, hence wait until old pod terminated
+        self._run_per_namespace(lambda ns, pods: self._delete_pods(ns, pods, wait=True), by_ns(plan.recycle))
+        self._run_per_namespace(self._apply_pods, by_ns(plan.recycle + plan.create))
+
     def on_scenario_begin(self):
         """
         On scenario begin this callback creates multiple pods and waits for all to be ready.
-        It updates spell caster
+        Pods of each namespace submitted in one kubectl apply and namespaces applied
+        and waited concurrently.  It updates spell caster
         :return:
         """
         self.logger.info("CallbackPodsOperator scenario begin")
 
-        pods_spec = self._master_spell_spec.pods_spells()
-        pod_creation_cmd = []
+        pods_by_ns = self._pods_by_namespace()
 
-        for k, v in pods_spec.items():
-            if isinstance(v, dict) and v['type'] == 'pod':
-                pod_spec = v
-                pod_name = pod_spec['pod_name']
-                pod_ns = pod_spec.get('namespace', "default")
-                pod_spec_path = (self._abs_dir / pod_spec['pod_spec_file']).resolve()
-
-                # schedule pod creation as best effort
-                ShellOperator.run_command_json(f"kubectl apply -f {pod_spec_path} -n {pod_ns} -o json")
-                pod_creation_cmd.append((k, pod_name, pod_ns))
-
-        # blocking call
-        all_pods_ready = False
-        while self._timeout > 0 and not all_pods_ready:
-            all_pods_ready = True
-            for k, pod_name, pod_ns in pod_creation_cmd:
-                pod_state = KubernetesState.read_pod_spec(pod_name, pod_ns)
-                if (pod_state.get('status', {}).get('phase') != 'Running' or
-                        not pod_state.get('status', {}).get('podIPs')):
-                    all_pods_ready = False
-                    break
-            if not all_pods_ready:
-                time.sleep(5)
-                self._timeout -= 1
+        # schedule pod creation as best effort
+        if self._warm_pool is not None:
+            self._acquire_warm_pods(pods_by_ns)
+        else:
+            self._run_per_namespace(self._apply_pods, pods_by_ns)
 
+        # blocking call, all namespaces share same deadline
+        timeout = self._timeout * 5
+        ready = self._run_per_namespace(lambda ns, pods: self._wait_pods(ns, pods, timeout), pods_by_ns)
+
+        all_pods_ready = all(
+            pod_name in ready[ns] for ns, pods in pods_by_ns.items() for _, pod_name, _ in pods
+        )
         if not all_pods_ready:
             self.logger.error("Not all pods were ready within the timeout period.")
             return
 
-        for k, pod_name, pod_ns in pod_creation_cmd:
-            pod_state = KubernetesState.read_pod_spec(pod_name, pod_ns)
-            pod_addr = pod_state.get('status', {}).get('podIPs', [])[0].get('ip')
-            phase = pod_state.get('status', {}).get('phase')
-            node_addr = pod_state.get('status', {}).get('hostIP')
-            self.logger.info(f"Scheduled pod read ip {pod_addr} status {phase} node {node_addr}")
-            self.caster_state.k8s_pods_states[k] = {
-                'ip': pod_addr,
-                'phase': phase,
-                'node_ip': node_addr,
-                'pod_state': pod_state
-            }
-
-        self._timeout = self._default_timeout
+        for pod_ns, pods in pods_by_ns.items():
+            for k, pod_name, _ in pods:
+                pod_state = ready[pod_ns][pod_name]
+                pod_addr = pod_state.get('status', {}).get('podIPs', [])[0].get('ip')
+                phase = pod_state.get('status', {}).get('phase')
+                node_addr = pod_state.get('status', {}).get('hostIP')
+                self.logger.info(f"Scheduled pod read ip {pod_addr} status {phase} node {node_addr}")
+                self.caster_state.k8s_pods_states[k] = {
+                    'ip': pod_addr,
+                    'phase': phase,
+                    'node_ip': node_addr,
+                    'pod_state': PodRecord.from_pod(pod_state)
+                }
 
     def on_scenario_end(self):
         """Executes at the end of a scenario, handling the cleanup of the created pods.
@@ -137,15 +266,15 @@ class CallbackPodsOperator(Callback['WarlockState']):
             self.logger.info("CallbackPodsOperator skip pod delete")
             return
 
+        if self._warm_pool is not None:
+            self.logger.info(f"CallbackPodsOperator keep {len(self._warm_pool.entries)} pods warm")
+            return
+
         if not hasattr(self.caster_state, 'k8s_pods_states') or not self.caster_state.k8s_pods_states:
             self.logger.info("No pods recorded in the caster state for deletion.")
             return
 
-        pods_spec = self._master_spell_spec.pods_spells()
-        for k, v in pods_spec.items():
-            if isinstance(v, dict) and v['type'] == 'pod':
-                pod_spec = v
-                pod_name = pod_spec['pod_name']
-                pod_ns = pod_spec.get('namespace', "default")
-                last_state = ShellOperator.run_command(f"kubectl delete pod {pod_name} -n {pod_ns}")
-                self.logger.info(f"Deleted pod {pod_name} in namespace {pod_ns}: {last_state}")
+        pods_by_ns = self._pods_by_namespace()
+        results = self._run_per_namespace(self._delete_pods, pods_by_ns)
+        for pod_ns, last_state in results.items():
+            self.logger.info(f"Deleted pods in namespace {pod_ns}: {last_state}")
@@ -0,0 +1,56 @@
+import logging
+from typing import Optional
+
+from warlock.callbacks.callback import Callback
+from warlock.spell_specs import SpellSpecs
+from warlock.states.topology_index import TopologyIndex
+
+
+class CallbackTopologyIndex(Callback['WarlockState']):
+    """
+    Callback joins pod, node, VM and ESXi host state read by other
+    callbacks into TopologyIndex and stores it in caster state topology,
+    hence downstream callbacks resolve pod -> VM -> host -> port id in O(1).
+
+    Callback must be registered after CallbackPodsOperator and
+    CallbackIaasObserver and before CallbackEsxiObserver,  ESXi observer
+    resolves VM hosts through the index and adds port ids and VFs to it.
+    """
+    def __init__(
+            self,
+            spell_master_specs: SpellSpecs,
+            kube_state=None,
+            logger: Optional[logging.Logger] = None,
+    ):
+        """
+        Create topology index callback.
+        :param spell_master_specs:
+        :param kube_state: optional KubernetesState, used to resolve node ip to node name
+        :param logger:
+        """
+        super().__init__()
+        self.logger = logger if logger else logging.getLogger(__name__)
+        self._master_spell_spec = spell_master_specs
+        self._kube_state = kube_state
+
+    def build_index(self) -> TopologyIndex:
+        """Build topology index from caster state and store it.
+        :return: TopologyIndex
+        """
+        node_addr_to_name = None
+        if self._kube_state is not None:
+            node_addr_to_name = {
+                r.internal_ip: name for name, r in self._kube_state.node_records().items() if r.internal_ip
+            }
+
+        topology = TopologyIndex.from_caster_state(self.caster_state, node_addr_to_name)
+        self.caster_state.topology = topology
+        unresolved = [p.pod for p in topology.paths() if p.esxi_host is None]
+        if unresolved:
+            self.logger.warning(f"pods {unresolved} not resolved to esxi host")
+        return topology
+
+    def on_scenario_begin(self):
+        """On scenario begin, build topology index."""
+        self.logger.info("CallbackTopologyIndex scenario begin")
+        self.build_index()
@@ -0,0 +1,169 @@
+"""
+CounterCatalog, is an on-disk cache of vCenter performance counter catalog
+(counter name to counter id) and available counters per entity type.
+
+Counter ids are stable for a given vCenter build,  hence the catalog keyed
+by vCenter instance UUID and build number.  A catalog from other build is
+ignored and re-fetched.  Fetching PerformanceManager.perfCounter transfers
+the full counter catalog and dominates start of metric session.
+
+Author: Mus
+ spyroot@gmail.com
+ mbayramo@stanford.edu
+"""
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Dict, List, Optional, Any
+
+COUNTER_CATALOG_VERSION = 1
+
+# catalog directory collectors use unless caller provides one
+DEFAULT_CATALOG_DIR = os.path.join(os.path.expanduser("~"), ".warlock", "counter_catalog")
+
+
+class CounterCatalogError(Exception):
+    """Raised if catalog can't be serialized or has invalid format."""
+
+    def __init__(self, msg):
+        super().__init__(msg)
+
+
+class CounterCatalog:
+    """
+    counters:  {counter name: counter id} i.e. {'cpu.usagemhz.average': 6}
+    available: {entity_type: [counter ids]} i.e. {'vm': [2, 6, 24]}
+    """
+
+    def __init__(
+            self,
+            instance_uuid: str,
+            build: str,
+            counters: Optional[Dict[str, int]] = None,
+            available: Optional[Dict[str, List[int]]] = None,
+            timestamp: Optional[float] = None,
+    ):
+        """
+        :param instance_uuid: vCenter instance uuid, content.about.instanceUuid
+        :param build: vCenter build, content.about.build
+        :param counters: a dict where key is counter name and value counter id
+        :param available: a dict where key is entity type and value list of counter ids
+        :param timestamp: time catalog fetched
+        """
+        self.instance_uuid = instance_uuid
+        self.build = build
+        self.counters = counters if counters is not None else {}
+        self.available = available if available is not None else {}
+        self.timestamp = timestamp if timestamp is not None else time.time()
+
+    @staticmethod
+    def catalog_path(
+            catalog_dir: str,
+            instance_uuid: str,
+            build: str
+    ) -> str:
+        """Return catalog file path for a vCenter instance and build.
+        :param catalog_dir: catalog directory
+        :param instance_uuid: vCenter instance uuid
+        :param build: vCenter build
+        :return: path to catalog file
+        """
+        return os.path.join(catalog_dir, f"counters-{instance_uuid}-{build}.json")
+
+    def counter_names(self) -> Dict[int, str]:
+        """Return reverse mapping counter id to counter name.
+        :return:
+        """
+        return {counter_id: name for name, counter_id in self.counters.items()}
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return catalog as json friendly dict.
+        :return:
+        """
+        return {
+            'version': COUNTER_CATALOG_VERSION,
+            'instance_uuid': self.instance_uuid,
+            'build': self.build,
+            'timestamp': self.timestamp,
+            'counters': self.counters,
+            'available': self.available,
+        }
+
+    @classmethod
+    def from_dict(
+            cls,
+            data: Dict[str, Any]
+    ) -> 'CounterCatalog':
+        """Create catalog from dict.
+        :param data: a dict produced by to_dict
+        :return: CounterCatalog
+        :raise CounterCatalogError: if version mismatch or mandatory key missing.
+        """
+        if data.get('version') != COUNTER_CATALOG_VERSION:
+            raise CounterCatalogError(
+                f"catalog version {data.get('version')} "
+                f"expected {COUNTER_CATALOG_VERSION}")
+        if 'instance_uuid' not in data or 'build' not in data:
+            raise CounterCatalogError("catalog has no instance_uuid or build")
+
+        return cls(
+            instance_uuid=data['instance_uuid'],
+            build=data['build'],
+            counters={k: int(v) for k, v in data.get('counters', {}).items()},
+            available={k: [int(c) for c in v] for k, v in data.get('available', {}).items()},
+            timestamp=data.get('timestamp'),
+        )
+
+    def save(
+            self,
+            catalog_dir: str
+    ) -> str:
+        """Save catalog to catalog dir,  catalog written to temp file
+        and atomically moved.
+
+        :param catalog_dir: catalog directory, created if not exists
+        :return: path to catalog file
+        """
+        os.makedirs(catalog_dir, exist_ok=True)
+        path = self.catalog_path(catalog_dir, self.instance_uuid, self.build)
+        fd, tmp_path = tempfile.mkstemp(dir=catalog_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.to_dict(), f)
+            os.replace(tmp_path, path)
+        except TypeError as e:
+            raise CounterCatalogError(f"failed serialize catalog: {e}") from e
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return path
+
+    @classmethod
+    def load(
+            cls,
+            catalog_dir: str,
+            instance_uuid: str,
+            build: str,
+            logger: Optional[logging.Logger] = None,
+    ) -> Optional['CounterCatalog']:
+        """Load catalog for vCenter instance and build.  Missing or
+        corrupted catalog ignored.
+
+        :param catalog_dir: catalog directory
+        :param instance_uuid: vCenter instance uuid
+        :param build: vCenter build
+        :param logger: optional logger
+        :return: CounterCatalog or None
+        """
+        logger = logger if logger else logging.getLogger(__name__)
+        path = cls.catalog_path(catalog_dir, instance_uuid, build)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r") as f:
+                return cls.from_dict(json.load(f))
+        except (json.JSONDecodeError, CounterCatalogError, OSError, ValueError, TypeError) as e:
+            logger.warning(f"Ignoring counter catalog {path}: {e}")
+            return None
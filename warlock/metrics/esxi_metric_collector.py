@@ -6,7 +6,9 @@ Author: Mus
  spyroot@gmail.com
  mbayramo@stanford.edu
 """
-from typing import List, Dict, Union
+from collections import namedtuple
+from typing import List, Dict, Union, Optional, Tuple
+import threading
 import time
 import numpy as np
 from concurrent.futures import (
@@ -16,6 +18,49 @@ from concurrent.futures import (
 
 from warlock.states.esxi_state_reader import EsxiStateReader
 
+# net-stats port counters in the order of sampler counter axis,
+# intr is intr.count
+PORT_COUNTERS = ['txpps', 'rxpps', 'txdisc', 'dropsByBurstQ', 'droppedbyQueuing', 'intr']
+
+# values (num_samples, num_ports, num_counters) and timestamps (num_samples, num_ports)
+# epoch seconds when port sample was read,  NaN if port not sampled.
+# port_labels[i] is (vm name, port id) of port i.
+PortSamples = namedtuple('PortSamples', ['timestamps', 'values', 'port_labels', 'counter_names'])
+
+
+def fill_port_counters(
+        data: dict,
+        port_slots: Dict[int, int],
+        values: np.ndarray,
+        timestamps: np.ndarray,
+        timestamp: float
+) -> int:
+    """Write port counters of a net-stats sample in place into preallocated arrays.
+
+    :param data: net-stats sample, dict with stats and ports
+    :param port_slots: a dict port id to port index in values
+    :param values: output array (num_ports, num_counters) for one sample
+    :param timestamps: output array (num_ports,) for one sample
+    :param timestamp: time sample was read
+    :return: number of ports written
+    """
+    written = 0
+    for stat in data.get('stats', []):
+        for port in stat.get('ports', []):
+            slot = port_slots.get(port.get('id'))
+            if slot is None:
+                continue
+            row = values[slot]
+            row[0] = port.get('txpps', 0)
+            row[1] = port.get('rxpps', 0)
+            row[2] = port.get('txdisc', 0)
+            row[3] = port.get('dropsByBurstQ', 0)
+            row[4] = port.get('droppedbyQueuing', 0)
+            row[5] = port.get('intr', {}).get('count', 0)
+            timestamps[slot] = timestamp
+            written += 1
+    return written
+
 
 class EsxiMetricCollector:
 
@@ -25,6 +70,89 @@ class EsxiMetricCollector:
     ):
         self.esxi_state_reader = esxi_states
 
+    @staticmethod
+    def client_vm_name(
+            client_name: str
+    ) -> str:
+        """Return VM name of net-stats port client name,
+        i.e. SRIOVmy_vm_name.eth7 and my_vm_name.eth0 are my_vm_name
+
+        :param client_name: net-stats port client name
+        :return: vm name
+        """
+        if client_name.startswith("SRIOV"):
+            client_name = client_name[len("SRIOV"):]
+        return client_name.rsplit('.', 1)[0]
+
+    def read_port_index(
+            self,
+            max_workers: Optional[int] = None
+    ) -> Dict[str, List[Tuple[str, int, str]]]:
+        """Read port ids of all ESXi hosts concurrently and build inverted index
+        from VM name to ports.  Ports of each VM ordered by host in
+        esxi_state_reader order.
+
+        Example output:
+        {
+            'my-test-np1-h5mtj-9cf8fdcf6xcfln5-k9jcm': [
+                ('10.x.x.x', 67108902, 'my-test-np1-h5mtj-9cf8fdcf6xcfln5-k9jcm.eth0'),
+                ('10.x.x.x', 100663326, 'SRIOVmy-test-np1-h5mtj-9cf8fdcf6xcfln5-k9jcm.eth1'),
+            ]
+        }
+
+        :param max_workers: max number of concurrent hosts, default all hosts.
+        :return: a dict where key is vm name and value list of (esxi host, port id, client name)
+        """
+        if not self.esxi_state_reader:
+            return {}
+
+        max_workers = max_workers if max_workers is not None else len(self.esxi_state_reader)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            port_maps = list(executor.map(
+                lambda esxi_state: esxi_state.read_netstats_vm_net_port_ids(), self.esxi_state_reader))
+
+        port_index = {}
+        for esxi_state, port_map in zip(self.esxi_state_reader, port_maps):
+            for port_id, port_info in port_map.items():
+                port_index.setdefault(self.client_vm_name(port_info.client_name), []).append(
+                    (esxi_state.fqdn, port_id, port_info.client_name))
+        return port_index
+
+    @staticmethod
+    def _resolve_vm_ports(
+            port_index: Dict[str, List[Tuple[str, int, str]]],
+            vm_names: List[str],
+            vmnic_name: Optional[Dict[str, str]] = None
+    ) -> Dict[str, Dict]:
+        """Resolve VM ports from inverted index.  VM name looked up directly,
+        if not found it matched as substring of VM names.  Only ports of the
+        first host VM found on are returned.
+
+        :param port_index: result of read_port_index
+        :param vm_names: List of VM names to map.
+        :param vmnic_name: optional dictionary of VM names to their target adapter names.
+        :return: a dict where key is vm name and value port_ids, esxi_host, port_vm_nic_name
+        """
+        vm_to_port_ids = {}
+        for vm_name in vm_names:
+            ports = port_index.get(vm_name)
+            if ports is None:
+                ports = [p for name, name_ports in port_index.items() if vm_name in name for p in name_ports]
+
+            target_adapter = vmnic_name.get(vm_name, None) if vmnic_name else None
+            if target_adapter is not None:
+                ports = [p for p in ports if target_adapter in p[2]]
+            if not ports:
+                continue
+
+            esxi_host = ports[0][0]
+            vm_to_port_ids[vm_name] = {
+                'port_ids': [port_id for host, port_id, _ in ports if host == esxi_host],
+                'esxi_host': esxi_host,
+                'port_vm_nic_name': [client_name for host, _, client_name in ports if host == esxi_host]
+            }
+        return vm_to_port_ids
+
     def map_vm_hosts_port_ids(
             self,
             vm_names: List[str]
@@ -32,6 +160,7 @@ class EsxiMetricCollector:
         """
         Returns a dictionary mapping VM names to their port IDs and ESXi host.
         Once a VM is found on one ESXi host, it's not searched for again on another host.
+        All hosts are read concurrently.
 
         Example output:
         {
@@ -47,32 +176,7 @@ class EsxiMetricCollector:
             }
         }
         """
-        vm_to_port_ids = {}
-        remaining_vm_names = set(vm_names)
-
-        for esxi_state in self.esxi_state_reader:
-            if not remaining_vm_names:
-                break
-
-            vm_port_id_map = esxi_state.read_netstats_vm_net_port_ids()
-            found_vm_names = []
-            for vm_name in remaining_vm_names:
-                port_ids = [port_id for port_id, port_vm_name in vm_port_id_map.items()
-                            if vm_name in port_vm_name]
-                port_vm_nic_name = [port_vm_name for port_id, port_vm_name in vm_port_id_map.items()
-                                    if vm_name in port_vm_name]
-                if port_ids:
-                    vm_to_port_ids[vm_name] = {
-                        'port_ids': port_ids,
-                        'esxi_host': esxi_state.fqdn,
-                        'port_vm_nic_name': port_vm_nic_name
-                    }
-                    found_vm_names.append(vm_name)
-
-            # remove found VMs
-            remaining_vm_names -= set(found_vm_names)
-
-        return vm_to_port_ids
+        return self._resolve_vm_ports(self.read_port_index(), vm_names)
 
     def filtered_map_vm_hosts_port_ids(
             self,
@@ -84,7 +188,7 @@ class EsxiMetricCollector:
         and port VM NIC names filtered by the specified adapter name.
 
         Once a VM is found on one ESXi host, it's not searched
-        for again on another host.
+        for again on another host.  All hosts are read concurrently.
 
         vm_names is list of VM that we want resolve
         vmnic_name is dict where key is VM name and adapter name.
@@ -93,38 +197,7 @@ class EsxiMetricCollector:
         :param vmnic_name: Dictionary of VM names to their target adapter names.
         :return: Dictionary mapping VM names to their details including filtered port VM NIC names.
         """
-        vm_to_port_ids = {}
-        remaining_vm_names = set(vm_names)
-
-        for esxi_state in self.esxi_state_reader:
-            if not remaining_vm_names:
-                break
-
-            vm_port_id_map = esxi_state.read_netstats_vm_net_port_ids()
-            found_vm_names = []
-            for vm_name in remaining_vm_names:
-                target_adapter = vmnic_name.get(vm_name, None)
-
-                port_ids = []
-                port_vm_nic_name = []
-
-                for port_id, port_vm_name in vm_port_id_map.items():
-                    if vm_name in port_vm_name and (target_adapter is None or target_adapter in port_vm_name):
-                        port_ids.append(port_id)
-                        port_vm_nic_name.append(port_vm_name)
-
-                if port_ids:
-                    vm_to_port_ids[vm_name] = {
-                        'port_ids': port_ids,
-                        'esxi_host': esxi_state.fqdn,
-                        'port_vm_nic_name': port_vm_nic_name
-                    }
-                    found_vm_names.append(vm_name)
-
-            # Remove found VMs
-            remaining_vm_names -= set(found_vm_names)
-
-        return vm_to_port_ids
+        return self._resolve_vm_ports(self.read_port_index(), vm_names, vmnic_name)
 
     def get_esxi_state(
             self,
@@ -164,6 +237,22 @@ class EsxiMetricCollector:
                 ))
         return np.array(temp_data)
 
+    @staticmethod
+    def _select_adapter(
+            vm_data: Dict,
+            is_sriov: bool = False
+    ) -> Optional[str]:
+        """Return adapter name net-stats sampled for a VM.
+        :param vm_data: VM entry of filtered_map_vm_hosts_port_ids
+        :param is_sriov: whether to select sriov or vmxnet3 adapter
+        :return: adapter name or None
+        """
+        filtered_adapter_names = [
+            nic_name for nic_name in vm_data['port_vm_nic_name']
+            if ("SRIOV" not in nic_name) or (is_sriov and "SRIOV" in nic_name)
+        ]
+        return filtered_adapter_names[0] if filtered_adapter_names else None
+
     def __fetch_and_vectorize_data(
             self,
             esxi_state,
@@ -171,11 +260,7 @@ class EsxiMetricCollector:
             vm_index,
             is_sriov: bool = False
     ):
-        filtered_adapter_names = [
-            nic_name for nic_name in vm_data['port_vm_nic_name']
-            if ("SRIOV" not in nic_name) or (is_sriov and "SRIOV" in nic_name)
-        ]
-        filtered_adapter_name = filtered_adapter_names[0]
+        filtered_adapter_name = self._select_adapter(vm_data, is_sriov)
         stats = esxi_state.read_netstats_by_vm(filtered_adapter_name)
         return self.vectorize_data(stats, vm_index)
 
@@ -211,9 +296,10 @@ class EsxiMetricCollector:
 
         all_vectorized_data = []
 
+        start = time.monotonic()
         with ThreadPoolExecutor(max_workers=len(vm_names)) as executor:
-            futures = []
             for _ in range(num_sample):
+                futures = []
                 for vm_name, vm_data in vm_to_port_ids.items():
                     esxi_state = self.get_esxi_state(vm_data['esxi_host'])
                     if esxi_state:
@@ -231,9 +317,100 @@ class EsxiMetricCollector:
                     all_vectorized_data.append(future.result())
 
                 if _ < num_sample - 1:
-                    time.sleep(interval)
+                    time.sleep(max(0.0, start + (_ + 1) * interval - time.monotonic()))
 
         if all_vectorized_data:
             return np.concatenate(all_vectorized_data)
 
         return np.array([])
+
+    def _port_layout(
+            self,
+            vm_to_port_ids: Dict[str, Dict],
+            is_sriov: bool = False
+    ) -> Tuple[List[Tuple[str, int]], List[Tuple[str, EsxiStateReader, str, Dict[int, int]]]]:
+        """Assign port index for each port of sampled adapters.
+
+        :param vm_to_port_ids: result of filtered_map_vm_hosts_port_ids
+        :param is_sriov: whether to sample sriov or vmxnet3 adapters
+        :return: tuple of port labels (vm name, port id) and list of
+                 (vm name, esxi state, adapter, port slots) to sample
+        """
+        port_labels = []
+        targets = []
+        for vm_name, vm_data in vm_to_port_ids.items():
+            esxi_state = self.get_esxi_state(vm_data['esxi_host'])
+            adapter = self._select_adapter(vm_data, is_sriov)
+            if esxi_state is None or adapter is None:
+                continue
+            port_slots = {}
+            for port_id, nic_name in zip(vm_data['port_ids'], vm_data['port_vm_nic_name']):
+                if nic_name == adapter:
+                    port_slots[port_id] = len(port_labels)
+                    port_labels.append((vm_name, port_id))
+            targets.append((vm_name, esxi_state, adapter, port_slots))
+        return port_labels, targets
+
+    def sample_vm_port_metrics(
+            self,
+            vm_names: List[str],
+            vmnic_name: Dict[str, str],
+            is_sriov: bool = False,
+            num_samples: int = 1,
+            interval: float = 10,
+            stop_event: Optional[threading.Event] = None,
+    ) -> PortSamples:
+        """Sample port counters of VM adapters into preallocated
+        (num_samples, num_ports, num_counters) array.
+
+        Sample k is scheduled at start + k * interval on a monotonic clock,
+        hence time spent in net-stats doesn't accumulate drift.  Actual time
+        each port read recorded in timestamps.  If a sample takes longer than
+        interval the next sample starts immediately.
+
+        :param vm_names:  a list of VM names
+        :param vmnic_name:  a dictionary of adapter name
+        :param is_sriov:    whether to collect metrics for sriov or vmxnet3
+        :param num_samples: number of samples to collect
+        :param interval:    sample interval in seconds
+        :param stop_event:  optional event to stop early, unsampled rows stay NaN
+        :return: PortSamples
+        """
+        vm_to_port_ids = self.filtered_map_vm_hosts_port_ids(vm_names, vmnic_name)
+        port_labels, targets = self._port_layout(vm_to_port_ids, is_sriov)
+
+        num_ports = len(port_labels)
+        values = np.full((num_samples, num_ports, len(PORT_COUNTERS)), np.nan, dtype=np.float64)
+        timestamps = np.full((num_samples, num_ports), np.nan, dtype=np.float64)
+
+        def _sample(k, esxi_state, adapter, port_slots):
+            read_start = time.time()
+            stats = esxi_state.read_netstats_by_vm(adapter)
+            read_time = (read_start + time.time()) / 2.0
+            return fill_port_counters(stats or {}, port_slots, values[k], timestamps[k], read_time)
+
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=max(1, len(targets))) as executor:
+            for k in range(num_samples):
+                if stop_event is not None and stop_event.is_set():
+                    break
+                futures = [
+                    executor.submit(_sample, k, esxi_state, adapter, port_slots)
+                    for _, esxi_state, adapter, port_slots in targets
+                ]
+                for future in as_completed(futures):
+                    future.result()
+
+                if k < num_samples - 1:
+                    delay = max(0.0, start + (k + 1) * interval - time.monotonic())
+                    if stop_event is not None:
+                        stop_event.wait(delay)
+                    else:
+                        time.sleep(delay)
+
+        return PortSamples(
+            timestamps=timestamps,
+            values=values,
+            port_labels=port_labels,
+            counter_names=list(PORT_COUNTERS)
+        )
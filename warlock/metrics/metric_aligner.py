@@ -0,0 +1,272 @@
+"""
+MetricAligner, resamples metric streams with different timebases onto
+a common time grid and joins them into one feature matrix.
+
+ - vCenter samples from read_entity_metric (20 sec or 300 sec interval)
+ - ESXi port stats from EsxiMetricCollector.vectorize_data (poll interval)
+ - iperf intervals from iperf_tcp_json_to_np (1 sec report interval)
+
+Each stream is (timestamps (N,), values (N, K)) and K feature names.
+A grid point outside a stream time range is NaN,  streams are not
+extrapolated.  Interpolation is vectorized over all columns of a stream,
+one searchsorted per stream.
+
+Example:
+
+    aligner = MetricAligner()
+    aligner.add_vcenter("vm-1", vc_timestamps, vc_data, ["cpu.usagemhz.average"])
+    aligner.add_iperf("client", iperf_tcp_json_to_np(json_data), start_time)
+    grid, features, names = aligner.align(t0, t1, step_seconds=1.0)
+
+Author: Mus
+ spyroot@gmail.com
+ mbayramo@stanford.edu
+"""
+from collections import namedtuple
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from warlock.metrics.metric_store import (
+    MetricStore,
+    PORT_METRIC_NAMES,
+    IPERF_METRIC_NAMES,
+    TimeLike,
+    to_datetime64
+)
+
+# linear interpolation between samples or hold of the last sample
+ALIGN_LINEAR = "linear"
+ALIGN_PREVIOUS = "previous"
+
+MetricStream = namedtuple('MetricStream', ['timestamps', 'values', 'feature_names', 'method'])
+
+
+def interpolate_columns(
+        timestamps: np.ndarray,
+        values: np.ndarray,
+        grid: np.ndarray,
+        method: str = ALIGN_LINEAR
+) -> np.ndarray:
+    """Resample all columns of values onto grid.  Timestamps must be sorted,
+    NaN samples are ignored per column.
+
+    :param timestamps: sample timestamps int64 (N,)
+    :param values: samples (N, K)
+    :param grid: grid timestamps int64 (T,)
+    :param method: linear or previous
+    :return: np.ndarray float64 (T, K), NaN outside of sample range
+    """
+    num_cols = values.shape[1]
+    result = np.full((len(grid), num_cols), np.nan, dtype=np.float64)
+    if len(timestamps) == 0:
+        return result
+
+    nan_cols = np.isnan(values).any(axis=0)
+    dense = np.flatnonzero(~nan_cols)
+    if len(dense) > 0:
+        result[:, dense] = _interpolate_dense(timestamps, values[:, dense], grid, method)
+
+    # sparse columns, each column has own sample times
+    for k in np.flatnonzero(nan_cols):
+        valid = ~np.isnan(values[:, k])
+        if valid.any():
+            result[:, k] = _interpolate_dense(timestamps[valid], values[valid, k:k + 1], grid, method)[:, 0]
+
+    return result
+
+
+def _interpolate_dense(
+        timestamps: np.ndarray,
+        values: np.ndarray,
+        grid: np.ndarray,
+        method: str
+) -> np.ndarray:
+    """Resample columns without NaN onto grid."""
+    right = np.searchsorted(timestamps, grid, side='right')
+    in_range = (grid >= timestamps[0]) & (grid <= timestamps[-1])
+    left = np.clip(right - 1, 0, len(timestamps) - 1)
+
+    if method == ALIGN_PREVIOUS:
+        result = values[left].astype(np.float64)
+    elif method == ALIGN_LINEAR:
+        right = np.clip(right, 0, len(timestamps) - 1)
+        span = (timestamps[right] - timestamps[left]).astype(np.float64)
+        weight = np.divide(grid - timestamps[left], span,
+                           out=np.zeros(len(grid), dtype=np.float64), where=span > 0)
+        result = values[left] + (values[right] - values[left]) * weight[:, None]
+    else:
+        raise ValueError(f"unknown align method {method}")
+
+    result[~in_range] = np.nan
+    return result
+
+
+class MetricAligner:
+    def __init__(self):
+        self.streams: List[MetricStream] = []
+
+    def add_stream(
+            self,
+            timestamps: TimeLike,
+            values: np.ndarray,
+            feature_names: List[str],
+            method: Optional[str] = ALIGN_LINEAR,
+    ):
+        """Add stream of samples.
+
+        :param timestamps: datetime64 or epoch seconds (N,)
+        :param values: samples (N,) or (N, K)
+        :param feature_names: K feature names
+        :param method: linear for gauges and rates, previous for step values
+        """
+        ts = to_datetime64(timestamps).astype(np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        if values.ndim == 1:
+            values = values[:, None]
+        if len(ts) != values.shape[0] or values.shape[1] != len(feature_names):
+            raise ValueError(f"stream shape {values.shape} doesn't match "
+                             f"{len(ts)} timestamps and {len(feature_names)} features")
+        order = np.argsort(ts, kind='stable')
+        self.streams.append(MetricStream(ts[order], values[order], list(feature_names), method))
+
+    def add_vcenter(
+            self,
+            entity: str,
+            timestamps: TimeLike,
+            data: np.ndarray,
+            metric_names: List[str],
+    ):
+        """Add vCenter samples of an entity, i.e. read_entity_metric result.
+        :param entity: entity name
+        :param timestamps: sample timestamps (S,)
+        :param data: np.ndarray (S, M)
+        :param metric_names: M metric names
+        """
+        self.add_stream(timestamps, data, [f"{entity}/{m}" for m in metric_names])
+
+    def add_port_metrics(
+            self,
+            data: np.ndarray,
+            vm_names: List[str],
+            timestamps: TimeLike,
+    ):
+        """Add ESXi port stats, i.e. rows of EsxiMetricCollector.vectorize_data
+        collected at timestamps.  One stream per (vm, port).
+
+        :param data: np.ndarray (N, 8) vm index, port id and port metrics
+        :param vm_names: vm names indexed by first column
+        :param timestamps: sample time per row (N,)
+        """
+        if data.size == 0:
+            return
+        timestamps = np.broadcast_to(to_datetime64(timestamps), (data.shape[0],))
+        keys = data[:, :2].astype(np.int64)
+        for vm_index, port_id in np.unique(keys, axis=0):
+            rows = (keys[:, 0] == vm_index) & (keys[:, 1] == port_id)
+            entity = f"{vm_names[vm_index]}:{port_id}"
+            self.add_stream(timestamps[rows], data[rows, 2:2 + len(PORT_METRIC_NAMES)],
+                            [f"{entity}/{m}" for m in PORT_METRIC_NAMES])
+
+    def add_iperf(
+            self,
+            entity: str,
+            data: np.ndarray,
+            start_time: TimeLike,
+            interval: float = 1.0,
+    ):
+        """Add iperf stats, i.e. iperf_tcp_json_to_np result, one stream per socket.
+        Sample is placed at the end of iperf report interval.
+
+        :param entity: entity name, i.e. pod or vm
+        :param data: np.ndarray (N, 7) socket and iperf metrics
+        :param start_time: iperf start time
+        :param interval: iperf report interval in seconds
+        """
+        if data.size == 0:
+            return
+        start = to_datetime64(start_time)
+        sockets = data[:, 0].astype(np.int64)
+        for s in np.unique(sockets):
+            rows = sockets == s
+            offsets = ((np.arange(rows.sum()) + 1) * interval * 1000.0).round().astype('timedelta64[ms]')
+            self.add_stream(start + offsets, data[rows, 1:1 + len(IPERF_METRIC_NAMES)],
+                            [f"{entity}:{s}/{m}" for m in IPERF_METRIC_NAMES])
+
+    @classmethod
+    def from_store(
+            cls,
+            store: MetricStore,
+            scenario: Optional[str] = None,
+            entities: Optional[List[str]] = None,
+            metrics: Optional[List[str]] = None,
+    ) -> 'MetricAligner':
+        """Create aligner from MetricStore rows, one stream per (entity, metric).
+        :param store: MetricStore
+        :param scenario: optional scenario id
+        :param entities: optional entity names
+        :param metrics: optional metric names
+        :return: MetricAligner
+        """
+        rows = store.query(entities=entities, metrics=metrics,
+                           scenarios=[scenario] if scenario is not None else None, decode=False)
+        entity_names, metric_names = store.names('entity'), store.names('metric')
+        aligner = cls()
+        keys = np.stack([rows['entity'], rows['metric']], axis=1)
+        if len(keys) == 0:
+            return aligner
+        unique_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        for i, (entity, metric) in enumerate(unique_keys):
+            selected = inverse == i
+            aligner.add_stream(rows['timestamp'][selected], rows['value'][selected],
+                               [f"{entity_names[entity]}/{metric_names[metric]}"])
+        return aligner
+
+    @property
+    def feature_names(self) -> List[str]:
+        """Return feature names of all streams in column order."""
+        return [name for stream in self.streams for name in stream.feature_names]
+
+    def time_range(self) -> Tuple[np.datetime64, np.datetime64]:
+        """Return time range covered by all streams,  the latest first
+        sample and the earliest last sample.
+        """
+        non_empty = [s for s in self.streams if len(s.timestamps) > 0]
+        if not non_empty:
+            raise ValueError("no samples to align")
+        start = max(s.timestamps[0] for s in non_empty)
+        end = min(s.timestamps[-1] for s in non_empty)
+        return np.datetime64(int(start), 'ms'), np.datetime64(int(end), 'ms')
+
+    def align(
+            self,
+            start_time: Optional[TimeLike] = None,
+            end_time: Optional[TimeLike] = None,
+            step_seconds: float = 1.0,
+    ) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+        """Resample all streams onto grid [start_time, end_time] with step
+        and return feature matrix,  one row per grid point.
+
+        :param start_time: grid start, default overlap start of all streams
+        :param end_time: grid end inclusive, default overlap end of all streams
+        :param step_seconds: grid step in seconds
+        :return: tuple grid datetime64[ms] (T,), features (T, F), F feature names
+        """
+        if step_seconds <= 0:
+            raise ValueError("step_seconds must be positive.")
+        if start_time is None or end_time is None:
+            overlap_start, overlap_end = self.time_range()
+            start_time = overlap_start if start_time is None else start_time
+            end_time = overlap_end if end_time is None else end_time
+
+        start = to_datetime64(start_time).astype(np.int64)
+        end = to_datetime64(end_time).astype(np.int64)
+        step = int(round(step_seconds * 1000.0))
+        grid = np.arange(start, end + 1, step, dtype=np.int64)
+
+        columns = [
+            interpolate_columns(s.timestamps, s.values, grid, s.method) for s in self.streams
+        ]
+        features = np.concatenate(columns, axis=1) if columns else np.empty((len(grid), 0))
+        return grid.astype('datetime64[ms]'), features, self.feature_names
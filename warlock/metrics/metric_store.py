@@ -0,0 +1,395 @@
+"""
+MetricStore, is a local columnar time-series store for collected metrics.
+
+Each row is (entity, metric, timestamp, value, scenario).  Every column
+stored in own flat binary file and read back with np.memmap, hence reading
+a store with millions of rows doesn't load it into memory, only rows that
+pass a filter are materialized.
+
+ - entity, metric, scenario are dictionary encoded int32,
+   dictionary stored in dictionary.json
+ - timestamp datetime64[ms] stored as int64
+ - value float64
+
+Writes are append only and expected from a single process.  If a process
+dies during append, columns might have different length,  number of rows
+is the length of the shortest column and next append cuts all columns
+back to it before writing.
+
+Example:
+
+    store = MetricStore("warlock_metrics")
+    store.append_tensor(["vm-1", "vm-2"], ["cpu.usagemhz.average"], timestamps, data, scenario="step-10")
+    store.append_iperf(iperf_tcp_json_to_np(json_data), "client-pod", start_time, scenario="step-10")
+    rows = store.query(entities=["vm-1"], start_time=t0, end_time=t1)
+
+Author: Mus
+ spyroot@gmail.com
+ mbayramo@stanford.edu
+"""
+import json
+import os
+import tempfile
+import threading
+from typing import Dict, List, Optional, Union, Iterable
+
+import numpy as np
+
+# column name and dtype
+METRIC_STORE_COLUMNS = {
+    'entity': np.int32,
+    'metric': np.int32,
+    'timestamp': np.int64,
+    'value': np.float64,
+    'scenario': np.int32,
+}
+
+# dictionary encoded columns
+_ENCODED_COLUMNS = ('entity', 'metric', 'scenario')
+
+# EsxiMetricCollector.vectorize_data columns after vm index and port id
+PORT_METRIC_NAMES = [
+    "port.txpps", "port.rxpps", "port.txdisc",
+    "port.dropsByBurstQ", "port.droppedbyQueuing", "port.intr"
+]
+
+# iperf_tcp_json_to_np columns after socket
+IPERF_METRIC_NAMES = [
+    "iperf.bytes", "iperf.bps", "iperf.snd_cwnd",
+    "iperf.snd_wnd", "iperf.rtt", "iperf.rttvar"
+]
+
+TimeLike = Union[np.datetime64, float, int, np.ndarray]
+
+
+def to_datetime64(
+        timestamps: TimeLike
+) -> np.ndarray:
+    """Convert timestamps to datetime64[ms],  numbers are epoch seconds.
+    :param timestamps: datetime64, datetime or epoch seconds, scalar or array
+    :return: np.ndarray datetime64[ms]
+    """
+    ts = np.asarray(timestamps)
+    if np.issubdtype(ts.dtype, np.datetime64):
+        return ts.astype('datetime64[ms]')
+    if ts.dtype == object:
+        return ts.astype('datetime64[ms]')
+    return (ts.astype(np.float64) * 1000.0).round().astype(np.int64).astype('datetime64[ms]')
+
+
+class MetricStoreError(Exception):
+    """Raised if appended data has invalid shape."""
+
+    def __init__(self, msg):
+        super().__init__(msg)
+
+
+class MetricStore:
+    def __init__(
+            self,
+            store_dir: str
+    ):
+        """
+        :param store_dir: store directory, created if not exists.
+        """
+        self.store_dir = store_dir
+        os.makedirs(store_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._dictionary: Dict[str, List[str]] = {c: [] for c in _ENCODED_COLUMNS}
+        self._codes: Dict[str, Dict[str, int]] = {c: {} for c in _ENCODED_COLUMNS}
+        self._load_dictionary()
+
+    def _column_path(
+            self,
+            column: str
+    ) -> str:
+        """Return path to column file."""
+        return os.path.join(self.store_dir, f"{column}.bin")
+
+    def _dictionary_path(self) -> str:
+        """Return path to dictionary file."""
+        return os.path.join(self.store_dir, "dictionary.json")
+
+    def _load_dictionary(self):
+        """Load dictionary of encoded columns."""
+        path = self._dictionary_path()
+        if not os.path.exists(path):
+            return
+        with open(path, "r") as f:
+            data = json.load(f)
+        for column in _ENCODED_COLUMNS:
+            self._dictionary[column] = list(data.get(column, []))
+            self._codes[column] = {name: code for code, name in enumerate(self._dictionary[column])}
+
+    def _save_dictionary(self):
+        """Save dictionary,  written to temp file and atomically moved."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.store_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self._dictionary, f)
+            os.replace(tmp_path, self._dictionary_path())
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _encode(
+            self,
+            column: str,
+            names: Iterable[str]
+    ) -> np.ndarray:
+        """Encode names to int32 codes, unseen names appended to dictionary.
+        :param column: encoded column name
+        :param names: array of names
+        :return: np.ndarray int32
+        """
+        names = np.asarray(names, dtype=str)
+        unique, inverse = np.unique(names, return_inverse=True)
+        codes = self._codes[column]
+        for name in unique:
+            if name not in codes:
+                codes[name] = len(self._dictionary[column])
+                self._dictionary[column].append(str(name))
+        unique_codes = np.array([codes[name] for name in unique], dtype=np.int32)
+        return unique_codes[inverse].reshape(names.shape)
+
+    def names(
+            self,
+            column: str
+    ) -> List[str]:
+        """Return all names of dictionary encoded column.
+        :param column: entity, metric or scenario
+        :return: list of names
+        """
+        return list(self._dictionary[column])
+
+    def __len__(self) -> int:
+        return self._num_rows()
+
+    def _num_rows(self) -> int:
+        """Return number of complete rows, the shortest column length."""
+        lengths = []
+        for column, dtype in METRIC_STORE_COLUMNS.items():
+            path = self._column_path(column)
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            lengths.append(size // np.dtype(dtype).itemsize)
+        return min(lengths)
+
+    def append(
+            self,
+            entity: Union[str, Iterable[str]],
+            metric: Union[str, Iterable[str]],
+            timestamp: TimeLike,
+            value: Union[float, np.ndarray],
+            scenario: Union[str, Iterable[str]] = "",
+    ) -> int:
+        """Append rows,  arguments broadcast to a common shape
+        so scalar entity or scenario applies to all rows.
+        Rows with NaN value are skipped.
+
+        :param entity: entity name or array of names
+        :param metric: metric name or array of names
+        :param timestamp: datetime64 or epoch seconds
+        :param value: value or array of values
+        :param scenario: scenario id, i.e. experiment step
+        :return: number of rows appended
+        """
+        value = np.asarray(value, dtype=np.float64)
+        timestamp = to_datetime64(timestamp)
+        entity, metric, timestamp, value, scenario = np.broadcast_arrays(
+            np.asarray(entity, dtype=str), np.asarray(metric, dtype=str),
+            timestamp, value, np.asarray(scenario, dtype=str))
+
+        mask = ~np.isnan(value)
+        if not mask.any():
+            return 0
+
+        with self._lock:
+            columns = {
+                'entity': self._encode('entity', entity[mask]),
+                'metric': self._encode('metric', metric[mask]),
+                'timestamp': timestamp[mask].astype(np.int64),
+                'value': value[mask],
+                'scenario': self._encode('scenario', scenario[mask]),
+            }
+            self._save_dictionary()
+            # cut columns back to complete rows, so a partial write
+            # or a longer column never shifts appended rows
+            num_rows = self._num_rows()
+            for column, dtype in METRIC_STORE_COLUMNS.items():
+                with open(self._column_path(column), "ab") as f:
+                    f.truncate(num_rows * np.dtype(dtype).itemsize)
+                    f.write(np.ascontiguousarray(columns[column], dtype=dtype).tobytes())
+
+        return int(mask.sum())
+
+    def append_tensor(
+            self,
+            entities: List[str],
+            metrics: List[str],
+            timestamps: TimeLike,
+            data: np.ndarray,
+            scenario: str = "",
+    ) -> int:
+        """Append (E, S, M) tensor, i.e. result of
+        VMwareMetricCollector.read_entities_metric,  NaN padding skipped.
+
+        :param entities: list of E entity names
+        :param metrics: list of M metric names
+        :param timestamps: (S,) or (E, S) sample timestamps
+        :param data: np.ndarray (E, S, M)
+        :param scenario: scenario id
+        :return: number of rows appended
+        """
+        if data.ndim != 3:
+            raise MetricStoreError(f"expected (E, S, M) tensor got shape {data.shape}")
+        timestamps = to_datetime64(timestamps)
+        if timestamps.ndim == 1:
+            timestamps = timestamps[None, :]
+        return self.append(
+            np.asarray(entities, dtype=str)[:, None, None],
+            np.asarray(metrics, dtype=str)[None, None, :],
+            timestamps[:, :, None],
+            data,
+            scenario
+        )
+
+    def append_port_metrics(
+            self,
+            data: np.ndarray,
+            vm_names: List[str],
+            timestamp: TimeLike,
+            scenario: str = "",
+    ) -> int:
+        """Append vectorized port metrics, i.e. result of
+        EsxiMetricCollector.collect_vm_port_metrics.  Entity is vm name and
+        port id, "vm-1:67108902".
+
+        :param data: np.ndarray (N, 8) vm index, port id and port metrics
+        :param vm_names: vm names, indexed by first column
+        :param timestamp: sample timestamp, scalar or (N,)
+        :param scenario: scenario id
+        :return: number of rows appended
+        """
+        if data.size == 0:
+            return 0
+        vm_names = np.asarray(vm_names, dtype=str)
+        entities = np.char.add(
+            np.char.add(vm_names[data[:, 0].astype(np.int64)], ":"),
+            data[:, 1].astype(np.int64).astype(str))
+        timestamp = to_datetime64(timestamp)
+        if timestamp.ndim == 1:
+            timestamp = timestamp[:, None]
+        return self.append(
+            entities[:, None],
+            np.asarray(PORT_METRIC_NAMES)[None, :],
+            timestamp,
+            data[:, 2:2 + len(PORT_METRIC_NAMES)],
+            scenario
+        )
+
+    def append_iperf(
+            self,
+            data: np.ndarray,
+            entity: str,
+            start_time: TimeLike,
+            scenario: str = "",
+            interval: float = 1.0,
+    ) -> int:
+        """Append iperf stats, i.e. result of inference.iperf_tcp_json_to_np.
+        Rows ordered by interval and by stream in interval,  a row is stamped
+        at the end of its report interval, start_time + interval * (sample index + 1),
+        same as MetricAligner.add_iperf.
+        Entity is entity name and socket, "client-pod:5".
+
+        :param data: np.ndarray (N, 7) socket and iperf metrics
+        :param entity: entity name, i.e. pod or vm
+        :param start_time: iperf start time
+        :param scenario: scenario id
+        :param interval: iperf report interval in seconds
+        :return: number of rows appended
+        """
+        if data.size == 0:
+            return 0
+        sockets = data[:, 0].astype(np.int64)
+        sample_idx = np.zeros(len(sockets), dtype=np.int64)
+        for s in np.unique(sockets):
+            is_socket = sockets == s
+            sample_idx[is_socket] = np.arange(is_socket.sum())
+
+        start = to_datetime64(start_time)
+        offsets = ((sample_idx + 1) * interval * 1000.0).round().astype('timedelta64[ms]')
+        entities = np.char.add(f"{entity}:", sockets.astype(str))
+        return self.append(
+            entities[:, None],
+            np.asarray(IPERF_METRIC_NAMES)[None, :],
+            (start + offsets)[:, None],
+            data[:, 1:1 + len(IPERF_METRIC_NAMES)],
+            scenario
+        )
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """Return memory mapped read only columns, codes are not decoded.
+        :return: a dict column name to np.memmap
+        """
+        num_rows = self._num_rows()
+        result = {}
+        for column, dtype in METRIC_STORE_COLUMNS.items():
+            if num_rows == 0:
+                result[column] = np.empty(0, dtype=dtype)
+            else:
+                result[column] = np.memmap(self._column_path(column), dtype=dtype, mode="r", shape=(num_rows,))
+        return result
+
+    def _codes_of(
+            self,
+            column: str,
+            names: Optional[Iterable[str]]
+    ) -> Optional[np.ndarray]:
+        """Return codes of known names, unknown names ignored."""
+        if names is None:
+            return None
+        if isinstance(names, str):
+            names = [names]
+        codes = self._codes[column]
+        return np.array([codes[n] for n in names if n in codes], dtype=np.int32)
+
+    def query(
+            self,
+            entities: Optional[Iterable[str]] = None,
+            metrics: Optional[Iterable[str]] = None,
+            start_time: Optional[TimeLike] = None,
+            end_time: Optional[TimeLike] = None,
+            scenarios: Optional[Iterable[str]] = None,
+            decode: bool = True,
+    ) -> Dict[str, np.ndarray]:
+        """Return rows matching filters, all filters are optional.
+        Time range is [start_time, end_time).
+
+        :param entities: entity names
+        :param metrics: metric names
+        :param start_time: inclusive start time
+        :param end_time: exclusive end time
+        :param scenarios: scenario ids
+        :param decode: decode entity, metric and scenario to names
+        :return: a dict column name to np.ndarray, timestamp is datetime64[ms]
+        """
+        columns = self.columns()
+        mask = np.ones(len(columns['value']), dtype=bool)
+
+        for column, names in (('entity', entities), ('metric', metrics), ('scenario', scenarios)):
+            codes = self._codes_of(column, names)
+            if codes is not None:
+                mask &= np.isin(columns[column], codes)
+
+        if start_time is not None:
+            mask &= columns['timestamp'] >= to_datetime64(start_time).astype(np.int64)
+        if end_time is not None:
+            mask &= columns['timestamp'] < to_datetime64(end_time).astype(np.int64)
+
+        result = {column: np.asarray(columns[column][mask]) for column in METRIC_STORE_COLUMNS}
+        result['timestamp'] = result['timestamp'].astype('datetime64[ms]')
+        if decode:
+            for column in _ENCODED_COLUMNS:
+                names = np.asarray(self._dictionary[column], dtype=str)
+                result[column] = names[result[column]] if len(names) else result[column].astype(str)
+        return result
@@ -0,0 +1,202 @@
+"""
+PerfCollectionScope, is a scoped change of vCenter statistics collection
+that is rolled back when the scope exits.
+
+vCenter stores a counter in a historical interval only if the counter
+level is less or equal to the interval level.  Instead of raising level
+of an interval, that makes vCenter store every counter of that level
+for every entity, the scope lowers level mapping of only the counters
+an experiment needs (UpdateCounterLevelMapping), optionally changes
+historical intervals,  and restores both on exit.
+
+Example:
+
+    with PerfCollectionScope(collector, ["net.droppedRx.summation"], num_series=64) as scope:
+        print(scope.budget)
+        ... run scenario
+
+Author: Mus
+ spyroot@gmail.com
+ mbayramo@stanford.edu
+"""
+import logging
+from collections import namedtuple
+from typing import Dict, List, Optional, Any
+
+from pyVmomi import vim
+
+from warlock.metrics.vm_metric_stats import VMwareMetricCollector
+
+# rough size of one stored sample row in vCenter stats database, bytes.
+STATS_BYTES_PER_SAMPLE = 100
+
+# estimate of stats database growth for the scope duration
+StatsBudget = namedtuple('StatsBudget', ['num_series', 'num_samples', 'num_bytes', 'per_interval'])
+
+
+def estimate_stats_growth(
+        intervals: Dict[int, Dict[str, Any]],
+        counter_level: int,
+        num_series: int,
+        duration_seconds: float,
+        bytes_per_sample: Optional[int] = STATS_BYTES_PER_SAMPLE,
+) -> StatsBudget:
+    """Estimate number of samples vCenter stores for set of series.
+    A series stored in each enabled interval which level >= counter_level,
+    interval keeps at most interval length worth of samples.
+
+    :param intervals: intervals as returned by read_update_intervals
+    :param counter_level: level counters collected at
+    :param num_series: number of series, entities x counters x instances
+    :param duration_seconds: scope duration in seconds
+    :param bytes_per_sample: estimated size of one sample row
+    :return: StatsBudget
+    """
+    per_interval = {}
+    for key, interval in intervals.items():
+        if not interval.get('enabled') or interval.get('level', 0) < counter_level:
+            continue
+        sampling_period = interval['samplingPeriod']
+        if sampling_period <= 0:
+            continue
+        retained = min(duration_seconds, interval['length'])
+        per_interval[key] = int(num_series * (retained // sampling_period))
+
+    num_samples = sum(per_interval.values())
+    return StatsBudget(
+        num_series=num_series,
+        num_samples=num_samples,
+        num_bytes=num_samples * bytes_per_sample,
+        per_interval=per_interval
+    )
+
+
+class PerfCollectionScope:
+    def __init__(
+            self,
+            collector: VMwareMetricCollector,
+            counters: List[str],
+            level: Optional[int] = 1,
+            intervals: Optional[Dict[int, Dict[str, Any]]] = None,
+            num_series: Optional[int] = None,
+            duration_seconds: Optional[float] = 3600,
+            logger: Optional[logging.Logger] = None,
+    ):
+        """
+        :param collector: VMwareMetricCollector
+        :param counters: counter names, i.e. net.droppedRx.summation
+        :param level: aggregate and per device level counters mapped to during scope.
+        :param intervals: optional interval changes during scope, a dict where key is
+                          interval id and value dict with enabled, length, sampling_period, level.
+                          i.e. {1: {'sampling_period': 60}}
+        :param num_series: number of series for budget estimate, default number of counters.
+        :param duration_seconds: expected scope duration for budget estimate.
+        :param logger: optional logger
+        """
+        if not 1 <= level <= 4:
+            raise ValueError("level must be in range 1-4.")
+
+        self.collector = collector
+        self.counters = counters
+        self.level = level
+        self.intervals = intervals if intervals is not None else {}
+        self.num_series = num_series if num_series is not None else len(counters)
+        self.duration_seconds = duration_seconds
+        self.logger = logger if logger else logging.getLogger(__name__)
+
+        self.budget: Optional[StatsBudget] = None
+        self._saved_levels: List[vim.PerformanceManager.CounterLevelMapping] = []
+        self._saved_intervals: Dict[int, Dict[str, Any]] = {}
+        self._active = False
+
+    @property
+    def active(self) -> bool:
+        """Return True if scope entered and not yet restored."""
+        return self._active
+
+    def enter(self) -> StatsBudget:
+        """Map counters to scope level and apply interval changes.
+        Previous counter levels and intervals saved for restore.
+
+        :return: estimate of stats database growth
+        """
+        if self._active:
+            return self.budget
+
+        perf_manager = self.collector._get_perf_manager()
+        counter_ids = [self.collector.metric_index(c) for c in self.counters]
+
+        self._saved_intervals = self.collector.read_update_intervals()
+        self._saved_levels = [
+            vim.PerformanceManager.CounterLevelMapping(
+                counterId=info.key,
+                aggregateLevel=info.level,
+                perDeviceLevel=info.perDeviceLevel
+            ) for info in perf_manager.QueryPerfCounter(counterId=counter_ids) or []
+        ]
+
+        self._active = True
+        try:
+            perf_manager.UpdateCounterLevelMapping(counterLevelMap=[
+                vim.PerformanceManager.CounterLevelMapping(
+                    counterId=counter_id,
+                    aggregateLevel=self.level,
+                    perDeviceLevel=self.level
+                ) for counter_id in counter_ids
+            ])
+            for interval_id, change in self.intervals.items():
+                self.collector.update_perf_intervals(interval_id, **change)
+        except Exception:
+            self.restore()
+            raise
+
+        self.budget = estimate_stats_growth(
+            self.collector.read_update_intervals(),
+            self.level,
+            self.num_series,
+            self.duration_seconds
+        )
+        self.logger.info(
+            f"perf collection scope for {len(counter_ids)} counters at level {self.level}, "
+            f"estimated stats growth {self.budget.num_samples} samples {self.budget.num_bytes} bytes")
+        return self.budget
+
+    def restore(self):
+        """Restore counter levels and intervals saved on enter.
+        Restore continues on error,  so one failed interval doesn't
+        leave counter levels changed.
+        """
+        if not self._active:
+            return
+
+        perf_manager = self.collector._get_perf_manager()
+        if self._saved_levels:
+            try:
+                perf_manager.UpdateCounterLevelMapping(counterLevelMap=self._saved_levels)
+            except Exception as e:
+                self.logger.error(f"Failed restore counter levels: {e}")
+
+        for interval_id in self.intervals:
+            saved = self._saved_intervals.get(interval_id)
+            if saved is None:
+                continue
+            try:
+                self.collector.update_perf_intervals(
+                    interval_id,
+                    enabled=saved['enabled'],
+                    length=saved['length'],
+                    sampling_period=saved['samplingPeriod'],
+                    level=saved['level']
+                )
+            except Exception as e:
+                self.logger.error(f"Failed restore interval {interval_id}: {e}")
+
+        self._active = False
+
+    def __enter__(self) -> 'PerfCollectionScope':
+        self.enter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.restore()
+        return False
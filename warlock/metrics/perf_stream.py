@@ -0,0 +1,293 @@
+"""
+PerfStreamCollector, is a streaming collector for vCenter real-time (20 second)
+performance counters.
+
+read_entity_metric always queries a window that ends now, so repeated calls
+re-download overlapping samples.  The streaming collector tracks the last
+sample timestamp per (entity, counter, instance), on each poll requests
+only samples newer than that timestamp at real-time interval, and appends
+them into a preallocated ring buffer.  Counters of a query are filtered
+against own last timestamp,  a counter behind others fills samples
+already buffered instead of appending them twice.
+
+All queries collected in a single QueryPerf call in CSV format,
+see VMwareMetricCollector.query_perf_since.
+
+Example:
+
+    stream = PerfStreamCollector(collector, [
+        MetricQuery("vm-1", "vm", [cpu_usage_id], ""),
+        MetricQuery("esxi-a", "host", [pkt_tx, pkt_rx], "vmnic5"),
+    ], capacity=180)
+
+    stream.run(duration=600)
+    timestamps, values = stream.window(1)
+
+Author: Mus
+ spyroot@gmail.com
+ mbayramo@stanford.edu
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from warlock.metrics.vm_metric_stats import (
+    VMwareMetricCollector,
+    MetricQuery,
+    PERF_FORMAT_CSV,
+    parse_csv_values,
+    parse_csv_sample_info
+)
+
+# vCenter real-time sampling interval in seconds
+REALTIME_INTERVAL = 20
+
+# timestamp used for slots that never written
+_NO_TIMESTAMP = np.iinfo(np.int64).min
+
+
+class PerfStreamCollector:
+    def __init__(
+            self,
+            collector: VMwareMetricCollector,
+            queries: List[MetricQuery],
+            capacity: Optional[int] = 180,
+            backfill_seconds: Optional[int] = 300,
+            logger: Optional[logging.Logger] = None,
+    ):
+        """
+        :param collector: VMwareMetricCollector used to query vCenter.
+        :param queries: list of MetricQuery, one query per entity and instance.
+        :param capacity: number of samples ring buffer holds per query,
+                         default 180 samples is one hour of real-time data.
+        :param backfill_seconds: on first poll collect samples for last backfill_seconds.
+        :param logger: optional logger
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be positive.")
+
+        self.collector = collector
+        self.queries = queries
+        self.capacity = capacity
+        self.backfill_seconds = backfill_seconds
+        self.logger = logger if logger else logging.getLogger(__name__)
+
+        num_queries = len(queries)
+        self.num_metrics = max((len(q.metric_indices) for q in queries), default=0)
+
+        # ring buffer, samples ordered by write position
+        self._timestamps = np.full((num_queries, capacity), _NO_TIMESTAMP, dtype=np.int64)
+        self._values = np.full((num_queries, capacity, self.num_metrics), np.nan, dtype=np.float32)
+        self._write_pos = np.zeros(num_queries, dtype=np.int64)
+        self._num_samples = np.zeros(num_queries, dtype=np.int64)
+
+        # last sample timestamp (epoch seconds) per (query, counter)
+        self._last_ts = np.full((num_queries, self.num_metrics), _NO_TIMESTAMP, dtype=np.int64)
+        self._resolved: Optional[List[MetricQuery]] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _to_datetime(
+            epoch_seconds: int
+    ) -> datetime:
+        """Convert epoch seconds to utc datetime."""
+        return datetime.fromtimestamp(int(epoch_seconds), tz=timezone.utc)
+
+    def _start_time(
+            self,
+            query_idx: int,
+            now: float
+    ) -> datetime:
+        """Return start time for query,  vCenter start time is exclusive
+        so samples newer than oldest last timestamp of query counters returned.
+        """
+        num_counters = len(self.queries[query_idx].metric_indices)
+        last_ts = self._last_ts[query_idx, :num_counters]
+        if num_counters == 0 or (last_ts == _NO_TIMESTAMP).any():
+            return self._to_datetime(now - self.backfill_seconds)
+        return self._to_datetime(last_ts.min())
+
+    def poll(
+            self,
+            now: Optional[float] = None
+    ) -> int:
+        """Collect new samples for all queries in one QueryPerf and
+        append them to ring buffer.
+
+        :param now: current time epoch seconds, default time.time()
+        :return: number of new samples appended across all queries.
+        """
+        now = now if now is not None else time.time()
+        if self._resolved is None:
+            self._resolved = self.collector.resolve_queries(self.queries)
+
+        entities, stats = self.collector.query_perf_since(
+            self._resolved,
+            [self._start_time(i, now) for i in range(len(self.queries))],
+            interval_id=REALTIME_INTERVAL,
+            perf_format=PERF_FORMAT_CSV
+        )
+
+        # entity metric keyed by entity moid, one per query spec
+        query_index = {}
+        for i, entity in enumerate(entities):
+            query_index.setdefault(entity._moId, []).append(i)
+
+        appended = 0
+        with self._lock:
+            for entity_metric in stats:
+                _, sample_ts = parse_csv_sample_info(entity_metric.sampleInfoCSV)
+                sample_ts = sample_ts.astype(np.int64)
+                series_by_key = {
+                    (s.id.counterId, s.id.instance): parse_csv_values(s.value) for s in entity_metric.value
+                }
+                for i in query_index.get(entity_metric.entity._moId, []):
+                    query = self.queries[i]
+                    if not any((c, query.instance) in series_by_key for c in query.metric_indices):
+                        continue
+                    appended += self._append(i, sample_ts, [
+                        series_by_key.get((c, query.instance)) for c in query.metric_indices
+                    ])
+
+        return appended
+
+    def _slot_of_timestamp(
+            self,
+            query_idx: int
+    ) -> Dict[int, int]:
+        """Return ring buffer slot of each buffered sample timestamp of query."""
+        n = int(self._num_samples[query_idx])
+        pos = (self._write_pos[query_idx] - n + np.arange(n)) % self.capacity
+        return {int(t): int(p) for t, p in zip(self._timestamps[query_idx, pos], pos)}
+
+    def _append(
+            self,
+            query_idx: int,
+            sample_ts: np.ndarray,
+            series: List[Optional[np.ndarray]]
+    ) -> int:
+        """Append samples of one query to ring buffer.  Each counter keeps
+        only samples newer than its own last timestamp.  A sample already
+        buffered, because a counter that is further ahead wrote it, is
+        filled in place instead of appended again.
+
+        :param query_idx: query index
+        :param sample_ts: sample timestamps epoch seconds
+        :param series: list of values per counter, None if counter not returned
+        :return: number of samples appended or filled
+        """
+        num_counters = len(series)
+        values = np.full((len(sample_ts), self.num_metrics), np.nan, dtype=np.float32)
+        for m, v in enumerate(series):
+            if v is not None:
+                n = min(len(v), len(sample_ts))
+                values[:n, m] = v[:n]
+
+        last_ts = self._last_ts[query_idx, :num_counters]
+        is_new = sample_ts[:, None] > last_ts[None, :]
+        values[:, :num_counters][~is_new] = np.nan
+        rows = ~np.isnan(values[:, :num_counters]).all(axis=1)
+        if not rows.any():
+            return 0
+
+        sample_ts = sample_ts[rows]
+        values = values[rows]
+
+        # counters with data advance last timestamp
+        has_value = ~np.isnan(values[:, :num_counters])
+        newest = np.where(has_value, sample_ts[:, None], _NO_TIMESTAMP).max(axis=0)
+        self._last_ts[query_idx, :num_counters] = np.maximum(last_ts, newest)
+
+        filled = 0
+        if self._num_samples[query_idx] > 0:
+            newest_buffered = self._timestamps[query_idx, (self._write_pos[query_idx] - 1) % self.capacity]
+            is_buffered = sample_ts <= newest_buffered
+            if is_buffered.any():
+                slots = self._slot_of_timestamp(query_idx)
+                for ts, row in zip(sample_ts[is_buffered], values[is_buffered]):
+                    slot = slots.get(int(ts))
+                    if slot is None:
+                        # older than ring buffer or a gap, can't insert out of order
+                        continue
+                    fill = ~np.isnan(row)
+                    self._values[query_idx, slot, fill] = row[fill]
+                    filled += 1
+                sample_ts = sample_ts[~is_buffered]
+                values = values[~is_buffered]
+
+        # keep only last capacity samples
+        sample_ts = sample_ts[-self.capacity:]
+        values = values[-self.capacity:]
+        n = len(sample_ts)
+        if n > 0:
+            pos = (self._write_pos[query_idx] + np.arange(n)) % self.capacity
+            self._timestamps[query_idx, pos] = sample_ts
+            self._values[query_idx, pos] = values
+            self._write_pos[query_idx] = (self._write_pos[query_idx] + n) % self.capacity
+            self._num_samples[query_idx] = min(self._num_samples[query_idx] + n, self.capacity)
+        return n + filled
+
+    def window(
+            self,
+            query_idx: int,
+            last_n: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Return samples of a query ordered by time.
+        :param query_idx: index of query
+        :param last_n: optional, only last n samples.
+        :return: tuple timestamps datetime64[s] (N,) and values (N, num_metrics)
+        """
+        with self._lock:
+            n = int(self._num_samples[query_idx])
+            if last_n is not None:
+                n = min(n, last_n)
+            pos = (self._write_pos[query_idx] - n + np.arange(n)) % self.capacity
+            timestamps = self._timestamps[query_idx, pos].astype('datetime64[s]')
+            values = self._values[query_idx, pos].copy()
+        return timestamps, values
+
+    def last_timestamps(self) -> np.ndarray:
+        """Return last sample timestamp per (query, counter),
+        NaT where no sample collected yet.
+        """
+        with self._lock:
+            ts = self._last_ts.copy()
+        result = ts.astype('datetime64[s]')
+        result[ts == _NO_TIMESTAMP] = np.datetime64('NaT')
+        return result
+
+    def run(
+            self,
+            duration: float,
+            stop_event: Optional[threading.Event] = None,
+            interval: Optional[float] = REALTIME_INTERVAL,
+    ) -> int:
+        """Poll every interval seconds for duration seconds.  Polls scheduled
+        on a fixed clock so time spent in QueryPerf doesn't accumulate drift.
+
+        :param duration: total duration in seconds
+        :param stop_event: optional event to stop early
+        :param interval: poll interval in seconds
+        :return: total number of samples appended
+        """
+        stop_event = stop_event if stop_event is not None else threading.Event()
+        start = time.monotonic()
+        appended = 0
+        num_polls = 0
+        while not stop_event.is_set():
+            try:
+                appended += self.poll()
+            except Exception as e:
+                self.logger.warning(f"PerfStreamCollector poll failed: {e}")
+
+            num_polls += 1
+            next_poll = start + num_polls * interval
+            if next_poll - start > duration:
+                break
+            stop_event.wait(max(0.0, next_poll - time.monotonic()))
+
+        return appended
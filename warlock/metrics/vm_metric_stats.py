@@ -14,14 +14,17 @@ Author: Mus
  mbayramo@stanford.edu
 """
 import os
+import threading
 import warnings
-from functools import lru_cache
+from collections import namedtuple
 from typing import Optional, Dict, List, Tuple, Any
 
 import numpy as np
 
+from warlock.metrics.counter_catalog import CounterCatalog, DEFAULT_CATALOG_DIR
 from warlock.states.vm_state import (
-    VMwareVimStateReader
+    VMwareVimStateReader,
+    ClusterNotFoundException
 )
 
 from pyVmomi import vim
@@ -31,6 +34,70 @@ VMwareMetricSeries = vim.PerformanceManager.MetricSeries
 VMwareMetricIntSeries = vim.PerformanceManager.IntSeries
 VMwarePerformanceManager = vim.PerformanceManager
 
+# entity is entity name resolved by entity_type (vm, host, dvs, cluster)
+# or vim.ManagedEntity,  instance "" is aggregate, vmnic0, 4000 etc.
+MetricQuery = namedtuple('MetricQuery', ['entity', 'entity_type', 'metric_indices', 'instance'])
+
+# result of cluster network sweep,  labels[i] is (host name, vmnic) of data[i]
+# and dvs_labels[i] is dvs name of dvs_data[i]
+NetSweep = namedtuple('NetSweep', [
+    'labels', 'data', 'metric_names', 'dvs_labels', 'dvs_data', 'dvs_metric_names'
+])
+
+# vmnic / vnic net counters
+NET_METRIC_NAMES = [
+    "net.packetsTx.summation",
+    "net.packetsRx.summation",
+    "net.droppedTx.summation",
+    "net.droppedRx.summation",
+    "net.received.average",
+    "net.transmitted.average",
+]
+
+# dvs throughput counters
+DVS_NET_METRIC_NAMES = [
+    "net.throughput.vds.pktsTx.average",
+    "net.throughput.vds.pktsRx.average",
+    "net.throughput.vds.droppedTx.average",
+    "net.throughput.vds.droppedRx.average",
+]
+
+# QuerySpec format, csv skips per sample xml deserialization in pyVmomi
+PERF_FORMAT_NORMAL = "normal"
+PERF_FORMAT_CSV = "csv"
+
+
+def parse_csv_values(
+        csv_values: Optional[str]
+) -> np.ndarray:
+    """Parse comma separated metric series values returned by
+    QueryPerf in csv format. i.e. "10,11,12"
+
+    :param csv_values: csv string
+    :return: np.ndarray float32
+    """
+    if not csv_values:
+        return np.empty(0, dtype=np.float32)
+    return np.fromstring(csv_values, dtype=np.float32, sep=',')
+
+
+def parse_csv_sample_info(
+        csv_sample_info: Optional[str]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Parse csv sample info returned by QueryPerf in csv format,
+    sample info is interval and timestamp pairs.
+    i.e. "20,2024-03-01T10:00:20Z,20,2024-03-01T10:00:40Z"
+
+    :param csv_sample_info: csv string
+    :return: tuple of intervals int32 and timestamps datetime64[s]
+    """
+    if not csv_sample_info:
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype='datetime64[s]')
+    fields = np.array(csv_sample_info.split(','))
+    intervals = fields[0::2].astype(np.int32)
+    timestamps = np.char.rstrip(fields[1::2], 'Z').astype('datetime64[s]')
+    return intervals, timestamps
+
 
 class UpdateIntervalNotFound(Exception):
     def __init__(self, entity_name):
@@ -72,15 +139,18 @@ class VMwareMetricCollector(VMwareVimStateReader):
                  environment_spec: Optional[Dict] = None,
                  vcenter_ip: Optional[str] = None,
                  username: Optional[str] = None,
-                 password: Optional[str] = None):
+                 password: Optional[str] = None,
+                 catalog_dir: Optional[str] = None):
         """
         :param environment_spec: is some dictionary where we get VC Sphere information.
         :param vcenter_ip: optional in case caller manually provide vCenter FQDN
         :param username: optional in case caller manually provide username
         :param password: optional in case caller manually provide
+        :param catalog_dir: optional directory where counter catalog persisted,
+                            catalog keyed by vCenter build and loaded on first use.
+                            Default DEFAULT_CATALOG_DIR, empty string disables catalog persistence.
         """
         super().__init__(
-            None,
             iaas_spec=environment_spec,
             vcenter_ip=vcenter_ip,
             username=username,
@@ -91,6 +161,11 @@ class VMwareMetricCollector(VMwareVimStateReader):
         self._vm_type_to_name = {}
         self._vm_metrics_type = {}
 
+        # counter catalog, persisted in catalog_dir and keyed by vCenter build
+        self.catalog_dir = catalog_dir if catalog_dir is not None else DEFAULT_CATALOG_DIR
+        self._counter_catalog: Optional[CounterCatalog] = None
+        self._catalog_lock = threading.Lock()
+
     @classmethod
     def from_optional_credentials(
             cls,
@@ -164,6 +239,7 @@ class VMwareMetricCollector(VMwareVimStateReader):
             interval_seconds: Optional[int] = 6000,
             max_sample: Optional[int] = 30,
             metric_instance: str = "",
+            perf_format: Optional[str] = PERF_FORMAT_NORMAL,
     ) -> np.ndarray:
         """
         Retrieve metric counters for a given VM over the specified interval,
@@ -175,48 +251,193 @@ class VMwareMetricCollector(VMwareVimStateReader):
         :param metric_indices:
         :param interval_seconds: The time interval in seconds to calculate samples.
         :param max_sample: number of samples returned.
+        :param perf_format: PERF_FORMAT_NORMAL or PERF_FORMAT_CSV
         :return: numpy array of metric values with shape (max_sample, num_metrics)
         """
 
-        max_sample = max(1, max_sample)
-        interval_seconds = max(60, interval_seconds)
+        np_values = self.read_entities_metric(
+            [MetricQuery(entity_name, entity_type, metric_indices, metric_instance)],
+            interval_seconds, max_sample, perf_format=perf_format
+        )
+        return self._trim_padding(np_values[0])
 
-        perf_manager = self._get_perf_manager()
-        entity = self.get_managed_entities(entity_name, entity_type)
+    def _resolve_query_entity(
+            self,
+            query: MetricQuery
+    ) -> vim.ManagedEntity:
+        """Resolve metric query entity to managed entity.
+        :param query: MetricQuery
+        :return: vim.ManagedEntity
+        """
+        if isinstance(query.entity, vim.ManagedEntity):
+            return query.entity
+        return self.get_managed_entities(query.entity, query.entity_type)
+
+    def query_perf_specs(
+            self,
+            queries: List[MetricQuery],
+            start_time: Optional[datetime],
+            end_time: Optional[datetime],
+            max_sample: Optional[int] = None,
+            interval_id: Optional[int] = None,
+            perf_format: Optional[str] = None,
+    ) -> Tuple[List[vim.ManagedEntity], List[vim.PerformanceManager.QuerySpec]]:
+        """Build one QuerySpec per metric query.
+        :param queries: list of MetricQuery
+        :param start_time: start time of window
+        :param end_time: end time of window
+        :param max_sample: max number of samples per spec
+        :param interval_id: sampling interval, 20 for real time.
+        :param perf_format: "normal" or "csv"
+        :return: a tuple of resolved entities and query specs
+        """
+        entities = [self._resolve_query_entity(q) for q in queries]
+        specs = []
+        for query, entity in zip(queries, entities):
+            spec = vim.PerformanceManager.QuerySpec(
+                entity=entity,
+                metricId=[vim.PerformanceManager.MetricId(
+                    counterId=idx, instance=query.instance) for idx in query.metric_indices],
+                startTime=start_time,
+                endTime=end_time,
+            )
+            if max_sample is not None:
+                spec.maxSample = max_sample
+            if interval_id is not None:
+                spec.intervalId = interval_id
+            if perf_format is not None:
+                spec.format = perf_format
+            specs.append(spec)
+        return entities, specs
+
+    def resolve_queries(
+            self,
+            queries: List[MetricQuery]
+    ) -> List[MetricQuery]:
+        """Return queries with entity resolved to managed entity, so
+        repeated queries skip entity lookup.
+        :param queries: list of MetricQuery
+        :return: list of MetricQuery
+        """
+        return [q._replace(entity=self._resolve_query_entity(q)) for q in queries]
+
+    def query_perf_since(
+            self,
+            queries: List[MetricQuery],
+            start_times: List[Optional[datetime]],
+            end_time: Optional[datetime] = None,
+            interval_id: Optional[int] = None,
+            perf_format: Optional[str] = None,
+    ) -> Tuple[List[vim.ManagedEntity], List[Any]]:
+        """Collect samples of many queries in a single QueryPerf call, each
+        query with own start time, i.e. timestamp of the last sample caller has.
+        vCenter start time is exclusive.
+
+        :param queries: list of MetricQuery
+        :param start_times: start time per query
+        :param end_time: optional end time, default latest sample.
+        :param interval_id: sampling interval, 20 for real time.
+        :param perf_format: "normal" or "csv"
+        :return: a tuple of resolved entities and list of entity metrics.
+        """
+        entities, specs = self.query_perf_specs(
+            queries, None, end_time, interval_id=interval_id, perf_format=perf_format)
+        for spec, start_time in zip(specs, start_times):
+            spec.startTime = start_time
+        return entities, self._get_perf_manager().QueryPerf(querySpec=specs) or []
+
+    @staticmethod
+    def _series_key(
+            entity: vim.ManagedEntity,
+            counter_id: int,
+            instance: str
+    ) -> Tuple[str, int, str]:
+        """Key used to match returned series to query."""
+        return entity._moId, counter_id, instance
+
+    def read_entities_metric(
+            self,
+            queries: List[MetricQuery],
+            interval_seconds: Optional[int] = 300,
+            max_sample: Optional[int] = 30,
+            perf_format: Optional[str] = PERF_FORMAT_NORMAL,
+    ) -> np.ndarray:
+        """Retrieve metric counters for many entities in a single QueryPerf call.
+        Each query is an entity, list of counter ids and instance,  for example
+        all VMs cpu counters and all host vmnic counters can be collected
+        in one SOAP request.
+
+        The result is dense tensor (num_queries, num_samples, num_metrics),
+        where num_metrics is max number of counters in any query and
+        num_samples is max number of samples returned.  Entities with fewer
+        samples or counters padded with NaN.
 
-        metric_ids = [vim.PerformanceManager.MetricId(
-            counterId=idx, instance=metric_instance) for idx in metric_indices]
+        :param queries: list of MetricQuery
+        :param interval_seconds: The time interval in seconds to calculate samples.
+        :param max_sample: number of samples returned per query.
+        :param perf_format: PERF_FORMAT_NORMAL or PERF_FORMAT_CSV,  csv format
+                            parsed directly to numpy and much cheaper for large queries.
+        :return: numpy array (num_queries, num_samples, num_metrics) float32
+        """
+        num_metrics = max((len(q.metric_indices) for q in queries), default=0)
+        if not queries:
+            return np.full((0, 0, num_metrics), np.nan, dtype=np.float32)
+
+        max_sample = max(1, max_sample)
+        interval_seconds = max(60, interval_seconds)
 
         end_time = datetime.now()
         start_time = end_time - timedelta(seconds=interval_seconds)
-        query = vim.PerformanceManager.QuerySpec(
-            entity=entity,
-            metricId=metric_ids,
-            startTime=start_time,
-            endTime=end_time,
-            maxSample=max_sample
-        )
-
-        stats = perf_manager.QueryPerf(querySpec=[query])
+        entities, specs = self.query_perf_specs(
+            queries, start_time, end_time, max_sample=max_sample, perf_format=perf_format)
+        stats = self._get_perf_manager().QueryPerf(querySpec=specs)
+        series_values = self._read_series_values(stats, perf_format)
 
-        if stats:
-            metric_values = {}
-            for metric_id, series in zip(metric_indices, stats[0].value):
-                metric_values[metric_id] = [vv for vv in series.value]
+        num_samples = max((len(v) for v in series_values.values()), default=0)
+        np_values = np.full((len(queries), num_samples, num_metrics), np.nan, dtype=np.float32)
+        for e, (query, entity) in enumerate(zip(queries, entities)):
+            for m, counter_id in enumerate(query.metric_indices):
+                values = series_values.get(self._series_key(entity, counter_id, query.instance))
+                if values is not None and len(values) > 0:
+                    np_values[e, :len(values), m] = values
 
-            if len(metric_values) == 0:
-                warnings.warn(f"No usage data found for host {entity_name}, metrics {str(metric_indices)}")
-                return np.array([], dtype=np.float32).reshape(0, len(metric_indices))
+        if not series_values:
+            warnings.warn(f"No usage data found for {len(queries)} metric queries")
 
-            num_samples = min(len(v) for v in metric_values.values())
-            np_values = np.zeros((num_samples, len(metric_indices)), dtype=np.float32)
-            for i, metric_id in enumerate(metric_indices):
-                np_values[:, i] = metric_values[metric_id][:num_samples]
+        return np_values
 
-            return np_values
-        else:
-            warnings.warn(f"No usage data found for {entity_name}, metrics {str(metric_indices)}")
-            return np.array([], dtype=np.float32).reshape(0, len(metric_indices))
+    @classmethod
+    def _read_series_values(
+            cls,
+            stats,
+            perf_format: Optional[str] = PERF_FORMAT_NORMAL
+    ) -> Dict[Tuple[str, int, str], Any]:
+        """Read series values from QueryPerf result.
+        :param stats: list of EntityMetric or EntityMetricCSV
+        :param perf_format: format stats requested in.
+        :return: a dict where key is (entity moid, counter id, instance)
+        """
+        series_values = {}
+        for entity_metric in stats or []:
+            for series in entity_metric.value:
+                key = cls._series_key(entity_metric.entity, series.id.counterId, series.id.instance)
+                if perf_format == PERF_FORMAT_CSV:
+                    series_values[key] = parse_csv_values(series.value)
+                else:
+                    series_values[key] = series.value
+        return series_values
+
+    @staticmethod
+    def _trim_padding(
+            np_values: np.ndarray
+    ) -> np.ndarray:
+        """Trim NaN padding of one entity (num_samples, num_metrics).
+        Padding is only trailing samples where every metric is NaN,
+        a sample with some missing metrics is kept.
+        """
+        has_value = np.flatnonzero(~np.isnan(np_values).all(axis=1))
+        num_samples = has_value[-1] + 1 if len(has_value) > 0 else 0
+        return np_values[:num_samples]
 
     def read_vm_usage_mhz_metric(
             self,
@@ -294,14 +515,14 @@ class VMwareMetricCollector(VMwareVimStateReader):
             self.metric_index("net.transmitted.average"),
         ]
 
+        # all vnics collected in one QueryPerf
+        vm = self.get_managed_entities(vm_name, "vm")
+        np_values = self.read_entities_metric([
+            MetricQuery(vm, "vm", metric_indices, str(vnic_key)) for vnic_key in vnic_labels
+        ], interval_seconds, max_sample)
+
         vnic_stats = {
-            vnic_key: self.read_entity_metric(
-                vm_name, "vm",
-                metric_indices,
-                interval_seconds,
-                max_sample,
-                metric_instance=str(vnic_key)
-            ) for vnic_key in vnic_labels
+            vnic_key: self._trim_padding(np_values[i]) for i, vnic_key in enumerate(vnic_labels)
         }
 
         return vnic_stats
@@ -334,29 +555,82 @@ class VMwareMetricCollector(VMwareVimStateReader):
 
         vmnic_dict = self.read_esxi_host_pnic(host_name)
         _vmnics = list(vmnic_dict.keys())
+        metric_indices = [self.metric_index(m) for m in NET_METRIC_NAMES]
 
-        metric_indices = [
-            self.metric_index("net.packetsTx.summation"),
-            self.metric_index("net.packetsRx.summation"),
-            self.metric_index("net.droppedTx.summation"),
-            self.metric_index("net.droppedRx.summation"),
-            self.metric_index("net.received.average"),
-            self.metric_index("net.transmitted.average"),
-        ]
+        # we're passing vmnic0, vmnic1 etc, all vmnics collected in one QueryPerf
+        host = self.get_managed_entities(host_name, "host")
+        np_values = self.read_entities_metric([
+            MetricQuery(host, "host", metric_indices, _vmnic) for _vmnic in _vmnics
+        ], interval_seconds, max_sample)
 
-        vmnic_stats = {}
-        # we're passing vmnic0, vmnic1 etc
-        for _vmnic in _vmnics:
-            vmnic_stats[_vmnic] = self.read_entity_metric(
-                host_name, "host",
-                metric_indices,
-                interval_seconds,
-                max_sample,
-                metric_instance=_vmnic
-            )
+        vmnic_stats = {
+            _vmnic: self._trim_padding(np_values[i]) for i, _vmnic in enumerate(_vmnics)
+        }
 
         return vmnic_stats
 
+    def read_cluster_net_sweep(
+            self,
+            cluster_name: str,
+            interval_seconds: Optional[int] = 300,
+            max_sample: Optional[int] = 30,
+            include_dvs: Optional[bool] = True,
+    ) -> NetSweep:
+        """Collect net counters for all vmnics on all hosts of a cluster and
+        throughput counters of DVS hosts attached to in one QueryPerf.
+
+        Hosts and vmnics resolved with a single property collector call,
+        DVS resolved from DVS uplink index.
+
+        data is (H * V, S, 6) where row i is labels[i] (host name, vmnic) and
+        columns follow NET_METRIC_NAMES.  dvs_data is (D, S, 4) and columns
+        follow DVS_NET_METRIC_NAMES.  Missing samples are NaN.
+
+        :param cluster_name: cluster name or managed object id
+        :param interval_seconds: Number of seconds in past to collect
+        :param max_sample: Maximum number of samples to collect per time frame
+        :param include_dvs: collect DVS counters
+        :raises ClusterNotFoundException: if cluster not found
+        :return: NetSweep
+        """
+        cluster = self.read_cluster(cluster_name)
+        if cluster is None:
+            raise ClusterNotFoundException(cluster_name)
+
+        net_indices = [self.metric_index(m) for m in NET_METRIC_NAMES]
+        labels, queries = [], []
+        host_names = set()
+        hosts = self.collect_properties(cluster, vim.HostSystem, ['name', 'config.network.pnic'])
+        for host_ref, props in sorted(hosts.items(), key=lambda kv: kv[1].get('name', '')):
+            host_name = props.get('name')
+            host_names.add(host_name)
+            for pnic in sorted(props.get('config.network.pnic') or [], key=lambda p: p.device):
+                labels.append((host_name, pnic.device))
+                queries.append(MetricQuery(host_ref, "host", net_indices, pnic.device))
+
+        dvs_labels = []
+        if include_dvs:
+            cluster_switches = self.dvs_switches_of_hosts(host_names)
+            dvs_indices = [self.metric_index(m) for m in DVS_NET_METRIC_NAMES]
+            switches = self.collect_properties(
+                self.si.content.rootFolder, vim.DistributedVirtualSwitch, ['uuid', 'name'])
+            for switch_ref, props in sorted(switches.items(), key=lambda kv: kv[1].get('name', '')):
+                if props.get('uuid') in cluster_switches:
+                    dvs_labels.append(props.get('name'))
+                    queries.append(MetricQuery(switch_ref, "dvs", dvs_indices, ""))
+
+        num_hosts_rows = len(labels)
+        data = self.read_entities_metric(queries, interval_seconds, max_sample)
+
+        return NetSweep(
+            labels=labels,
+            data=data[:num_hosts_rows, :, :len(NET_METRIC_NAMES)],
+            metric_names=list(NET_METRIC_NAMES),
+            dvs_labels=dvs_labels,
+            dvs_data=data[num_hosts_rows:, :, :len(DVS_NET_METRIC_NAMES)],
+            dvs_metric_names=list(DVS_NET_METRIC_NAMES),
+        )
+
     def read_core_utilization_metric(
             self,
             host_name: str,
@@ -430,13 +704,7 @@ class VMwareMetricCollector(VMwareVimStateReader):
         :return:
         """
         metric_ids, metric_names = self.read_dvs_available_perf_metric(dvs_name)
-
-        metric_indices = [
-            self.metric_index("net.throughput.vds.pktsTx.average"),
-            self.metric_index("net.throughput.vds.pktsRx.average"),
-            self.metric_index("net.throughput.vds.droppedTx.average"),
-            self.metric_index("net.throughput.vds.droppedRx.average"),
-        ]
+        metric_indices = [self.metric_index(m) for m in DVS_NET_METRIC_NAMES]
 
         return self.read_entity_metric(dvs_name, "dvs", metric_indices, interval_seconds, max_sample)
 
@@ -499,27 +767,111 @@ class VMwareMetricCollector(VMwareVimStateReader):
 
         return [self._vm_type_to_name.get(cid, f"Unknown Metric ID: {cid}") for cid in counter_ids]
 
-    @lru_cache(maxsize=None)
+    def _vcenter_build(
+            self
+    ) -> Tuple[str, str]:
+        """Return vCenter instance uuid and build,  counter catalog keyed by both.
+        :return: tuple instance uuid, build
+        """
+        if not self.si:
+            self.connect_to_vcenter()
+        about = self.si.content.about
+        return about.instanceUuid, about.build
+
+    def _set_counter_catalog(
+            self,
+            catalog: CounterCatalog
+    ):
+        """Populate counter name / id mapping from catalog.
+        :param catalog: CounterCatalog
+        """
+        self._counter_catalog = catalog
+        self._vm_metrics_type = dict(catalog.counters)
+        self._vm_type_to_name = catalog.counter_names()
+
+    def _save_counter_catalog(self):
+        """Persist counter catalog if catalog dir set."""
+        if not self.catalog_dir or self._counter_catalog is None:
+            return
+        try:
+            self._counter_catalog.save(self.catalog_dir)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Failed save counter catalog: {e}")
+
+    def load_counter_catalog(
+            self,
+            catalog_dir: Optional[str] = None
+    ) -> bool:
+        """Load counter catalog of connected vCenter build from disk.
+
+        :param catalog_dir: optional catalog directory, default catalog_dir
+        :return: True if catalog loaded
+        """
+        catalog_dir = catalog_dir if catalog_dir is not None else self.catalog_dir
+        if not catalog_dir:
+            return False
+        instance_uuid, build = self._vcenter_build()
+        catalog = CounterCatalog.load(catalog_dir, instance_uuid, build, logger=self.logger)
+        if catalog is None or len(catalog.counters) == 0:
+            return False
+        self.catalog_dir = catalog_dir
+        self._set_counter_catalog(catalog)
+        return True
+
     def read_all_supported_metrics(
             self,
     ) -> Dict[str, int]:
         """Retrieve list of all available metrics and return Dict
-        mapping metric name to counter id.
+        mapping metric name to counter id.  Catalog fetched once per
+        vCenter build,  if catalog_dir set loaded from disk.
 
         :return: Dict mapping metric name to counter id
         """
-        perf_manager = self._get_perf_manager()
-        perf_counters = perf_manager.perfCounter
-        if perf_manager is None:
-            raise VMwareMetricCollectorError("perfCounter is None")
-
-        for counter in perf_counters:
-            counter_full = f"{counter.groupInfo.key}.{counter.nameInfo.key}.{counter.rollupType}"
-            self._vm_metrics_type[counter_full] = counter.key
-            self._vm_type_to_name[counter.key] = counter_full
+        with self._catalog_lock:
+            if self._counter_catalog is not None:
+                return self._vm_metrics_type
+            if self.load_counter_catalog():
+                return self._vm_metrics_type
+
+            perf_manager = self._get_perf_manager()
+            perf_counters = perf_manager.perfCounter
+            if perf_counters is None:
+                raise VMwareMetricCollectorError("perfCounter is None")
+
+            counters = {
+                f"{counter.groupInfo.key}.{counter.nameInfo.key}.{counter.rollupType}": counter.key
+                for counter in perf_counters
+            }
+            instance_uuid, build = self._vcenter_build()
+            self._set_counter_catalog(CounterCatalog(instance_uuid, build, counters))
+            self._save_counter_catalog()
 
         return self._vm_metrics_type
 
+    def read_entity_type_counters(
+            self,
+            entity,
+            entity_type: str,
+    ) -> List[int]:
+        """Return counter ids available for entity type.  Result of
+        QueryAvailablePerfMetric cached per entity type in counter catalog,
+        entities of same type share the same counter set.
+
+        :param entity: managed entity used if entity type not in catalog.
+        :param entity_type: entity type vm, host, dvs, cluster
+        :return: list of counter ids
+        """
+        if self._counter_catalog is None:
+            self.read_all_supported_metrics()
+
+        available = self._counter_catalog.available
+        if entity_type not in available:
+            metric_ids = self._read_available_perf_metrics(entity)
+            available[entity_type] = sorted({metric.counterId for metric in metric_ids})
+            self._save_counter_catalog()
+
+        return available[entity_type]
+
     def read_available_perf_metrics(
             self,
             entity_name: str,
@@ -532,8 +884,7 @@ class VMwareMetricCollector(VMwareVimStateReader):
         :return:  A list of available performance metrics for the entity.
         """
         entity = self.get_managed_entities(entity_name, entity_type)
-        metric_ids = self._read_available_perf_metrics(entity)
-        counter_ids = [metric.counterId for metric in metric_ids]
+        counter_ids = list(self.read_entity_type_counters(entity, entity_type))
         metric_names = self.resolve_metric_names(counter_ids)
         return counter_ids, metric_names
 
@@ -583,7 +934,8 @@ class VMwareMetricCollector(VMwareVimStateReader):
             interval_id: int,
             enabled: Optional[bool] = None,
             length: Optional[int] = None,
-            sampling_period: Optional[int] = None
+            sampling_period: Optional[int] = None,
+            level: Optional[int] = None
     ):
         """
         Update the performance collection interval settings to a x-second sampling period.
@@ -596,6 +948,7 @@ class VMwareMetricCollector(VMwareVimStateReader):
         :param enabled: Whether the interval is enabled (True or False).
         :param length: The length of the interval in seconds.
         :param sampling_period: The new sampling period in seconds. Set to 60 for this example.
+        :param level: The statistics collection level of the interval (1-4).
         """
 
         perf_manager = self._get_perf_manager()
@@ -613,6 +966,8 @@ class VMwareMetricCollector(VMwareVimStateReader):
             interval.length = length
         if sampling_period is not None:
             interval.samplingPeriod = sampling_period
+        if level is not None:
+            interval.level = level
 
         try:
             perf_manager.UpdatePerfInterval(interval)
@@ -8,13 +8,14 @@ Author: Mus
  spyroot@gmail.com
  mbayramo@stanford.edu
 """
-from typing import List
+from typing import List, Dict, Tuple, Optional, Any
 import time
 import json
 
 from warlock.spell_specs import SpellSpecs
 from warlock.operators.ssh_operator import SSHOperator
 from warlock.operators.shell_operator import ShellOperator
+from warlock.operators.pod_exec_engine import PodExecEngine, ExecRequest
 
 
 class NodeActions(ShellOperator):
@@ -22,7 +23,8 @@ class NodeActions(ShellOperator):
             self,
             node_ips: List[str],
             ssh_operator: SSHOperator,
-            spell_specs: SpellSpecs
+            spell_specs: SpellSpecs,
+            exec_engine: Optional[PodExecEngine] = None,
     ):
         """
         Initializes the NodeActions instance with a list of node IPs, an SSH command executor,
@@ -31,11 +33,13 @@ class NodeActions(ShellOperator):
         :param node_ips: A list of IP addresses for the  kubernetes nodes.
         :param ssh_operator: An object responsible for executing SSH commands.
         :param spell_specs: The test environment specification including configurations for the test.
+        :param exec_engine: optional engine pod commands run through, default PodExecEngine.
         """
         self.node_ips = node_ips
         self.ssh_executor = ssh_operator
 
         self.tun_value = spell_specs
+        self.exec_engine = exec_engine if exec_engine else PodExecEngine()
         self.debug = True
 
     def update_ring_buffer(self):
@@ -134,53 +138,79 @@ class NodeActions(ShellOperator):
             else:
                 print(f"Failed to get current profile on {ip}; exit code: {exit_code}.")
 
-    def start_environment(self):
-        """
-        Starts an iperf server on one pod and then starts an iperf client
-        on another pod to perform a test, based on the configuration defined in a JSON file.
-        Server pod's IP address is provided as an argument.
-        """
-        server_config = self.tun_value.get('environment', {}).get('server', {})
-        client_config = self.tun_value.get('environment', {}).get('client', {})
+    @staticmethod
+    def _iperf_requests(
+            server_config: Dict,
+            client_config: Dict
+    ) -> Tuple[ExecRequest, ExecRequest]:
+        """Return iperf server and client exec requests of a pod pair."""
         server_pod_ip = server_config.get('ip')
+        server_command = (f"{server_config.get('cmd')} "
+                          f"--bind {server_pod_ip} {server_config.get('options')} "
+                          f"--port {server_config.get('port')}")
+        client_command = (f"{client_config.get('cmd')} "
+                          f"--client {server_pod_ip} {client_config.get('options')} "
+                          f"--time {client_config.get('duration', 60)} "
+                          f"--parallel {client_config.get('parallel_streams', 4)} "
+                          f"--port {client_config.get('port')}")
+        return (
+            ExecRequest(server_config.get('pod_name'), server_command, server_config.get('namespace', "default")),
+            ExecRequest(client_config.get('pod_name'), client_command, client_config.get('namespace', "default"))
+        )
+
+    def run_iperf_pairs(
+            self,
+            pairs: List[Tuple[Dict, Dict]],
+            timeout: Optional[float] = None
+    ) -> List[Tuple[float, float, Any]]:
+        """
+        Starts iperf servers on all server pods detached and then starts all
+        iperf clients at the same moment, so streams of all pairs overlap.
+        Servers terminated once clients finished.
 
-        server_pod_name = server_config.get('pod_name')
-        server_cmd = server_config.get('cmd')
-        server_port = server_config.get('port')
-        server_options = server_config.get('options')
-
-        client_pod_name = client_config.get('pod_name')
-        client_cmd = client_config.get('cmd')
-        client_port = client_config.get('port')
-        duration = client_config.get('duration', 60)
-        parallel_streams = client_config.get('parallel_streams', 4)
-        client_options = client_config.get('options')
+        :param pairs: list of (server config, client config), server config holds server pod ip.
+        :param timeout: optional client timeout in seconds, default iperf duration plus 60 seconds.
+        :return: list of (bps sent, bps received, client cmd) per pair, (0, 0, {}) for a failed pair.
+        """
+        requests = [self._iperf_requests(server, client) for server, client in pairs]
+        if timeout is None:
+            timeout = max(c.get('duration', 60) for _, c in pairs) + 60
 
+        # servers detached, terminated once all clients finished
+        server_handles = self.exec_engine.start([server for server, _ in requests])
         try:
-            server_command = (f"kubectl exec {server_pod_name} "
-                              f"-- /bin/bash -c \"{server_cmd} "
-                              f"--bind {server_pod_ip} {server_options} "
-                              f"--port {server_port}\"")
-            server_output = self.run_command(server_command)
             time.sleep(1)
-
-            client_command = (f"kubectl exec -it {client_pod_name} "
-                              f"-- /bin/bash -c \"{client_cmd} "
-                              f"--client {server_pod_ip} {client_options} "
-                              f"--time {duration} "
-                              f"--parallel {parallel_streams} --port {client_port}\"")
-
-            client_out = self.run_command_json(client_command)
-            bps_sent = client_out["end"]["sum_sent"]["bits_per_second"]
-            bps_received = client_out["end"]["sum_received"]["bits_per_second"]
+            client_results = self.exec_engine.run([client for _, client in requests], timeout=timeout)
+        finally:
+            server_results = self.exec_engine.terminate(server_handles)
+
+        results = []
+        for (_, client_config), client_result, server_result in zip(pairs, client_results, server_results):
+            try:
+                client_out = json.loads(client_result.stdout)
+                bps_sent = client_out["end"]["sum_sent"]["bits_per_second"]
+                bps_received = client_out["end"]["sum_received"]["bits_per_second"]
+            except (json.JSONDecodeError, KeyError):
+                print(f"Failed to parse client {client_result.pod_name} output as JSON, "
+                      f"client stderr: {client_result.stderr!r}, "
+                      f"server {server_result.pod_name} stderr: {server_result.stderr!r}")
+                results.append((0, 0, {}))
+                continue
 
             if self.debug:
                 print(f"Bits per second sent: {bps_sent}")
                 print(f"Bits per second received: {bps_received}")
                 print(json.dumps(client_out, indent=4))
 
-            return bps_sent, bps_received, client_cmd
-        except json.JSONDecodeError:
-            print("Failed to parse client output as JSON.")
+            results.append((bps_sent, bps_received, client_config.get('cmd')))
+        return results
 
-        return 0, 0, {}
+    def start_environment(self):
+        """
+        Starts an iperf server on one pod and then starts an iperf client
+        on another pod to perform a test, based on the configuration defined in a JSON file.
+        Server pod's IP address is provided as an argument.
+        """
+        server_config = self.tun_value.get('environment', {}).get('server', {})
+        client_config = self.tun_value.get('environment', {}).get('client', {})
+        return self.run_iperf_pairs([(server_config, client_config)])[0]
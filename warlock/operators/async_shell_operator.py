@@ -0,0 +1,368 @@
+"""
+AsyncShellOperator, is an asyncio variant of ShellOperator.
+
+Commands spawned without a shell, stdout read in chunks as process
+writes it and fed to a parser incrementally, stderr drained concurrently,
+and each command has a timeout after which process is killed.  Number of
+commands running at once bounded by a semaphore,  so many commands can be
+awaited concurrently without fork bombing the host.
+
+JsonStreamDecoder decodes JSON while kubectl is still writing it.  In
+items mode it returns each element of top level "items" list as soon as
+element is closed,  hence caller processes a large kubectl get -o json
+list object by object and decoded text is dropped from the buffer.
+
+Example:
+
+    shell = AsyncShellOperator(max_concurrency=16)
+    async for pod in shell.iter_json_items("kubectl get pods -A -o json"):
+        ...
+    nodes, pods = await asyncio.gather(
+        shell.run_command_json("kubectl get nodes -o json"),
+        shell.run_command_json("kubectl get pods -o json"))
+
+Author: Mus
+ spyroot@gmail.com
+ mbayramo@stanford.edu
+"""
+import asyncio
+import codecs
+import json
+import logging
+import re
+import shlex
+from typing import Dict, List, Optional, Any, Union, AsyncIterator
+
+# structural characters outside and inside of JSON string
+_STRUCT_RE = re.compile(r'["{}\[\]]')
+_STRING_RE = re.compile(r'["\\]')
+
+# stdout read size
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class CommandError(Exception):
+    """Raised if command exits with non-zero exit code."""
+
+    def __init__(self, cmd: str, returncode: int, stderr: str):
+        self.cmd = cmd
+        self.returncode = returncode
+        self.stderr = stderr
+        super().__init__(f"Command '{cmd}' failed with error: {stderr}")
+
+
+class CommandTimeoutError(CommandError):
+    """Raised if command didn't finish within timeout, process killed."""
+
+    def __init__(self, cmd: str, timeout: float):
+        self.timeout = timeout
+        super().__init__(cmd, -9, f"timeout after {timeout} seconds")
+
+
+class JsonStreamDecoder:
+    """
+    Incremental JSON decoder.  Text fed in chunks, decoder scans only
+    structural characters and decodes a value once it is closed.
+
+    In values mode feed returns each complete top level value, i.e. stream
+    of objects printed by kubectl get -w -o json.  In items mode feed returns
+    each complete element of top level "items" array.
+
+    A bare top level scalar, i.e. 42 or "str", has no closing bracket,
+    hence it is returned by close once input ended.
+    """
+
+    def __init__(
+            self,
+            items: Optional[bool] = False
+    ):
+        """
+        :param items: if True decode elements of top level items array.
+        """
+        self.items = items
+        self._buf = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._string_start = 0
+        self._last_string = None
+        self._in_items = False
+        self._start = None
+        # end of last decoded top level value, values mode
+        self._end = 0
+
+    def _trim(self):
+        """Drop decoded text from the buffer."""
+        if not self.items and self._depth == 0 and self._start is None:
+            # keep text after last value, it may be a top level scalar
+            cut = self._end
+        elif self._start is not None:
+            cut = self._start
+        elif self._in_string:
+            # keep open string, it may be key of items array
+            cut = self._string_start
+        else:
+            cut = self._pos
+        if cut > 0:
+            self._buf = self._buf[cut:]
+            self._pos -= cut
+            self._string_start -= cut
+            self._end = max(0, self._end - cut)
+            if self._start is not None:
+                self._start -= cut
+
+    def _close_string(self, end: int):
+        """Remember short strings closed at depth 1, key of items array."""
+        if self._depth == 1 and end - self._string_start <= 16:
+            self._last_string = self._buf[self._string_start + 1:end]
+
+    def feed(
+            self,
+            text: str
+    ) -> List[Any]:
+        """Feed text and return values completed by it.
+        :param text: chunk of JSON text
+        :return: list of decoded values
+        """
+        self._buf += text
+        values = []
+        buf = self._buf
+        while True:
+            if self._in_string:
+                m = _STRING_RE.search(buf, self._pos)
+                if m is None:
+                    self._pos = len(buf)
+                    break
+                if m.group() == '\\':
+                    if m.end() >= len(buf):
+                        # escaped character arrives with next chunk
+                        self._pos = m.start()
+                        break
+                    self._pos = m.end() + 1
+                    continue
+                self._in_string = False
+                self._close_string(m.start())
+                self._pos = m.end()
+                continue
+
+            m = _STRUCT_RE.search(buf, self._pos)
+            if m is None:
+                self._pos = len(buf)
+                break
+            i = m.start()
+            c = m.group()
+            self._pos = m.end()
+            if c == '"':
+                self._in_string = True
+                self._string_start = i
+            elif c in '{[':
+                if self.items:
+                    if self._in_items and self._depth == 2 and c == '{':
+                        self._start = i
+                    elif c == '[' and self._depth == 1 and self._last_string == "items":
+                        self._in_items = True
+                elif self._depth == 0:
+                    self._start = i
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._depth < 0:
+                    raise ValueError("Unbalanced JSON input")
+                target = 2 if self.items else 0
+                if self._start is not None and self._depth == target:
+                    values.append(json.loads(buf[self._start:self._pos]))
+                    self._start = None
+                    self._end = self._pos
+                if self.items and self._depth == 1 and c == ']':
+                    self._in_items = False
+
+        self._trim()
+        return values
+
+    def close(self) -> List[Any]:
+        """Check that input ended on value boundary and decode
+        a top level scalar left in the buffer, values mode.
+        :return: list with trailing scalar value, empty if none.
+        :raise ValueError: if last value is incomplete.
+        """
+        if self._depth != 0 or self._in_string:
+            raise ValueError("Incomplete JSON input")
+        if self.items:
+            return []
+        tail = self._buf[self._end:].strip()
+        self._buf = ""
+        self._pos = self._end = 0
+        return [json.loads(tail)] if tail else []
+
+
+class AsyncShellOperator:
+    def __init__(
+            self,
+            max_concurrency: Optional[int] = 16,
+            timeout: Optional[float] = 120,
+            logger: Optional[logging.Logger] = None,
+    ):
+        """
+        :param max_concurrency: max number of processes running at once.
+        :param timeout: default command timeout in seconds, None no timeout.
+        :param logger: optional logger
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be positive.")
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.logger = logger if logger else logging.getLogger(__name__)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """Return semaphore of running loop."""
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._semaphore
+
+    @staticmethod
+    def split(
+            cmd: Union[str, List[str]]
+    ) -> List[str]:
+        """Return argument list of command, command never run by shell."""
+        return shlex.split(cmd) if isinstance(cmd, str) else list(cmd)
+
+    async def stream(
+            self,
+            cmd: Union[str, List[str]],
+            timeout: Optional[float] = None,
+    ) -> AsyncIterator[str]:
+        """Run command and yield stdout chunks as process writes them.
+
+        :param cmd: command string or argument list
+        :param timeout: timeout in seconds, default operator timeout.
+        :return: async iterator of stdout text chunks
+        :raise CommandError: if command exits with non-zero exit code.
+        :raise CommandTimeoutError: if command didn't finish within timeout.
+        """
+        args = self.split(cmd)
+        cmd_str = cmd if isinstance(cmd, str) else shlex.join(args)
+        timeout = self.timeout if timeout is None else timeout
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+
+        def remaining():
+            if deadline is None:
+                return None
+            left = deadline - loop.time()
+            if left <= 0:
+                raise asyncio.TimeoutError()
+            return left
+
+        async with self._get_semaphore():
+            process = await asyncio.create_subprocess_exec(
+                *args,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE)
+            stderr_task = asyncio.ensure_future(process.stderr.read())
+            # multibyte character may span two chunks
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            try:
+                while True:
+                    chunk = await asyncio.wait_for(process.stdout.read(READ_CHUNK_SIZE), remaining())
+                    if not chunk:
+                        break
+                    text = decoder.decode(chunk)
+                    if text:
+                        yield text
+                returncode = await asyncio.wait_for(process.wait(), remaining())
+                stderr = (await stderr_task).decode(errors="replace").strip()
+            except asyncio.TimeoutError:
+                raise CommandTimeoutError(cmd_str, timeout) from None
+            finally:
+                if process.returncode is None:
+                    process.kill()
+                    await process.wait()
+                if not stderr_task.done():
+                    stderr_task.cancel()
+
+        if returncode != 0:
+            raise CommandError(cmd_str, returncode, stderr)
+
+    async def run_command(
+            self,
+            cmd: Union[str, List[str]],
+            timeout: Optional[float] = None,
+    ) -> List[str]:
+        """Run command, same contract as ShellOperator.run_command.
+        :param cmd: command string or argument list
+        :param timeout: timeout in seconds
+        :return: stdout lines
+        """
+        chunks = [chunk async for chunk in self.stream(cmd, timeout)]
+        return "".join(chunks).strip().split('\n')
+
+    async def run_command_json(
+            self,
+            cmd: Union[str, List[str]],
+            expect_error: Optional[str] = None,
+            timeout: Optional[float] = None,
+    ) -> Dict:
+        """Run command that returns a JSON,  same contract as ShellOperator.run_command_json.
+        JSON decoded incrementally as process writes it.
+
+        :param cmd: command string or argument list
+        :param expect_error: substring of error message that returns empty dict instead of raising.
+        :param timeout: timeout in seconds
+        :return: decoded JSON
+        """
+        decoder = JsonStreamDecoder()
+        values = []
+        try:
+            async for chunk in self.stream(cmd, timeout):
+                values.extend(decoder.feed(chunk))
+        except CommandError as e:
+            if expect_error and expect_error in e.stderr:
+                return {}
+            raise
+        values.extend(decoder.close())
+        if len(values) != 1:
+            raise json.JSONDecodeError(f"Expected one JSON value, got {len(values)}", "", 0)
+        return values[0]
+
+    async def iter_json_items(
+            self,
+            cmd: Union[str, List[str]],
+            timeout: Optional[float] = None,
+    ) -> AsyncIterator[Dict]:
+        """Run command that returns a list object, i.e. kubectl get pods -o json,
+        and yield each element of items as soon as it decoded.
+
+        :param cmd: command string or argument list
+        :param timeout: timeout in seconds
+        :return: async iterator of list items
+        """
+        decoder = JsonStreamDecoder(items=True)
+        async for chunk in self.stream(cmd, timeout):
+            for item in decoder.feed(chunk):
+                yield item
+        decoder.close()
+
+    async def run_many(
+            self,
+            cmds: List[Union[str, List[str]]],
+            json_output: Optional[bool] = False,
+            timeout: Optional[float] = None,
+    ) -> List[Any]:
+        """Run commands concurrently, bounded by max_concurrency.
+
+        :param cmds: list of commands
+        :param json_output: if True decode each output as JSON
+        :param timeout: per command timeout in seconds
+        :return: list of results in cmds order, exception instance for failed command.
+        """
+        if json_output:
+            coros = [self.run_command_json(cmd, timeout=timeout) for cmd in cmds]
+        else:
+            coros = [self.run_command(cmd, timeout=timeout) for cmd in cmds]
+        return await asyncio.gather(*coros, return_exceptions=True)
+
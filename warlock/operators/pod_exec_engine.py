@@ -0,0 +1,269 @@
+"""
+PodExecEngine, runs kubectl exec commands in many pods concurrently.
+
+Engine has two modes.
+
+    run     commands run in parallel with bounded concurrency, stdout of
+            each pod streamed line by line to a callback and each call
+            returns ExecResult once all commands finished.
+
+    start   commands detached, engine returns ExecHandle per command
+            and caller collects results later, i.e. iperf servers started
+            before clients and collected after clients finished.
+
+Each command is a separate kubectl process started without a shell.  If
+the batch fits into max_workers, all workers wait on a barrier and spawn
+processes at the same moment, so 32 iperf clients start near-simultaneously
+instead of one after another.
+
+Example:
+
+    engine = PodExecEngine(max_workers=32)
+    results = engine.run([ExecRequest("client0", "iperf3 -c 10.1.0.1 --json")],
+                         on_line=lambda pod, line: print(pod, line))
+
+Author: Mus
+ spyroot@gmail.com
+ mbayramo@stanford.edu
+"""
+import logging
+import subprocess
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Callable, IO
+
+ExecRequest = namedtuple('ExecRequest', ['pod_name', 'command', 'namespace', 'container'],
+                         defaults=["default", None])
+
+ExecResult = namedtuple('ExecResult', ['pod_name', 'namespace', 'command', 'exit_code',
+                                       'stdout', 'stderr', 'start_time', 'end_time'])
+
+# exit code of command killed by engine on timeout
+EXEC_TIMEOUT_EXIT_CODE = -9
+
+
+def kubectl_exec_args(
+        request: ExecRequest,
+        kubectl: Optional[str] = "kubectl"
+) -> List[str]:
+    """Return kubectl exec argument list for request,  command run by bash in pod.
+    :param request: ExecRequest
+    :param kubectl: kubectl binary
+    :return: list of arguments
+    """
+    args = [kubectl, "exec", request.pod_name, "-n", request.namespace]
+    if request.container:
+        args += ["-c", request.container]
+    return args + ["--", "/bin/bash", "-c", request.command]
+
+
+class ExecHandle:
+    """Detached command,  stdout and stderr go to temp files."""
+
+    def __init__(
+            self,
+            request: ExecRequest,
+            process: subprocess.Popen,
+            stdout: IO,
+            stderr: IO,
+            start_time: float
+    ):
+        self.request = request
+        self.process = process
+        self.stdout = stdout
+        self.stderr = stderr
+        self.start_time = start_time
+
+    def poll(self) -> Optional[int]:
+        """Return exit code or None if command still running."""
+        return self.process.poll()
+
+    def wait(
+            self,
+            timeout: Optional[float] = None
+    ) -> ExecResult:
+        """Wait for command, kill it on timeout, and return result.
+        :param timeout: timeout in seconds, None wait forever
+        :return: ExecResult
+        """
+        try:
+            exit_code = self.process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+            exit_code = EXEC_TIMEOUT_EXIT_CODE
+        end_time = time.time()
+        self.stdout.seek(0)
+        self.stderr.seek(0)
+        result = ExecResult(
+            self.request.pod_name, self.request.namespace, self.request.command, exit_code,
+            self.stdout.read(), self.stderr.read(), self.start_time, end_time
+        )
+        self.stdout.close()
+        self.stderr.close()
+        return result
+
+
+class PodExecEngine:
+    def __init__(
+            self,
+            max_workers: Optional[int] = 32,
+            kubectl: Optional[str] = "kubectl",
+            logger: Optional[logging.Logger] = None,
+    ):
+        """
+        :param max_workers: max number of commands running concurrently.
+        :param kubectl: kubectl binary
+        :param logger: optional logger
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be positive.")
+        self.max_workers = max_workers
+        self.kubectl = kubectl
+        self.logger = logger if logger else logging.getLogger(__name__)
+
+    def _spawn(
+            self,
+            request: ExecRequest,
+            stdout,
+            stderr
+    ) -> subprocess.Popen:
+        """Start kubectl exec process."""
+        return subprocess.Popen(
+            kubectl_exec_args(request, self.kubectl),
+            stdout=stdout, stderr=stderr, stdin=subprocess.DEVNULL, text=True
+        )
+
+    def _run_one(
+            self,
+            request: ExecRequest,
+            timeout: Optional[float],
+            on_line: Optional[Callable[[str, str], None]],
+            barrier: Optional[threading.Barrier],
+    ) -> ExecResult:
+        """Run a command,  stream stdout lines to on_line and return result."""
+        if barrier is not None:
+            barrier.wait()
+
+        start_time = time.time()
+        with tempfile.TemporaryFile(mode="w+") as stderr:
+            process = self._spawn(request, subprocess.PIPE, stderr)
+            timer = None
+            timed_out = threading.Event()
+            if timeout is not None:
+                def kill():
+                    timed_out.set()
+                    process.kill()
+                timer = threading.Timer(timeout, kill)
+                timer.daemon = True
+                timer.start()
+
+            lines = []
+            try:
+                for line in process.stdout:
+                    lines.append(line)
+                    if on_line is not None:
+                        on_line(request.pod_name, line.rstrip("\n"))
+                exit_code = process.wait()
+            finally:
+                if timer is not None:
+                    timer.cancel()
+                process.stdout.close()
+
+            stderr.seek(0)
+            return ExecResult(
+                request.pod_name, request.namespace, request.command,
+                EXEC_TIMEOUT_EXIT_CODE if timed_out.is_set() else exit_code,
+                "".join(lines), stderr.read(), start_time, time.time()
+            )
+
+    def run(
+            self,
+            requests: List[ExecRequest],
+            timeout: Optional[float] = None,
+            on_line: Optional[Callable[[str, str], None]] = None,
+            synchronized_start: Optional[bool] = True,
+    ) -> List[ExecResult]:
+        """Run commands in parallel and wait for all.
+
+        :param requests: list of ExecRequest
+        :param timeout: per command timeout in seconds, command killed on timeout.
+        :param on_line: optional callback called with pod name and stdout line
+                        as soon as pod prints it, called from worker threads.
+        :param synchronized_start: if batch fits into max_workers, spawn all
+                                   processes at the same moment.
+        :return: list of ExecResult in requests order
+        """
+        if not requests:
+            return []
+
+        num_workers = min(self.max_workers, len(requests))
+        barrier = None
+        if synchronized_start and len(requests) <= self.max_workers and len(requests) > 1:
+            barrier = threading.Barrier(len(requests))
+
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            futures = [
+                executor.submit(self._run_one, r, timeout, on_line, barrier) for r in requests
+            ]
+            results = [f.result() for f in futures]
+
+        failed = [r for r in results if r.exit_code != 0]
+        if failed:
+            self.logger.warning(f"{len(failed)} of {len(results)} pod commands failed, "
+                                f"first {failed[0].pod_name}: {failed[0].stderr.strip()}")
+        return results
+
+    def start(
+            self,
+            requests: List[ExecRequest]
+    ) -> List[ExecHandle]:
+        """Start commands detached,  stdout and stderr buffered in temp files.
+        Caller collects results with collect.
+
+        :param requests: list of ExecRequest
+        :return: list of ExecHandle in requests order
+        """
+        handles = []
+        try:
+            for request in requests:
+                stdout = tempfile.TemporaryFile(mode="w+")
+                stderr = tempfile.TemporaryFile(mode="w+")
+                process = self._spawn(request, stdout, stderr)
+                handles.append(ExecHandle(request, process, stdout, stderr, time.time()))
+        except Exception:
+            self.terminate(handles)
+            raise
+        return handles
+
+    @staticmethod
+    def collect(
+            handles: List[ExecHandle],
+            timeout: Optional[float] = None
+    ) -> List[ExecResult]:
+        """Wait for detached commands and return results,  all commands
+        share the same deadline.
+
+        :param handles: list of ExecHandle
+        :param timeout: timeout in seconds, commands still running killed.
+        :return: list of ExecResult in handles order
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        results = []
+        for handle in handles:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            results.append(handle.wait(remaining))
+        return results
+
+    @staticmethod
+    def terminate(
+            handles: List[ExecHandle]
+    ) -> List[ExecResult]:
+        """Terminate detached commands that still run and return results."""
+        for handle in handles:
+            if handle.poll() is None:
+                handle.process.terminate()
+        return PodExecEngine.collect(handles, timeout=5)
@@ -0,0 +1,264 @@
+"""
+AsyncVimStateReader, is a facade on top of VMwareVimStateReader that runs
+pyVmomi calls in a bounded thread pool and coalesces identical in-flight
+requests (single-flight).
+
+Callbacks and collectors often ask for the same object at the same time,
+i.e. many VM threads resolve the same ESXi host via read_esxi_host.
+Facade ensures only one SOAP call in flight for the same method and
+arguments, all other callers wait and share the result.
+
+Facade calls reader through a view, an instance of reader subclass with
+single-flight wrappers for methods in DEFAULT_COALESCE that shares reader
+state (instance dict).  Nested calls reader does internally
+(vm_state -> read_host_hardware -> read_esxi_host) coalesced as well,
+reader object itself is never modified.  Reader guards multi-step cache
+updates (DVS uplink index, inventory) with its own lock.
+
+Example:
+
+    with AsyncVimStateReader(reader, max_workers=8) as vim_reader:
+        futures = [vim_reader.submit('vm_state', vm_name) for vm_name in vm_names]
+        states = [f.result() for f in futures]
+
+    or from asyncio code
+
+        state = await vim_reader.call('vm_state', vm_name)
+
+Author: Mus
+ spyroot@gmail.com
+ mbayramo@stanford.edu
+"""
+import asyncio
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from warlock.states.vm_state import VMwareVimStateReader
+
+# reader methods that coalesced when facade attached to reader
+DEFAULT_COALESCE = [
+    'read_esxi_hosts',
+    'read_esxi_host',
+    'read_host_hardware',
+    'get_esxi_ip_of_vm',
+    '_find_by_dns_or_uuid',
+    'read_dvs_pnics_by_switch_uuid',
+    'build_dvs_uplink_index',
+    'read_numa_topology',
+]
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key, first caller (leader)
+    executes function, callers that arrive while call in flight wait for
+    the leader result.  Re-entrant call from leader thread executed directly.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight: Dict[Hashable, Tuple[Future, int]] = {}
+
+    def do(
+            self,
+            key: Hashable,
+            fn: Callable,
+            *args,
+            **kwargs
+    ) -> Any:
+        """Execute fn or wait for in-flight call with the same key.
+        :param key: call key
+        :param fn: callable
+        :return: result of fn
+        """
+        thread_id = threading.get_ident()
+        with self._lock:
+            entry = self._in_flight.get(key)
+            if entry is None:
+                future = Future()
+                self._in_flight[key] = (future, thread_id)
+                is_leader = True
+            else:
+                future, leader_id = entry
+                is_leader = False
+
+        if not is_leader:
+            if leader_id == thread_id:
+                return fn(*args, **kwargs)
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def in_flight(self) -> int:
+        """Return number of in-flight calls."""
+        with self._lock:
+            return len(self._in_flight)
+
+
+def _call_key(
+        method: str,
+        args: tuple,
+        kwargs: dict
+) -> Optional[Hashable]:
+    """Return hashable key for a call, or None if arguments not hashable.
+    """
+    key = (method, args, tuple(sorted(kwargs.items())))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+class AsyncVimStateReader:
+    def __init__(
+            self,
+            reader: VMwareVimStateReader,
+            max_workers: Optional[int] = 8,
+            coalesce: Optional[List[str]] = None,
+            logger: Optional[logging.Logger] = None,
+    ):
+        """
+        :param reader: VMwareVimStateReader all calls delegated to.
+        :param max_workers: max number of concurrent calls to vCenter.
+        :param coalesce: reader methods coalesced for internal calls, default DEFAULT_COALESCE
+        :param logger: optional logger
+        """
+        self.reader = reader
+        self.logger = logger if logger else logging.getLogger(__name__)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="vim-reader")
+        self._single_flight = SingleFlight()
+        self._lock = threading.Lock()
+        self._futures: Dict[Hashable, Future] = {}
+        self._view = self._coalesced_view(
+            reader, coalesce if coalesce is not None else DEFAULT_COALESCE)
+
+    def _coalesced_view(
+            self,
+            reader: VMwareVimStateReader,
+            coalesce: List[str]
+    ) -> VMwareVimStateReader:
+        """Return view of reader, instance of reader subclass where coalesced
+        methods wrapped with single-flight.  View shares reader instance dict,
+        hence state and caches are the same, reader class and instance untouched.
+
+        :param reader: VMwareVimStateReader
+        :param coalesce: list of reader method names
+        :return: reader view
+        """
+        reader_cls = type(reader)
+        wrappers = {
+            method: self._wrap(method, getattr(reader_cls, method))
+            for method in coalesce if callable(getattr(reader_cls, method, None))
+        }
+        view_cls = type(f"Coalesced{reader_cls.__name__}", (reader_cls,), wrappers)
+        view = object.__new__(view_cls)
+        view.__dict__ = reader.__dict__
+        return view
+
+    def _wrap(
+            self,
+            method: str,
+            fn: Callable
+    ) -> Callable:
+        """Return single-flight wrapper for unbound reader method."""
+
+        @functools.wraps(fn)
+        def coalesced(reader, *args, **kwargs):
+            key = _call_key(method, args, kwargs)
+            if key is None:
+                return fn(reader, *args, **kwargs)
+            return self._single_flight.do(key, fn, reader, *args, **kwargs)
+
+        return coalesced
+
+    def submit(
+            self,
+            method: str,
+            *args,
+            **kwargs
+    ) -> Future:
+        """Submit reader method call to executor.  If identical call
+        already in flight, return future of in-flight call.
+
+        :param method: reader method name, i.e. read_esxi_host
+        :return: Future
+        """
+        fn = getattr(self._view, method)
+        key = _call_key(method, args, kwargs)
+        if key is None:
+            return self._executor.submit(fn, *args, **kwargs)
+
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None:
+                return future
+            future = self._executor.submit(fn, *args, **kwargs)
+            self._futures[key] = future
+
+        future.add_done_callback(lambda _: self._done(key))
+        return future
+
+    def _done(
+            self,
+            key: Hashable
+    ):
+        """Remove completed call from in-flight calls."""
+        with self._lock:
+            self._futures.pop(key, None)
+
+    def map(
+            self,
+            method: str,
+            args_list: List[Any]
+    ) -> List[Future]:
+        """Submit method for each argument.
+        :param method: reader method name
+        :param args_list: list of arguments, each argument is single value or tuple
+        :return: list of futures in the same order as args_list
+        """
+        return [
+            self.submit(method, *(args if isinstance(args, tuple) else (args,)))
+            for args in args_list
+        ]
+
+    async def call(
+            self,
+            method: str,
+            *args,
+            **kwargs
+    ) -> Any:
+        """Awaitable version of submit for asyncio callers.
+        :param method: reader method name
+        :return: result of reader method
+        """
+        return await asyncio.wrap_future(self.submit(method, *args, **kwargs))
+
+    def shutdown(
+            self,
+            wait: Optional[bool] = True
+    ):
+        """Shutdown executor.
+        :param wait: wait for pending calls.
+        :return:
+        """
+        self._executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
@@ -0,0 +1,266 @@
+"""
+EsxiHostHardware, is a per host hardware model built from a single
+vim.HostSystem read.  It holds NUMA topology, PCI devices indexed by
+device id and by PCI class and physical NIC information.
+
+Every VM that runs on the same ESXi host shares the same hardware,
+hence VMwareVimStateReader builds this model once per host and
+re-uses it for all VMs. Note that each attribute access on pyVmomi
+managed object (host_system.hardware, host_system.config) is a
+round trip to vCenter, so model reads each property only once.
+
+Author: Mus
+ spyroot@gmail.com
+ mbayramo@stanford.edu
+"""
+from typing import Dict, List, Optional, Tuple, Any, Union
+from enum import Enum
+
+from pyVmomi import vim
+
+# vim.host.PciDevice fields we persist in inventory snapshot
+_PCI_DEVICE_FIELDS = [
+    'id', 'classId', 'bus', 'slot', 'function', 'vendorId', 'subVendorId',
+    'vendorName', 'deviceId', 'subDeviceId', 'parentBridge', 'deviceName'
+]
+
+
+class EsxiHostHardware:
+    """
+    Hardware model of a single ESXi host.
+
+    numa_topology is in the same format vm_state produce.
+    {
+        'cpu': {
+            <numa_node_id>: [<cpu_id_1>, <cpu_id_2>, ...],
+        },
+        'pci': {
+            <numa_node_id>: [<pci_device_id_1>, <pci_device_id_2>, ...],
+        }
+    }
+
+    pnics is in the same format read_esxi_host_pnic return.
+    """
+
+    def __init__(
+            self,
+            moid: str,
+            num_numa_nodes: Optional[int],
+            numa_topology: Dict[str, Any],
+            pci_devices: Dict[str, Any],
+            pnics: Dict[str, Dict[str, Any]],
+            sriov_devices: Optional[Dict[str, int]] = None,
+    ):
+        """
+        :param moid: esxi host managed object id. i.e. host-12
+        :param num_numa_nodes: number of numa nodes or None if host doesn't report it.
+        :param numa_topology: a dict with numa node to cpu and pci device mapping.
+        :param pci_devices: a dict where key is PCI device id and value vim.host.PciDevice
+        :param pnics: a dict where key is pnic name (vmnic0) and value pnic data.
+        :param sriov_devices: a dict where key is PCI device id of SR-IOV enabled PF
+                              and value number of VFs.
+        """
+        self.moid = moid
+        self.num_numa_nodes = num_numa_nodes
+        self.numa_topology = numa_topology
+        self.pci_devices = pci_devices
+        self.pnics = pnics
+        self.sriov_devices = sriov_devices if sriov_devices is not None else {}
+
+        # pci device class (upper byte of classId) -> pci device id -> device
+        self.pci_by_class: Dict[int, Dict[str, Any]] = {}
+        for pci_id, pci_device in pci_devices.items():
+            class_id = pci_device.classId >> 8
+            if class_id not in self.pci_by_class:
+                self.pci_by_class[class_id] = {}
+            self.pci_by_class[class_id][pci_id] = pci_device
+
+        # pci device id -> pnic name
+        self.pnic_by_pci: Dict[str, str] = {
+            pnic_data['pci']: pnic_name for pnic_name, pnic_data in pnics.items()
+            if pnic_data.get('pci') is not None
+        }
+
+        # pci device id -> numa node
+        self.pci_numa_node: Dict[str, int] = {}
+        if numa_topology.get('pci'):
+            for node_id, devices in numa_topology['pci'].items():
+                for pci_id in devices:
+                    self.pci_numa_node[pci_id] = node_id
+
+    @staticmethod
+    def read_numa_topology(
+            numa_info
+    ) -> Dict[str, Any]:
+        """Converts vim.host.NumaInfo to numa topology dict.
+        :param numa_info: vim.host.NumaInfo or None
+        :return: numa topology dict
+        """
+        if not numa_info or not numa_info.numaNode:
+            return {'cpu': None, 'pci': None}
+
+        return {
+            'cpu': {numa_node.typeId: [str(cpu).replace('(short)', '').strip()
+                                       for cpu in numa_node.cpuID] for numa_node in numa_info.numaNode},
+            'pci': {numa_node.typeId: [pci.replace('\n', '').strip()
+                                       for pci in numa_node.pciId] for numa_node in numa_info.numaNode}
+        }
+
+    @staticmethod
+    def read_pnics(
+            network_info
+    ) -> Dict[str, Dict[str, Any]]:
+        """Converts host network info to pnic dict.
+        :param network_info: vim.host.NetworkInfo or None
+        :return: a dict where key is pnic name
+        """
+        pnics = {}
+        if network_info is None or not network_info.pnic:
+            return pnics
+
+        for pnic in network_info.pnic:
+            pnics[pnic.device] = {
+                "pci": pnic.pci,
+                'mac': pnic.mac,
+                "driver": pnic.driver,
+                "driver_version": pnic.driverVersion,
+                "driver_firmware": pnic.firmwareVersion,
+                "speed": pnic.linkSpeed.speedMb if pnic.linkSpeed else None,
+                "is_connected": True if pnic.linkSpeed else False
+            }
+        return pnics
+
+    @staticmethod
+    def read_sriov_devices(
+            pci_passthru_info
+    ) -> Dict[str, int]:
+        """Return SR-IOV enabled PF devices from host pci passthru info.
+        :param pci_passthru_info: list of vim.host.PciPassthruInfo or None
+        :return: a dict where key is PF pci device id and value number of VFs
+        """
+        if not pci_passthru_info:
+            return {}
+        return {
+            info.id: info.numVirtualFunction for info in pci_passthru_info
+            if getattr(info, 'sriovEnabled', False)
+        }
+
+    @classmethod
+    def from_host_system(
+            cls,
+            host_system
+    ) -> 'EsxiHostHardware':
+        """Build hardware model from vim.HostSystem. Method reads
+        host_system.hardware and host_system.config exactly once.
+
+        :param host_system: vim.HostSystem
+        :return: EsxiHostHardware
+        """
+        hardware = host_system.hardware
+        config = host_system.config
+
+        numa_info = hardware.numaInfo if hardware else None
+        pci_devices = {
+            pci_device.id: pci_device for pci_device in hardware.pciDevice
+        } if hardware and hardware.pciDevice else {}
+
+        network_info = config.network if config else None
+        pci_passthru_info = config.pciPassthruInfo if config else None
+
+        return cls(
+            moid=host_system._moId,
+            num_numa_nodes=numa_info.numNodes if numa_info else None,
+            numa_topology=cls.read_numa_topology(numa_info),
+            pci_devices=pci_devices,
+            pnics=cls.read_pnics(network_info),
+            sriov_devices=cls.read_sriov_devices(pci_passthru_info),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize model to json friendly dict, see from_dict.
+        :return: a dict
+        """
+        return {
+            'moid': self.moid,
+            'num_numa_nodes': self.num_numa_nodes,
+            'numa_topology': self.numa_topology,
+            'pci_devices': {
+                pci_id: {f: getattr(pci_device, f, None) for f in _PCI_DEVICE_FIELDS}
+                for pci_id, pci_device in self.pci_devices.items()
+            },
+            'pnics': self.pnics,
+            'sriov_devices': self.sriov_devices,
+        }
+
+    @classmethod
+    def from_dict(
+            cls,
+            data: Dict[str, Any]
+    ) -> 'EsxiHostHardware':
+        """Restore model from dict produced by to_dict.  PCI devices
+        restored as vim.host.PciDevice data objects.
+
+        :param data: a dict
+        :return: EsxiHostHardware
+        """
+        # json converts numa node ids to str
+        numa_topology = {
+            k: {int(node_id): v for node_id, v in nodes.items()} if nodes else nodes
+            for k, nodes in data['numa_topology'].items()
+        }
+        pci_devices = {
+            pci_id: vim.host.PciDevice(**{k: v for k, v in fields.items() if v is not None})
+            for pci_id, fields in data['pci_devices'].items()
+        }
+        return cls(
+            moid=data['moid'],
+            num_numa_nodes=data['num_numa_nodes'],
+            numa_topology=numa_topology,
+            pci_devices=pci_devices,
+            pnics=data['pnics'],
+            sriov_devices=data.get('sriov_devices'),
+        )
+
+    def pci_devices_by_class(
+            self,
+            filter_class: Optional[Union[int, Enum]] = None
+    ) -> Dict[str, Any]:
+        """Return PCI devices of a particular PCI class.
+        :param filter_class: PCI class i.e. PciDeviceClass.NETWORK_CONTROLLER or raw int,
+                             if None return all PCI devices.
+        :return: a dict where key is pci device id
+        """
+        if filter_class is None:
+            return self.pci_devices
+        class_id = filter_class.value if isinstance(filter_class, Enum) else filter_class
+        return self.pci_by_class.get(class_id, {})
+
+    def find_pnic(
+            self,
+            pci_device_id: str
+    ) -> Union[
+        Tuple[None, None],
+        Tuple[str, Dict[str, Any]]
+    ]:
+        """Find pnic by pci device id.
+        :param pci_device_id: a pci device id
+        :return: a tuple pnic name and pnic data or None, None
+        """
+        pnic_name = self.pnic_by_pci.get(pci_device_id)
+        if pnic_name is None:
+            return None, None
+        return pnic_name, self.pnics[pnic_name]
+
+    def numa_node_of_pci(
+            self,
+            pci_device_id: str
+    ) -> Optional[int]:
+        """Return numa node of pci device.
+        :param pci_device_id: a pci device id
+        :return: numa node id or None
+        """
+        return self.pci_numa_node.get(pci_device_id)
+
+    def pnic_names(self) -> List[str]:
+        """Return list of all pnic names on a host."""
+        return list(self.pnics.keys())
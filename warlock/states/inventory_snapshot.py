@@ -0,0 +1,207 @@
+"""
+InventorySnapshot, is a versioned on-disk snapshot of vCenter inventory
+(VMs, ESXi hosts, DVS, portgroups, host PCI / NUMA hardware).
+
+Snapshot keyed by vCenter instance UUID, hence the same snapshot directory
+can hold snapshots for many vCenter servers.  VMwareVimStateReader loads
+a snapshot on start (warm start), populates caches from it and
+reconciles in background against live change versions:
+
+ - VM      config.changeVersion, runtime host
+ - DVS     config.configVersion
+ - Host    managed object id and hardware uuid
+
+Snapshot stores only managed object ids and plain data,  managed object
+references re-created locally from moid and bound to a current session,
+hence no round trip to vCenter required to use them.
+
+Author: Mus
+ spyroot@gmail.com
+ mbayramo@stanford.edu
+"""
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Dict, Any, Optional, List
+
+INVENTORY_SNAPSHOT_VERSION = 1
+
+
+class InventorySnapshotError(Exception):
+    """Raised if snapshot can't be serialized or has invalid format."""
+
+    def __init__(self, msg):
+        super().__init__(msg)
+
+
+class InventorySnapshot:
+    """
+    vms:      {vm_name: {'uuid', 'moid', 'change_version', 'host'}}
+    hosts:    {host_name: {'uuid', 'moid'}}
+    dvs:      {switch_uuid: {'moid', 'name', 'config_version', 'portgroups', 'pnics'}}
+    hardware: {host_moid: EsxiHostHardware.to_dict()}
+    """
+
+    def __init__(
+            self,
+            instance_uuid: str,
+            vcenter: Optional[str] = None,
+            vms: Optional[Dict[str, Dict[str, Any]]] = None,
+            hosts: Optional[Dict[str, Dict[str, Any]]] = None,
+            dvs: Optional[Dict[str, Dict[str, Any]]] = None,
+            hardware: Optional[Dict[str, Dict[str, Any]]] = None,
+            timestamp: Optional[float] = None,
+    ):
+        """
+        :param instance_uuid: vCenter instance uuid, content.about.instanceUuid
+        :param vcenter: vCenter address snapshot taken from.
+        :param vms: a dict where key is vm name
+        :param hosts: a dict where key is esxi host name
+        :param dvs: a dict where key is switch uuid
+        :param hardware: a dict where key is esxi host moid
+        :param timestamp: time snapshot taken
+        """
+        self.instance_uuid = instance_uuid
+        self.vcenter = vcenter
+        self.vms = vms if vms is not None else {}
+        self.hosts = hosts if hosts is not None else {}
+        self.dvs = dvs if dvs is not None else {}
+        self.hardware = hardware if hardware is not None else {}
+        self.timestamp = timestamp if timestamp is not None else time.time()
+
+    @staticmethod
+    def snapshot_path(
+            snapshot_dir: str,
+            instance_uuid: str
+    ) -> str:
+        """Return snapshot file path for a vCenter instance.
+        :param snapshot_dir: snapshot directory
+        :param instance_uuid: vCenter instance uuid
+        :return: path to snapshot file
+        """
+        return os.path.join(snapshot_dir, f"{instance_uuid}.json")
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return snapshot as json friendly dict.
+        :return:
+        """
+        return {
+            'version': INVENTORY_SNAPSHOT_VERSION,
+            'instance_uuid': self.instance_uuid,
+            'vcenter': self.vcenter,
+            'timestamp': self.timestamp,
+            'vms': self.vms,
+            'hosts': self.hosts,
+            'dvs': self.dvs,
+            'hardware': self.hardware,
+        }
+
+    @classmethod
+    def from_dict(
+            cls,
+            data: Dict[str, Any]
+    ) -> 'InventorySnapshot':
+        """Create snapshot from dict.
+        :param data: a dict produced by to_dict
+        :return: InventorySnapshot
+        :raise InventorySnapshotError: if version mismatch or mandatory key missing.
+        """
+        if data.get('version') != INVENTORY_SNAPSHOT_VERSION:
+            raise InventorySnapshotError(
+                f"snapshot version {data.get('version')} "
+                f"expected {INVENTORY_SNAPSHOT_VERSION}")
+        if 'instance_uuid' not in data:
+            raise InventorySnapshotError("snapshot has no instance_uuid")
+
+        return cls(
+            instance_uuid=data['instance_uuid'],
+            vcenter=data.get('vcenter'),
+            vms=data.get('vms'),
+            hosts=data.get('hosts'),
+            dvs=data.get('dvs'),
+            hardware=data.get('hardware'),
+            timestamp=data.get('timestamp'),
+        )
+
+    def save(
+            self,
+            snapshot_dir: str
+    ) -> str:
+        """Save snapshot to snapshot dir.  Snapshot written to
+        temp file and atomically moved, so concurrent readers never
+        observe partial file.
+
+        :param snapshot_dir: snapshot directory, created if not exists
+        :return: path to snapshot file
+        """
+        os.makedirs(snapshot_dir, exist_ok=True)
+        path = self.snapshot_path(snapshot_dir, self.instance_uuid)
+        fd, tmp_path = tempfile.mkstemp(dir=snapshot_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.to_dict(), f)
+            os.replace(tmp_path, path)
+        except TypeError as e:
+            raise InventorySnapshotError(f"failed serialize snapshot: {e}") from e
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return path
+
+    @classmethod
+    def load(
+            cls,
+            snapshot_dir: str,
+            instance_uuid: str,
+            logger: Optional[logging.Logger] = None,
+    ) -> Optional['InventorySnapshot']:
+        """Load snapshot for vCenter instance.  Missing, corrupted snapshot
+        or snapshot from other version are ignored.
+
+        :param snapshot_dir: snapshot directory
+        :param instance_uuid: vCenter instance uuid
+        :param logger: optional logger
+        :return: InventorySnapshot or None
+        """
+        logger = logger if logger else logging.getLogger(__name__)
+        path = cls.snapshot_path(snapshot_dir, instance_uuid)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r") as f:
+                return cls.from_dict(json.load(f))
+        except (json.JSONDecodeError, InventorySnapshotError, OSError) as e:
+            logger.warning(f"Ignoring inventory snapshot {path}: {e}")
+            return None
+
+    def stale_entries(
+            self,
+            live: 'InventorySnapshot'
+    ) -> Dict[str, List[str]]:
+        """Compare snapshot with live inventory and return entries
+        that changed or removed.
+
+        :param live: snapshot collected from vCenter.
+        :return: a dict with 'vms', 'hosts' and 'dvs' keys and list of names / switch uuids
+        """
+        stale_vms = [
+            vm_name for vm_name, vm in self.vms.items()
+            if live.vms.get(vm_name) != vm
+        ]
+        stale_hosts = [
+            host_name for host_name, host in self.hosts.items()
+            if live.hosts.get(host_name) != host
+        ]
+        stale_dvs = [
+            switch_uuid for switch_uuid, switch in self.dvs.items()
+            if switch_uuid not in live.dvs
+            or live.dvs[switch_uuid]['config_version'] != switch['config_version']
+            or live.dvs[switch_uuid]['moid'] != switch['moid']
+        ]
+        return {
+            'vms': stale_vms,
+            'hosts': stale_hosts,
+            'dvs': stale_dvs,
+        }
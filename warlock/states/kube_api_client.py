@@ -0,0 +1,396 @@
+"""
+KubeApiClient, is a minimal Kubernetes API client that talks to the API
+server directly over pooled HTTPS connection.
+
+Client reads the same kubeconfig kubectl reads, KUBECONFIG or ~/.kube/config,
+and supports client certificate, bearer token and basic auth.  Exec and auth
+provider plugins are not supported,  KubernetesState falls back to kubectl
+for such kubeconfig.
+
+Each call is a single request on a keep-alive connection,  there is no
+process startup and no text parsing per call as with kubectl.
+
+Author: Mus
+ spyroot@gmail.com
+ mbayramo@stanford.edu
+"""
+import base64
+import copy
+import json
+import os
+import shutil
+import tempfile
+from typing import Dict, Optional, Any, List, Iterator
+
+import requests
+import yaml
+from requests.adapters import HTTPAdapter
+
+# kubectl config view replaces secrets with these values
+_DATA_OMITTED = "DATA+OMITTED"
+_REDACTED = "REDACTED"
+
+
+class KubeConfigError(Exception):
+    """Raised if kubeconfig can't be used by api client."""
+
+    def __init__(self, msg):
+        super().__init__(msg)
+
+
+class KubeApiError(Exception):
+    """Raised if API server returns an error."""
+
+    def __init__(self, status_code: int, path: str, msg: str):
+        self.status_code = status_code
+        self.path = path
+        super().__init__(f"API request '{path}' failed with status {status_code}: {msg}")
+
+
+def kubeconfig_path(
+        path: Optional[str] = None
+) -> str:
+    """Return kubeconfig path, explicit path, first entry of KUBECONFIG
+    or ~/.kube/config.
+
+    :param path: optional explicit path
+    :return: path to kubeconfig
+    """
+    if path:
+        return path
+    env_path = os.environ.get('KUBECONFIG')
+    if env_path:
+        return env_path.split(os.pathsep)[0]
+    return os.path.join(os.path.expanduser("~"), ".kube", "config")
+
+
+def load_kubeconfig(
+        path: Optional[str] = None
+) -> Dict[str, Any]:
+    """Load kubeconfig yaml.
+    :param path: optional path to kubeconfig
+    :return: kubeconfig dict
+    :raise KubeConfigError: if kubeconfig missing or invalid.
+    """
+    path = kubeconfig_path(path)
+    if not os.path.isfile(path):
+        raise KubeConfigError(f"Kubeconfig file not found at '{path}'")
+    try:
+        with open(path, "r") as f:
+            config = yaml.safe_load(f)
+    except yaml.YAMLError as e:
+        raise KubeConfigError(f"Failed parse kubeconfig '{path}': {e}") from e
+    if not isinstance(config, dict):
+        raise KubeConfigError(f"Kubeconfig '{path}' is empty.")
+    return config
+
+
+def _named(
+        items: Optional[List[Dict]],
+        name: str,
+        key: str
+) -> Dict[str, Any]:
+    """Return named entry of kubeconfig list, clusters, users or contexts."""
+    for item in items or []:
+        if item.get('name') == name:
+            return item.get(key) or {}
+    raise KubeConfigError(f"Kubeconfig has no {key} '{name}'")
+
+
+class KubeApiClient:
+    def __init__(
+            self,
+            path_to_kubeconfig: Optional[str] = None,
+            context: Optional[str] = None,
+            timeout: Optional[float] = 30,
+            pool_maxsize: Optional[int] = 16,
+    ):
+        """
+        :param path_to_kubeconfig: optional path to kubeconfig, default KUBECONFIG or ~/.kube/config
+        :param context: optional context name, default current-context
+        :param timeout: request timeout in seconds
+        :param pool_maxsize: max number of pooled connections to API server
+        :raise KubeConfigError: if kubeconfig can't be used.
+        """
+        self.kubeconfig = load_kubeconfig(path_to_kubeconfig)
+        self.context = context if context else self.kubeconfig.get('current-context')
+        if not self.context:
+            raise KubeConfigError("Kubeconfig has no current-context")
+
+        context_spec = _named(self.kubeconfig.get('contexts'), self.context, 'context')
+        cluster = _named(self.kubeconfig.get('clusters'), context_spec.get('cluster'), 'cluster')
+        user = _named(self.kubeconfig.get('users'), context_spec.get('user'), 'user') \
+            if context_spec.get('user') else {}
+
+        if 'exec' in user or 'auth-provider' in user:
+            raise KubeConfigError("Kubeconfig exec and auth-provider plugins are not supported")
+        if not cluster.get('server'):
+            raise KubeConfigError("Kubeconfig cluster has no server")
+
+        self.server = cluster['server'].rstrip('/')
+        self.namespace = context_spec.get('namespace', 'default')
+        self.timeout = timeout
+        self._tmp_dir = None
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({'Accept': 'application/json'})
+
+        try:
+            self._configure_tls(cluster, user)
+            self._configure_auth(user)
+        except Exception:
+            self.close()
+            raise
+
+    def _data_file(
+            self,
+            data: str,
+            name: str
+    ) -> str:
+        """Write base64 kubeconfig data to file,  requests takes
+        certificates only as files.
+
+        :param data: base64 data
+        :param name: file name
+        :return: path to file
+        """
+        if self._tmp_dir is None:
+            self._tmp_dir = tempfile.mkdtemp(prefix="warlock-kube-")
+        path = os.path.join(self._tmp_dir, name)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(base64.b64decode(data))
+        return path
+
+    def _configure_tls(
+            self,
+            cluster: Dict[str, Any],
+            user: Dict[str, Any]
+    ):
+        """Configure server verification and client certificate."""
+        if cluster.get('insecure-skip-tls-verify'):
+            self.session.verify = False
+        elif cluster.get('certificate-authority-data'):
+            self.session.verify = self._data_file(cluster['certificate-authority-data'], "ca.crt")
+        elif cluster.get('certificate-authority'):
+            self.session.verify = cluster['certificate-authority']
+
+        cert = user.get('client-certificate')
+        if user.get('client-certificate-data'):
+            cert = self._data_file(user['client-certificate-data'], "client.crt")
+        key = user.get('client-key')
+        if user.get('client-key-data'):
+            key = self._data_file(user['client-key-data'], "client.key")
+        if cert and key:
+            self.session.cert = (cert, key)
+        elif cert:
+            self.session.cert = cert
+
+    def _configure_auth(
+            self,
+            user: Dict[str, Any]
+    ):
+        """Configure bearer token or basic auth."""
+        token = user.get('token')
+        if not token and user.get('tokenFile'):
+            with open(user['tokenFile'], "r") as f:
+                token = f.read().strip()
+        if token:
+            self.session.headers['Authorization'] = f"Bearer {token}"
+        elif user.get('username'):
+            self.session.auth = (user['username'], user.get('password', ''))
+
+    def close(self):
+        """Close pooled connections and remove certificate files."""
+        self.session.close()
+        if self._tmp_dir is not None:
+            shutil.rmtree(self._tmp_dir, ignore_errors=True)
+            self._tmp_dir = None
+
+    def __enter__(self) -> 'KubeApiClient':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def get(
+            self,
+            path: str,
+            params: Optional[Dict[str, Any]] = None,
+            expect_not_found: Optional[bool] = False,
+    ) -> Dict[str, Any]:
+        """GET API path and return json.
+
+        :param path: API path, i.e. /api/v1/nodes
+        :param params: optional query parameters
+        :param expect_not_found: return empty dict if object not found.
+        :return: a dict
+        :raise KubeApiError: if API server returns error
+        """
+        response = self.session.get(f"{self.server}{path}", params=params, timeout=self.timeout)
+        if response.status_code == 404 and expect_not_found:
+            return {}
+        if response.status_code >= 400:
+            raise KubeApiError(response.status_code, path, response.text.strip())
+        return response.json()
+
+    def watch(
+            self,
+            path: str,
+            resource_version: Optional[str] = None,
+            timeout_seconds: Optional[int] = 300,
+            params: Optional[Dict[str, Any]] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Watch API collection and yield watch events
+        {'type': ADDED | MODIFIED | DELETED | BOOKMARK | ERROR, 'object': {...}}.
+        Server closes stream after timeout_seconds.
+
+        :param path: collection path, i.e. /api/v1/pods
+        :param resource_version: resource version watch starts from
+        :param timeout_seconds: server side watch timeout
+        :param params: optional query parameters, i.e. labelSelector
+        :return: iterator of events
+        :raise KubeApiError: if API server returns error
+        """
+        query = dict(params) if params else {}
+        query.update({'watch': 1, 'allowWatchBookmarks': 'true', 'timeoutSeconds': timeout_seconds})
+        if resource_version:
+            query['resourceVersion'] = resource_version
+
+        response = self.session.get(
+            f"{self.server}{path}", params=query, stream=True,
+            timeout=(self.timeout, timeout_seconds + self.timeout))
+        try:
+            if response.status_code >= 400:
+                raise KubeApiError(response.status_code, path, response.text.strip())
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)
+        finally:
+            response.close()
+
+    @staticmethod
+    def _ns_path(
+            namespace: Optional[str],
+            resource: str,
+            prefix: Optional[str] = "/api/v1"
+    ) -> str:
+        """Return collection path of namespaced resource, all namespaces if namespace is None."""
+        if namespace is None:
+            return f"{prefix}/{resource}"
+        return f"{prefix}/namespaces/{namespace}/{resource}"
+
+    def server_version(self) -> Dict[str, Any]:
+        """Return API server version."""
+        return self.get("/version")
+
+    def list_collection(
+            self,
+            path: str,
+            label_selector: Optional[str] = None,
+            field_selector: Optional[str] = None,
+            limit: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """List API collection with server side selectors.  If limit is set,
+        collection read in pages of limit items following continue token,
+        and all pages merged in a single list.
+
+        :param path: collection path, i.e. /api/v1/nodes
+        :param label_selector: optional label selector, i.e. app=iperf,!node-role.kubernetes.io/master
+        :param field_selector: optional field selector, i.e. spec.nodeName=worker-1
+        :param limit: optional page size
+        :return: a list object, items of all pages
+        :raise KubeApiError: if API server returns error,  410 if continue token expired.
+        """
+        params = {}
+        if label_selector:
+            params['labelSelector'] = label_selector
+        if field_selector:
+            params['fieldSelector'] = field_selector
+        if limit:
+            params['limit'] = limit
+
+        items = []
+        while True:
+            result = self.get(path, params=dict(params) if params else None)
+            items.extend(result.get('items', []))
+            token = result.get('metadata', {}).get('continue')
+            if not limit or not token:
+                break
+            params['continue'] = token
+
+        result['items'] = items
+        result.get('metadata', {}).pop('continue', None)
+        return result
+
+    def list_nodes(
+            self,
+            label_selector: Optional[str] = None,
+            field_selector: Optional[str] = None,
+            limit: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Return NodeList, see list_collection for selectors and limit."""
+        return self.list_collection("/api/v1/nodes", label_selector, field_selector, limit)
+
+    def read_node(
+            self,
+            node_name: str
+    ) -> Dict[str, Any]:
+        """Return node, empty dict if node not found."""
+        return self.get(f"/api/v1/nodes/{node_name}", expect_not_found=True)
+
+    def list_pods(
+            self,
+            namespace: Optional[str] = "default",
+            label_selector: Optional[str] = None,
+            field_selector: Optional[str] = None,
+            limit: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Return PodList, all namespaces if namespace is None,
+        see list_collection for selectors and limit.
+        """
+        return self.list_collection(self._ns_path(namespace, "pods"), label_selector, field_selector, limit)
+
+    def read_pod(
+            self,
+            pod_name: str,
+            namespace: Optional[str] = "default"
+    ) -> Dict[str, Any]:
+        """Return pod.
+        :raise KubeApiError: if pod not found
+        """
+        return self.get(f"/api/v1/namespaces/{namespace}/pods/{pod_name}")
+
+    def list_namespaces(self) -> Dict[str, Any]:
+        """Return NamespaceList."""
+        return self.get("/api/v1/namespaces")
+
+    def list_network_attachment_definitions(
+            self,
+            namespace: Optional[str] = "default"
+    ) -> Dict[str, Any]:
+        """Return multus NetworkAttachmentDefinition list."""
+        return self.get(self._ns_path(namespace, "network-attachment-definitions", "/apis/k8s.cni.cncf.io/v1"))
+
+    def config_view(self) -> Dict[str, Any]:
+        """Return kubeconfig in the form of kubectl config view -o json,
+        certificate data and secrets redacted.
+        """
+        config = copy.deepcopy(self.kubeconfig)
+        for cluster in config.get('clusters') or []:
+            spec = cluster.get('cluster') or {}
+            if 'certificate-authority-data' in spec:
+                spec['certificate-authority-data'] = _DATA_OMITTED
+        for user in config.get('users') or []:
+            spec = user.get('user') or {}
+            for key in ('client-certificate-data', 'client-key-data'):
+                if key in spec:
+                    spec[key] = _DATA_OMITTED
+            for key in ('token', 'password'):
+                if key in spec:
+                    spec[key] = _REDACTED
+        return config
@@ -0,0 +1,277 @@
+"""
+KubeInformer, is an informer style local cache of Kubernetes objects
+fed by list and watch.
+
+Informer lists a collection once, remembers list resourceVersion and
+watches collection from that version in a background thread.  Each watch
+event updates cache and wakes up waiters,  hence a waiter observes
+a pod becoming ready as soon as API server reports it, and API server
+serves a single watch stream instead of repeated full reads.
+
+If resourceVersion expired (410 Gone) informer re-lists.  If watch stream
+breaks, informer re-watches from the last seen resourceVersion.
+
+Example:
+
+    with KubeInformer(api, "pods", namespace="default") as pods:
+        ready = pods.wait_for_pods_ready(["server", "client"], timeout=120)
+
+Author: Mus
+ spyroot@gmail.com
+ mbayramo@stanford.edu
+"""
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Any, Callable, Tuple
+
+import requests
+
+from warlock.states.kube_api_client import KubeApiClient, KubeApiError
+
+# informer resource and api prefix
+INFORMER_RESOURCES = {
+    'pods': ("/api/v1", True),
+    'nodes': ("/api/v1", False),
+    'network-attachment-definitions': ("/apis/k8s.cni.cncf.io/v1", True),
+}
+
+ObjectKey = Tuple[str, str]
+
+
+def object_key(
+        obj: Dict[str, Any]
+) -> ObjectKey:
+    """Return cache key (namespace, name) of a Kubernetes object, namespace
+    is empty string for cluster scoped objects.
+    """
+    metadata = obj.get('metadata', {})
+    return metadata.get('namespace', ''), metadata.get('name', '')
+
+
+def is_pod_ready(
+        pod: Dict[str, Any]
+) -> bool:
+    """Return True if pod is Running, has an IP and Ready condition is not False.
+    :param pod: pod object
+    :return:
+    """
+    status = pod.get('status', {})
+    if status.get('phase') != 'Running' or not status.get('podIPs'):
+        return False
+    for condition in status.get('conditions', []):
+        if condition.get('type') == 'Ready':
+            return condition.get('status') == 'True'
+    return True
+
+
+class KubeInformer:
+    def __init__(
+            self,
+            api: KubeApiClient,
+            resource: str,
+            namespace: Optional[str] = None,
+            watch_timeout: Optional[int] = 300,
+            logger: Optional[logging.Logger] = None,
+    ):
+        """
+        :param api: KubeApiClient
+        :param resource: pods, nodes or network-attachment-definitions
+        :param namespace: optional namespace, all namespaces if None
+        :param watch_timeout: server side watch timeout, watch re-established after it.
+        :param logger: optional logger
+        """
+        if resource not in INFORMER_RESOURCES:
+            raise ValueError(f"resource must be one of {list(INFORMER_RESOURCES)}, got {resource}")
+
+        prefix, namespaced = INFORMER_RESOURCES[resource]
+        if namespaced and namespace is not None:
+            self.path = f"{prefix}/namespaces/{namespace}/{resource}"
+        else:
+            self.path = f"{prefix}/{resource}"
+
+        self.api = api
+        self.resource = resource
+        self.namespace = namespace if namespaced else None
+        self.watch_timeout = watch_timeout
+        self.logger = logger if logger else logging.getLogger(__name__)
+
+        self._cache: Dict[ObjectKey, Dict[str, Any]] = {}
+        self._resource_version: Optional[str] = None
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._synced = False
+
+    @property
+    def resource_version(self) -> Optional[str]:
+        """Return last resourceVersion observed."""
+        return self._resource_version
+
+    @property
+    def synced(self) -> bool:
+        """Return True once initial list loaded."""
+        return self._synced
+
+    def _list(self):
+        """List collection and replace cache."""
+        result = self.api.get(self.path)
+        with self._cond:
+            self._cache = {object_key(obj): obj for obj in result.get('items', [])}
+            self._resource_version = result.get('metadata', {}).get('resourceVersion')
+            self._synced = True
+            self._cond.notify_all()
+
+    def apply_event(
+            self,
+            event: Dict[str, Any]
+    ) -> bool:
+        """Apply watch event to cache.
+
+        :param event: watch event
+        :return: False if watch must re-list, i.e. resourceVersion expired.
+        """
+        event_type = event.get('type')
+        obj = event.get('object', {})
+        if event_type == 'ERROR':
+            # 410 Gone, resource version too old
+            if obj.get('code') == 410:
+                return False
+            raise KubeApiError(obj.get('code', 500), self.path, obj.get('message', ''))
+
+        with self._cond:
+            resource_version = obj.get('metadata', {}).get('resourceVersion')
+            if resource_version:
+                self._resource_version = resource_version
+            if event_type in ('ADDED', 'MODIFIED'):
+                self._cache[object_key(obj)] = obj
+            elif event_type == 'DELETED':
+                self._cache.pop(object_key(obj), None)
+            self._cond.notify_all()
+        return True
+
+    def _run(self):
+        """List and watch until stopped."""
+        backoff = 1.0
+        relist = not self._synced
+        while not self._stop.is_set():
+            try:
+                if relist:
+                    self._list()
+                    relist = False
+                for event in self.api.watch(self.path, self._resource_version, self.watch_timeout):
+                    if self._stop.is_set():
+                        return
+                    if not self.apply_event(event):
+                        relist = True
+                        break
+                backoff = 1.0
+            except KubeApiError as e:
+                relist = e.status_code == 410
+                if not relist:
+                    self.logger.warning(f"{self.resource} informer watch failed: {e}")
+                    self._stop.wait(backoff)
+                    backoff = min(backoff * 2, 30.0)
+            except (requests.RequestException, ValueError) as e:
+                self.logger.warning(f"{self.resource} informer watch interrupted: {e}")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+    def start(self) -> 'KubeInformer':
+        """List collection and start watch thread,  cache is populated
+        when method returns.
+        """
+        if self._thread is not None:
+            return self
+        self._stop.clear()
+        self._list()
+        self._thread = threading.Thread(target=self._run, name=f"informer-{self.resource}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop watch thread.  Open watch stream ends by watch timeout
+        or next event, thread is daemon hence doesn't block exit.
+        """
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        self._thread = None
+
+    def __enter__(self) -> 'KubeInformer':
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+        return False
+
+    def get(
+            self,
+            name: str,
+            namespace: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Return cached object or None.
+        :param name: object name
+        :param namespace: object namespace, default informer namespace
+        :return:
+        """
+        namespace = namespace if namespace is not None else (self.namespace or '')
+        with self._cond:
+            return self._cache.get((namespace, name))
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Return all cached objects."""
+        with self._cond:
+            return list(self._cache.values())
+
+    def wait_for(
+            self,
+            predicate: Callable[[Dict[ObjectKey, Dict[str, Any]]], bool],
+            timeout: Optional[float] = None
+    ) -> bool:
+        """Block until predicate over cache is True.  Predicate evaluated
+        on every cache change.
+
+        :param predicate: callable that takes cache dict
+        :param timeout: timeout in seconds, None wait forever
+        :return: True if predicate satisfied, False on timeout or stop.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not predicate(self._cache):
+                if self._stop.is_set():
+                    return False
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def wait_for_pods_ready(
+            self,
+            names: List[str],
+            timeout: Optional[float] = None,
+            namespace: Optional[str] = None,
+    ) -> Dict[str, Dict[str, Any]]:
+        """Block until all pods ready or timeout.
+
+        :param names: pod names
+        :param timeout: timeout in seconds
+        :param namespace: pods namespace, default informer namespace
+        :return: a dict pod name to pod object for pods that are ready
+        """
+        if self.resource != 'pods':
+            raise ValueError("wait_for_pods_ready requires pods informer")
+
+        namespace = namespace if namespace is not None else (self.namespace or 'default')
+        keys = [(namespace, name) for name in names]
+
+        def all_ready(cache):
+            return all(k in cache and is_pod_ready(cache[k]) for k in keys)
+
+        self.wait_for(all_ready, timeout)
+        with self._cond:
+            return {
+                name: self._cache[k] for name, k in zip(names, keys)
+                if k in self._cache and is_pod_ready(self._cache[k])
+            }
@@ -0,0 +1,476 @@
+"""
+NetworkInventory, is a cached inventory of Multus networks and SR-IOV
+resources of a cluster.
+
+Inventory holds
+
+    NetworkAttachmentDefinitions of all namespaces with parsed CNI config,
+    SR-IOV device plugin resources allocatable on each node,
+    VFs consumed by each pod, read from Multus network-status annotation.
+
+Refresh is incremental.  Each object cached with its resourceVersion,
+only added or changed objects are parsed again and deleted objects
+dropped,  hence a refresh of an unchanged cluster doesn't parse anything.
+If KubernetesState runs pods informer, or inventory started its own
+NetworkAttachmentDefinition informer, objects read from the informer
+cache and refresh doesn't call API server at all.  Without a pods informer
+refresh lists all pods,  hence pods and nodes refreshed only on request.
+
+Example:
+
+    inventory = NetworkInventory(kube_state)
+    inventory.refresh(pods=True, nodes=True)
+    nodes = inventory.nodes_with_resource("intel.com/sriov_netdevice", count=2)
+    pod = inventory.pod_of_vf("worker-1", "0000:3b:02.1")
+
+Author: Mus
+ spyroot@gmail.com
+ mbayramo@stanford.edu
+"""
+import json
+import logging
+from collections import namedtuple
+from typing import Dict, List, Optional, Any, Tuple
+
+from warlock.states.kube_api_client import KubeApiError
+from warlock.states.kube_informer import KubeInformer, object_key, ObjectKey
+from warlock.states.kube_records import _Record
+
+NETWORKS_ANNOTATION = "k8s.v1.cni.cncf.io/networks"
+NETWORK_STATUS_ANNOTATION = "k8s.v1.cni.cncf.io/network-status"
+RESOURCE_NAME_ANNOTATION = "k8s.v1.cni.cncf.io/resourceName"
+NAD_RESOURCE = "network-attachment-definitions"
+
+# VF consumed by pod,  pci_address None if CNI didn't report device info
+VfAllocation = namedtuple(
+    'VfAllocation', [
+        'pod',
+        'namespace',
+        'node',
+        'network',
+        'interface',
+        'resource_name',
+        'pci_address',
+        'mac',
+    ]
+)
+
+
+def parse_cni_config(
+        config: Any
+) -> Dict[str, Any]:
+    """Parse CNI config of NetworkAttachmentDefinition, config
+    is a JSON string of a single plugin or a plugin list.
+
+    :param config: spec.config string or dict
+    :return: config dict, empty dict if config is empty or invalid.
+    """
+    if not config:
+        return {}
+    if isinstance(config, dict):
+        return config
+    try:
+        parsed = json.loads(config)
+    except ValueError:
+        return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+
+def parse_network_selection(
+        value: Optional[str],
+        namespace: Optional[str] = "default"
+) -> List[Tuple[str, str, Optional[str]]]:
+    """Parse Multus networks annotation of a pod,  annotation is either
+    JSON list of selection elements or comma separated ns/name@interface.
+
+    :param value: annotation value
+    :param namespace: pod namespace, default namespace of network
+    :return: list of (namespace, network name, interface)
+    """
+    if not value or not value.strip():
+        return []
+    value = value.strip()
+    if value.startswith('['):
+        try:
+            elements = json.loads(value)
+        except ValueError:
+            return []
+        return [
+            (e.get('namespace', namespace), e.get('name'), e.get('interface'))
+            for e in elements if isinstance(e, dict) and e.get('name')
+        ]
+
+    selections = []
+    for element in value.split(','):
+        element = element.strip()
+        if not element:
+            continue
+        name, _, interface = element.partition('@')
+        ns, _, name = name.rpartition('/')
+        selections.append((ns or namespace, name, interface or None))
+    return selections
+
+
+def is_device_resource(
+        resource_name: str
+) -> bool:
+    """Return True if resource is an extended device plugin resource,
+    i.e. intel.com/sriov_netdevice, not cpu, memory or hugepages.
+    """
+    domain, sep, _ = resource_name.partition('/')
+    return bool(sep) and not domain.endswith("kubernetes.io")
+
+
+def _to_int(value: Any) -> int:
+    """Return resource quantity of device resource as int."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+class NetworkRecord(_Record):
+    __slots__ = ('name', 'namespace', 'resource_name', 'cni_type', 'plugins',
+                 'master', 'vlan', 'ipam_type', 'config')
+
+    def __init__(
+            self,
+            name: str,
+            namespace: Optional[str] = "default",
+            resource_name: Optional[str] = None,
+            cni_type: Optional[str] = None,
+            plugins: Optional[Tuple[str, ...]] = None,
+            master: Optional[str] = None,
+            vlan: Optional[int] = None,
+            ipam_type: Optional[str] = None,
+            config: Optional[Dict[str, Any]] = None,
+    ):
+        """
+        :param name: network name
+        :param namespace: network namespace
+        :param resource_name: device plugin resource of network, i.e. intel.com/sriov_netdevice
+        :param cni_type: type of main CNI plugin, i.e. sriov, macvlan
+        :param plugins: types of all plugins in plugin list
+        :param master: master interface of macvlan / ipvlan network
+        :param vlan: vlan id
+        :param ipam_type: ipam plugin type
+        :param config: parsed CNI config
+        """
+        self.name = name
+        self.namespace = namespace
+        self.resource_name = resource_name
+        self.cni_type = cni_type
+        self.plugins = tuple(plugins) if plugins else ()
+        self.master = master
+        self.vlan = vlan
+        self.ipam_type = ipam_type
+        self.config = config if config is not None else {}
+
+    @property
+    def is_sriov(self) -> bool:
+        """Return True if network is SR-IOV network."""
+        return self.cni_type == "sriov" or (
+                self.resource_name is not None and "sriov" in self.resource_name)
+
+    @classmethod
+    def from_nad(
+            cls,
+            nad: Dict[str, Any]
+    ) -> 'NetworkRecord':
+        """Project NetworkAttachmentDefinition to NetworkRecord.
+        :param nad: NetworkAttachmentDefinition object
+        :return: NetworkRecord
+        """
+        metadata = nad.get('metadata', {})
+        config = parse_cni_config(nad.get('spec', {}).get('config'))
+        plugins = config.get('plugins') if isinstance(config.get('plugins'), list) else [config]
+        main = plugins[0] if plugins else {}
+        return cls(
+            name=metadata.get('name'),
+            namespace=metadata.get('namespace', 'default'),
+            resource_name=(metadata.get('annotations') or {}).get(RESOURCE_NAME_ANNOTATION),
+            cni_type=main.get('type'),
+            plugins=tuple(p.get('type') for p in plugins if p.get('type')),
+            master=main.get('master'),
+            vlan=main.get('vlan'),
+            ipam_type=(main.get('ipam') or {}).get('type'),
+            config=config
+        )
+
+
+class NetworkInventory:
+    def __init__(
+            self,
+            kube_state,
+            page_size: Optional[int] = 500,
+            logger: Optional[logging.Logger] = None,
+    ):
+        """
+        :param kube_state: KubernetesState
+        :param page_size: page size of pod list, API backend only.
+        :param logger: optional logger
+        """
+        self.kube_state = kube_state
+        self.page_size = page_size
+        self.logger = logger if logger else logging.getLogger(__name__)
+        self._informer: Optional[KubeInformer] = None
+
+        # (namespace, name) -> (resourceVersion, parsed object)
+        self._networks: Dict[ObjectKey, Tuple[str, NetworkRecord]] = {}
+        self._pods: Dict[ObjectKey, Tuple[str, List[VfAllocation]]] = {}
+        # node -> pci address -> allocation
+        self._vfs_of_node: Dict[str, Dict[str, VfAllocation]] = {}
+        # node -> device resource -> allocatable
+        self._node_resources: Dict[str, Dict[str, int]] = {}
+
+    def start(self) -> 'NetworkInventory':
+        """Start NetworkAttachmentDefinition informer, API backend only.
+        If CRD is not installed inventory keeps listing on refresh.
+        """
+        api = self.kube_state.api
+        if api is None or self._informer is not None:
+            return self
+        informer = KubeInformer(api, NAD_RESOURCE, logger=self.logger)
+        try:
+            informer.start()
+        except KubeApiError as e:
+            self.logger.warning(f"network attachment definition informer not started: {e}")
+            return self
+        self._informer = informer
+        return self
+
+    def stop(self):
+        """Stop NetworkAttachmentDefinition informer."""
+        if self._informer is not None:
+            self._informer.stop()
+            self._informer = None
+
+    def _list_nads(self) -> List[Dict[str, Any]]:
+        """Return NetworkAttachmentDefinitions of all namespaces."""
+        if self._informer is not None:
+            return self._informer.list()
+        if self.kube_state.api is not None:
+            try:
+                return self.kube_state.api.list_network_attachment_definitions(None).get('items', [])
+            except KubeApiError as e:
+                if e.status_code == 404:
+                    return []
+                raise
+        return self.kube_state.run_command_json(
+            "kubectl get net-attach-def -A -o json",
+            expect_error="the server doesn't have a resource type").get('items', [])
+
+    def _list_pods(self) -> List[Dict[str, Any]]:
+        """Return pods of all namespaces."""
+        informer = self.kube_state.informer('pods')
+        if informer is not None and informer.namespace is None:
+            return informer.list()
+        if self.kube_state.api is not None:
+            return self.kube_state.api.list_pods(None, limit=self.page_size).get('items', [])
+        return self.kube_state.run_command_json("kubectl get pods -A -o json").get('items', [])
+
+    @staticmethod
+    def _sync(
+            cache: Dict[ObjectKey, Tuple[str, Any]],
+            objects: List[Dict[str, Any]],
+            parse,
+    ) -> Tuple[List[ObjectKey], Dict[ObjectKey, Any]]:
+        """Update cache from objects,  parse only added or changed objects.
+
+        :param cache: cache (namespace, name) -> (resourceVersion, parsed)
+        :param objects: current objects
+        :param parse: callable that parses object
+        :return: (added or changed keys, old parsed value of changed and deleted keys)
+        """
+        seen = set()
+        updated = []
+        stale = {}
+        for obj in objects:
+            key = object_key(obj)
+            seen.add(key)
+            version = obj.get('metadata', {}).get('resourceVersion', '')
+            cached = cache.get(key)
+            if cached is not None and version and cached[0] == version:
+                continue
+            if cached is not None:
+                stale[key] = cached[1]
+            cache[key] = (version, parse(obj))
+            updated.append(key)
+        for key in [k for k in cache if k not in seen]:
+            stale[key] = cache.pop(key)[1]
+        return updated, stale
+
+    def _pod_allocations(
+            self,
+            pod: Dict[str, Any]
+    ) -> List[VfAllocation]:
+        """Return VFs consumed by pod,  from network-status annotation,
+        or from requested SR-IOV networks if CNI didn't report status yet.
+        """
+        metadata = pod.get('metadata', {})
+        annotations = metadata.get('annotations') or {}
+        name = metadata.get('name')
+        namespace = metadata.get('namespace', 'default')
+        node = pod.get('spec', {}).get('nodeName')
+
+        allocations = []
+        try:
+            status = json.loads(annotations.get(NETWORK_STATUS_ANNOTATION) or "[]")
+        except ValueError:
+            status = []
+        for entry in status if isinstance(status, list) else []:
+            pci = ((entry.get('device-info') or {}).get('pci') or {}).get('pci-address')
+            if pci is None:
+                continue
+            net_ns, _, net_name = entry.get('name', '').rpartition('/')
+            allocations.append(VfAllocation(
+                name, namespace, node, (net_ns or namespace, net_name),
+                entry.get('interface'), None, pci, entry.get('mac')))
+
+        if not allocations:
+            for net_ns, net_name, interface in parse_network_selection(
+                    annotations.get(NETWORKS_ANNOTATION), namespace):
+                allocations.append(VfAllocation(
+                    name, namespace, node, (net_ns, net_name), interface, None, None, None))
+        return allocations
+
+    def refresh(
+            self,
+            pods: Optional[bool] = False,
+            nodes: Optional[bool] = False
+    ) -> Dict[str, int]:
+        """Refresh inventory incrementally,  networks are always refreshed.
+
+        :param pods: if True refresh VFs consumed by pods too,  without pods
+                     informer all pods of all namespaces listed.
+        :param nodes: if True refresh node resources too,  nodes read via
+                      KubernetesState.node_records.
+        :return: number of added, changed or deleted networks and pods
+        """
+        updated_networks, stale_networks = self._sync(
+            self._networks, self._list_nads(), NetworkRecord.from_nad)
+        updated_pods, stale_pods = [], {}
+        if pods:
+            updated_pods, stale_pods = self._sync(self._pods, self._list_pods(), self._pod_allocations)
+
+        for allocations in stale_pods.values():
+            for a in allocations:
+                if a.pci_address and a.node in self._vfs_of_node:
+                    self._vfs_of_node[a.node].pop(a.pci_address, None)
+        for key in updated_pods:
+            for a in self._pods[key][1]:
+                if a.pci_address and a.node:
+                    self._vfs_of_node.setdefault(a.node, {})[a.pci_address] = a
+
+        if nodes:
+            self._node_resources = {
+                name: {
+                    r: _to_int(v) for r, v in record.allocatable.items() if is_device_resource(r)
+                }
+                for name, record in self.kube_state.node_records(
+                    is_worker_node_only=False, refresh=True).items()
+            }
+        return {
+            'networks': len(set(updated_networks) | set(stale_networks)),
+            'pods': len(set(updated_pods) | set(stale_pods)),
+        }
+
+    def networks(
+            self,
+            namespace: Optional[str] = None,
+            sriov_only: Optional[bool] = False
+    ) -> List[NetworkRecord]:
+        """Return networks, all namespaces if namespace is None."""
+        return [
+            record for (ns, _), (_, record) in self._networks.items()
+            if (namespace is None or ns == namespace) and (not sriov_only or record.is_sriov)
+        ]
+
+    def network(
+            self,
+            name: str,
+            namespace: Optional[str] = "default"
+    ) -> Optional[NetworkRecord]:
+        """Return network or None."""
+        cached = self._networks.get((namespace, name))
+        return cached[1] if cached else None
+
+    def resources_of_node(
+            self,
+            node: str
+    ) -> Dict[str, int]:
+        """Return device plugin resources allocatable on node."""
+        return dict(self._node_resources.get(node, {}))
+
+    def _with_resource(
+            self,
+            allocation: VfAllocation
+    ) -> VfAllocation:
+        """Return allocation with resource name of its network."""
+        network = self.network(allocation.network[1], allocation.network[0])
+        return allocation._replace(resource_name=network.resource_name if network else None)
+
+    def vf_allocations(
+            self,
+            node: Optional[str] = None,
+            pod: Optional[str] = None,
+            namespace: Optional[str] = None,
+    ) -> List[VfAllocation]:
+        """Return VFs consumed by pods, SR-IOV networks only.
+        :param node: optional node name
+        :param pod: optional pod name
+        :param namespace: optional pod namespace
+        :return: list of VfAllocation
+        """
+        if pod is not None:
+            cached = self._pods.get((namespace or "default", pod))
+            allocations = cached[1] if cached else []
+        else:
+            allocations = [
+                a for (ns, _), (_, pod_allocations) in self._pods.items()
+                if namespace is None or ns == namespace for a in pod_allocations
+            ]
+        result = []
+        for a in allocations:
+            if node is not None and a.node != node:
+                continue
+            a = self._with_resource(a)
+            network = self.network(a.network[1], a.network[0])
+            if a.pci_address or (network is not None and network.is_sriov):
+                result.append(a)
+        return result
+
+    def pod_of_vf(
+            self,
+            node: str,
+            pci_address: str
+    ) -> Optional[VfAllocation]:
+        """Return allocation of VF on node or None if VF is free."""
+        allocation = self._vfs_of_node.get(node, {}).get(pci_address)
+        return self._with_resource(allocation) if allocation else None
+
+    def free_resources(
+            self,
+            node: str
+    ) -> Dict[str, int]:
+        """Return device resources not consumed by pods on node."""
+        free = self.resources_of_node(node)
+        for a in self.vf_allocations(node=node):
+            if a.resource_name in free:
+                free[a.resource_name] -= 1
+        return free
+
+    def nodes_with_resource(
+            self,
+            resource_name: str,
+            count: Optional[int] = 1
+    ) -> List[str]:
+        """Return nodes that have count free units of device resource.
+        :param resource_name: i.e. intel.com/sriov_netdevice
+        :param count: number of units
+        :return: list of node names
+        """
+        return [
+            node for node in self._node_resources
+            if self.free_resources(node).get(resource_name, 0) >= count
+        ]
@@ -0,0 +1,159 @@
+"""
+NodeRecord and PodRecord, are compact typed records of Kubernetes node and pod.
+
+A node or pod JSON document is projected to a record at fetch time,  only
+fields downstream code uses are retained, the rest of the document is
+dropped.  Records use __slots__,  hence no per instance dict, small pickle
+and fast attribute access on large clusters.
+
+Both records expose _asdict() so WarlockState JSON encoder serializes
+them the same way it serializes named tuples.
+
+Author: Mus
+ spyroot@gmail.com
+ mbayramo@stanford.edu
+"""
+from typing import Dict, Optional, Any, Tuple
+
+CONTROL_PLANE_KEYS = (
+    "node-role.kubernetes.io/master",
+    "node-role.kubernetes.io/control-plane",
+)
+
+
+class _Record:
+    __slots__ = ()
+
+    def _asdict(self) -> Dict[str, Any]:
+        """Return record as a dict."""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]):
+        """Create record from dict produced by _asdict."""
+        return cls(**{name: data.get(name) for name in cls.__slots__})
+
+    def __eq__(self, other) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, n) == getattr(other, n) for n in self.__slots__)
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{n}={getattr(self, n)!r}" for n in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class NodeRecord(_Record):
+    __slots__ = ('name', 'internal_ip', 'addresses', 'labels', 'allocatable', 'is_control_plane')
+
+    def __init__(
+            self,
+            name: str,
+            internal_ip: Optional[str] = None,
+            addresses: Optional[Tuple[Tuple[str, str], ...]] = None,
+            labels: Optional[Dict[str, str]] = None,
+            allocatable: Optional[Dict[str, str]] = None,
+            is_control_plane: Optional[bool] = False,
+    ):
+        """
+        :param name: node name
+        :param internal_ip: node InternalIP address
+        :param addresses: tuple of (address type, address)
+        :param labels: node labels
+        :param allocatable: node allocatable resources, i.e. {'cpu': '8'}
+        :param is_control_plane: True if node is control plane node
+        """
+        self.name = name
+        self.internal_ip = internal_ip
+        self.addresses = tuple(tuple(a) for a in addresses) if addresses else ()
+        self.labels = labels if labels is not None else {}
+        self.allocatable = allocatable if allocatable is not None else {}
+        self.is_control_plane = bool(is_control_plane)
+
+    @classmethod
+    def from_node(
+            cls,
+            node: Dict[str, Any]
+    ) -> 'NodeRecord':
+        """Project node JSON document to NodeRecord.
+        :param node: node object, as returned by API server or kubectl -o json
+        :return: NodeRecord
+        """
+        metadata = node.get('metadata', {})
+        spec = node.get('spec', {})
+        status = node.get('status', {})
+        labels = metadata.get('labels') or {}
+
+        addresses = tuple(
+            (a.get('type'), a.get('address')) for a in status.get('addresses', [])
+        )
+        internal_ip = next((addr for t, addr in addresses if t == 'InternalIP'), None)
+        is_control_plane = (
+                any(k in labels for k in CONTROL_PLANE_KEYS)
+                or any(t.get('key') in CONTROL_PLANE_KEYS for t in spec.get('taints', []))
+        )
+        return cls(
+            name=metadata.get('name'),
+            internal_ip=internal_ip,
+            addresses=addresses,
+            labels=dict(labels),
+            allocatable=dict(status.get('allocatable') or {}),
+            is_control_plane=is_control_plane
+        )
+
+
+class PodRecord(_Record):
+    __slots__ = ('name', 'namespace', 'node_name', 'pod_ip', 'pod_ips', 'host_ip', 'phase', 'labels')
+
+    def __init__(
+            self,
+            name: str,
+            namespace: Optional[str] = "default",
+            node_name: Optional[str] = None,
+            pod_ip: Optional[str] = None,
+            pod_ips: Optional[Tuple[str, ...]] = None,
+            host_ip: Optional[str] = None,
+            phase: Optional[str] = None,
+            labels: Optional[Dict[str, str]] = None,
+    ):
+        """
+        :param name: pod name
+        :param namespace: pod namespace
+        :param node_name: node pod scheduled to
+        :param pod_ip: primary pod ip
+        :param pod_ips: all pod ips
+        :param host_ip: ip address of node
+        :param phase: pod phase
+        :param labels: pod labels
+        """
+        self.name = name
+        self.namespace = namespace
+        self.node_name = node_name
+        self.pod_ip = pod_ip
+        self.pod_ips = tuple(pod_ips) if pod_ips else ()
+        self.host_ip = host_ip
+        self.phase = phase
+        self.labels = labels if labels is not None else {}
+
+    @classmethod
+    def from_pod(
+            cls,
+            pod: Dict[str, Any]
+    ) -> 'PodRecord':
+        """Project pod JSON document to PodRecord.
+        :param pod: pod object, as returned by API server or kubectl -o json
+        :return: PodRecord
+        """
+        metadata = pod.get('metadata', {})
+        status = pod.get('status', {})
+        pod_ips = tuple(p.get('ip') for p in status.get('podIPs', []) if p.get('ip'))
+        return cls(
+            name=metadata.get('name'),
+            namespace=metadata.get('namespace', 'default'),
+            node_name=pod.get('spec', {}).get('nodeName'),
+            pod_ip=status.get('podIP') or (pod_ips[0] if pod_ips else None),
+            pod_ips=pod_ips,
+            host_ip=status.get('hostIP'),
+            phase=status.get('phase'),
+            labels=dict(metadata.get('labels') or {})
+        )
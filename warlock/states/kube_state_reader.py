@@ -6,6 +6,10 @@ code we can use that data for something.
 All data fetched once and cached is stored in states.  Caller can do force read
 in case it need constantly update a state of particular object
 
+State reads either through kubectl (default) or directly from API server
+through KubeApiClient.  Backend "auto" uses API server if kubeconfig
+can be used by KubeApiClient and falls back to kubectl otherwise.
+
 Author: Mus
  spyroot@gmail.com
  mbayramo@stanford.edu
@@ -13,21 +17,61 @@ Author: Mus
 
 import os
 import json
+import logging
 import subprocess
+import time
 from typing import Dict, List, Optional, Any
 
+from warlock.states.kube_api_client import (
+    KubeApiClient,
+    KubeConfigError
+)
+from warlock.states.kube_informer import KubeInformer, is_pod_ready
+from warlock.states.kube_network_inventory import NetworkInventory
+from warlock.states.kube_records import NodeRecord, PodRecord
+
+KUBE_BACKEND_KUBECTL = "kubectl"
+KUBE_BACKEND_API = "api"
+KUBE_BACKEND_AUTO = "auto"
+KUBE_BACKENDS = (KUBE_BACKEND_KUBECTL, KUBE_BACKEND_API, KUBE_BACKEND_AUTO)
+
+# page size of list requests, kubectl --chunk-size and API limit
+KUBE_LIST_PAGE_SIZE = 500
+# server side selector that excludes labeled control plane nodes
+WORKER_NODE_SELECTOR = "!node-role.kubernetes.io/control-plane,!node-role.kubernetes.io/master"
+# label key substring of node pool label, see read_node_pool_name
+NODE_POOL_LABEL_SUBSTRING = "nodepool"
+
+
+def join_selectors(*selectors: Optional[str]) -> Optional[str]:
+    """Join label or field selectors with comma, None if all empty."""
+    joined = ",".join(s for s in selectors if s)
+    return joined if joined else None
+
 
 class KubernetesState:
 
     def __init__(
             self,
-            path_to_kubeconfig: str = None
+            path_to_kubeconfig: str = None,
+            backend: Optional[str] = KUBE_BACKEND_KUBECTL,
+            logger: Optional[logging.Logger] = None,
     ):
         """
         :param path_to_kubeconfig:
+        :param backend: kubectl, api or auto.
+        :param logger: optional logger
         """
+        if backend not in KUBE_BACKENDS:
+            raise ValueError(f"backend must be one of {KUBE_BACKENDS}, got {backend}")
+
+        self.logger = logger if logger else logging.getLogger(__name__)
         # store a node state information
-        self._node_state: Dict[str, Dict] = {}
+        self._node_state: Dict[str, NodeRecord] = {}
+        # True once node state holds all nodes, not a filtered subset
+        self._node_state_complete = False
+        # trimmed specs of nodes read by name, see node_specs
+        self._node_spec_cache: Dict[str, Dict[str, Any]] = {}
         # cache store a node ip address as key and node name
         self._cache_addr2node = None
         self._cache_node2addr = None
@@ -36,15 +80,14 @@ class KubernetesState:
         self._cache_pods_names: Dict[str, Dict[str, str]] = {}
         # networks
         self._cache_networks = None
+        # multus networks and sr-iov resources inventory, see network_inventory
+        self._network_inventory: Optional[NetworkInventory] = None
         # current cluster config
         self.kube_config = None
 
         # namespaces cache
         self._namespaces = None
 
-        if self.is_kubectl_installed() is False:
-            raise Exception("kubectl is not installed. Please install kubectl to proceed.")
-
         if path_to_kubeconfig:
             if not os.path.exists(path_to_kubeconfig):
                 raise FileNotFoundError(f"Kubeconfig file not found at '{path_to_kubeconfig}'")
@@ -54,10 +97,30 @@ class KubernetesState:
                 raise PermissionError(f"The file '{path_to_kubeconfig}' is not readable.")
             os.environ['KUBECONFIG'] = path_to_kubeconfig
 
+        # api server client, None if state reads through kubectl
+        self._api: Optional[KubeApiClient] = None
+        # pods and nodes informers, started by start_informers
+        self._informers: Dict[str, KubeInformer] = {}
+        if backend != KUBE_BACKEND_KUBECTL:
+            try:
+                self._api = KubeApiClient(path_to_kubeconfig)
+            except (KubeConfigError, OSError, ValueError) as e:
+                if backend == KUBE_BACKEND_API:
+                    raise
+                self.logger.info(f"Kubernetes API client unavailable, using kubectl: {e}")
+
+        if self._api is None and self.is_kubectl_installed() is False:
+            raise Exception("kubectl is not installed. Please install kubectl to proceed.")
+
         try:
             if "SKIP_KUBECONFIG_VALIDATE" not in os.environ:
-                self.validate_kubeconfig()
+                if self._api is not None:
+                    self._validate_api_kubeconfig()
+                else:
+                    self.validate_kubeconfig()
         except Exception as e:
+            if self._api is not None:
+                self._api.close()
             if 'KUBECONFIG' in os.environ:
                 del os.environ['KUBECONFIG']
             raise e
@@ -65,13 +128,123 @@ class KubernetesState:
     @classmethod
     def from_kubeconfig(
             cls,
-            path_to_kubeconfig: str
+            path_to_kubeconfig: str,
+            backend: Optional[str] = KUBE_BACKEND_KUBECTL
     ):
         """
         Constructor KubernetesState from custom path to kubeconfig
+        :param path_to_kubeconfig: path to kubeconfig
+        :param backend: kubectl, api or auto.
         :return: An instance of VMwareVimState.
         """
-        return cls(path_to_kubeconfig=path_to_kubeconfig)
+        return cls(path_to_kubeconfig=path_to_kubeconfig, backend=backend)
+
+    @property
+    def backend(self) -> str:
+        """Return backend state reads through, kubectl or api."""
+        return KUBE_BACKEND_API if self._api is not None else KUBE_BACKEND_KUBECTL
+
+    @property
+    def api(self) -> Optional[KubeApiClient]:
+        """Return API client, None if state reads through kubectl."""
+        return self._api
+
+    def close(self):
+        """Stop informers and release pooled API server connections."""
+        self.stop_informers()
+        if self._network_inventory is not None:
+            self._network_inventory.stop()
+        if self._api is not None:
+            self._api.close()
+
+    def start_informers(
+            self,
+            namespace: Optional[str] = None
+    ) -> 'KubernetesState':
+        """Start pods and nodes informers.  Once started, node and pod reads
+        served from informers cache that is kept up to date by a watch stream,
+        and wait_for_pods_ready waits on watch events instead of polling.
+
+        :param namespace: pods namespace informer watches, all namespaces if None.
+        :return: self
+        :raise ValueError: if state reads through kubectl.
+        """
+        if self._api is None:
+            raise ValueError("informers require api backend")
+        if not self._informers:
+            self._informers = {
+                'pods': KubeInformer(self._api, 'pods', namespace=namespace, logger=self.logger),
+                'nodes': KubeInformer(self._api, 'nodes', logger=self.logger),
+            }
+            try:
+                for informer in self._informers.values():
+                    informer.start()
+            except Exception:
+                self.stop_informers()
+                raise
+        return self
+
+    def stop_informers(self):
+        """Stop pods and nodes informers."""
+        for informer in self._informers.values():
+            informer.stop()
+        self._informers = {}
+
+    def informer(
+            self,
+            resource: str
+    ) -> Optional[KubeInformer]:
+        """Return running informer of resource, pods or nodes.
+        :param resource: pods or nodes
+        :return: KubeInformer or None if informers not started.
+        """
+        return self._informers.get(resource)
+
+    def _pod_informer(
+            self,
+            ns: str
+    ) -> Optional[KubeInformer]:
+        """Return pods informer if it watches namespace ns."""
+        informer = self._informers.get('pods')
+        if informer is not None and informer.namespace in (None, ns):
+            return informer
+        return None
+
+    def _list_nodes_api(self) -> Dict[str, Any]:
+        """Return NodeList from nodes informer if started, otherwise from API server."""
+        informer = self._informers.get('nodes')
+        if informer is not None:
+            return {'items': informer.list()}
+        return self._api.list_nodes(limit=KUBE_LIST_PAGE_SIZE)
+
+    @staticmethod
+    def _kubectl_selector_args(
+            label_selector: Optional[str] = None,
+            field_selector: Optional[str] = None,
+    ) -> str:
+        """Return kubectl selector and chunk size arguments."""
+        args = f" --chunk-size={KUBE_LIST_PAGE_SIZE}"
+        if label_selector:
+            args += f" -l '{label_selector}'"
+        if field_selector:
+            args += f" --field-selector '{field_selector}'"
+        return args
+
+    def _validate_api_kubeconfig(self) -> Dict:
+        """Validates kubeconfig used by API client, same checks as validate_kubeconfig.
+        :return: kubeconfig
+        :raises: Exception if kubeconfig is empty or API server not reachable.
+        """
+        kubeconfig = self._api.config_view()
+        if not kubeconfig.get('clusters') or not kubeconfig.get('users') or not kubeconfig.get('contexts'):
+            raise Exception("Kubeconfig appears to be empty or "
+                            "improperly configured. Please check your kubeconfig.")
+
+        if "SKIP_KUBE_SERVER_CHECK" not in os.environ:
+            if 'gitVersion' not in self._api.server_version():
+                raise Exception("Failed fetch server version. Please check your kubeconfig")
+
+        return kubeconfig
 
     @staticmethod
     def run_command(cmd):
@@ -154,10 +327,69 @@ class KubernetesState:
 
         return False
 
+    def _read_nodes_json(
+            self,
+            node_name: str = None,
+            label_selector: Optional[str] = None,
+            field_selector: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Read node or NodeList JSON through state backend.  Selectors
+        applied by API server,  list read in pages of KUBE_LIST_PAGE_SIZE.
+
+        :param node_name: optional node name, empty dict if node not found.
+        :param label_selector: optional label selector
+        :param field_selector: optional field selector
+        :return: node or NodeList
+        """
+        is_filtered = label_selector is not None or field_selector is not None
+        if self._api is not None and 'nodes' in self._informers and not is_filtered:
+            return (self._informers['nodes'].get(node_name) or {}) if node_name else self._list_nodes_api()
+        if self._api is not None:
+            if node_name:
+                return self._api.read_node(node_name)
+            if not is_filtered:
+                return self._list_nodes_api()
+            return self._api.list_nodes(label_selector, field_selector, KUBE_LIST_PAGE_SIZE)
+        if node_name:
+            cmd = f"kubectl get node {node_name} -o json"
+        else:
+            cmd = "kubectl get nodes --no-headers -o json" + self._kubectl_selector_args(label_selector, field_selector)
+        return self.run_command_json(cmd, expect_error="(NotFound)")
+
+    def _update_node_records(
+            self,
+            nodes: List[Dict[str, Any]]
+    ) -> List[NodeRecord]:
+        """Project node documents to NodeRecord and update node state.
+        :param nodes: list of node objects
+        :return: list of node records
+        """
+        records = [NodeRecord.from_node(n) for n in nodes if n.get('metadata', {}).get('name')]
+        for record in records:
+            self._node_state[record.name] = record
+        return records
+
+    @staticmethod
+    def _trim_node_spec(
+            node: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Return node spec without managedFields and status images,
+        the bulk of a node document that no reader uses.
+        """
+        node = dict(node)
+        if 'managedFields' in node.get('metadata', {}):
+            node['metadata'] = {k: v for k, v in node['metadata'].items() if k != 'managedFields'}
+        if 'images' in node.get('status', {}):
+            node['status'] = {k: v for k, v in node['status'].items() if k != 'images'}
+        return node
+
     def node_specs(
             self,
             node_name: str = None,
             is_worker_node_only: bool = True,
+            label_selector: Optional[str] = None,
+            field_selector: Optional[str] = None,
+            node_pool: Optional[str] = None,
     ) -> Dict[str, Dict[Any, Any]]:
         """Method read kubernetes node specs and return
         a dictionary that holds a kubernetes node specs.
@@ -166,39 +398,102 @@ class KubernetesState:
         control plane nodes and return only worker node.
 
         If caller need a particular node name it should pass node_name arg.
+        A node read by name is served from cache after first read,  cache holds
+        spec without managedFields and status images.  Full node list is not
+        retained,  state keeps only NodeRecord projection, see node_records.
+        Control plane nodes are not recorded unless is_worker_node_only is False.
+
+        Labeled control plane nodes, selectors and node pool are filtered by
+        API server,  control plane nodes marked only by taint filtered client side.
+        Unfiltered reads served from nodes informer if started.
 
         :param node_name: a particular node name that
         :param is_worker_node_only: if False will return all nodes specs.
+        :param label_selector: optional label selector, i.e. kubernetes.io/os=linux
+        :param field_selector: optional field selector, i.e. spec.unschedulable=false
+        :param node_pool: optional node pool name, see read_node_pool_name
         :raise ValueError: if node_name container invalid spaces
         :return: a dictionary that holds a kubernetes node specs
         """
         if node_name is not None and len(node_name.split()) > 1:
             raise ValueError("node name should not contain spaces")
 
-        if node_name is not None and node_name in self._node_state:
-            return {node_name: self._node_state[node_name]}
+        is_filtered = label_selector is not None or field_selector is not None or node_pool is not None
+        # nodes informer cache is up to date, served from it instead
+        use_cache = not is_filtered and 'nodes' not in self._informers
+        if node_name is not None and use_cache:
+            if node_name in self._node_spec_cache:
+                return {node_name: self._node_spec_cache[node_name]}
+            record = self._node_state.get(node_name)
+            if record is not None and record.is_control_plane and is_worker_node_only:
+                return {}
+            if record is None and self._node_state_complete:
+                return {}
 
-        if node_name:
-            cmd = f"kubectl get node {node_name} -o json"
-        else:
-            cmd = "kubectl get nodes --no-headers -o json"
+        if node_name is None and node_pool is not None:
+            pool_selector = self.node_pool_selector(node_pool)
+            if pool_selector is None:
+                return {}
+            label_selector = join_selectors(label_selector, pool_selector)
 
-        node_output = self.run_command_json(cmd, expect_error="(NotFound)")
+        # nodes informer cache holds all nodes, control plane filtered client side
+        if node_name is None and is_worker_node_only and 'nodes' not in self._informers:
+            node_output = self._read_nodes_json(
+                label_selector=join_selectors(label_selector, WORKER_NODE_SELECTOR),
+                field_selector=field_selector)
+        else:
+            node_output = self._read_nodes_json(node_name, label_selector, field_selector)
         if node_name:
-            if ((self.is_control_plane_node(node_output) and is_worker_node_only)
-                    or len(node_output) == 0):
+            if len(node_output) == 0:
+                return {}
+            if self.is_control_plane_node(node_output) and is_worker_node_only:
                 return {}
-            self._node_state[node_name] = node_output
+            self._update_node_records([node_output])
+            node_output = self._trim_node_spec(node_output)
+            if use_cache:
+                self._node_spec_cache[node_name] = node_output
             return {node_name: node_output}
 
-        for node in node_output.get('items', []):
-            if is_worker_node_only and self.is_control_plane_node(node):
-                continue
-            node_name_key = node.get('metadata', {}).get('name')
-            if node_name_key:
-                self._node_state[node_name_key] = node
+        nodes = [
+            n for n in node_output.get('items', [])
+            if n.get('metadata', {}).get('name')
+            and not (is_worker_node_only and self.is_control_plane_node(n))
+        ]
+        self._update_node_records(nodes)
+        return {n['metadata']['name']: n for n in nodes}
 
-        return self._node_state
+    def node_records(
+            self,
+            node_name: str = None,
+            is_worker_node_only: bool = True,
+            refresh: Optional[bool] = False,
+            node_pool: Optional[str] = None,
+    ) -> Dict[str, NodeRecord]:
+        """Return node records, node state is fetched once and
+        served from state after, unless refresh is True.
+
+        :param node_name: optional a particular node name
+        :param is_worker_node_only: if False will return control plane nodes too.
+        :param refresh: force re-fetch node state.
+        :param node_pool: optional node pool name, see read_node_pool_name
+        :return: a dictionary where key is node name and value NodeRecord
+        """
+        if refresh or not self._node_state_complete:
+            self._node_state.clear()
+            self._node_spec_cache.clear()
+            self._update_node_records(self._read_nodes_json().get('items', []))
+            self._node_state_complete = True
+        elif node_name and node_name not in self._node_state:
+            node = self._read_nodes_json(node_name)
+            if node:
+                self._update_node_records([node])
+
+        return {
+            name: record for name, record in self._node_state.items()
+            if (node_name is None or name == node_name)
+            and not (is_worker_node_only and record.is_control_plane)
+            and (node_pool is None or self._record_node_pool(record) == node_pool)
+        }
 
     def update_nodes_uuid_ip_view(
             self,
@@ -239,27 +534,23 @@ class KubernetesState:
 
         Helper method to avoid code duplication between fetch and update operations.
         Note node_substring is substring or exact string of node name that client need
-        to filter out.
+        to filter out.  Nodes projected to NodeRecord,  node address is InternalIP.
 
         :param node_substring:
         :return: a dictionary where key is ip address and it and value a name.
         """
-        nodes_output = self.run_command("kubectl get nodes -o wide --no-headers")
-        if nodes_output is None or len(nodes_output) == 0:
-            return {}
-
-        for line in nodes_output:
-            if node_substring is None or node_substring in line:
-                parts = line.split()
-                if len(parts) > 5 and len(parts[0]) > 0:
-                    node_name = parts[0].strip()
-                    node_addr = parts[5].strip()
-                    self._add_node_and_addr_entry(node_name, node_addr)
-                    # for exact match we stop
-                    if node_substring == node_name:
-                        break
+        records = self._update_node_records(self._read_nodes_json().get('items', []))
+        for record in records:
+            if node_substring is not None and node_substring not in record.name:
+                continue
+            if record.internal_ip is None:
+                continue
+            self._add_node_and_addr_entry(record.name, record.internal_ip)
+            # for exact match we stop
+            if node_substring == record.name:
+                break
 
-        return self._cache_addr2node
+        return self._cache_addr2node if self._cache_addr2node is not None else {}
 
     def fetch_networks(
             self,
@@ -268,13 +559,24 @@ class KubernetesState:
     ) -> List[str]:
         """Fetch Kubernetes networks name and return list.
 
-        :param ns_name:  by default only default namespace is returned.
+        :param ns_name:  by default only default namespace is returned,
+                         if None names of all namespaces read from network_inventory.
         :param refresh: force to re fetch Kubernetes networks.
         :return: list of network names
         """
+        if ns_name is None:
+            # names only, pods and nodes not refreshed
+            inventory = self.network_inventory(refresh=refresh or self._network_inventory is None)
+            return [n.name for n in inventory.networks()]
+
         if refresh is False and self._cache_networks is not None:
             return self._cache_networks
 
+        if self._api is not None:
+            net_defs = self._api.list_network_attachment_definitions(ns_name)
+            self._cache_networks = [n['metadata']['name'] for n in net_defs.get('items', [])]
+            return self._cache_networks
+
         raw_output = self.run_command(
             f"kubectl get net-attach-def -o custom-columns=NAME:.metadata.name --no-headers -n {ns_name}")
 
@@ -284,6 +586,31 @@ class KubernetesState:
         self._cache_networks = [net_name for net_name in raw_output]
         return self._cache_networks
 
+    def network_inventory(
+            self,
+            refresh: Optional[bool] = True,
+            pods: Optional[bool] = False,
+            nodes: Optional[bool] = False,
+    ) -> NetworkInventory:
+        """Return inventory of multus networks of all namespaces, SR-IOV
+        resources of nodes and VFs consumed by pods.  Inventory created once,
+        each refresh re-parses only objects that changed since last refresh.
+        If informers are running, inventory watches network attachment definitions.
+
+        :param refresh: refresh inventory networks before return.
+        :param pods: refresh VFs consumed by pods too, lists all pods without pods informer.
+        :param nodes: refresh node resources too.
+        :return: NetworkInventory
+        """
+        if self._network_inventory is None:
+            self._network_inventory = NetworkInventory(
+                self, page_size=KUBE_LIST_PAGE_SIZE, logger=self.logger)
+            if self._informers:
+                self._network_inventory.start()
+        if refresh:
+            self._network_inventory.refresh(pods=pods, nodes=nodes)
+        return self._network_inventory
+
     def read_all_node_specs(self):
         """Read all nodes spec and update internal
         :return:
@@ -319,6 +646,73 @@ class KubernetesState:
         """
         return KubernetesState.run_command_json(f"kubectl get pod {pod_name} -n {ns} -o json")
 
+    def pod_spec(
+            self,
+            pod_name: str,
+            ns: Optional[str] = "default"
+    ) -> Dict[str, Any]:
+        """Read pod spec through state backend.
+        :param pod_name: pod name
+        :param ns: pod namespace
+        :return: pod spec
+        """
+        informer = self._pod_informer(ns)
+        if informer is not None:
+            pod = informer.get(pod_name, ns)
+            if pod is not None:
+                return pod
+        if self._api is not None:
+            return self._api.read_pod(pod_name, ns)
+        return self.read_pod_spec(pod_name, ns)
+
+    def pod_record(
+            self,
+            pod_name: str,
+            ns: Optional[str] = "default"
+    ) -> PodRecord:
+        """Read pod spec and project it to PodRecord.
+        :param pod_name: pod name
+        :param ns: pod namespace
+        :return: PodRecord
+        """
+        return PodRecord.from_pod(self.pod_spec(pod_name, ns))
+
+    def wait_for_pods_ready(
+            self,
+            pod_names: List[str],
+            ns: Optional[str] = "default",
+            timeout: Optional[float] = 150,
+            poll_interval: Optional[float] = 5,
+    ) -> Dict[str, Dict[str, Any]]:
+        """Block until all pods are Running, have an IP and Ready, or timeout.
+
+        If pods informer started, method wakes up on watch events, hence
+        readiness observed as soon as API server reports it.  Otherwise,
+        pod specs polled every poll_interval seconds.
+
+        :param pod_names: list of pod names
+        :param ns: pods namespace
+        :param timeout: timeout in seconds
+        :param poll_interval: poll interval when informer not started.
+        :return: a dict pod name to pod spec for pods that are ready
+        """
+        informer = self._pod_informer(ns)
+        if informer is not None:
+            return informer.wait_for_pods_ready(pod_names, timeout=timeout, namespace=ns)
+
+        deadline = time.monotonic() + timeout
+        ready = {}
+        while True:
+            for pod_name in pod_names:
+                if pod_name not in ready:
+                    pod = self.pod_spec(pod_name, ns)
+                    if is_pod_ready(pod):
+                        ready[pod_name] = pod
+            remaining = deadline - time.monotonic()
+            if len(ready) == len(pod_names) or remaining <= 0:
+                return ready
+            time.sleep(min(poll_interval, remaining))
+
     def pods_name(
             self,
             ns: Optional[str] = "default"
@@ -333,38 +727,67 @@ class KubernetesState:
 
     def pod_node_ns_names(
             self,
-            ns: Optional[str] = "default"
+            ns: Optional[str] = "default",
+            label_selector: Optional[str] = None,
+            field_selector: Optional[str] = None,
+            node_name: Optional[str] = None,
     ) -> Dict[str, Dict[str, str]]:
         """Return pod node name and node name, and namespace.
         {'pod_name': {'node': 'node_name', 'ns': 'default'}}
+
+        Selectors applied by API server and pods read in pages.  Unfiltered
+        reads update pods cache and return it,  filtered reads return only
+        matching pods.
+
+        :param ns: namespace, all for all namespaces
+        :param label_selector: optional label selector, i.e. app=iperf
+        :param field_selector: optional field selector, i.e. status.phase=Running
+        :param node_name: optional node name, only pods scheduled on node.
         :return:
         """
+        if node_name is not None:
+            field_selector = join_selectors(field_selector, f"spec.nodeName={node_name}")
+        is_filtered = label_selector is not None or field_selector is not None
+        result = {} if is_filtered else self._cache_pods_names
+
+        if self._api is not None:
+            pods = self._api.list_pods(
+                None if ns == "all" else ns, label_selector, field_selector, KUBE_LIST_PAGE_SIZE)
+            for pod in pods.get('items', []):
+                metadata = pod.get('metadata', {})
+                result[metadata.get('name')] = {
+                    # kubectl custom-columns print <none> for unscheduled pods
+                    "node": pod.get('spec', {}).get('nodeName') or "<none>",
+                    "ns": metadata.get('namespace')
+                }
+            return result
+
         if ns == "all":
             raw_output = self.run_command(
                 f"kubectl get pods -A "
                 f"-o=custom-columns=NAME:.metadata.name,"
                 f"NODE:.spec.nodeName,"
                 f"NAMESPACE:.metadata.namespace "
-                f"--no-headers")
+                f"--no-headers" + self._kubectl_selector_args(label_selector, field_selector))
         else:
             raw_output = self.run_command(
                 f"kubectl get pods "
                 f"-o=custom-columns=NAME:.metadata.name,"
                 f"NODE:.spec.nodeName,"
                 f"NAMESPACE:.metadata.namespace "
-                f"--no-headers -n {ns}")
+                f"--no-headers -n {ns}" + self._kubectl_selector_args(label_selector, field_selector))
 
         for line in raw_output:
             if len(line) == 0:
                 continue
             parts = line.split()
             if len(parts) > 2:
-                self._cache_pods_names[parts[0]] = {
+                result[parts[0]] = {
                     "node": parts[1],
                     "ns": parts[2]
                 }
 
-        return self._cache_pods_names
+        return result
 
     def namespaces(
             self
@@ -372,6 +795,12 @@ class KubernetesState:
         """Return list of namespaces
         :return:
         """
+        if self._api is not None:
+            self._namespaces = [
+                n['metadata']['name'] for n in self._api.list_namespaces().get('items', [])
+            ]
+            return self._namespaces
+
         raw_output = self.run_command("kubectl get namespaces -o jsonpath='{.items[*].metadata.name}'")
         if raw_output and len(raw_output) > 0:
             name_spaces = raw_output[0].split()
@@ -387,7 +816,10 @@ class KubernetesState:
         if self.kube_config is not None:
             return self.kube_config
 
-        self.kube_config = KubernetesState.run_command_json("kubectl config view -o json")
+        if self._api is not None:
+            self.kube_config = self._api.config_view()
+        else:
+            self.kube_config = KubernetesState.run_command_json("kubectl config view -o json")
         return self.kube_config
 
     def read_cluster_name(self):
@@ -479,9 +911,9 @@ class KubernetesState:
         :param node_name: a kubernetes node name
         :return: a dictionary with labels as keys.
         """
-        meta = self.read_node_metadata(node_name)
-        if 'labels' in meta:
-            return meta['labels']
+        records = self.node_records(node_name=node_name, is_worker_node_only=False)
+        if node_name in records:
+            return records[node_name].labels
         return {}
 
     def read_node_pool_name(
@@ -495,8 +927,34 @@ class KubernetesState:
         """
         labels = self.read_node_labels(node_name)
         for k, v in labels.items():
-            if 'nodepool' in k:
+            if NODE_POOL_LABEL_SUBSTRING in k:
                 return v
         return None
 
+    @staticmethod
+    def _record_node_pool(
+            record: NodeRecord
+    ) -> Optional[str]:
+        """Return node pool name of node record, same semantics as read_node_pool_name."""
+        for k, v in record.labels.items():
+            if NODE_POOL_LABEL_SUBSTRING in k:
+                return v
+        return None
+
+    def node_pool_selector(
+            self,
+            node_pool: str
+    ) -> Optional[str]:
+        """Return label selector for node pool.  Node pool label key is
+        first label key that contains nodepool, key discovered from node records.
+
+        :param node_pool: node pool name
+        :return: label selector key=node_pool, None if nodes have no node pool label.
+        """
+        for record in self.node_records(is_worker_node_only=False).values():
+            for k in record.labels:
+                if NODE_POOL_LABEL_SUBSTRING in k:
+                    return f"{k}={node_pool}"
+        return None
+
 
@@ -0,0 +1,295 @@
+"""
+NumaTopology, is a cluster wide NUMA / PCI locality model backed by
+numpy arrays.  It is built from EsxiHostHardware models and answers
+placement questions such as "which SR-IOV PFs are on the same NUMA node
+as this VM's vCPUs" for many hosts and VMs at once without Python
+level nested loops.
+
+PCI address encoded to an int64 key (host index, domain, bus, device, function)
+and all PCI devices of all hosts stored in one sorted array, hence lookup
+of N devices is a single np.searchsorted call.  CPU to NUMA node mapping
+stored as dense (num_hosts, max_cpu) array where -1 indicates unknown.
+
+Author: Mus
+ spyroot@gmail.com
+ mbayramo@stanford.edu
+"""
+import re
+from enum import Enum
+from typing import Dict, List, Optional, Union, Iterable, Tuple
+
+import numpy as np
+
+from warlock.states.esxi_host_hardware import EsxiHostHardware
+
+_PCI_ADDRESS_RE = re.compile(
+    r'^(?:([0-9a-fA-F]{1,4}):)?([0-9a-fA-F]{1,2}):([0-9a-fA-F]{1,2})\.([0-7])$'
+)
+
+# 32 bit for pci address, upper bits store a host index.
+_HOST_SHIFT = 32
+_UNKNOWN_NODE = -1
+
+
+def encode_pci_address(
+        pci_address: str
+) -> int:
+    """Encode PCI address string to int.  i.e. 0000:88:00.0
+    Domain is optional,  88:00.0 encoded same as 0000:88:00.0
+
+    :param pci_address: PCI address string
+    :return: encoded address or -1 if address invalid
+    """
+    if not isinstance(pci_address, str):
+        return -1
+
+    m = _PCI_ADDRESS_RE.match(pci_address.strip())
+    if m is None:
+        return -1
+
+    domain = int(m.group(1), 16) if m.group(1) else 0
+    bus = int(m.group(2), 16)
+    device = int(m.group(3), 16)
+    function = int(m.group(4))
+    return (domain << 16) | (bus << 8) | ((device & 0x1F) << 3) | function
+
+
+def encode_pci_addresses(
+        pci_addresses: Iterable[str]
+) -> np.ndarray:
+    """Encode list of PCI address to int64 array.
+    :param pci_addresses: PCI address strings
+    :return: np.ndarray of encoded addresses, -1 for invalid address
+    """
+    return np.fromiter(
+        (encode_pci_address(a) for a in pci_addresses), dtype=np.int64)
+
+
+class NumaTopology:
+    """
+    Cluster wide NUMA topology.  Host identifiers are whatever
+    keys caller used to build topology,  VMwareVimStateReader uses
+    esxi host name.
+    """
+
+    def __init__(
+            self,
+            hosts: Dict[str, EsxiHostHardware]
+    ):
+        """
+        :param hosts: a dict where key is esxi host identifier and value hardware model.
+        """
+        self.hosts: List[str] = list(hosts.keys())
+        self.host_index: Dict[str, int] = {h: i for i, h in enumerate(self.hosts)}
+
+        keys, numa, class_ids, num_vfs, pci_ids = [], [], [], [], []
+        max_cpu = 0
+        cpu_entries = []
+
+        for host_idx, host_name in enumerate(self.hosts):
+            hardware = hosts[host_name]
+            for pci_id, pci_device in hardware.pci_devices.items():
+                code = encode_pci_address(pci_id)
+                if code < 0:
+                    continue
+                keys.append((host_idx << _HOST_SHIFT) | code)
+                node = hardware.numa_node_of_pci(pci_id)
+                numa.append(_UNKNOWN_NODE if node is None else node)
+                class_ids.append(pci_device.classId >> 8)
+                num_vfs.append(hardware.sriov_devices.get(pci_id, 0))
+                pci_ids.append(pci_id)
+
+            cpu_topology = hardware.numa_topology.get('cpu') or {}
+            for node_id, cpus in cpu_topology.items():
+                cpu_array = np.asarray([int(c) for c in cpus], dtype=np.int64)
+                if cpu_array.size:
+                    max_cpu = max(max_cpu, int(cpu_array.max()) + 1)
+                cpu_entries.append((host_idx, node_id, cpu_array))
+
+        order = np.argsort(np.asarray(keys, dtype=np.int64), kind='stable')
+        self._pci_keys = np.asarray(keys, dtype=np.int64)[order]
+        self._pci_numa = np.asarray(numa, dtype=np.int16)[order]
+        self._pci_class = np.asarray(class_ids, dtype=np.int16)[order]
+        self._pci_num_vfs = np.asarray(num_vfs, dtype=np.int32)[order]
+        self._pci_ids = np.asarray(pci_ids, dtype=object)[order]
+        self._pci_host = (self._pci_keys >> _HOST_SHIFT).astype(np.int32)
+
+        self._cpu_numa = np.full((len(self.hosts), max_cpu), _UNKNOWN_NODE, dtype=np.int16)
+        for host_idx, node_id, cpu_array in cpu_entries:
+            self._cpu_numa[host_idx, cpu_array] = node_id
+
+    @classmethod
+    def from_host_hardware(
+            cls,
+            hosts: Dict[str, EsxiHostHardware]
+    ) -> 'NumaTopology':
+        """Build topology from host hardware models.
+        :param hosts: a dict where key is esxi host identifier
+        :return: NumaTopology
+        """
+        return cls(hosts)
+
+    def _host_idx(
+            self,
+            host: str
+    ) -> int:
+        """Return host index
+        :param host: esxi host identifier
+        :raise KeyError: if host is not part of topology
+        """
+        if host not in self.host_index:
+            raise KeyError(f"ESXi host '{host}' is not part of topology.")
+        return self.host_index[host]
+
+    def _lookup_pci(
+            self,
+            host_indices: np.ndarray,
+            pci_codes: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Vectorized lookup of (host, pci) pairs.
+        :return: a tuple position in pci arrays and mask of found devices
+        """
+        query = (host_indices.astype(np.int64) << _HOST_SHIFT) | pci_codes
+        pos = np.searchsorted(self._pci_keys, query)
+        pos = np.clip(pos, 0, max(len(self._pci_keys) - 1, 0))
+        found = (pci_codes >= 0)
+        if len(self._pci_keys):
+            found &= self._pci_keys[pos] == query
+        else:
+            found &= False
+        return pos, found
+
+    def pci_numa_nodes(
+            self,
+            host: str,
+            pci_ids: Iterable[str]
+    ) -> np.ndarray:
+        """Return numa node for each PCI device on a host.
+        :param host: esxi host identifier
+        :param pci_ids: PCI device ids
+        :return: int array of numa node ids, -1 for unknown device or node
+        """
+        codes = encode_pci_addresses(pci_ids)
+        host_indices = np.full(codes.shape, self._host_idx(host), dtype=np.int64)
+        return self.cluster_pci_numa_nodes(host_indices, codes)
+
+    def cluster_pci_numa_nodes(
+            self,
+            host_indices: np.ndarray,
+            pci_codes: np.ndarray
+    ) -> np.ndarray:
+        """Return numa node for many (host index, encoded pci address) pairs
+        across entire cluster.
+
+        :param host_indices: int array of host indices, see host_index
+        :param pci_codes: int64 array of encoded PCI address, see encode_pci_address
+        :return: int array of numa node ids, -1 for unknown device or node
+        """
+        pos, found = self._lookup_pci(np.asarray(host_indices), np.asarray(pci_codes, dtype=np.int64))
+        nodes = np.full(pos.shape, _UNKNOWN_NODE, dtype=np.int16)
+        if len(self._pci_keys):
+            nodes[found] = self._pci_numa[pos[found]]
+        return nodes
+
+    def cpu_numa_nodes(
+            self,
+            host: str,
+            cpu_ids: Iterable[int]
+    ) -> np.ndarray:
+        """Return numa node for each physical CPU on a host.
+        :param host: esxi host identifier
+        :param cpu_ids: physical cpu ids
+        :return: int array of numa node ids, -1 for unknown cpu
+        """
+        host_idx = self._host_idx(host)
+        cpus = np.asarray(list(cpu_ids), dtype=np.int64)
+        nodes = np.full(cpus.shape, _UNKNOWN_NODE, dtype=np.int16)
+        valid = (cpus >= 0) & (cpus < self._cpu_numa.shape[1])
+        nodes[valid] = self._cpu_numa[host_idx, cpus[valid]]
+        return nodes
+
+    def pci_devices_on_numa(
+            self,
+            host: str,
+            numa_nodes: Iterable[int],
+            filter_class: Optional[Union[int, Enum]] = None,
+            sriov_only: Optional[bool] = False,
+    ) -> List[str]:
+        """Return PCI devices on a host that attached to any of numa nodes.
+        :param host: esxi host identifier
+        :param numa_nodes: numa node ids
+        :param filter_class: optional PCI class, PciDeviceClass or raw int.
+        :param sriov_only: return only SR-IOV enabled PFs.
+        :return: list of pci device ids
+        """
+        mask = self._host_mask(self._host_idx(host), numa_nodes, filter_class, sriov_only)
+        return self._pci_ids[mask].tolist()
+
+    def _host_mask(
+            self,
+            host_idx: int,
+            numa_nodes: Iterable[int],
+            filter_class: Optional[Union[int, Enum]] = None,
+            sriov_only: Optional[bool] = False,
+    ) -> np.ndarray:
+        """Return mask over pci arrays for a host and set of numa nodes."""
+        nodes = np.asarray(list(numa_nodes), dtype=np.int16)
+        nodes = nodes[nodes != _UNKNOWN_NODE]
+        mask = (self._pci_host == host_idx) & np.isin(self._pci_numa, nodes)
+        if filter_class is not None:
+            class_id = filter_class.value if isinstance(filter_class, Enum) else filter_class
+            mask &= self._pci_class == class_id
+        if sriov_only:
+            mask &= self._pci_num_vfs > 0
+        return mask
+
+    def colocated_sriov_devices(
+            self,
+            host: str,
+            cpu_ids: Optional[Iterable[int]] = None,
+            numa_nodes: Optional[Iterable[int]] = None,
+    ) -> List[str]:
+        """Return SR-IOV enabled PFs that on same numa node as a set of
+        physical CPUs (i.e. VM vCPU affinity) or explicit set of numa nodes.
+
+        :param host: esxi host identifier
+        :param cpu_ids: physical cpu ids VM vCPUs scheduled on
+        :param numa_nodes: numa node ids, used if cpu_ids is None
+        :return: list of PF pci device ids
+        """
+        if cpu_ids is not None:
+            numa_nodes = np.unique(self.cpu_numa_nodes(host, cpu_ids))
+        if numa_nodes is None:
+            return []
+        return self.pci_devices_on_numa(host, numa_nodes, sriov_only=True)
+
+    def cluster_colocated_sriov_devices(
+            self,
+            placements: Dict[str, Tuple[str, Iterable[int]]]
+    ) -> Dict[str, List[str]]:
+        """Return SR-IOV PFs colocated with vCPUs for many VMs at once.
+        :param placements: a dict where key is vm name and value a tuple
+                           esxi host identifier and numa nodes of VM.
+        :return: a dict where key is vm name and value list of PF pci device ids
+        """
+        if not placements:
+            return {}
+
+        num_nodes = int(max(self._pci_numa.max(initial=0), self._cpu_numa.max(initial=0))) + 1
+        # (num_vms, num_nodes) mask of numa nodes each VM pinned to
+        vm_names = list(placements.keys())
+        vm_host = np.asarray([self._host_idx(placements[v][0]) for v in vm_names], dtype=np.int32)
+        vm_nodes = np.zeros((len(vm_names), num_nodes), dtype=bool)
+        for i, v in enumerate(vm_names):
+            nodes = np.asarray(list(placements[v][1]), dtype=np.int64)
+            nodes = nodes[(nodes >= 0) & (nodes < num_nodes)]
+            vm_nodes[i, nodes] = True
+
+        pf_idx = np.nonzero((self._pci_num_vfs > 0) & (self._pci_numa >= 0))[0]
+        # (num_vms, num_pfs) mask, vm and pf on same host and pf numa node in vm numa nodes
+        same_host = vm_host[:, None] == self._pci_host[pf_idx][None, :]
+        on_node = vm_nodes[:, self._pci_numa[pf_idx]]
+        mask = same_host & on_node
+        return {
+            v: self._pci_ids[pf_idx[mask[i]]].tolist() for i, v in enumerate(vm_names)
+        }
@@ -0,0 +1,229 @@
+"""
+PodWarmPool, is a pool of pre-created pods that are kept running
+between scenarios.
+
+Each pod manifest the pool applies is labeled as a pool pod and annotated
+with hash of the manifest and node it is pinned to.  On next scenario pool
+compares running pods against current manifests and
+
+    reuse   pod exists, not terminating and hash and node match
+    recycle pod exists but manifest or node changed, delete and re-create
+    create  pod doesn't exist
+
+hence only pods whose spec changed pay cold start, image pull and CNI attach.
+Pool pods no current entry references, i.e. spell spec key removed,
+deleted on plan.
+
+Pool pods outlive scenarios, hence pool never drains itself.  Owner of the
+pool, code that creates it and passes it to CallbackPodsOperator, calls
+drain() once all scenarios done.
+
+Author: Mus
+ spyroot@gmail.com
+ mbayramo@stanford.edu
+"""
+import copy
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from collections import namedtuple
+from pathlib import Path
+from typing import Dict, List, Optional, Any, Union
+
+import yaml
+
+from warlock.operators.shell_operator import ShellOperator
+from warlock.states.kube_state_reader import KubernetesState
+
+POOL_LABEL = "warlock.io/warm-pool"
+SPEC_HASH_ANNOTATION = "warlock.io/spec-hash"
+NODE_ANNOTATION = "warlock.io/node"
+
+# pod of the pool, key is spell spec key
+PoolEntry = namedtuple('PoolEntry', ['key', 'pod_name', 'namespace', 'spec_hash', 'node', 'manifest_path'])
+
+# what pool does with each entry on scenario begin,
+# orphan is (namespace, pod name) of pool pods no entry references
+PoolPlan = namedtuple('PoolPlan', ['reuse', 'recycle', 'create', 'orphan'])
+
+
+def manifest_node(
+        manifest: Dict[str, Any]
+) -> str:
+    """Return node pod manifest pinned to, nodeName or hostname
+    node selector, empty string if pod not pinned.
+    """
+    spec = manifest.get('spec', {})
+    if spec.get('nodeName'):
+        return spec['nodeName']
+    return (spec.get('nodeSelector') or {}).get('kubernetes.io/hostname', '')
+
+
+def manifest_hash(
+        manifest: Dict[str, Any]
+) -> str:
+    """Return hash of pod manifest,  pool label and annotations are excluded
+    so hash of a manifest and of a pod created from it are the same.
+    """
+    manifest = copy.deepcopy(manifest)
+    metadata = manifest.get('metadata', {})
+    for key in ('labels', 'annotations'):
+        values = metadata.get(key) or {}
+        for pool_key in (POOL_LABEL, SPEC_HASH_ANNOTATION, NODE_ANNOTATION):
+            values.pop(pool_key, None)
+        if not values:
+            metadata.pop(key, None)
+    manifest.pop('status', None)
+    data = json.dumps(manifest, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(data.encode()).hexdigest()[:16]
+
+
+class PodWarmPool:
+    def __init__(
+            self,
+            work_dir: Optional[Union[str, Path]] = None,
+            kube_state: Optional[KubernetesState] = None,
+            logger: Optional[logging.Logger] = None,
+    ):
+        """
+        :param work_dir: directory annotated manifests written to, default temp dir.
+        :param kube_state: optional KubernetesState, pool pods listed through
+                           API server if state uses api backend, otherwise kubectl.
+        :param logger: optional logger
+        """
+        self.work_dir = Path(work_dir) if work_dir else Path(tempfile.mkdtemp(prefix="warlock-pool-"))
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        self._kube_state = kube_state
+        self.logger = logger if logger else logging.getLogger(__name__)
+        # warm pods handed out, key is spell spec key
+        self._entries: Dict[str, PoolEntry] = {}
+        # namespaces pool ever created pods in
+        self._namespaces = set()
+
+    @property
+    def entries(self) -> Dict[str, PoolEntry]:
+        """Return pool entries of last scenario."""
+        return dict(self._entries)
+
+    def prepare(
+            self,
+            key: str,
+            pod_name: str,
+            namespace: str,
+            spec_path: Union[str, Path],
+    ) -> PoolEntry:
+        """Read pod manifest, set pod name, pool label and hash annotations
+        and write annotated manifest to work dir.
+
+        :param key: spell spec key
+        :param pod_name: pod name
+        :param namespace: pod namespace
+        :param spec_path: path to pod manifest
+        :return: PoolEntry
+        """
+        with open(spec_path, "r") as f:
+            manifest = yaml.safe_load(f)
+
+        metadata = manifest.setdefault('metadata', {})
+        metadata['name'] = pod_name
+        spec_hash = manifest_hash(manifest)
+        node = manifest_node(manifest)
+
+        metadata.setdefault('labels', {})[POOL_LABEL] = "true"
+        annotations = metadata.setdefault('annotations', {})
+        annotations[SPEC_HASH_ANNOTATION] = spec_hash
+        annotations[NODE_ANNOTATION] = node
+
+        manifest_path = self.work_dir / f"{namespace}-{pod_name}.yaml"
+        tmp_path = manifest_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            yaml.safe_dump(manifest, f)
+        os.replace(tmp_path, manifest_path)
+
+        return PoolEntry(key, pod_name, namespace, spec_hash, node, manifest_path)
+
+    def list_pool_pods(
+            self,
+            namespace: str
+    ) -> Dict[str, Dict[str, Any]]:
+        """Return pool pods of namespace, a dict pod name to pod.
+        :param namespace: namespace
+        :return:
+        """
+        selector = f"{POOL_LABEL}=true"
+        if self._kube_state is not None and self._kube_state.api is not None:
+            pods = self._kube_state.api.list_pods(namespace, label_selector=selector)
+        else:
+            pods = ShellOperator.run_command_json(f"kubectl get pods -n {namespace} -l {selector} -o json")
+        return {p['metadata']['name']: p for p in pods.get('items', [])}
+
+    @staticmethod
+    def is_reusable(
+            entry: PoolEntry,
+            pod: Dict[str, Any]
+    ) -> bool:
+        """Return True if running pod matches pool entry and can be handed out.
+        :param entry: pool entry
+        :param pod: pod
+        :return:
+        """
+        metadata = pod.get('metadata', {})
+        if metadata.get('deletionTimestamp'):
+            return False
+        if pod.get('status', {}).get('phase') not in ('Pending', 'Running'):
+            return False
+        annotations = metadata.get('annotations') or {}
+        if annotations.get(SPEC_HASH_ANNOTATION) != entry.spec_hash:
+            return False
+        if entry.node and pod.get('spec', {}).get('nodeName', entry.node) != entry.node:
+            return False
+        return True
+
+    def plan(
+            self,
+            entries: List[PoolEntry]
+    ) -> PoolPlan:
+        """Split entries into pods to reuse, recycle and create.  Pool pods
+        no entry references, in namespaces of entries or of pods pool
+        handed out before, deleted.
+
+        :param entries: list of pool entries
+        :return: PoolPlan
+        """
+        self._namespaces.update(e.namespace for e in entries)
+        pods_by_ns = {ns: self.list_pool_pods(ns) for ns in sorted(self._namespaces)}
+
+        plan = PoolPlan([], [], [], [])
+        for entry in entries:
+            pod = pods_by_ns[entry.namespace].get(entry.pod_name)
+            if pod is None:
+                plan.create.append(entry)
+            elif self.is_reusable(entry, pod):
+                plan.reuse.append(entry)
+            else:
+                plan.recycle.append(entry)
+
+        referenced = {(e.namespace, e.pod_name) for e in entries}
+        for ns, pods in pods_by_ns.items():
+            orphans = [name for name in pods if (ns, name) not in referenced]
+            if orphans:
+                ShellOperator.run_command(
+                    f"kubectl delete pod {' '.join(orphans)} -n {ns} --ignore-not-found --wait=false")
+                plan.orphan.extend((ns, name) for name in orphans)
+
+        self._entries = {e.key: e for e in entries}
+        self.logger.info(
+            f"warm pool reuse {len(plan.reuse)} recycle {len(plan.recycle)} create {len(plan.create)} "
+            f"delete {len(plan.orphan)} pods")
+        return plan
+
+    def drain(self):
+        """Delete all pool pods in namespaces pool used and forget them,
+        called by pool owner once all scenarios done.
+        """
+        for ns in sorted(self._namespaces):
+            ShellOperator.run_command(f"kubectl delete pod -n {ns} -l {POOL_LABEL}=true --ignore-not-found")
+        self._entries = {}
+        self._namespaces = set()
@@ -0,0 +1,407 @@
+"""
+TopologyIndex, joins Kubernetes and vCenter state of a scenario
+pod -> node -> VM -> ESXi host -> vmnic / VF / port id into a set of
+dictionaries, so every direction is a single lookup.
+
+Index built once per scenario from WarlockState,  pods from
+CallbackPodsOperator, VMs from CallbackIaasObserver and ports and VFs
+from CallbackEsxiObserver.  Kubernetes node to VM join done on node name,
+on TKG/CAPV worker node name is VM name.  If names differ, node matched to
+VM which name contains node name or is contained in node name on a "-" or
+"." boundary.  Fallback match accepted only if it is unique and one to one,
+an ambiguous node or a VM claimed by several nodes left unlinked.  Match
+is done only once at build time.
+
+Example:
+
+    topology = TopologyIndex.from_caster_state(caster_state)
+    vm = topology.vm_of_pod("iperf-server")
+    host = topology.host_of_vm(vm)
+    vm = topology.vm_of_port(host, 67108881)
+
+Author: Mus
+ spyroot@gmail.com
+ mbayramo@stanford.edu
+"""
+import logging
+import re
+from collections import namedtuple
+from typing import Dict, List, Optional, Any, Tuple
+
+# joined path of a pod, None for hop that can't be resolved
+TopologyPath = namedtuple(
+    'TopologyPath', [
+        'pod',
+        'namespace',
+        'pod_ip',
+        'node',
+        'node_ip',
+        'vm',
+        'esxi_host',
+        'vmnics',
+        'sriov_vmnics',
+        'port_ids',
+        'vf_ids',
+    ]
+)
+
+
+class TopologyIndex:
+    def __init__(
+            self,
+            logger: Optional[logging.Logger] = None
+    ):
+        """Empty index, use build or from_caster_state.
+        :param logger: optional logger
+        """
+        self.logger = logger if logger else logging.getLogger(__name__)
+        # pod -> (namespace, pod ip, node), spell key -> pod
+        self._pods: Dict[str, Tuple[str, Optional[str], Optional[str]]] = {}
+        self._pod_of_key: Dict[str, str] = {}
+        self._pod_of_ip: Dict[str, str] = {}
+        # node <-> node ip, node -> pods
+        self._node_ip: Dict[str, str] = {}
+        self._node_of_ip: Dict[str, str] = {}
+        self._pods_of_node: Dict[str, List[str]] = {}
+        # node <-> vm
+        self._vm_of_node: Dict[str, str] = {}
+        self._node_of_vm: Dict[str, str] = {}
+        # vm <-> esxi host
+        self._host_of_vm: Dict[str, str] = {}
+        self._vms_of_host: Dict[str, List[str]] = {}
+        # vm <-> vmnic
+        self._vmnics_of_vm: Dict[str, Tuple[List[str], List[str]]] = {}
+        self._vms_of_vmnic: Dict[Tuple[str, str], List[str]] = {}
+        # vm <-> port id and VF
+        self._ports_of_vm: Dict[str, List[int]] = {}
+        self._vm_of_port: Dict[Tuple[str, int], str] = {}
+        self._vfs_of_vm: Dict[str, List[str]] = {}
+        self._vm_of_vf: Dict[Tuple[str, str], str] = {}
+
+    @staticmethod
+    def _contains_token(
+            name: str,
+            part: str
+    ) -> bool:
+        """Return True if part is in name on a "-" or "." boundary."""
+        return re.search(rf'(^|[-.]){re.escape(part)}($|[-.])', name) is not None
+
+    @staticmethod
+    def _match_vm(
+            node: str,
+            vm_names: List[str]
+    ) -> List[str]:
+        """Return candidate VMs of Kubernetes node, exact name or
+        name that contains node name or is contained in node name.
+        """
+        if node in vm_names:
+            return [node]
+        return [
+            vm_name for vm_name in vm_names
+            if TopologyIndex._contains_token(vm_name, node) or TopologyIndex._contains_token(node, vm_name)
+        ]
+
+    def add_pod(
+            self,
+            pod: str,
+            namespace: Optional[str] = "default",
+            pod_ip: Optional[str] = None,
+            node: Optional[str] = None,
+            node_ip: Optional[str] = None,
+            key: Optional[str] = None,
+    ):
+        """Add pod and node it runs on.
+        :param pod: pod name
+        :param namespace: pod namespace
+        :param pod_ip: pod ip address
+        :param node: node name, resolved from node_ip if None
+        :param node_ip: node ip address
+        :param key: optional spell spec key of pod
+        """
+        if node is None and node_ip is not None:
+            node = self._node_of_ip.get(node_ip)
+        if node is not None and node_ip is not None:
+            self.add_node(node, node_ip)
+
+        self._pods[pod] = (namespace, pod_ip, node)
+        if key is not None:
+            self._pod_of_key[key] = pod
+        if pod_ip:
+            self._pod_of_ip[pod_ip] = pod
+        if node is not None:
+            pods = self._pods_of_node.setdefault(node, [])
+            if pod not in pods:
+                pods.append(pod)
+
+    def add_node(
+            self,
+            node: str,
+            node_ip: str
+    ):
+        """Add Kubernetes node address."""
+        self._node_ip[node] = node_ip
+        self._node_of_ip[node_ip] = node
+
+    def add_vm(
+            self,
+            vm: str,
+            esxi_host: Optional[str],
+            vmnics: Optional[List[str]] = None,
+            sriov_vmnics: Optional[List[str]] = None,
+    ):
+        """Add VM, ESXi host it runs on and host uplinks VM uses.
+        :param vm: VM name
+        :param esxi_host: ESXi host
+        :param vmnics: non SR-IOV vmnics
+        :param sriov_vmnics: SR-IOV PF vmnics
+        """
+        vmnics = list(vmnics or [])
+        sriov_vmnics = list(sriov_vmnics or [])
+        self._vmnics_of_vm[vm] = (vmnics, sriov_vmnics)
+        if esxi_host is None:
+            return
+        self._host_of_vm[vm] = esxi_host
+        vms = self._vms_of_host.setdefault(esxi_host, [])
+        if vm not in vms:
+            vms.append(vm)
+        for vmnic in vmnics + sriov_vmnics:
+            vms = self._vms_of_vmnic.setdefault((esxi_host, vmnic), [])
+            if vm not in vms:
+                vms.append(vm)
+
+    def add_ports(
+            self,
+            vm: str,
+            esxi_host: str,
+            port_ids: List[int],
+            vf_ids: Optional[List[str]] = None,
+    ):
+        """Add ESXi port ids and VFs of VM.
+        :param vm: VM name
+        :param esxi_host: ESXi host
+        :param port_ids: port ids of VM on host
+        :param vf_ids: VF PCI addresses or ids owned by VM
+        """
+        self._ports_of_vm[vm] = list(port_ids)
+        for port_id in port_ids:
+            self._vm_of_port[(esxi_host, int(port_id))] = vm
+        self._vfs_of_vm[vm] = list(vf_ids or [])
+        for vf_id in self._vfs_of_vm[vm]:
+            self._vm_of_vf[(esxi_host, str(vf_id))] = vm
+
+    def add_esxi_states(
+            self,
+            esxi_node_states: Optional[Dict[str, Dict[str, Any]]]
+    ):
+        """Add port ids and VFs of VMs as CallbackEsxiObserver stores them.
+        :param esxi_node_states: esxi_node_states, host to vm to {'port_ids', 'active_vfs'}
+        """
+        for esxi_host, vms in (esxi_node_states or {}).items():
+            for vm, vm_esxi_state in vms.items():
+                port_ids = [p.port_id for p in vm_esxi_state.get('port_ids', [])]
+                vf_ids = [
+                    vf.get('PCIAddress', vf.get('VFID')) for vf in vm_esxi_state.get('active_vfs', [])
+                ]
+                self.add_ports(vm, esxi_host, port_ids, [v for v in vf_ids if v is not None])
+
+    def link_nodes(self):
+        """Join Kubernetes nodes to VMs,  called after nodes and VMs added.
+        Exact names joined first,  a fallback match joined only if node
+        has a single candidate VM and no other node claims that VM.
+        """
+        vm_names = list(self._vmnics_of_vm.keys())
+        self._vm_of_node.clear()
+        self._node_of_vm.clear()
+        nodes = sorted(set(self._node_ip) | set(self._pods_of_node))
+        for node in nodes:
+            if node in self._vmnics_of_vm:
+                self._vm_of_node[node] = node
+                self._node_of_vm[node] = node
+
+        free_vms = [vm for vm in vm_names if vm not in self._node_of_vm]
+        claims: Dict[str, List[str]] = {}
+        for node in nodes:
+            if node in self._vm_of_node:
+                continue
+            candidates = self._match_vm(node, free_vms)
+            if len(candidates) > 1:
+                self.logger.warning(f"node {node} matches VMs {candidates}, node left unlinked")
+            elif candidates:
+                claims.setdefault(candidates[0], []).append(node)
+
+        for vm, claimed_by in claims.items():
+            if len(claimed_by) > 1:
+                self.logger.warning(f"VM {vm} matches nodes {claimed_by}, nodes left unlinked")
+                continue
+            self._vm_of_node[claimed_by[0]] = vm
+            self._node_of_vm[vm] = claimed_by[0]
+
+    @classmethod
+    def build(
+            cls,
+            pods_states: Dict[str, Dict[str, Any]],
+            iaas_state: Optional[Dict[str, Any]] = None,
+            esxi_node_states: Optional[Dict[str, Dict[str, Any]]] = None,
+            node_addr_to_name: Optional[Dict[str, str]] = None,
+    ) -> 'TopologyIndex':
+        """Build index from warlock state parts.
+
+        :param pods_states: k8s_pods_states, spell key to {'ip', 'node_ip', 'pod_state'}
+        :param iaas_state: iaas_state, vm name to VmState and 'vms' list
+        :param esxi_node_states: esxi_node_states, host to vm to {'port_ids', 'active_vfs'}
+        :param node_addr_to_name: optional node ip to node name, i.e. KubernetesState.fetch_nodes_uuid_ip
+        :return: TopologyIndex
+        """
+        index = cls()
+        for node_ip, node in (node_addr_to_name or {}).items():
+            index.add_node(node, node_ip)
+
+        for key, pod_state in (pods_states or {}).items():
+            record = pod_state.get('pod_state')
+            pod = getattr(record, 'name', None) or key
+            node = getattr(record, 'node_name', None)
+            namespace = getattr(record, 'namespace', None) or "default"
+            index.add_pod(pod, namespace, pod_state.get('ip'), node, pod_state.get('node_ip'), key)
+
+        iaas_state = iaas_state or {}
+        for vm in iaas_state.get('vms', []):
+            vm_state = iaas_state.get(vm)
+            if vm_state is None or not hasattr(vm_state, 'pnic_map'):
+                continue
+            esxi_host = vm_state.state.get('esxiHost') if vm_state.state else vm_state.pnic_map.host
+            index.add_vm(vm, esxi_host, vm_state.pnic_map.vnic, vm_state.pnic_map.sriov_vmnic)
+
+        index.add_esxi_states(esxi_node_states)
+        index.link_nodes()
+        return index
+
+    @classmethod
+    def from_caster_state(
+            cls,
+            caster_state,
+            node_addr_to_name: Optional[Dict[str, str]] = None,
+    ) -> 'TopologyIndex':
+        """Build index from WarlockState.
+        :param caster_state: WarlockState
+        :param node_addr_to_name: optional node ip to node name
+        :return: TopologyIndex
+        """
+        return cls.build(
+            caster_state.k8s_pods_states,
+            caster_state.iaas_state,
+            caster_state.esxi_node_states,
+            node_addr_to_name
+        )
+
+    def pod_of_key(self, key: str) -> Optional[str]:
+        """Return pod name of spell spec key."""
+        return self._pod_of_key.get(key)
+
+    def pod_of_ip(self, pod_ip: str) -> Optional[str]:
+        """Return pod of pod ip address."""
+        return self._pod_of_ip.get(pod_ip)
+
+    def node_of_pod(self, pod: str) -> Optional[str]:
+        """Return node pod runs on."""
+        entry = self._pods.get(pod)
+        return entry[2] if entry else None
+
+    def pods_of_node(self, node: str) -> List[str]:
+        """Return pods that run on node."""
+        return list(self._pods_of_node.get(node, []))
+
+    def node_of_ip(self, node_ip: str) -> Optional[str]:
+        """Return node of node ip address."""
+        return self._node_of_ip.get(node_ip)
+
+    def ip_of_node(self, node: str) -> Optional[str]:
+        """Return node ip address."""
+        return self._node_ip.get(node)
+
+    def vm_of_node(self, node: str) -> Optional[str]:
+        """Return VM of Kubernetes node."""
+        return self._vm_of_node.get(node)
+
+    def node_of_vm(self, vm: str) -> Optional[str]:
+        """Return Kubernetes node of VM."""
+        return self._node_of_vm.get(vm)
+
+    def vm_of_pod(self, pod: str) -> Optional[str]:
+        """Return VM pod runs on."""
+        node = self.node_of_pod(pod)
+        return self._vm_of_node.get(node) if node else None
+
+    def pods_of_vm(self, vm: str) -> List[str]:
+        """Return pods that run on VM."""
+        node = self._node_of_vm.get(vm)
+        return self.pods_of_node(node) if node else []
+
+    def vms(self) -> List[str]:
+        """Return all VMs in index."""
+        return list(self._vmnics_of_vm.keys())
+
+    def host_vmnics(self) -> List[Tuple[str, str]]:
+        """Return (esxi host, vmnic) uplinks used by VMs in index."""
+        return list(self._vms_of_vmnic.keys())
+
+    def host_of_vm(self, vm: str) -> Optional[str]:
+        """Return ESXi host VM runs on."""
+        return self._host_of_vm.get(vm)
+
+    def vms_of_host(self, esxi_host: str) -> List[str]:
+        """Return VMs that run on ESXi host."""
+        return list(self._vms_of_host.get(esxi_host, []))
+
+    def vmnics_of_vm(self, vm: str) -> Tuple[List[str], List[str]]:
+        """Return (vmnics, SR-IOV vmnics) of VM."""
+        vmnics, sriov_vmnics = self._vmnics_of_vm.get(vm, ([], []))
+        return list(vmnics), list(sriov_vmnics)
+
+    def vms_of_vmnic(self, esxi_host: str, vmnic: str) -> List[str]:
+        """Return VMs that use host vmnic."""
+        return list(self._vms_of_vmnic.get((esxi_host, vmnic), []))
+
+    def ports_of_vm(self, vm: str) -> List[int]:
+        """Return ESXi port ids of VM."""
+        return list(self._ports_of_vm.get(vm, []))
+
+    def vm_of_port(self, esxi_host: str, port_id: int) -> Optional[str]:
+        """Return VM that owns port id on ESXi host."""
+        return self._vm_of_port.get((esxi_host, int(port_id)))
+
+    def vfs_of_vm(self, vm: str) -> List[str]:
+        """Return VFs owned by VM."""
+        return list(self._vfs_of_vm.get(vm, []))
+
+    def vm_of_vf(self, esxi_host: str, vf_id: str) -> Optional[str]:
+        """Return VM that owns VF on ESXi host."""
+        return self._vm_of_vf.get((esxi_host, str(vf_id)))
+
+    def path(self, pod: str) -> Optional[TopologyPath]:
+        """Return joined path of pod, None if pod unknown.
+        :param pod: pod name
+        :return: TopologyPath
+        """
+        entry = self._pods.get(pod)
+        if entry is None:
+            return None
+        namespace, pod_ip, node = entry
+        vm = self._vm_of_node.get(node) if node else None
+        vmnics, sriov_vmnics = self.vmnics_of_vm(vm) if vm else ([], [])
+        return TopologyPath(
+            pod=pod,
+            namespace=namespace,
+            pod_ip=pod_ip,
+            node=node,
+            node_ip=self._node_ip.get(node) if node else None,
+            vm=vm,
+            esxi_host=self._host_of_vm.get(vm) if vm else None,
+            vmnics=vmnics,
+            sriov_vmnics=sriov_vmnics,
+            port_ids=self.ports_of_vm(vm) if vm else [],
+            vf_ids=self.vfs_of_vm(vm) if vm else [],
+        )
+
+    def paths(self) -> List[TopologyPath]:
+        """Return joined paths of all pods."""
+        return [self.path(pod) for pod in self._pods]
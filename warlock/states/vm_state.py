@@ -23,9 +23,12 @@ from typing import (
     Optional,
     List,
     Tuple,
-    Any, Union
+    Any, Union,
+    Iterable,
+    Set
 )
 
+import numpy as np
 from pyVim.connect import (
     SmartConnect,
     Disconnect
@@ -35,10 +38,14 @@ from contextlib import contextmanager
 from pyVmomi import vim
 import atexit
 import ssl
+import threading
 import time
 from pyVmomi import vim, vmodl
 
 from warlock.operators.ssh_operator import SSHOperator
+from warlock.states.esxi_host_hardware import EsxiHostHardware
+from warlock.states.numa_topology import NumaTopology
+from warlock.states.inventory_snapshot import InventorySnapshot
 
 VMConfigInfo = vim.vm.ConfigInfo
 VirtualHardwareInfo = vim.vm.VirtualHardware
@@ -219,6 +226,20 @@ class VMwareVimStateReader:
         # esxi host pnic, key is esxi identifier
         self._host_device_pnic = {}
 
+        # esxi host hardware model, key is esxi identifier (moid, name, uuid)
+        # all VMs on same host share same model.
+        self._host_hardware: Dict[str, EsxiHostHardware] = {}
+
+        # cluster wide numa topology, built from host hardware models
+        self._numa_topology: Optional[NumaTopology] = None
+
+        # inventory snapshot loaded on warm start and background reconciler
+        self._inventory: Optional[InventorySnapshot] = None
+        self._inventory_reconciler: Optional[threading.Thread] = None
+        # guards multi-step cache updates (inventory, DVS uplink index),
+        # reader shared by background reconciler and AsyncVimStateReader workers
+        self._inventory_lock = threading.RLock()
+
         # vc
         self.si = None
 
@@ -229,11 +250,28 @@ class VMwareVimStateReader:
         self._cache_timestamp = None
         self._cache_timeout = 300
         self._obj_cache = {}
+        # guards connect_to_vcenter, reader used from many threads
+        self._connect_lock = threading.Lock()
+        # dvs uplink index, switch uuid -> {host: [pnics]}
         self._dvs_cache = {}
+        # (switch uuid, host name) -> [pnics]
+        self._dvs_uplinks: Dict[Tuple[str, str], List[str]] = {}
+        # portgroup key -> switch uuid
+        self._portgroup_switch: Dict[str, str] = {}
+        # switch uuid -> config.configVersion uplink index built from
+        self._dvs_config_version: Dict[str, Optional[str]] = {}
+        # config versions re-checked on read once index older than ttl seconds
+        self.dvs_index_ttl = 30
+        self._dvs_index_checked: Optional[float] = None
 
     def connect_to_vcenter(self):
         """Connect to the vCenter server and store the connection instance."""
-        if not self.si:
+        if self.si:
+            return
+
+        with self._connect_lock:
+            if self.si:
+                return
             context = ssl._create_unverified_context()
             try:
                 self.si = SmartConnect(
@@ -526,45 +564,180 @@ class VMwareVimStateReader:
            }
 
 
+        Served from DVS uplink index, index built for all switches on first
+        read and switch config versions re-checked once index is older than
+        dvs_index_ttl, see ensure_dvs_uplink_index.
+
         :param switch_uuid: The UUID of the Distributed Virtual Switch.
         :return: A dictionary where keys are host identifiers and values are lists of pNICs.
         :raises SwitchNotFound: If no DVS with the given UUID is found.
         """
         start_time = time.time()
-        if switch_uuid in self._dvs_cache:
-            self.logger.debug(
-                f"read_dvs_pnics_by_switch_uuid for {switch_uuid}, "
-                f"cache took {time.time() - start_time:.2f} seconds")
-            return self._dvs_cache[switch_uuid]
+        if not self.ensure_dvs_uplink_index() and switch_uuid not in self._dvs_cache:
+            self.build_dvs_uplink_index()
 
-        dvs_pnics_by_host = {}
-        start_time = time.time()
-        _dvs = self.get_dvs_by_uuid(switch_uuid)
-        if _dvs.config.host is None:
-            raise ValueError("DVS has no host associated with.")
-
-        _dvs_hosts = _dvs.config.host
-        for host_member in _dvs_hosts:
-            if (hasattr(host_member, 'config')
-                    and hasattr(host_member.config, 'host') and host_member.config.host):
-                _dvs_host_member = getattr(host_member.config.host, 'name', 'Unknown Host')
-                if _dvs_host_member not in dvs_pnics_by_host:
-                    dvs_pnics_by_host[_dvs_host_member] = []
-
-                # we take pnic from backing config
-                if (hasattr(host_member.config, 'backing')
-                        and hasattr(host_member.config.backing, 'pnicSpec')):
-
-                    dvs_pnics_by_host[_dvs_host_member] = [
-                        pnic_spec.pnicDevice for pnic_spec in host_member.config.backing.pnicSpec
-                    ]
+        dvs_pnics_by_host = self._dvs_cache.get(switch_uuid)
+        if dvs_pnics_by_host is None:
+            raise SwitchNotFound(switch_uuid)
+
+        self.logger.debug(
+            f"read_dvs_pnics_by_switch_uuid for {switch_uuid}, "
+            f"took {time.time() - start_time:.2f} seconds")
+        return dvs_pnics_by_host
 
+    def _index_dvs_uplinks(
+            self,
+            switch_uuid: str,
+            config_version: Optional[str],
+            dvs_pnics_by_host: Dict[str, List[str]]
+    ):
+        """Add switch to DVS uplink index.
+        :param switch_uuid: DVS uuid
+        :param config_version: DVS config.configVersion index built from.
+        :param dvs_pnics_by_host: a dict where key is esxi host name and value list of pnics.
+        :return:
+        """
+        self._drop_dvs_uplinks(switch_uuid)
         self._dvs_cache[switch_uuid] = dvs_pnics_by_host
+        self._dvs_config_version[switch_uuid] = config_version
+        for host_name, pnics in dvs_pnics_by_host.items():
+            self._dvs_uplinks[(switch_uuid, host_name)] = pnics
+
+    def _drop_dvs_uplinks(
+            self,
+            switch_uuid: str
+    ):
+        """Remove switch and its portgroups from DVS uplink index.
+        :param switch_uuid: DVS uuid
+        :return:
+        """
+        dvs_pnics_by_host = self._dvs_cache.pop(switch_uuid, None) or {}
+        self._dvs_config_version.pop(switch_uuid, None)
+        for host_name in dvs_pnics_by_host:
+            self._dvs_uplinks.pop((switch_uuid, host_name), None)
+        for pg_key in [k for k, v in self._portgroup_switch.items() if v == switch_uuid]:
+            del self._portgroup_switch[pg_key]
+
+    def build_dvs_uplink_index(
+            self
+    ) -> Dict[str, Optional[str]]:
+        """Build (switch uuid, esxi host) -> pNICs and portgroup key -> switch uuid
+        index for all DVS.  Index is rebuilt only for switches which
+        config.configVersion changed since last build, hence if nothing changed
+        method costs a single property collector round trip.  Switch uuid,
+        config version and host members are collected in that one call.
+
+        :return: a dict where key is switch uuid and value config version index built from.
+        """
+        start_time = time.time()
+        self.connect_to_vcenter()
+        root = self.si.content.rootFolder
+
+        switches = self.collect_properties(
+            root, vim.DistributedVirtualSwitch, ['uuid', 'config.configVersion', 'config.host'])
+        # index updated in many steps, reader shared by worker threads
+        with self._inventory_lock:
+            self._dvs_index_checked = time.monotonic()
+            live = {props['uuid']: props.get('config.configVersion') for props in switches.values()}
+            for switch_uuid in [s for s in self._dvs_config_version if s not in live]:
+                self._drop_dvs_uplinks(switch_uuid)
+
+            changed = {
+                switch_uuid for switch_uuid, config_version in live.items()
+                if switch_uuid not in self._dvs_config_version
+                or self._dvs_config_version[switch_uuid] != config_version
+            }
+            if not changed:
+                return dict(self._dvs_config_version)
+
+            host_names = {
+                host_ref._moId: props['name'] for host_ref, props in
+                self.collect_properties(root, vim.HostSystem, ['name']).items()
+            }
+
+            switch_uuid_by_moid = {}
+            for switch_ref, props in switches.items():
+                switch_uuid = props['uuid']
+                switch_uuid_by_moid[switch_ref._moId] = switch_uuid
+                if switch_uuid not in changed:
+                    continue
+
+                dvs_pnics_by_host = {}
+                for host_member in props.get('config.host') or []:
+                    if host_member.config is None or host_member.config.host is None:
+                        continue
+                    host_name = host_names.get(host_member.config.host._moId, 'Unknown Host')
+                    backing = host_member.config.backing
+                    dvs_pnics_by_host[host_name] = [
+                        pnic_spec.pnicDevice for pnic_spec in backing.pnicSpec
+                    ] if backing is not None and hasattr(backing, 'pnicSpec') else []
+
+                self._index_dvs_uplinks(switch_uuid, props.get('config.configVersion'), dvs_pnics_by_host)
+
+            for pg_ref, props in self.collect_properties(
+                    root, vim.dvs.DistributedVirtualPortgroup, ['key', 'config.distributedVirtualSwitch']).items():
+                switch_ref = props.get('config.distributedVirtualSwitch')
+                if switch_ref is not None and switch_uuid_by_moid.get(switch_ref._moId) in changed:
+                    self._portgroup_switch[props['key']] = switch_uuid_by_moid[switch_ref._moId]
+
         self.logger.debug(
-            f"read_dvs_pnics_by_switch_uuid - {switch_uuid} "
+            f"build_dvs_uplink_index, re-indexed {len(changed)} switches, "
             f"took {time.time() - start_time:.2f} seconds")
+        return dict(self._dvs_config_version)
 
-        return dvs_pnics_by_host
+    def ensure_dvs_uplink_index(self) -> bool:
+        """Build DVS uplink index or re-check switch config versions
+        if index is older than dvs_index_ttl seconds.
+        :return: True if config versions were checked against vCenter.
+        """
+        if (self._dvs_index_checked is not None
+                and time.monotonic() - self._dvs_index_checked < self.dvs_index_ttl):
+            return False
+        self.build_dvs_uplink_index()
+        return True
+
+    def find_dvs_uplinks(
+            self,
+            switch_uuid: str,
+            esxi_host: str
+    ) -> List[str]:
+        """Return pNICs that back DVS on particular ESXi host.
+        :param switch_uuid: DVS uuid
+        :param esxi_host: esxi host name
+        :return: list of pnic names, i.e. ['vmnic5'], empty if host not member of DVS.
+        :raises SwitchNotFound: If no DVS with the given UUID is found.
+        """
+        self.ensure_dvs_uplink_index()
+        pnics = self._dvs_uplinks.get((switch_uuid, esxi_host))
+        if pnics is not None:
+            return pnics
+        return self.read_dvs_pnics_by_switch_uuid(switch_uuid).get(esxi_host, [])
+
+    def dvs_switches_of_hosts(
+            self,
+            host_names: Iterable[str]
+    ) -> Set[str]:
+        """Return uuids of DVS that have uplinks on any of ESXi hosts.
+        :param host_names: esxi host names
+        :return: set of switch uuids
+        """
+        host_names = set(host_names)
+        self.ensure_dvs_uplink_index()
+        with self._inventory_lock:
+            keys = list(self._dvs_uplinks)
+        return {switch_uuid for switch_uuid, host_name in keys if host_name in host_names}
+
+    def find_portgroup_switch(
+            self,
+            portgroup_key: str
+    ) -> Optional[str]:
+        """Return DVS uuid portgroup belongs to.
+        :param portgroup_key: portgroup key, i.e. dvportgroup-69
+        :return: switch uuid or None if portgroup not found.
+        """
+        if not self.ensure_dvs_uplink_index() and portgroup_key not in self._portgroup_switch:
+            self.build_dvs_uplink_index()
+        return self._portgroup_switch.get(portgroup_key)
 
     def get_dvs_by_uuid(
             self,
@@ -699,12 +872,14 @@ class VMwareVimStateReader:
         for device in vm.config.hardware.device:
             if isinstance(device, vim.vm.device.VirtualEthernetCard) and \
                     isinstance(device.backing, VMwareDvsBackingInfo):
-                if hasattr(device.backing, 'port') and hasattr(device.backing.port, 'switchUuid'):
-                    switch_uuid = device.backing.port.switchUuid
-                    if switch_uuid not in processed_switches:
-                        vm_network_data = self.read_dvs_pnics_by_switch_uuid(switch_uuid)
-                        all_vm_network_data[switch_uuid] = vm_network_data
-                        processed_switches.add(switch_uuid)
+                port = getattr(device.backing, 'port', None)
+                switch_uuid = getattr(port, 'switchUuid', None)
+                if switch_uuid is None and getattr(port, 'portgroupKey', None):
+                    switch_uuid = self.find_portgroup_switch(port.portgroupKey)
+                if switch_uuid is not None and switch_uuid not in processed_switches:
+                    vm_network_data = self.read_dvs_pnics_by_switch_uuid(switch_uuid)
+                    all_vm_network_data[switch_uuid] = vm_network_data
+                    processed_switches.add(switch_uuid)
 
         self.logger.debug(
             f"read_vm_pnic_info, took {time.time() - start_time:.2f} seconds")
@@ -748,9 +923,11 @@ class VMwareVimStateReader:
             if vm:
                 if vm.runtime is not None and vm.runtime.host is not None:
                     host = vm.runtime.host
-                    host_info = VMwareHost(uuid=host.summary.hardware.uuid,
-                                           host=host.summary.config.name,
-                                           moid=host.summary.host)
+                    # summary is a property fetch, read it once
+                    host_summary = host.summary
+                    host_info = VMwareHost(uuid=host_summary.hardware.uuid,
+                                           host=host_summary.config.name,
+                                           moid=host_summary.host)
                     self._add_to_host_cache(host, host_info)
                     self.esxi_host_cache[vm_name] = host_info
                     return host_info
@@ -905,9 +1082,10 @@ class VMwareVimStateReader:
 
         try:
             for host in container.view:
+                host_summary = host.summary
                 self.esxi_host_cache['name'][host.name] = host
-                self.esxi_host_cache['uuid'][host.summary.hardware.uuid] = host
-                self.esxi_host_cache['moId'][str(host.summary.host)] = host
+                self.esxi_host_cache['uuid'][host_summary.hardware.uuid] = host
+                self.esxi_host_cache['moId'][str(host_summary.host)] = host
 
         finally:
             container.Destroy()
@@ -950,13 +1128,14 @@ class VMwareVimStateReader:
 
         try:
             for host in container.view:
+                host_summary = host.summary
                 host_name = host.name
-                host_uuid = host.summary.hardware.uuid
-                host_moid = str(host.summary.host)
+                host_uuid = host_summary.hardware.uuid
+                host_moid = str(host_summary.host)
 
                 host_info = VMwareHost(uuid=host_uuid,
                                        host=host_name,
-                                       moid=str(host.summary.host))
+                                       moid=host_moid)
                 self._add_to_host_cache(host, host_info)
                 if identifier in [host_name, host_uuid, host_moid]:
                     self.logger.debug(
@@ -999,11 +1178,59 @@ class VMwareVimStateReader:
             f"read_esxi_mgmt_address, took {time.time() - start_time:.2f} seconds")
         return host_address
 
+    def _read_host_hardware(
+            self,
+            host_system: vim.HostSystem,
+            esxi_host_identifier: Optional[str] = None
+    ) -> EsxiHostHardware:
+        """Return hardware model for a host system object,  model built once
+        per host (keyed by host managed object id) and shared.
+
+        :param host_system: vim.HostSystem
+        :param esxi_host_identifier: optional identifier caller used to resolve a host.
+        :return: EsxiHostHardware
+        """
+        host_moid = host_system._moId
+        hardware = self._host_hardware.get(host_moid)
+        if hardware is None:
+            start_time = time.time()
+            hardware = EsxiHostHardware.from_host_system(host_system)
+            self._host_hardware[host_moid] = hardware
+            self.logger.debug(
+                f"_read_host_hardware for {host_moid} took {time.time() - start_time:.2f} seconds")
+
+        if esxi_host_identifier is not None:
+            self._host_hardware[esxi_host_identifier] = hardware
+
+        return hardware
+
+    def read_host_hardware(
+            self,
+            esxi_host_identifier: str
+    ) -> EsxiHostHardware:
+        """Return hardware model ( NUMA, PCI devices, pNICs ) for ESXi host.
+        The model is built once per host and shared by all callers,
+        i.e. all VMs that run on the same host.
+
+        :param esxi_host_identifier: IP address, name, UUID, or host system ID of the ESXi host.
+        :return: EsxiHostHardware
+        :raise EsxHostNotFound: if ESXi host with identifier not found
+        """
+        if esxi_host_identifier in self._host_hardware:
+            return self._host_hardware[esxi_host_identifier]
+
+        self.connect_to_vcenter()
+        host_system = self.read_esxi_host(esxi_host_identifier)
+        if not host_system:
+            raise EsxHostNotFound(f"ESXi host {esxi_host_identifier} not found")
+
+        return self._read_host_hardware(host_system, esxi_host_identifier)
+
     def read_pci_devices(
             self,
             esxi_host_identifier: Optional[str] = None,
             filter_class: Optional[PciDeviceClass] = None,
-    ) -> Dict[str, VMwarePciDevice]:
+    ) -> Dict[str, Dict[str, VMwarePciDevice]]:
         """Read  all PCI device info from some ESXi if esxi_host_identifier arg supplied
           where  we find based on identifier. i.e. esxi managed object id, uuid.
           if identifies is none then method will read PCI devices for all ESXi hosts.
@@ -1013,29 +1240,23 @@ class VMwareVimStateReader:
 
         :param esxi_host_identifier: Optional; ESXi managed object id, uuid. If None, read from all hosts.
         :param filter_class: Optional; A PCI device class.
-        :return:  a dictionary of PCI device where a key is a PCI device id
+        :return:  a dictionary where a key is esxi host identifier and value
+                  is a dictionary of PCI device where a key is a PCI device id
         :raise EsxHostNotFound: if ESXi host with identifier not found
         """
 
         start_time = time.time()
-        if esxi_host_identifier and esxi_host_identifier in self._pci_dev_cache:
-            return self._pci_dev_cache[esxi_host_identifier]
-
         self.connect_to_vcenter()
         if esxi_host_identifier:
-            host_system = self.read_esxi_host(esxi_host_identifier)
-            if not host_system:
-                raise EsxHostNotFound(f"ESXi host {esxi_host_identifier} not found")
-            hosts = {esxi_host_identifier: host_system}
-        else:
-            hosts = self.read_esxi_hosts()
+            hardware = self.read_host_hardware(esxi_host_identifier)
+            self._pci_dev_cache[esxi_host_identifier] = dict(
+                hardware.pci_devices_by_class(filter_class))
+            return {esxi_host_identifier: self._pci_dev_cache[esxi_host_identifier]}
 
+        hosts = self.read_esxi_hosts()
         for k in hosts:
-            host_system = hosts[str(k)]
-            self._pci_dev_cache[k] = {}
-            for pci_device in host_system.hardware.pciDevice:
-                if filter_class is None or (pci_device.classId >> 8) == filter_class.value:
-                    self._pci_dev_cache[str(k)][pci_device.id] = pci_device
+            hardware = self._read_host_hardware(hosts[k], str(k))
+            self._pci_dev_cache[str(k)] = dict(hardware.pci_devices_by_class(filter_class))
 
         self.logger.debug(f"read_pci_devices for {esxi_host_identifier}, took {time.time() - start_time:.2f} seconds")
         return self._pci_dev_cache
@@ -1053,27 +1274,18 @@ class VMwareVimStateReader:
         :return:VMwarePciDevice
         :raises EsxHostNotFound if ESX host not found
         """
-        start_time = time.time()
         if (esxi_host_identifier in self._pci_dev_cache
                 and pci_device_id in self._pci_dev_cache[esxi_host_identifier]):
             return self._pci_dev_cache[esxi_host_identifier][pci_device_id]
 
-        self.connect_to_vcenter()
-        host_system = self.read_esxi_host(esxi_host_identifier)
-        if not host_system:
-            raise EsxHostNotFound(
-                f"ESXi host {esxi_host_identifier} not found")
-
-        for pci_device in host_system.hardware.pciDevice:
-            if pci_device.id == pci_device_id:
-                if esxi_host_identifier not in self._pci_dev_cache:
-                    self._pci_dev_cache[esxi_host_identifier] = {}
-                self._pci_dev_cache[esxi_host_identifier][pci_device_id] = pci_device
-                self.logger.debug(
-                    f"find_pci_device for {esxi_host_identifier} took {time.time() - start_time:.2f} seconds")
-                return pci_device
+        hardware = self.read_host_hardware(esxi_host_identifier)
+        pci_device = hardware.pci_devices.get(pci_device_id)
+        if pci_device is not None:
+            if esxi_host_identifier not in self._pci_dev_cache:
+                self._pci_dev_cache[esxi_host_identifier] = {}
+            self._pci_dev_cache[esxi_host_identifier][pci_device_id] = pci_device
 
-        return None
+        return pci_device
 
     def read_esxi_host_pnic(
             self,
@@ -1099,23 +1311,9 @@ class VMwareVimStateReader:
         """
         if esxi_identifier in self._host_device_pnic:
             return self._host_device_pnic[esxi_identifier]
-        else:
-            self._host_device_pnic[esxi_identifier] = {}
-
-        self.connect_to_vcenter()
-        host_system = self.read_esxi_host(esxi_identifier)
-
-        for pnic in host_system.config.network.pnic:
-            self._host_device_pnic[esxi_identifier][pnic.device] = {
-                "pci": pnic.pci,
-                'mac': pnic.mac,
-                "driver": pnic.driver,
-                "driver_version": pnic.driverVersion,
-                "driver_firmware": pnic.firmwareVersion,
-                "speed": pnic.linkSpeed.speedMb if pnic.linkSpeed else None,
-                "is_connected": True if pnic.linkSpeed else False
-            }
 
+        hardware = self.read_host_hardware(esxi_identifier)
+        self._host_device_pnic[esxi_identifier] = hardware.pnics
         return self._host_device_pnic[esxi_identifier]
 
     def find_esxi_host_pnic(
@@ -1146,17 +1344,7 @@ class VMwareVimStateReader:
         :param pci_device:  a pci device id
         :return: dictionary where key is pnic name
         """
-        if esxi_host_identified not in self._host_device_pnic:
-            host_pnic_dict = self.read_esxi_host_pnic(esxi_host_identified)
-        else:
-            host_pnic_dict = self._host_device_pnic[esxi_host_identified]
-
-        for pnic in host_pnic_dict:
-            pnic_dict = host_pnic_dict[pnic]
-            if 'pci' in pnic_dict and pnic_dict['pci'] == pci_device:
-                return pnic, pnic_dict
-
-        return None, None
+        return self.read_host_hardware(esxi_host_identified).find_pnic(pci_device)
 
     def read_pci_net_device_info(
             self,
@@ -1200,7 +1388,8 @@ class VMwareVimStateReader:
 
         pci_device_vendor_and_dev = f"{pci_info.id} - {pci_info.vendorName} {pci_info.deviceName}"
         pnic_name, pnic_info_dict = self.find_esxi_host_pnic(esxi_host_identified, pci_device_id)
-        pnic_info_dict["pnic_vendor"] = pci_device_vendor_and_dev
+        # pnic data is shared by host hardware model, we don't mutate it
+        pnic_info_dict = pnic_info_dict or {}
 
         pci_pnic_info = {
             "mac": pnic_info_dict.get("mac", "Not found"),
@@ -1213,7 +1402,7 @@ class VMwareVimStateReader:
             "driver_firmware": pnic_info_dict.get("driver_firmware", "Unknown"),
             "speed": pnic_info_dict.get("speed", 0),
             "is_connected": pnic_info_dict.get("is_connected", False),
-            "pnic_vendor": f"{pci_info.id} - {pci_info.vendorName} {pci_info.deviceName}"
+            "pnic_vendor": pci_device_vendor_and_dev
         }
 
         return pci_pnic_info
@@ -1448,11 +1637,16 @@ class VMwareVimStateReader:
 
     @staticmethod
     def get_numa_node_by_pci_device(
-            pci_device,
-            numa_topology
-    ):
-        """
-        topology must be in format
+            pci_device: str,
+            numa_topology: Union[NumaTopology, Dict[str, Any]],
+            esxi_host: Optional[str] = None
+    ) -> Optional[int]:
+        """Return numa node PCI device attached to.
+
+        numa_topology is cluster wide NumaTopology, see read_numa_topology,
+        device looked up by (esxi_host, pci address) with a binary search.
+        For a single host topology dict in format
+
         {
             'cpu': {
                 <numa_node_id>: [<cpu_id_1>, <cpu_id_2>, ...],
@@ -1463,15 +1657,105 @@ class VMwareVimStateReader:
                 ...
             }
         }
-        :param pci_device:
-        :param numa_topology:
-        :return:
+
+        devices of each node are scanned.
+
+        :param pci_device: pci device id, i.e. 0000:3b:00.0
+        :param numa_topology: NumaTopology or single host topology dict
+        :param esxi_host: esxi host name, required for NumaTopology
+        :return: numa node id or None if device or node unknown
         """
+        if isinstance(numa_topology, NumaTopology):
+            if esxi_host is None:
+                raise ValueError("esxi_host is required for NumaTopology lookup.")
+            node = numa_topology.pci_numa_nodes(esxi_host, [pci_device])[0]
+            return int(node) if node >= 0 else None
+
         for node_id, devices in numa_topology['pci'].items():
             if pci_device in devices:
                 return node_id
         return None
 
+    def read_numa_topology(
+            self,
+            refresh: Optional[bool] = False
+    ) -> NumaTopology:
+        """Return cluster wide NUMA topology for all ESXi hosts,
+        topology keyed by esxi host name.
+
+        :param refresh: rebuild topology from host hardware models.
+        :return: NumaTopology
+        """
+        if self._numa_topology is not None and not refresh:
+            return self._numa_topology
+
+        start_time = time.time()
+        self.read_esxi_hosts()
+        hosts = {
+            host_name: self._read_host_hardware(host_system, host_name)
+            for host_name, host_system in list(self.esxi_host_cache['name'].items())
+        }
+        self._numa_topology = NumaTopology.from_host_hardware(hosts)
+        self.logger.debug(
+            f"read_numa_topology, took {time.time() - start_time:.2f} seconds")
+        return self._numa_topology
+
+    def read_vm_numa_nodes(
+            self,
+            vm_name: str
+    ) -> Tuple[str, List[int]]:
+        """Return esxi host and NUMA nodes VM vCPUs pinned to.  NUMA nodes resolved
+        from VM cpu affinity (physical cpu ids) and if VM has no cpu affinity
+        from numa.nodeAffinity advanced setting.  If VM is not pinned
+        method returns empty list.
+
+        :param vm_name: virtual machine name
+        :return: a tuple esxi host name and list of numa node ids.
+        :raise VMNotFoundException: if VM not found
+        """
+        _vm = self._find_by_dns_or_uuid(vm_name)
+        if _vm is None:
+            raise VMNotFoundException(f"VM '{vm_name}' not found")
+
+        host = self.get_esxi_ip_of_vm(vm_name)
+        if not isinstance(host, VMwareHost):
+            raise VMNotFoundException(f"ESXi host for VM '{vm_name}' not found")
+
+        config = _vm.config
+        topology = self.read_numa_topology()
+        if host.host not in topology.host_index:
+            topology = self.read_numa_topology(refresh=True)
+
+        cpu_affinity = config.cpuAffinity if config else None
+        if cpu_affinity is not None and cpu_affinity.affinitySet:
+            nodes = np.unique(topology.cpu_numa_nodes(host.host, cpu_affinity.affinitySet))
+            return host.host, [int(n) for n in nodes if n >= 0]
+
+        extra_config = config.extraConfig if config and config.extraConfig else []
+        for opt in extra_config:
+            if opt.key == 'numa.nodeAffinity' and opt.value:
+                return host.host, [int(n) for n in str(opt.value).split(',') if n.strip().isdigit()]
+
+        return host.host, []
+
+    def vm_colocated_sriov_devices(
+            self,
+            vm_names: Union[str, List[str]]
+    ) -> Dict[str, List[str]]:
+        """Return SR-IOV enabled PFs that on the same NUMA node as VM vCPUs.
+        Accepts list of VMs and resolve all of them in one vectorized query.
+
+        :param vm_names: virtual machine name or list of names.
+        :return: a dict where key is vm name and value list of PF pci device ids
+        """
+        if isinstance(vm_names, str):
+            vm_names = [vm_names]
+
+        placements = {
+            vm_name: self.read_vm_numa_nodes(vm_name) for vm_name in vm_names
+        }
+        return self.read_numa_topology().cluster_colocated_sriov_devices(placements)
+
     def vm_state(
             self,
             vm_name: str
@@ -1516,26 +1800,14 @@ class VMwareVimStateReader:
             }
 
             host = self.get_esxi_ip_of_vm(vm.name)
-            host_data = self.read_esxi_host(host.host)
-
-            numa_info = None
-            if host_data and host_data.hardware:
-                numa_info = host_data.hardware.numaInfo
-
-            numa_topology = {
-                'cpu': {numa_node.typeId: [str(cpu).replace('(short)', '').strip()
-                                           for cpu in numa_node.cpuID] for numa_node in numa_info.numaNode},
-
-                'pci': {numa_node.typeId: [pci.replace('\n', '').strip()
-                                           for pci in numa_node.pciId] for numa_node in numa_info.numaNode}
-            } if numa_info else {'cpu': None, 'pci': None}
+            host_hardware = self.read_host_hardware(host.host)
 
             _sriov_adapters, _vmx_net_adapters = self.vm_adapters_and_sriov_devices(vm.name)
 
             vm_states[vm_name] = {
                 'esxiHost': host.host,
-                'numa_nodes': numa_info.numNodes,
-                'numa_topology': numa_topology,
+                'numa_nodes': host_hardware.num_numa_nodes,
+                'numa_topology': host_hardware.numa_topology,
                 'esxiHostUuid': host.uuid,
                 'pnic_data': self.read_vm_pnic_info(vm.name),
                 'sriov_adapters': _sriov_adapters,
@@ -1785,14 +2057,283 @@ class VMwareVimStateReader:
             return self._vm_name_cache[name_substring]
 
         start_time = time.time()
-        self.connect_to_vcenter()
-        self.logger.debug(f"connect_to_vcenter took {time.time() - start_time:.2f} seconds")
-        vms = self.collect_properties(
-            self.si.content.rootFolder, vim.VirtualMachine, ['name', 'config.uuid'])
-        vms = [VmUuid(*v.values(), k) for k, v in vms.items() if name_substring in v['name']]
+        if self._inventory is not None:
+            # warm start, inventory snapshot already has all VM names
+            with self._inventory_lock:
+                vms = [VmUuid(uuid=v['uuid'], name=k, moid=self._vm_cache.get(k))
+                       for k, v in self._inventory.vms.items() if name_substring in k]
+        else:
+            self.connect_to_vcenter()
+            self.logger.debug(f"connect_to_vcenter took {time.time() - start_time:.2f} seconds")
+            vms = self.collect_properties(
+                self.si.content.rootFolder, vim.VirtualMachine, ['name', 'config.uuid'])
+            vms = [VmUuid(*v.values(), k) for k, v in vms.items() if name_substring in v['name']]
         self._vm_name_cache[name_substring] = vms
         for vm in vms:
             self._vm_name_cache[vm.name] = [vm]
             self._vm_name_cache[vm.uuid] = [vm]
 
         return vms
+
+    def collect_inventory(
+            self
+    ) -> InventorySnapshot:
+        """Collect light weight inventory (VMs, hosts, DVS, portgroups) and
+        change versions from vCenter.  Method uses property collector, so entire
+        inventory collected in a handful of round trips.
+
+        :return: InventorySnapshot
+        """
+        start_time = time.time()
+        self.connect_to_vcenter()
+        content = self.si.content
+        root = content.rootFolder
+
+        host_names = {}
+        hosts = {}
+        for host_ref, props in self.collect_properties(
+                root, vim.HostSystem, ['name', 'summary.hardware.uuid']).items():
+            host_names[host_ref._moId] = props['name']
+            hosts[props['name']] = {
+                'uuid': props.get('summary.hardware.uuid'),
+                'moid': host_ref._moId
+            }
+
+        vms = {}
+        for vm_ref, props in self.collect_properties(
+                root, vim.VirtualMachine,
+                ['name', 'config.uuid', 'config.changeVersion', 'runtime.host']).items():
+            host_ref = props.get('runtime.host')
+            vms[props['name']] = {
+                'uuid': props.get('config.uuid'),
+                'moid': vm_ref._moId,
+                'change_version': props.get('config.changeVersion'),
+                'host': host_names.get(host_ref._moId) if host_ref is not None else None
+            }
+
+        portgroups = defaultdict(dict)
+        for pg_ref, props in self.collect_properties(
+                root, vim.dvs.DistributedVirtualPortgroup,
+                ['key', 'name', 'config.distributedVirtualSwitch']).items():
+            switch_ref = props.get('config.distributedVirtualSwitch')
+            if switch_ref is not None:
+                portgroups[switch_ref._moId][props['key']] = props['name']
+
+        switches = {}
+        for switch_ref, props in self.collect_properties(
+                root, vim.DistributedVirtualSwitch, ['uuid', 'name', 'config.configVersion']).items():
+            switches[props['uuid']] = {
+                'moid': switch_ref._moId,
+                'name': props['name'],
+                'config_version': props.get('config.configVersion'),
+                'portgroups': portgroups.get(switch_ref._moId, {}),
+                'pnics': None
+            }
+
+        self.logger.debug(
+            f"collect_inventory, took {time.time() - start_time:.2f} seconds")
+
+        return InventorySnapshot(
+            instance_uuid=content.about.instanceUuid,
+            vcenter=self.vcenter_ip,
+            vms=vms,
+            hosts=hosts,
+            dvs=switches,
+        )
+
+    def save_inventory_snapshot(
+            self,
+            snapshot_dir: str,
+            inventory: Optional[InventorySnapshot] = None
+    ) -> str:
+        """Save inventory snapshot to disk.  Snapshot includes DVS pNICs and
+        host hardware models reader already discovered.
+
+        :param snapshot_dir: snapshot directory
+        :param inventory: optional inventory, if None collected from vCenter.
+        :return: path to snapshot file
+        """
+        inventory = inventory if inventory is not None else self.collect_inventory()
+        with self._inventory_lock:
+            for switch_uuid, switch in inventory.dvs.items():
+                switch['pnics'] = self._dvs_cache.get(switch_uuid)
+            inventory.hardware = {
+                hardware.moid: hardware.to_dict() for hardware in list(self._host_hardware.values())
+            }
+        return inventory.save(snapshot_dir)
+
+    @property
+    def inventory(self) -> Optional[InventorySnapshot]:
+        """Return inventory reader caches populated from, None if reader
+        wasn't warm started.  Once background reconcile finished it is
+        the reconciled live inventory.
+        """
+        return self._inventory
+
+    def _restore_inventory(
+            self,
+            inventory: InventorySnapshot
+    ):
+        """Populate reader caches from inventory.  Managed object
+        references re-created from moid and bound to current session.
+
+        :param inventory: InventorySnapshot
+        :return:
+        """
+        stub = self.si._stub
+        for host_name, host in inventory.hosts.items():
+            host_ref = vim.HostSystem(host['moid'], stub)
+            self.esxi_host_cache['name'][host_name] = host_ref
+            self.esxi_host_cache['uuid'][host['uuid']] = host_ref
+            self.esxi_host_cache['moId'][str(host_ref)] = host_ref
+            self._add_to_host_cache(host_ref, VMwareHost(uuid=host['uuid'], host=host_name, moid=str(host_ref)))
+            if host['moid'] in inventory.hardware:
+                hardware = EsxiHostHardware.from_dict(inventory.hardware[host['moid']])
+                for k in [host['moid'], host_name, host['uuid']]:
+                    self._host_hardware[k] = hardware
+
+        for vm_name, vm in inventory.vms.items():
+            vm_ref = vim.VirtualMachine(vm['moid'], stub)
+            self._vm_cache[vm_name] = vm_ref
+            if vm['uuid']:
+                self._vm_cache[vm['uuid']] = vm_ref
+                self._vm_name_cache[vm_name] = [VmUuid(uuid=vm['uuid'], name=vm_name, moid=vm_ref)]
+            host = inventory.hosts.get(vm['host'])
+            if host is not None:
+                self.esxi_host_cache[vm_name] = VMwareHost(
+                    uuid=host['uuid'], host=vm['host'], moid=vim.HostSystem(host['moid'], stub))
+
+        for switch_uuid, switch in inventory.dvs.items():
+            self._dvs_uuid_to_dvs[switch_uuid] = vim.dvs.VmwareDistributedVirtualSwitch(switch['moid'], stub)
+            if switch.get('pnics') is not None:
+                self._index_dvs_uplinks(switch_uuid, switch['config_version'], switch['pnics'])
+            for pg_key in switch.get('portgroups') or {}:
+                self._portgroup_switch[pg_key] = switch_uuid
+        if inventory.dvs:
+            self._dvs_index_checked = time.monotonic()
+
+    def _evict_inventory(
+            self,
+            inventory: InventorySnapshot,
+            stale: Dict[str, List[str]]
+    ):
+        """Remove stale VMs, hosts and switches from reader caches.
+        :param inventory: inventory stale entries belong to
+        :param stale: stale entries, see InventorySnapshot.stale_entries
+        :return:
+        """
+        for vm_name in stale['vms']:
+            vm = inventory.vms[vm_name]
+            self._vm_cache.pop(vm_name, None)
+            self._vm_cache.pop(vm['uuid'], None)
+            self._vm_name_cache.pop(vm_name, None)
+            self.esxi_host_cache.pop(vm_name, None)
+            self._sriov_device_cache.pop(f"vm_sriov_devices_{vm_name}", None)
+
+        for host_name in stale['hosts']:
+            host = inventory.hosts[host_name]
+            host_ref = str(vim.HostSystem(host['moid']))
+            self.esxi_host_cache['name'].pop(host_name, None)
+            self.esxi_host_cache['uuid'].pop(host['uuid'], None)
+            self.esxi_host_cache['moId'].pop(host_ref, None)
+            for k in [host_name, host['uuid'], host['moid'], host_ref]:
+                self.esxi_host_cache.pop(k, None)
+                self._host_hardware.pop(k, None)
+                self._pci_dev_cache.pop(k, None)
+            self._numa_topology = None
+
+        for switch_uuid in stale['dvs']:
+            self._drop_dvs_uplinks(switch_uuid)
+            self._dvs_uuid_to_dvs.pop(switch_uuid, None)
+
+    def reconcile_inventory(
+            self,
+            inventory: InventorySnapshot,
+            snapshot_dir: Optional[str] = None
+    ) -> Dict[str, List[str]]:
+        """Reconcile inventory (i.e. loaded from disk) against live vCenter
+        change versions.  Stale entries evicted from caches, hence next read
+        goes to vCenter, new entries added.  If snapshot_dir provided
+        reconciled snapshot saved to disk.
+
+        :param inventory: inventory reader caches populated from.
+        :param snapshot_dir: optional snapshot directory.
+        :return: stale entries, see InventorySnapshot.stale_entries
+        """
+        start_time = time.time()
+        live = self.collect_inventory()
+        stale = inventory.stale_entries(live)
+        with self._inventory_lock:
+            self._evict_inventory(inventory, stale)
+            if set(live.vms.keys()) != set(inventory.vms.keys()):
+                # substring search results no longer valid
+                self._vm_name_cache.clear()
+
+            self._restore_inventory(live)
+            self._inventory = live
+        if snapshot_dir is not None:
+            self.save_inventory_snapshot(snapshot_dir, live)
+
+        self.logger.info(
+            f"reconcile_inventory, stale vms {len(stale['vms'])} hosts {len(stale['hosts'])} "
+            f"dvs {len(stale['dvs'])}, took {time.time() - start_time:.2f} seconds")
+        return stale
+
+    def _reconcile_in_background(
+            self,
+            inventory: InventorySnapshot,
+            snapshot_dir: Optional[str] = None
+    ):
+        """Reconcile inventory, log failures."""
+        try:
+            self.reconcile_inventory(inventory, snapshot_dir)
+        except Exception as e:
+            self.logger.warning(f"Failed reconcile inventory snapshot: {e}")
+
+    def warm_start(
+            self,
+            snapshot_dir: str,
+            reconcile: Optional[bool] = True
+    ) -> bool:
+        """Warm start reader from inventory snapshot of connected vCenter.
+        Caches populated from snapshot and reconciled in background thread
+        against live change versions, so caller can start work immediately.
+
+        :param snapshot_dir: snapshot directory
+        :param reconcile: reconcile snapshot in background
+        :return: True if snapshot loaded
+        """
+        self.connect_to_vcenter()
+        instance_uuid = self.si.content.about.instanceUuid
+        inventory = InventorySnapshot.load(snapshot_dir, instance_uuid, logger=self.logger)
+        if inventory is None:
+            return False
+
+        with self._inventory_lock:
+            self._restore_inventory(inventory)
+            self._inventory = inventory
+        self.logger.info(
+            f"warm start from inventory snapshot, {len(inventory.vms)} vms, "
+            f"{len(inventory.hosts)} hosts, {len(inventory.dvs)} dvs")
+
+        if reconcile:
+            self._inventory_reconciler = threading.Thread(
+                target=self._reconcile_in_background,
+                args=(inventory, snapshot_dir),
+                name="inventory-reconcile",
+                daemon=True
+            )
+            self._inventory_reconciler.start()
+
+        return True
+
+    def wait_inventory_reconciled(
+            self,
+            timeout: Optional[float] = None
+    ):
+        """Wait for background inventory reconciliation.
+        :param timeout: optional timeout in seconds.
+        :return:
+        """
+        if self._inventory_reconciler is not None:
+            self._inventory_reconciler.join(timeout)
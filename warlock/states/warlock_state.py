@@ -75,6 +75,9 @@ class NamedTupleEncoder(json.JSONEncoder):
     def default(self, obj):
         if isinstance(obj, tuple) and hasattr(obj, '_asdict'):
             return obj._asdict()
+        # slots records, i.e. NodeRecord, PodRecord
+        if hasattr(obj, '_asdict'):
+            return obj._asdict()
         return json.JSONEncoder.default(self, obj)
 
 
@@ -97,13 +100,16 @@ class WarlockState(SpellCasterState):
         self.k8s_node_states = {}
         # k8s pod state is state read from kubernetes
         # it include 'ip', 'phase', 'node_ip', 'pod_state'
-        # where pod state is state read from kubernetes
+        # where pod state is PodRecord projected from pod read from kubernetes
         self.k8s_pods_states = {}
         # esxi node state is state read from each esxi host
         self.esxi_node_states = {}
         # iaas state is state read from particular iaas.
         # in case VMWare it vCenter
         self.iaas_state = None
+        # topology index pod -> node -> VM -> esxi host -> port id,
+        # built from the states above by CallbackTopologyIndex
+        self.topology = None
 
     def __str__(self):
         """To string warlock state